@@ -0,0 +1,144 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+CPU GEMM time of the convolutions with and without `channel_multiple` rounding of the builders.
+Every ConvLayer of the traced model is timed as the im2col GEMM [batch * h * w, kh * kw * in_f] x [kh * kw * in_f, out_f]
+(float32, numpy/BLAS), which is how CPU backends compute convolutions. Depthwise convolutions, batch normalization
+and other memory-bound layers are not timed. Extra parameters and MACs show the cost of the rounding:
+added feature maps keep the capacity of the model, so accuracy is not reduced.
+
+Usage:
+    python benchmarks/channel_alignment.py [--models DenseNet161 MobileNetV2_0_75] [--multiples 8 16 32]
+        [--batch-size 1] [--image-size 224] [--repeat 5]
+
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import time
+
+import numpy as np
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from makizoo.ir import trace
+from makizoo.analysis.cost import layer_macs, layer_params
+
+
+# model name -> (module of the family, name of the builder in this module)
+MODELS = {
+    'ResNet50': ('makizoo.backbones.resnetv1.models', 'build_ResNetV1'),
+    'Little_ResNet20': ('makizoo.backbones.resnetv1.models', 'build_LittleResNetV1'),
+    'MobileNetV2_1_0': ('makizoo.backbones.mobilenetv2.models', 'build_MobileNetV2'),
+    'MobileNetV2_0_75': ('makizoo.backbones.mobilenetv2.models', 'build_MobileNetV2'),
+    'DenseNet121': ('makizoo.backbones.densenet.models', 'build_DenseNet'),
+    'DenseNet161': ('makizoo.backbones.densenet.models', 'build_DenseNet'),
+    'ShuffleNetv2_10': ('makizoo.backbones.shufflenetv2.models', 'build_ShuffleNetV2'),
+    'ShuffleNetv2_05': ('makizoo.backbones.shufflenetv2.models', 'build_ShuffleNetV2'),
+}
+
+
+def trace_model(name, channel_multiple, input_shape):
+    """
+    Trace model factory `name` with `channel_multiple` passed into its builder.
+
+    """
+    module_name, builder_name = MODELS[name]
+    module = importlib.import_module(module_name)
+    builder = getattr(module, builder_name)
+
+    def builder_with_multiple(*args, **kwargs):
+        return builder(*args, channel_multiple=channel_multiple, **kwargs)
+
+    # Model factories call the builder by the module-level name
+    setattr(module, builder_name, builder_with_multiple)
+    try:
+        return trace(getattr(module, name), input_shape=input_shape)
+    finally:
+        setattr(module, builder_name, builder)
+
+
+def gemm_shapes(arch):
+    shapes = []
+    for spec in arch.layers:
+        if spec.type not in ('ConvLayer', 'AtrousConvLayer'):
+            continue
+        n, h, w, out_f = spec.output_shapes[0]
+        kh, kw = spec.kernel
+        shapes.append((n * h * w, kh * kw * spec.in_f, out_f))
+    return shapes
+
+
+def measure_gemm(m, k, n, repeat):
+    a = np.random.randn(m, k).astype(np.float32)
+    b = np.random.randn(k, n).astype(np.float32)
+    np.matmul(a, b)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        np.matmul(a, b)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def measure_model(arch, repeat, cache):
+    total = 0.0
+    for shape in gemm_shapes(arch):
+        if shape not in cache:
+            cache[shape] = measure_gemm(*shape, repeat)
+        total += cache[shape]
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the SIMD-aligned channel rounding.')
+    parser.add_argument('--models', nargs='+', default=list(MODELS), choices=list(MODELS))
+    parser.add_argument('--multiples', nargs='+', type=int, default=[8, 16, 32])
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument('--image-size', type=int, default=224)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    input_shape = [args.batch_size, args.image_size, args.image_size, 3]
+    cache = {}
+    print(
+        f'{"model":>16} | {"multiple":>8} | {"GEMM, ms":>9} | {"speedup":>7} | {"params":>8} | {"MACs":>8} | '
+        f'{"ms per GMAC":>11}'
+    )
+    for name in args.models:
+        reference = None
+        for channel_multiple in [None] + args.multiples:
+            arch = trace_model(name, channel_multiple, input_shape)
+            gemm_time = measure_model(arch, args.repeat, cache)
+            params = sum(layer_params(spec) for spec in arch.layers)
+            macs = sum(layer_macs(spec) for spec in arch.layers)
+            if reference is None:
+                reference = (gemm_time, params, macs)
+            print(
+                f'{name:>16} | {str(channel_multiple):>8} | {gemm_time * 1e3:9.2f} | {reference[0] / gemm_time:7.2f} | '
+                f'{(params / reference[1] - 1) * 100:+7.1f}% | {(macs / reference[2] - 1) * 100:+7.1f}% | '
+                f'{gemm_time * 1e3 / (macs / 1e9):11.2f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Micro-benchmark of the concat + channel shuffle at the end of ShuffleNetV2 units:
+ConcatLayer + ChannelShuffleLayer (reshape-transpose-reshape) against the fused version
+(`fuse_shuffle=True`), where branches are written straight into interleaved channel positions.
+Shapes are the shapes of the units of ShuffleNetV2 x0.5 with input 224x224.
+
+Usage:
+    python benchmarks/channel_shuffle.py [--batch-size 32] [--iterations 200]
+
+"""
+
+import argparse
+import time
+
+import numpy as np
+import tensorflow.compat.v1 as tf
+
+
+# (height, width, channels of one branch)
+SHAPES = [(28, 28, 24), (14, 14, 48), (7, 7, 96)]
+
+
+def concat_shuffle(x1, x2, num_groups=2):
+    # Same operations as ConcatLayer + ChannelShuffleLayer
+    x = tf.concat([x1, x2], axis=3)
+    _, h, w, c = x.get_shape().as_list()
+    x = tf.reshape(x, [-1, h, w, num_groups, c // num_groups])
+    x = tf.transpose(x, [0, 1, 2, 4, 3])
+    return tf.reshape(x, [-1, h, w, c])
+
+
+def fused_concat_shuffle(x1, x2):
+    # Same operations as ConcatChannelShuffle with `fuse_shuffle=True`
+    _, h, w, c = x1.get_shape().as_list()
+    x1 = tf.reshape(x1, [-1, h, w, c, 1])
+    x2 = tf.reshape(x2, [-1, h, w, c, 1])
+    x = tf.concat([x1, x2], axis=4)
+    return tf.reshape(x, [-1, h, w, 2 * c])
+
+
+def measure(sess, op, iterations):
+    for _ in range(10):
+        sess.run(op)
+    times = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        sess.run(op)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the fused concat + channel shuffle.')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+    tf.disable_eager_execution()
+
+    print(f'{"shape":>16} | {"concat+shuffle, us":>18} | {"fused, us":>10} | {"speedup":>7} | max diff')
+    for h, w, c in SHAPES:
+        graph = tf.Graph()
+        with graph.as_default():
+            x1 = tf.Variable(np.random.randn(args.batch_size, h, w, c).astype(np.float32))
+            x2 = tf.Variable(np.random.randn(args.batch_size, h, w, c).astype(np.float32))
+            reference = concat_shuffle(x1, x2)
+            fused = fused_concat_shuffle(x1, x2)
+            # Run ops without fetching the result into numpy
+            reference_op = tf.group(reference)
+            fused_op = tf.group(fused)
+            empty_op = tf.no_op()
+            max_diff = tf.reduce_max(tf.abs(reference - fused))
+
+            # Grappler prunes ops which only have control outputs, so `tf.group` would not run them
+            config = tf.ConfigProto()
+            config.graph_options.rewrite_options.disable_meta_optimizer = True
+            with tf.Session(graph=graph, config=config) as sess:
+                sess.run(tf.global_variables_initializer())
+                overhead = measure(sess, empty_op, args.iterations)
+                reference_time = measure(sess, reference_op, args.iterations) - overhead
+                fused_time = measure(sess, fused_op, args.iterations) - overhead
+                diff = sess.run(max_diff)
+
+        print(
+            f'{str([args.batch_size, h, w, 2 * c]):>16} | {reference_time * 1e6:18.1f} | {fused_time * 1e6:10.1f} | '
+            f'{reference_time / fused_time:7.2f} | {diff}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Latency of the zoo models in NHWC and NCHW data formats (`data_format` argument of the builders).
+MakiFlow layers support only NHWC, so every model is traced into the IR in both formats and
+the IR is executed with raw TensorFlow ops (see `makizoo.ir.build_tf_graph`) which are given
+the data format of the layer. Weights are random, only the speed is measured.
+On GPU (cuDNN) NCHW is usually faster, on CPU NHWC is usually faster.
+
+Usage:
+    python benchmarks/data_format.py [--models ResNet50 MobileNetV2_1_0] [--batch-size 8]
+        [--image-size 224] [--iterations 50]
+
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import time
+
+import numpy as np
+import tensorflow.compat.v1 as tf
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from makizoo.ir import trace, build_tf_graph, NHWC, NCHW, DATA_FORMATS, from_nhwc
+from makizoo.ir.weights import random_weights
+
+
+# model name -> (module of the family, name of the builder in this module)
+MODELS = {
+    'ResNet50': ('makizoo.backbones.resnetv1.models', 'build_ResNetV1'),
+    'MobileNetV2_1_0': ('makizoo.backbones.mobilenetv2.models', 'build_MobileNetV2'),
+    'DenseNet121': ('makizoo.backbones.densenet.models', 'build_DenseNet'),
+    'ShuffleNetv2_10': ('makizoo.backbones.shufflenetv2.models', 'build_ShuffleNetV2'),
+    'VGG16': ('makizoo.backbones.vgg.models', 'build_VGG'),
+}
+
+
+def trace_model(name, data_format, input_shape):
+    """
+    Trace model factory `name` with `data_format` passed into its builder.
+
+    """
+    module_name, builder_name = MODELS[name]
+    module = importlib.import_module(module_name)
+    builder = getattr(module, builder_name)
+
+    def builder_with_format(*args, **kwargs):
+        return builder(*args, data_format=data_format, **kwargs)
+
+    # Model factories call the builder by the module-level name
+    setattr(module, builder_name, builder_with_format)
+    try:
+        return trace(getattr(module, name), input_shape=input_shape)
+    finally:
+        setattr(module, builder_name, builder)
+
+
+def build_graph(arch):
+    """
+    Build TensorFlow ops of the IR with random weights, input is a variable so that feeding does not count in the time.
+
+    """
+    x = tf.Variable(np.random.randn(*arch.get_shape(arch.inputs[0])).astype(np.float32))
+    tensors = build_tf_graph(arch, random_weights(arch), inputs={arch.inputs[0]: x})
+    return [tensors[name] for name in arch.outputs]
+
+
+def measure(sess, op, iterations):
+    for _ in range(10):
+        sess.run(op)
+    times = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        sess.run(op)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the NHWC and NCHW data formats.')
+    parser.add_argument('--models', nargs='+', default=list(MODELS), choices=list(MODELS))
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--image-size', type=int, default=224)
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+    tf.disable_eager_execution()
+
+    print(f'{"model":>16} | {"NHWC, ms":>9} | {"NCHW, ms":>9} | {"faster":>6}')
+    for name in args.models:
+        times = {}
+        for data_format in DATA_FORMATS:
+            input_shape = from_nhwc([args.batch_size, args.image_size, args.image_size, 3], data_format)
+            arch = trace_model(name, data_format, input_shape)
+            graph = tf.Graph()
+            with graph.as_default():
+                # Only sums are fetched: grappler prunes ops which only have control outputs,
+                # so `tf.group` would not run the model
+                op = [tf.reduce_sum(output) for output in build_graph(arch)]
+                with tf.Session(graph=graph) as sess:
+                    sess.run(tf.global_variables_initializer())
+                    times[data_format] = measure(sess, op, args.iterations)
+
+        faster = min(times, key=times.get)
+        print(f'{name:>16} | {times[NHWC] * 1e3:9.2f} | {times[NCHW] * 1e3:9.2f} | {faster:>6}')
+
+
+if __name__ == '__main__':
+    main()
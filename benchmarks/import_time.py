@@ -0,0 +1,89 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Cold-start import time of the zoo.
+Every statement is executed in a fresh interpreter, so nothing is cached between runs.
+
+Usage:
+    python benchmarks/import_time.py [--repeat 5]
+
+"""
+
+import argparse
+import subprocess
+import sys
+import os
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATEMENTS = [
+    # Constants and pure helpers, must not load tensorflow
+    'import makizoo.backbones',
+    'from makizoo.backbones.mobilenetv2 import make_divisible',
+    'from makizoo.backbones.shufflenetv2 import SIZE_2_CONFIG_MODEL',
+    # Single family
+    'from makizoo.backbones.mobilenetv2 import MobileNetV2_1_0',
+    # Whole zoo, i.e. what every import cost before lazy loading
+    'from makizoo.backbones.resnetv1 import ResNet50; '
+    'from makizoo.backbones.mobilenetv2 import MobileNetV2_1_0; '
+    'from makizoo.backbones.densenet import DenseNet121; '
+    'from makizoo.backbones.shufflenetv2 import ShuffleNetv2_10; '
+    'from makizoo.backbones.vgg import VGG16',
+]
+
+TEMPLATE = (
+    'import time, sys\n'
+    'start = time.perf_counter()\n'
+    '{statement}\n'
+    'print(time.perf_counter() - start, int("tensorflow" in sys.modules))\n'
+)
+
+
+def measure(statement, repeat):
+    times = []
+    loaded_tf = False
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, '-c', TEMPLATE.format(statement=statement)],
+            cwd=ROOT, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            return None, result.stderr.strip().splitlines()[-1]
+        elapsed, tf_flag = result.stdout.split()
+        times.append(float(elapsed))
+        loaded_tf = bool(int(tf_flag))
+    return min(times), loaded_tf
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure cold-start import time of MakiZoo.')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of fresh interpreters per statement.')
+    args = parser.parse_args()
+
+    print(f'{"time, ms":>10} | {"tensorflow":>10} | statement')
+    for statement in STATEMENTS:
+        elapsed, loaded_tf = measure(statement, args.repeat)
+        if elapsed is None:
+            print(f'{"failed":>10} | {"-":>10} | {statement}\n{"":>13} {loaded_tf}')
+            continue
+        print(f'{elapsed * 1000:10.1f} | {str(loaded_tf):>10} | {statement}')
+
+
+if __name__ == '__main__':
+    main()
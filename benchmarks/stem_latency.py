@@ -0,0 +1,131 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Latency benchmark of the ResNet/DenseNet stems (`stem` argument of the builders):
+7x7/2 conv + BN + ReLU + 3x3/2 max pooling against the space-to-depth stem,
+which is a 4x4/4 VALID conv + BN + ReLU. Both stems have output stride 4 and 64 output channels.
+The space-to-depth stem is also measured as tf.nn.space_to_depth + 1x1 conv to check
+that the single strided conv is not slower than the explicit rearrangement.
+
+Usage:
+    python benchmarks/stem_latency.py [--batch-size 8] [--iterations 50] [--sizes 224 512 1024]
+
+"""
+
+import argparse
+import time
+
+import numpy as np
+import tensorflow.compat.v1 as tf
+
+
+OUT_F = 64
+BLOCK = 4
+
+
+def batch_norm(x):
+    # Inference batch normalization with the moving statistics, the same as BatchNormLayer
+    mean = tf.Variable(np.random.randn(OUT_F).astype(np.float32) * 0.1)
+    variance = tf.Variable(np.random.uniform(0.5, 1.5, size=OUT_F).astype(np.float32))
+    gamma = tf.Variable(np.ones(OUT_F, dtype=np.float32))
+    beta = tf.Variable(np.zeros(OUT_F, dtype=np.float32))
+    return tf.nn.batch_normalization(x, mean, variance, beta, gamma, variance_epsilon=1e-3)
+
+
+def conv_stem(x, in_f):
+    w = tf.Variable(np.random.randn(7, 7, in_f, OUT_F).astype(np.float32) * 0.01)
+    x = tf.nn.conv2d(x, w, strides=[1, 2, 2, 1], padding='SAME')
+    x = batch_norm(x)
+    x = tf.nn.relu(x)
+    return tf.nn.max_pool(x, ksize=[1, 3, 3, 1], strides=[1, 2, 2, 1], padding='SAME')
+
+
+def s2d_stem(x, in_f):
+    # Same operations as SpaceToDepthConv + BN + activation
+    w = tf.Variable(np.random.randn(BLOCK, BLOCK, in_f, OUT_F).astype(np.float32) * 0.01)
+    x = tf.nn.conv2d(x, w, strides=[1, BLOCK, BLOCK, 1], padding='VALID')
+    x = batch_norm(x)
+    return tf.nn.relu(x)
+
+
+def explicit_s2d_stem(x, in_f):
+    w = tf.Variable(np.random.randn(1, 1, BLOCK * BLOCK * in_f, OUT_F).astype(np.float32) * 0.01)
+    x = tf.nn.space_to_depth(x, BLOCK)
+    x = tf.nn.conv2d(x, w, strides=[1, 1, 1, 1], padding='VALID')
+    x = batch_norm(x)
+    return tf.nn.relu(x)
+
+
+STEMS = [
+    ('conv 7x7/2 + pool', conv_stem, 7 * 7),
+    ('s2d conv 4x4/4', s2d_stem, BLOCK * BLOCK),
+    ('space_to_depth + 1x1', explicit_s2d_stem, BLOCK * BLOCK),
+]
+
+
+def measure(sess, op, iterations):
+    for _ in range(10):
+        sess.run(op)
+    times = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        sess.run(op)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the space-to-depth stem.')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[224, 512, 1024])
+    args = parser.parse_args()
+    tf.disable_eager_execution()
+
+    in_f = 3
+    print(f'{"input":>20} | {"stem":>22} | {"MMACs":>8} | {"ms":>8} | {"speedup":>7}')
+    for size in args.sizes:
+        baseline_time = None
+        for name, stem_fn, kernel_area in STEMS:
+            graph = tf.Graph()
+            with graph.as_default():
+                x = tf.Variable(np.random.randn(args.batch_size, size, size, in_f).astype(np.float32))
+                # Run ops without fetching the result into numpy
+                op = tf.group(stem_fn(x, in_f))
+                empty_op = tf.no_op()
+                # Grappler prunes ops which only have control outputs, so `tf.group` would not run them
+                config = tf.ConfigProto()
+                config.graph_options.rewrite_options.disable_meta_optimizer = True
+                with tf.Session(graph=graph, config=config) as sess:
+                    sess.run(tf.global_variables_initializer())
+                    overhead = measure(sess, empty_op, args.iterations)
+                    stem_time = measure(sess, op, args.iterations) - overhead
+
+            conv_size = size // 2 if stem_fn is conv_stem else size // BLOCK
+            macs = args.batch_size * conv_size * conv_size * kernel_area * in_f * OUT_F
+            if baseline_time is None:
+                baseline_time = stem_time
+            print(
+                f'{str([args.batch_size, size, size, in_f]):>20} | {name:>22} | {macs / 1e6:8.1f} | '
+                f'{stem_time * 1e3:8.2f} | {baseline_time / stem_time:7.2f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
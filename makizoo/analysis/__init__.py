@@ -0,0 +1,21 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+from .profiler import profile, profile_arch, ModelProfile, BlockProfile, LayerProfile
+from .grouping import group_layers, match_block
+from .cost import layer_macs, layer_params, layer_activation_bytes
+from .memory import plan_memory, plan_memory_arch, MemoryPlan, TensorLifetime, INFERENCE, TRAINING
@@ -0,0 +1,94 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Analytical cost of the single layer spec.
+All values are computed from static shapes of the IR, no tensorflow session is required.
+
+"""
+
+FLOAT32_BYTES = 4
+# float16 and bfloat16
+FLOAT16_BYTES = 2
+
+
+def num_elements(shape):
+    """
+    Number of elements in the tensor with `shape`.
+    Raise ValueError if some dimension is unknown.
+
+    """
+    result = 1
+    for dim in shape:
+        if dim is None:
+            raise ValueError(
+                f'Shape {shape} has unknown dimensions, cost can be computed only for fully specified shapes.'
+            )
+        result *= dim
+    return result
+
+
+def layer_macs(spec):
+    """
+    Number of multiply-add operations of the layer.
+    Conv (including atrous), depthwise conv and dense layers are counted as usual, batch normalization
+    is counted as one multiply-add per element (scale and shift at inference),
+    other layers (activations, pooling, concat, etc.) are counted as zero.
+
+    """
+    if spec.type in ('ConvLayer', 'AtrousConvLayer'):
+        kh, kw = spec.kernel
+        return num_elements(spec.output_shapes[0]) * kh * kw * spec.in_f
+    if spec.type == 'DepthWiseConvLayer':
+        kh, kw = spec.kernel
+        return num_elements(spec.output_shapes[0]) * kh * kw
+    if spec.type == 'DenseLayer':
+        return num_elements(spec.output_shapes[0]) * spec.in_f
+    if spec.type == 'BatchNormLayer':
+        return num_elements(spec.output_shapes[0])
+    return 0
+
+
+def layer_params(spec):
+    """
+    Number of parameters of the layer (including non-trainable statistics of batch normalization).
+
+    """
+    use_bias = spec.kwargs.get('use_bias', True)
+    if spec.type in ('ConvLayer', 'AtrousConvLayer'):
+        kh, kw = spec.kernel
+        return kh * kw * spec.in_f * spec.out_f + (spec.out_f if use_bias else 0)
+    if spec.type == 'DepthWiseConvLayer':
+        kh, kw = spec.kernel
+        return kh * kw * spec.out_f + (spec.out_f if use_bias else 0)
+    if spec.type == 'DenseLayer':
+        return spec.in_f * spec.out_f + (spec.out_f if use_bias else 0)
+    if spec.type == 'BatchNormLayer':
+        # mean and var + gamma and beta if they are used
+        count = 2
+        count += int(spec.kwargs.get('use_gamma', True))
+        count += int(spec.kwargs.get('use_beta', True))
+        return count * spec.out_f
+    return 0
+
+
+def layer_activation_bytes(spec, dtype_bytes=FLOAT32_BYTES):
+    """
+    Size of the outputs of the layer in bytes.
+
+    """
+    return sum(num_elements(shape) for shape in spec.output_shapes) * dtype_bytes
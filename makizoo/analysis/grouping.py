@@ -0,0 +1,108 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import re
+
+
+# Prefixes of the layer names which are used by blocks of the zoo
+BLOCK_PATTERNS = (
+    # ResNet with pointwise, PREFIX_NAME_BLOCK = "block{}/unit_{}"
+    re.compile(r'^(block\d+/unit_\d+)/'),
+    # ResNet without pointwise, PREFIX_NAME_BLOCK_WOP = "stage{}_unit{}_"
+    re.compile(r'^(stage\d+_unit\d+_)'),
+    # MobileNetV2, first block is "expanded_conv/", others "expanded_conv_{}/"
+    re.compile(r'^(expanded_conv(?:_\d+)?)/'),
+    # DenseNet, dense layers "conv{}_block{}_" and transitions "pool{}_"
+    re.compile(r'^(conv\d+_block\d+_)'),
+    re.compile(r'^(pool\d+_)'),
+    # ShuffleNetV2, "{}_block_down_shufflenet_" and "{}_block_num_{}_shufflenet_"
+    re.compile(r'^(\d+_block_(?:down|num_\d+)_shufflenet_)'),
+    # VGG, "conv{}/conv{}_" and "block{}_pool"
+    re.compile(r'^(conv\d+)/conv\d+_'),
+    re.compile(r'^block(\d+)_pool$'),
+)
+
+STEM = 'stem'
+HEAD = 'head'
+
+
+def match_block(layer_name):
+    """
+    Return name of the block to which layer belongs according to `BLOCK_PATTERNS`,
+    None if name of the layer does not match any of them.
+
+    """
+    for pattern in BLOCK_PATTERNS:
+        result = pattern.match(layer_name)
+        if result is not None:
+            block_name = result.group(1)
+            # VGG pool layer belongs to the block with the same number
+            if pattern is BLOCK_PATTERNS[-1]:
+                block_name = f'conv{block_name}'
+            return block_name
+    return None
+
+
+def group_layers(arch):
+    """
+    Assign every layer of the IR to the block.
+
+    Rules:
+    - Layer which name matches one of `BLOCK_PATTERNS` belongs to the matched block;
+    - SumLayer belongs to the block of its input (names of sum operations in ResNet
+      contains the number of the block and can not be parsed unambiguously);
+    - Layers before the first block belong to 'stem', after the last block - to 'head';
+    - Other layers (activations between blocks, for example) belong to the previous block.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model.
+
+    Returns
+    -------
+    dict
+        Mapping from the name of the layer to the name of the block.
+
+    """
+    matched = {}
+    for spec in arch.layers:
+        block_name = None
+        if spec.type == 'SumLayer':
+            for tensor_name in spec.inputs:
+                block_name = matched.get(arch.producer(tensor_name).name)
+                if block_name is not None:
+                    break
+        if block_name is None:
+            block_name = match_block(spec.name)
+        matched[spec.name] = block_name
+
+    last_matched = max(
+        (i for i, spec in enumerate(arch.layers) if matched[spec.name] is not None),
+        default=len(arch.layers)
+    )
+
+    layer2block = {}
+    previous_block = STEM
+    for i, spec in enumerate(arch.layers):
+        block_name = matched[spec.name]
+        if block_name is None:
+            block_name = HEAD if i > last_matched else previous_block
+        layer2block[spec.name] = block_name
+        previous_block = block_name
+
+    return layer2block
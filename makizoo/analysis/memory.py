@@ -0,0 +1,292 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+from makizoo.ir import ArchitectureIR, trace
+from .cost import num_elements, layer_params, FLOAT32_BYTES
+
+
+INFERENCE = 'inference'
+TRAINING = 'training'
+
+# Layers which output is a view of the input (no new buffer is allocated)
+ALIAS_LAYERS = ('ReshapeLayer', 'FlattenLayer', 'DropoutLayer')
+
+
+class TensorLifetime:
+    """
+    Lifetime of the buffer: it is allocated before execution of the layer with index `start`
+    and released after execution of the layer with index `end`.
+
+    """
+    def __init__(self, name, start, end, bytes_per_sample):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.bytes_per_sample = bytes_per_sample
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    def __repr__(self):
+        return f'TensorLifetime(name={self.name}, start={self.start}, end={self.end}, bytes={self.bytes_per_sample})'
+
+
+class MemoryPlan:
+    """
+    Result of the `plan_memory`.
+    All sizes are stored per sample, methods scale them to the certain batch size.
+
+    Attributes
+    ----------
+    lifetimes : list
+        List of `TensorLifetime` of every buffer.
+    timeline : list
+        Resident activation bytes (per sample) during execution of every layer.
+    layer_names : list
+        Names of the layers in the order of execution.
+    params_bytes : int
+        Size of all parameters of the model.
+    mode : str
+        'inference' or 'training'.
+    recompute_bytes_per_sample : int
+        Size of the largest recomputed segment, i.e. additional memory
+        which is required to recompute activations during the backward pass.
+
+    """
+    def __init__(self, name, lifetimes, timeline, layer_names, params_bytes, mode, recompute_bytes_per_sample=0):
+        self.name = name
+        self.lifetimes = lifetimes
+        self.timeline = timeline
+        self.layer_names = layer_names
+        self.params_bytes = params_bytes
+        self.mode = mode
+        self.recompute_bytes_per_sample = recompute_bytes_per_sample
+
+        self._peak_index = max(range(len(timeline)), key=lambda i: timeline[i])
+
+    @property
+    def peak_bytes_per_sample(self):
+        return max(self.timeline[self._peak_index], self.timeline[-1] + self.recompute_bytes_per_sample)
+
+    @property
+    def peak_layer(self):
+        """
+        Name of the layer during execution of which memory usage is the highest.
+
+        """
+        return self.layer_names[self._peak_index]
+
+    @property
+    def sum_bytes_per_sample(self):
+        """
+        Sum of sizes of all buffers, i.e. memory usage without any reuse.
+
+        """
+        return sum(lifetime.bytes_per_sample for lifetime in self.lifetimes)
+
+    def live_at_peak(self):
+        """
+        Return list of `TensorLifetime` of buffers which are resident at the peak.
+
+        """
+        return [
+            lifetime for lifetime in self.lifetimes
+            if lifetime.start <= self._peak_index <= lifetime.end
+        ]
+
+    def peak_bytes(self, batch_size=1, include_params=False):
+        """
+        Peak resident activation bytes for the `batch_size`.
+
+        """
+        peak = self.peak_bytes_per_sample * batch_size
+        if include_params:
+            peak += self.params_bytes
+        return peak
+
+    def max_batch_size(self, budget_bytes, include_params=True):
+        """
+        Largest batch size which activations (and parameters if `include_params` is True) fit into `budget_bytes`.
+
+        """
+        available = budget_bytes - (self.params_bytes if include_params else 0)
+        if available <= 0:
+            return 0
+        return int(available // self.peak_bytes_per_sample)
+
+    def summary(self, batch_size=1, budget_bytes=None):
+        lines = [
+            f'{self.name} ({self.mode})',
+            f'params, MB: {self.params_bytes / 2 ** 20:.2f}',
+            f'peak activations for batch {batch_size}, MB: {self.peak_bytes(batch_size) / 2 ** 20:.2f} '
+            f'(at layer {self.peak_layer})',
+            f'sum of all activations for batch {batch_size}, MB: '
+            f'{self.sum_bytes_per_sample * batch_size / 2 ** 20:.2f}',
+        ]
+        if self.recompute_bytes_per_sample > 0:
+            lines.append(
+                f'largest recomputed segment for batch {batch_size}, MB: '
+                f'{self.recompute_bytes_per_sample * batch_size / 2 ** 20:.2f}'
+            )
+        if budget_bytes is not None:
+            lines.append(
+                f'max batch size for budget {budget_bytes / 2 ** 20:.2f} MB: {self.max_batch_size(budget_bytes)}'
+            )
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return (
+            f'MemoryPlan(name={self.name}, mode={self.mode}, '
+            f'peak MB per sample={self.peak_bytes_per_sample / 2 ** 20:.2f}, peak layer={self.peak_layer})'
+        )
+
+
+def _normalize_segments(recompute):
+    if recompute is None:
+        return []
+    return [[segment] if isinstance(segment, str) else list(segment) for segment in recompute]
+
+
+def plan_memory_arch(arch: ArchitectureIR, dtype_bytes=FLOAT32_BYTES, mode=INFERENCE, name=None, recompute=None):
+    """
+    Compute lifetimes of the activations of the IR and peak resident activation memory.
+
+    Every output of the layer is allocated right before execution of the layer
+    and released after execution of its last consumer (outputs of the model are never released).
+    Outputs of reshape, flatten and dropout layers are considered as views of their inputs.
+    In 'training' mode all activations are kept until the end of the forward pass,
+    because they are required by the backward pass, except outputs of the layers from `recompute`:
+    they are released as in 'inference' mode and recomputed segment by segment during the backward pass.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model. Batch dimension can be unknown, all other dimensions must be known.
+    dtype_bytes : int
+        Size of one element of activations in bytes, 4 for float32.
+    mode : str
+        'inference' or 'training'.
+    name : str
+        Name of the plan (used in summary).
+    recompute : list
+        Segments of layers which outputs are recomputed during the backward pass (used only in 'training' mode).
+        Every segment is a list of names of the layers which are recomputed together, single name is a segment too.
+
+    Returns
+    -------
+    MemoryPlan
+
+    """
+    if mode not in (INFERENCE, TRAINING):
+        raise ValueError(f'Unknown mode: {mode}. Available: {INFERENCE}, {TRAINING}')
+
+    last_index = len(arch.layers) - 1
+    # Buffer to which tensor belongs (views share buffer of their input)
+    tensor2buffer = {}
+    buffers = {}
+    for index, spec in enumerate(arch.layers):
+        for tensor_name, shape in zip(spec.outputs, spec.output_shapes):
+            if spec.type in ALIAS_LAYERS:
+                tensor2buffer[tensor_name] = tensor2buffer[spec.inputs[0]]
+                continue
+
+            tensor2buffer[tensor_name] = tensor_name
+            buffers[tensor_name] = TensorLifetime(
+                name=tensor_name,
+                start=index,
+                end=index,
+                bytes_per_sample=num_elements(shape[1:]) * dtype_bytes
+            )
+
+        for tensor_name in spec.inputs:
+            lifetime = buffers[tensor2buffer[tensor_name]]
+            lifetime.end = max(lifetime.end, index)
+
+    model_outputs = set(tensor2buffer[tensor_name] for tensor_name in arch.outputs)
+    keep_until_end = set(model_outputs)
+    recompute_bytes = 0
+    if mode == TRAINING:
+        keep_until_end = set(buffers)
+        for segment in _normalize_segments(recompute):
+            segment_buffers = set(
+                tensor2buffer[tensor_name]
+                for layer_name in segment
+                for tensor_name in arch.get_layer(layer_name).outputs
+            ) - model_outputs
+            keep_until_end -= segment_buffers
+            recompute_bytes = max(
+                recompute_bytes,
+                sum(buffers[buffer_name].bytes_per_sample for buffer_name in segment_buffers)
+            )
+
+    for buffer_name in keep_until_end:
+        buffers[buffer_name].end = last_index
+
+    timeline = [0] * len(arch.layers)
+    for lifetime in buffers.values():
+        for index in range(lifetime.start, lifetime.end + 1):
+            timeline[index] += lifetime.bytes_per_sample
+
+    params_bytes = sum(layer_params(spec) for spec in arch.layers) * FLOAT32_BYTES
+    return MemoryPlan(
+        name=name,
+        lifetimes=list(buffers.values()),
+        timeline=timeline,
+        layer_names=[spec.name for spec in arch.layers],
+        params_bytes=params_bytes,
+        mode=mode,
+        recompute_bytes_per_sample=recompute_bytes
+    )
+
+
+def plan_memory(model_fn, input_shape, dtype_bytes=FLOAT32_BYTES, mode=INFERENCE, recompute=None, **kwargs):
+    """
+    Compute peak resident activation memory of the model without building tensorflow graph.
+
+    Parameters
+    ----------
+    model_fn : function
+        Any builder or model from the zoo, for example `DenseNet121` or `build_ResNetV1`.
+    input_shape : list
+        Input shape of the model. Batch dimension is ignored (can be None),
+        use `MemoryPlan.peak_bytes(batch_size)` to get memory for the certain batch size.
+    dtype_bytes : int
+        Size of one element of activations in bytes, 4 for float32.
+    mode : str
+        'inference' or 'training'.
+    recompute : list
+        Segments of layers which outputs are recomputed during the backward pass, see `plan_memory_arch`.
+    kwargs : dict
+        Additional arguments of `model_fn`.
+
+    Returns
+    -------
+    MemoryPlan
+
+    Examples
+    --------
+    >>> from makizoo.backbones.densenet import DenseNet169
+    >>> plan = plan_memory(DenseNet169, [None, 224, 224, 3], include_top=True)
+    >>> plan.peak_bytes(batch_size=32)
+    >>> plan.max_batch_size(budget_bytes=8 * 2 ** 30)
+
+    """
+    arch = trace(model_fn, input_shape=input_shape, **kwargs)
+    return plan_memory_arch(
+        arch, dtype_bytes=dtype_bytes, mode=mode,
+        name=getattr(model_fn, '__name__', None), recompute=recompute
+    )
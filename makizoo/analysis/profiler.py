@@ -0,0 +1,200 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+from collections import OrderedDict
+
+from makizoo.ir import ArchitectureIR, trace
+from .cost import layer_macs, layer_params, layer_activation_bytes, FLOAT32_BYTES
+from .grouping import group_layers
+
+
+class LayerProfile:
+    def __init__(self, name, type, block, output_shapes, macs, params, activation_bytes):
+        self.name = name
+        self.type = type
+        self.block = block
+        self.output_shapes = output_shapes
+        self.macs = macs
+        self.params = params
+        self.activation_bytes = activation_bytes
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+class BlockProfile:
+    def __init__(self, name):
+        self.name = name
+        self.layers = []
+        self.macs = 0
+        self.params = 0
+        self.activation_bytes = 0
+
+    def add(self, layer: LayerProfile):
+        self.layers.append(layer.name)
+        self.macs += layer.macs
+        self.params += layer.params
+        self.activation_bytes += layer.activation_bytes
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+class ModelProfile:
+    """
+    Result of the `profile`: cost of every layer, every block and of the whole model.
+
+    Attributes
+    ----------
+    layers : list
+        List of `LayerProfile` in the order of execution.
+    blocks : OrderedDict
+        Mapping from the name of the block to `BlockProfile`.
+    macs : int
+        Total number of multiply-add operations.
+    flops : int
+        Total number of floating point operations, i.e. 2 * `macs`.
+    params : int
+        Total number of parameters.
+    activation_bytes : int
+        Total size of all outputs of all layers.
+
+    """
+    def __init__(self, name, layers, blocks):
+        self.name = name
+        self.layers = layers
+        self.blocks = blocks
+        self.macs = sum(layer.macs for layer in layers)
+        self.params = sum(layer.params for layer in layers)
+        self.activation_bytes = sum(layer.activation_bytes for layer in layers)
+
+    @property
+    def flops(self):
+        return 2 * self.macs
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'macs': self.macs,
+            'flops': self.flops,
+            'params': self.params,
+            'activation_bytes': self.activation_bytes,
+            'blocks': [block.to_dict() for block in self.blocks.values()],
+            'layers': [layer.to_dict() for layer in self.layers],
+        }
+
+    def summary(self, by_layers=False):
+        """
+        Return table (as string) with cost of every block (or layer if `by_layers` is True).
+
+        """
+        rows = self.layers if by_layers else list(self.blocks.values())
+        name_width = max([len(row.name) for row in rows] + [len('name')])
+        lines = [
+            f'{"name":<{name_width}} | {"MMACs":>10} | {"params":>12} | {"act, MB":>10}',
+            '-' * (name_width + 43)
+        ]
+        for row in rows:
+            lines.append(
+                f'{row.name:<{name_width}} | {row.macs / 1e6:10.2f} | '
+                f'{row.params:12d} | {row.activation_bytes / 2 ** 20:10.2f}'
+            )
+        lines.append('-' * (name_width + 43))
+        lines.append(
+            f'{"total":<{name_width}} | {self.macs / 1e6:10.2f} | '
+            f'{self.params:12d} | {self.activation_bytes / 2 ** 20:10.2f}'
+        )
+        if self.name is not None:
+            lines.insert(0, self.name)
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return (
+            f'ModelProfile(name={self.name}, GMACs={self.macs / 1e9:.3f}, '
+            f'params={self.params}, activation MB={self.activation_bytes / 2 ** 20:.2f})'
+        )
+
+
+def profile_arch(arch: ArchitectureIR, dtype_bytes=FLOAT32_BYTES, name=None):
+    """
+    Compute cost of every layer and block of the IR.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model with fully specified shapes.
+    dtype_bytes : int
+        Size of one element of activations in bytes, 4 for float32.
+    name : str
+        Name of the profile (used in summary).
+
+    Returns
+    -------
+    ModelProfile
+
+    """
+    layer2block = group_layers(arch)
+    layers = []
+    blocks = OrderedDict()
+    for spec in arch.layers:
+        layer = LayerProfile(
+            name=spec.name,
+            type=spec.type,
+            block=layer2block[spec.name],
+            output_shapes=spec.output_shapes,
+            macs=layer_macs(spec),
+            params=layer_params(spec),
+            activation_bytes=layer_activation_bytes(spec, dtype_bytes=dtype_bytes)
+        )
+        layers.append(layer)
+        if layer.block not in blocks:
+            blocks[layer.block] = BlockProfile(layer.block)
+        blocks[layer.block].add(layer)
+
+    return ModelProfile(name=name, layers=layers, blocks=blocks)
+
+
+def profile(model_fn, input_shape, dtype_bytes=FLOAT32_BYTES, **kwargs):
+    """
+    Compute multiply-adds, number of parameters and size of activations
+    of every layer and block of the model without building tensorflow graph.
+
+    Parameters
+    ----------
+    model_fn : function
+        Any builder or model from the zoo, for example `ResNet50` or `build_DenseNet`.
+    input_shape : list
+        Input shape of the model, all dimensions must be known. Example: [1, 224, 224, 3].
+    dtype_bytes : int
+        Size of one element of activations in bytes, 4 for float32.
+    kwargs : dict
+        Additional arguments of `model_fn`.
+
+    Returns
+    -------
+    ModelProfile
+
+    Examples
+    --------
+    >>> from makizoo.backbones.resnetv1 import ResNet50
+    >>> from makizoo.backbones.mobilenetv2 import MobileNetV2_1_4
+    >>> for model_fn in [ResNet50, MobileNetV2_1_4]:
+    ...     print(profile(model_fn, [1, 224, 224, 3], include_top=True))
+
+    """
+    arch = trace(model_fn, input_shape=input_shape, **kwargs)
+    return profile_arch(arch, dtype_bytes=dtype_bytes, name=getattr(model_fn, '__name__', None))
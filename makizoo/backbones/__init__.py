@@ -15,5 +15,11 @@
 # You should have received a copy of the GNU General Public License
 # along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
 
+from makizoo.lazy import attach
 
-
+# Every family is imported only on first access,
+# i.e. `from makizoo.backbones import mobilenetv2` does not load other families
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=['resnetv1', 'mobilenetv2', 'densenet', 'shufflenetv2', 'vgg', 'blocks', 'utils']
+)
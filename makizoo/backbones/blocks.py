@@ -0,0 +1,66 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+from makizoo.layers import *
+from makiflow.layers.utils import InitConvKernel
+
+from makizoo.ir import NHWC, layout_kwargs
+from .utils import SPACE_TO_DEPTH_BLOCK, get_channels
+
+
+def SpaceToDepthConv(
+        x,
+        out_f: int,
+        name: str,
+        use_bias=False,
+        kernel_initializer=InitConvKernel.HE,
+        data_format=NHWC):
+    """
+    Stem of the TResNet style: space-to-depth with block 4 followed by 1x1 convolution.
+    Both operations are expressed as one convolution with 4x4 kernel, stride 4 and 'VALID' padding:
+    every output pixel reads its own 4x4 patch of the input once, instead of overlapping 7x7 windows
+    of the usual stem and the max pooling after it. Weight W[dy, dx, c, o] of this convolution is the weight
+    of the 1x1 convolution for the channel (dy * 4 + dx) * in_f + c of `tf.nn.space_to_depth(x, 4)`.
+
+    Parameters
+    ----------
+    x : MakiTensor
+        Input MakiTensor.
+    out_f : int
+        Number of output feature maps.
+    name : str
+        Name of the ConvLayer.
+    use_bias : bool
+        Use bias on layers or not.
+    kernel_initializer : str
+        Name of type initialization for conv layers,
+        For more examples see: makiflow.layers.utils,
+        By default He initialization are used
+    data_format : str
+        Data format of the tensors: 'NHWC' or 'NCHW'.
+
+    Returns
+    ---------
+    x : MakiTensor
+        Output MakiTensor, spatial size is 4 times smaller than of the input.
+
+    """
+    return ConvLayer(
+        kw=SPACE_TO_DEPTH_BLOCK, kh=SPACE_TO_DEPTH_BLOCK, in_f=get_channels(x, data_format), out_f=out_f,
+        stride=SPACE_TO_DEPTH_BLOCK, padding='VALID', activation=None, use_bias=use_bias,
+        name=name, kernel_initializer=kernel_initializer, **layout_kwargs(data_format)
+    )(x)
@@ -15,13 +15,15 @@
 # You should have received a copy of the GNU General Public License
 # along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
 
+from makizoo.lazy import attach
 
-from __future__ import absolute_import
-
-from .blocks import TransitionDenseNetBlock, ConvDenseNetBlock, DenseNetBlock
-from .utils import get_batchnorm_params
-from .builder import build_DenseNet
-from .models import DenseNet121, DenseNet161, DenseNet169, DenseNet201, DenseNet264
-
-del absolute_import
-
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=['blocks', 'builder', 'models', 'utils'],
+    attributes={
+        'blocks': ['TransitionDenseNetBlock', 'ConvDenseNetBlock', 'DenseNetBlock'],
+        'utils': ['get_batchnorm_params'],
+        'builder': ['build_DenseNet'],
+        'models': ['DenseNet121', 'DenseNet161', 'DenseNet169', 'DenseNet201', 'DenseNet264'],
+    }
+)
@@ -19,8 +19,10 @@
 import numpy as np
 import tensorflow as tf
 
-from makiflow.layers import *
+from makizoo.layers import *
 from makiflow.layers.utils import InitConvKernel
+from makizoo.backbones.utils import align_channels, get_channels
+from makizoo.ir import NHWC, layout_kwargs
 
 
 def TransitionDenseNetBlock(
@@ -31,7 +33,10 @@ def TransitionDenseNetBlock(
         activation=tf.nn.relu,
         use_bias=False,
         kernel_initializer=InitConvKernel.HE,
-        bn_params={}
+        bn_params={},
+        pool_before_conv=False,
+        channel_multiple=None,
+        data_format=NHWC
     ):
     """
     Parameters
@@ -54,6 +59,17 @@ def TransitionDenseNetBlock(
         By default He initialization are used
     bn_params : dict
         Parameters for BatchNormLayer. If empty all parameters will have default valued.
+    pool_before_conv : bool
+        If equal to True, then AvgPoolLayer will be applied before 1x1 ConvLayer.
+        Both operations are linear, so at inference (or without dropout) the result is the same,
+        but the conv is computed on the 4 times smaller feature map.
+        During training with dropout it is applied to the pooled feature map instead of being averaged
+        by the pooling, so statistics of the training differ from the default order.
+        Names of the layers are the same, so weights are compatible with the default order.
+    channel_multiple : int
+        If not None, number of output feature maps is rounded up to the multiple of it.
+    data_format : str
+        Data format of the tensors: 'NHWC' or 'NCHW'.
 
     Returns
     ---------
@@ -64,20 +80,26 @@ def TransitionDenseNetBlock(
     assert compression >= 0.0 and compression <= 1.0, f"wrong value for compression: {compression}"
 
     prefix = f'pool{str(number)}_'
+    layout_params = layout_kwargs(data_format)
 
-    in_f = x.get_shape()[-1]
-    out_f = int(in_f * compression)
+    in_f = get_channels(x, data_format)
+    out_f = align_channels(int(in_f * compression), channel_multiple)
+
+    x = BatchNormLayer(D=in_f, name=prefix + 'bn', **bn_params, **layout_params)(x)
+    x = ActivationLayer(activation=activation, name=prefix + 'relu', **layout_params)(x)
+    if pool_before_conv:
+        x = AvgPoolLayer(padding='VALID', name=prefix + 'avg_pool', **layout_params)(x)
 
-    x = BatchNormLayer(D=in_f, name=prefix + 'bn', **bn_params)(x)
-    x = ActivationLayer(activation=activation, name=prefix + 'relu')(x)
     x = ConvLayer(
         kw=1,kh=1,in_f=in_f, out_f=out_f, activation=None,
         use_bias=use_bias,  name=prefix + 'conv', padding='VALID',
-        kernel_initializer=kernel_initializer
+        kernel_initializer=kernel_initializer, **layout_params
     )(x)
     if dropout_p_keep is not None:
-        x = DropoutLayer(p_keep=dropout_p_keep, name=prefix + 'dropout')(x)
-    x = AvgPoolLayer(padding='VALID', name=prefix + 'avg_pool')(x)
+        x = DropoutLayer(p_keep=dropout_p_keep, name=prefix + 'dropout', **layout_params)(x)
+
+    if not pool_before_conv:
+        x = AvgPoolLayer(padding='VALID', name=prefix + 'avg_pool', **layout_params)(x)
 
     return x
 
@@ -93,7 +115,8 @@ def ConvDenseNetBlock(
         activation=tf.nn.relu,
         use_bias=False,
         kernel_initializer=InitConvKernel.HE,
-        bn_params = {}
+        bn_params = {},
+        data_format=NHWC
     ):
     """
     Parameters
@@ -122,6 +145,8 @@ def ConvDenseNetBlock(
         By default He initialization are used
     bn_params : dict
         Parameters for BatchNormLayer. If empty all parameters will have default valued.
+    data_format : str
+        Data format of the tensors: 'NHWC' or 'NCHW'.
 
     Returns
     ---------
@@ -130,33 +155,34 @@ def ConvDenseNetBlock(
 
     """
     prefix = f'conv{str(stage)}_block{str(block)}_'
+    layout_params = layout_kwargs(data_format)
 
-    in_f = x.get_shape()[-1]
+    in_f = get_channels(x, data_format)
 
-    x = BatchNormLayer(D=in_f, name=prefix + '0_bn', **bn_params)(x)
-    x = ActivationLayer(activation=activation, name=prefix + '0_relu')(x)
+    x = BatchNormLayer(D=in_f, name=prefix + '0_bn', **bn_params, **layout_params)(x)
+    x = ActivationLayer(activation=activation, name=prefix + '0_relu', **layout_params)(x)
     if use_bottleneck:
         growth_f = multiply * growth_rate
         x = ConvLayer(
             kw=1,kh=1,in_f=in_f, out_f=growth_f, activation=None,
             use_bias=use_bias, name=prefix + '1_conv', padding='VALID',
-            kernel_initializer=kernel_initializer
+            kernel_initializer=kernel_initializer, **layout_params
         )(x)
 
         if dropout_p_keep is not None:
-            x = DropoutLayer(p_keep=dropout_p_keep, name=prefix + '1_dropout')(x)
+            x = DropoutLayer(p_keep=dropout_p_keep, name=prefix + '1_dropout', **layout_params)(x)
 
-        x = BatchNormLayer(D=growth_f, name=prefix + '1_bn', **bn_params)(x)
-        x = ActivationLayer(activation=activation, name=prefix + '1_relu')(x)
+        x = BatchNormLayer(D=growth_f, name=prefix + '1_bn', **bn_params, **layout_params)(x)
+        x = ActivationLayer(activation=activation, name=prefix + '1_relu', **layout_params)(x)
 
     x = ConvLayer(
-        kw=3,kh=3,in_f=x.get_shape()[-1], out_f=growth_rate, activation=None,
+        kw=3,kh=3,in_f=get_channels(x, data_format), out_f=growth_rate, activation=None,
         use_bias=use_bias, name=prefix + '2_conv',
-        kernel_initializer=kernel_initializer
+        kernel_initializer=kernel_initializer, **layout_params
     )(x)
 
     if dropout_p_keep is not None:
-        x = DropoutLayer(p_keep=dropout_p_keep, name=prefix + '2_dropout')(x)
+        x = DropoutLayer(p_keep=dropout_p_keep, name=prefix + '2_dropout', **layout_params)(x)
 
     return x
 
@@ -171,7 +197,8 @@ def DenseNetBlock(
         activation=tf.nn.relu,
         use_bias=False,
         kernel_initializer=InitConvKernel.HE,
-        bn_params={}
+        bn_params={},
+        data_format=NHWC
     ):
     """
     DenseNetBlock use several DenseBlock blocks (equal to `nb_layers`)
@@ -204,6 +231,8 @@ def DenseNetBlock(
         By default He initialization are used
     bn_params : dict
         Parameters for BatchNormLayer. If empty all parameters will have default valued.
+    data_format : str
+        Data format of the tensors: 'NHWC' or 'NCHW'.
 
     Returns
     ---------
@@ -211,16 +240,18 @@ def DenseNetBlock(
         Output MakiTensor.
 
     """
+    layout_params = layout_kwargs(data_format)
     concat_layers = x
 
     for i in range(nb_layers):
         x = ConvDenseNetBlock(
             x=concat_layers, growth_rate=growth_rate, dropout_p_keep=dropout_p_keep,
             stage=stage, block=i + 1, activation=activation, use_bottleneck=use_bottleneck,
-            use_bias=use_bias, bn_params=bn_params, kernel_initializer=kernel_initializer
+            use_bias=use_bias, bn_params=bn_params, kernel_initializer=kernel_initializer,
+            data_format=data_format
         )
 
-        concat_layers = ConcatLayer(name=f'conv{stage}_block{i+1}_concat')([concat_layers, x])
+        concat_layers = ConcatLayer(name=f'conv{stage}_block{i+1}_concat', **layout_params)([concat_layers, x])
 
     return concat_layers
 
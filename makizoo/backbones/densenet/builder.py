@@ -20,9 +20,13 @@ import tensorflow as tf
 from .blocks import TransitionDenseNetBlock, DenseNetBlock
 from .utils import get_batchnorm_params
 
-from makiflow.layers import *
+from makizoo.layers import *
 from makiflow.layers.utils import InitConvKernel
 from makiflow.models import Classificator
+from makizoo.backbones.utils import (StageOutputs, scale_width, align_channels, check_stem,
+                                     check_data_format, get_channels, STEM_CONV, STEM_SPACE_TO_DEPTH)
+from makizoo.ir import NHWC, layout_kwargs, from_nhwc
+from makizoo.backbones.blocks import SpaceToDepthConv
 
 
 def build_DenseNet(
@@ -43,13 +47,21 @@ def build_DenseNet(
         create_model=False,
         name_model='MakiClassificator',
         kernel_initializer=InitConvKernel.HE,
-        bn_params={}):
+        bn_params={},
+        pool_before_conv=False,
+        return_stages=None,
+        stop_at_stage=None,
+        width_multiplier=1.0,
+        channel_multiple=None,
+        stem=STEM_CONV,
+        data_format=NHWC):
     """
      Parameters
      ----------
     input_shape : List
         Input shape of neural network. Example - [32, 128, 128, 3]
         which mean 32 - batch size, two 128 - size of picture, 3 - number of colors
+        Batch size, height and width can be None, then one graph serves any batch size and resolution.
     input_tensor : mf.MakiTensor
         A tensor that will be fed into the model instead of InputLayer with the specified `input_shape`.
     nb_layers : int
@@ -92,9 +104,41 @@ def build_DenseNet(
         By default He initialization are used
     bn_params : dict
         Parameters for BatchNormLayer. If empty all parameters will have default valued.
+    pool_before_conv : bool
+        If equal to True, then in transition blocks AvgPoolLayer will be applied before 1x1 ConvLayer,
+        which gives the same result at inference (or without dropout) with 4 times less computation for these convs.
+        During training with dropout statistics differ from the default order, see `TransitionDenseNetBlock`.
+        Names of the layers are not changed, so the same weights can be used.
+    return_stages : list
+        Indices of the stages which outputs will be returned, for example (2, 3, 4, 5) for C2-C5 features.
+        Stage 1 is the stem, other stages are outputs of the dense blocks (before transition blocks), the last stage includes the final batch normalization and activation.
+        If not None, then list of outputs is returned instead of the single output.
+    stop_at_stage : int
+        Index of the last stage which will be created, layers after it are not created at all.
+        By default it is equal to max(`return_stages`), if both are None then the whole model is created.
+    width_multiplier : float
+        Multiplier of the number of feature maps, for example 0.5 or 0.75 (analogue of `alpha` of MobileNetV2).
+        It is applied to `growth_rate`, which is rounded to the multiple of 8.
+    channel_multiple : int
+        If not None, numbers of feature maps (`growth_rate` and outputs of the transition blocks) are rounded up
+        to the multiple of `channel_multiple` (for example 8, 16 or 32), so that GEMMs of the convolutions
+        have SIMD-friendly sizes. By default is None, i.e. numbers are not changed.
+    stem : str
+        'conv' - usual stem (see `subsample_initial_block`).
+        'space_to_depth' - 4x4 space-to-depth followed by the cheap convolution (TResNet), instead of the 7x7 conv
+        and the max pooling, layers have prefix 'stem_s2d/'. Can be used only with `subsample_initial_block`,
+        output of the stage 1 is the output of the stem (stride 4).
+    data_format : str
+        Data format of the tensors: 'NHWC' (default) or 'NCHW', for NCHW `input_shape` is [N, C, H, W].
+        MakiFlow layers support only NHWC, so NCHW model can be created only as IR (see `makizoo.ir.trace`).
 
     Returns
     ---------
+    if `return_stages` is not None
+        in_x : mf.MakiTensor
+            Input MakiTensor
+        outputs : list
+            Output MakiTensors of the `return_stages`
     if `create_model` is False
         in_x : mf.MakiTensor
             Input MakiTensor
@@ -107,10 +151,13 @@ def build_DenseNet(
     """
     if bn_params is None or len(bn_params) == 0:
         bn_params = get_batchnorm_params()
+    check_data_format(data_format)
+    layout_params = layout_kwargs(data_format)
     compression = 1 - reduction
+    growth_rate = align_channels(scale_width(growth_rate, width_multiplier), channel_multiple)
 
     if input_tensor is None and input_shape is not None:
-        in_x = InputLayer(input_shape=input_shape, name='input')
+        in_x = InputLayer(input_shape=input_shape, name='Input', **layout_params)
     elif input_tensor is not None:
         in_x = input_tensor
     else:
@@ -124,46 +171,74 @@ def build_DenseNet(
             count //= 2
         nb_layers = [count for _ in range(nb_blocks+1)]
 
-    in_x = InputLayer(input_shape=input_shape, name='Input')
+    stages = StageOutputs(
+        return_stages=return_stages, stop_at_stage=stop_at_stage, num_stages=len(nb_layers) + 1,
+        include_top=include_top, create_model=create_model
+    )
 
-    if subsample_initial_block:
-        x = ZeroPaddingLayer(padding=[[3,3],[3,3]], name='zero_padding2d_4')(in_x)
+    check_stem(stem)
+    if stem == STEM_SPACE_TO_DEPTH and not subsample_initial_block:
+        raise ValueError('Space-to-depth stem can be used only with `subsample_initial_block` equal to True.')
+
+    if stem == STEM_SPACE_TO_DEPTH:
+        x = SpaceToDepthConv(
+            in_x, out_f=growth_rate * 2, name='stem_s2d/conv',
+            use_bias=use_bias, kernel_initializer=kernel_initializer, data_format=data_format
+        )
+        x = BatchNormLayer(D=growth_rate * 2, name='stem_s2d/bn', **bn_params, **layout_params)(x)
+        x = ActivationLayer(activation=activation, name='stem_s2d/relu', **layout_params)(x)
+    elif subsample_initial_block:
+        x = ZeroPaddingLayer(padding=[[3,3],[3,3]], name='zero_padding2d_4', **layout_params)(in_x)
 
         x = ConvLayer(
-            kw=7,kh=7,in_f=3, stride=2, out_f=growth_rate * 2, activation=None, use_bias=use_bias,
-            name='conv1/conv', padding='VALID', kernel_initializer=kernel_initializer
+            kw=7,kh=7,in_f=get_channels(in_x, data_format), stride=2, out_f=growth_rate * 2, activation=None,
+            use_bias=use_bias, name='conv1/conv', padding='VALID', kernel_initializer=kernel_initializer, **layout_params
         )(x)
 
-        x = BatchNormLayer(D=growth_rate * 2, name='conv1/bn', **bn_params)(x)
-        x = ActivationLayer(activation=activation, name='conv1/relu')(x)
-        x = ZeroPaddingLayer(padding=[[1,1],[1,1]], name='zero_padding2d_5')(x)
-
-        x = MaxPoolLayer(ksize=[1,3,3,1], padding='VALID', name='pool1')(x)
+        x = BatchNormLayer(D=growth_rate * 2, name='conv1/bn', **bn_params, **layout_params)(x)
+        x = ActivationLayer(activation=activation, name='conv1/relu', **layout_params)(x)
     else:
         x = ConvLayer(
-            kw=3,kh=3,in_f=3, stride=1, out_f=growth_rate * 2, activation=None, use_bias=use_bias,
-            name='conv1/conv', kernel_initializer=kernel_initializer)(in_x)
+            kw=3,kh=3,in_f=get_channels(in_x, data_format), stride=1, out_f=growth_rate * 2, activation=None,
+            use_bias=use_bias, name='conv1/conv', kernel_initializer=kernel_initializer, **layout_params)(in_x)
+
+    if stages.add(1, x):
+        return stages.result(in_x)
+
+    # Space-to-depth stem already has stride 4, so max pooling is used only after the conv stem
+    if stem == STEM_CONV and subsample_initial_block:
+        x = ZeroPaddingLayer(padding=[[1,1],[1,1]], name='zero_padding2d_5', **layout_params)(x)
+        x = MaxPoolLayer(ksize=from_nhwc([1, 3, 3, 1], data_format), padding='VALID', name='pool1', **layout_params)(x)
 
     # densenet blocks
     for block_index in range(len(nb_layers) - 1):
         # dense block
         x = DenseNetBlock(x=x, nb_layers=nb_layers[block_index], stage=block_index + 2,
                           growth_rate=growth_rate, dropout_p_keep=dropout_p_keep, use_bottleneck=use_bottleneck,
-                          activation=activation, use_bias=use_bias, bn_params=bn_params)
+                          activation=activation, use_bias=use_bias, bn_params=bn_params, data_format=data_format)
+
+        if stages.add(block_index + 2, x):
+            return stages.result(in_x)
 
         # transition block
         x = TransitionDenseNetBlock(x=x,
                                     dropout_p_keep=dropout_p_keep, number=block_index+2, compression=compression,
-                                    activation=activation, use_bias=use_bias, bn_params=bn_params)
+                                    activation=activation, use_bias=use_bias, bn_params=bn_params,
+                                    pool_before_conv=pool_before_conv, channel_multiple=channel_multiple,
+                                    data_format=data_format)
 
     x = DenseNetBlock(x=x, nb_layers=nb_layers[-1], stage=len(nb_layers) + 1,
                       growth_rate=growth_rate, dropout_p_keep=dropout_p_keep, use_bottleneck=use_bottleneck,
-                      activation=activation, use_bias=use_bias, bn_params=bn_params)
+                      activation=activation, use_bias=use_bias, bn_params=bn_params, data_format=data_format)
+
+    x = BatchNormLayer(D=get_channels(x, data_format), name='bn', **bn_params, **layout_params)(x)
+    x = ActivationLayer(activation=activation, name='relu', **layout_params)(x)
+
+    if stages.add(len(nb_layers) + 1, x):
+        return stages.result(in_x)
 
-    x = BatchNormLayer(D=x.get_shape()[-1], name='bn', **bn_params)(x)
-    x = ActivationLayer(activation=activation, name='relu')(x)
     if include_top:
-        x = GlobalAvgPoolLayer(name='avg_pool')(x)
+        x = GlobalAvgPoolLayer(name='avg_pool', **layout_params)(x)
         # dense part (fc layers)
         output = DenseLayer(in_d=x.get_shape()[-1], out_d=num_classes, activation=None, use_bias=True, name="fc1000")(x)
         if create_model:
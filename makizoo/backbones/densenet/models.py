@@ -20,7 +20,8 @@ import tensorflow as tf
 from .builder import build_DenseNet
 
 
-def DenseNet121(input_shape, classes=1000, include_top=False, create_model=False, kernel_initializer=InitConvKernel.HE):
+def DenseNet121(input_shape, classes=1000, include_top=False, create_model=False, kernel_initializer=InitConvKernel.HE,
+                pool_before_conv=False):
     """
     Create ResNet18 model with certain `input_shape`
 
@@ -29,6 +30,7 @@ def DenseNet121(input_shape, classes=1000, include_top=False, create_model=False
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3]
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -41,6 +43,10 @@ def DenseNet121(input_shape, classes=1000, include_top=False, create_model=False
         Name of type initialization for conv layers,
         For more examples see: makiflow.layers.utils,
         By default He initialization are used
+    pool_before_conv : bool
+        If equal to True, then in transition blocks AvgPoolLayer will be applied before 1x1 ConvLayer,
+        which gives the same result at inference with less computation (training with dropout differs,
+        see `TransitionDenseNetBlock`), weights are compatible with default model.
 
     Returns
     -------
@@ -69,11 +75,13 @@ def DenseNet121(input_shape, classes=1000, include_top=False, create_model=False
         reduction=0.5,
         dropout_p_keep=0.8,
         kernel_initializer=kernel_initializer,
-        bn_params={}
+        bn_params={},
+        pool_before_conv=pool_before_conv
     )
 
 
-def DenseNet161(input_shape, classes=1000, include_top=False, create_model=False, kernel_initializer=InitConvKernel.HE):
+def DenseNet161(input_shape, classes=1000, include_top=False, create_model=False, kernel_initializer=InitConvKernel.HE,
+                pool_before_conv=False):
     """
     Create ResNet18 model with certain `input_shape`
 
@@ -82,6 +90,7 @@ def DenseNet161(input_shape, classes=1000, include_top=False, create_model=False
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3]
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -94,6 +103,10 @@ def DenseNet161(input_shape, classes=1000, include_top=False, create_model=False
         Name of type initialization for conv layers,
         For more examples see: makiflow.layers.utils,
         By default He initialization are used
+    pool_before_conv : bool
+        If equal to True, then in transition blocks AvgPoolLayer will be applied before 1x1 ConvLayer,
+        which gives the same result at inference with less computation (training with dropout differs,
+        see `TransitionDenseNetBlock`), weights are compatible with default model.
 
     Returns
     -------
@@ -122,11 +135,13 @@ def DenseNet161(input_shape, classes=1000, include_top=False, create_model=False
         reduction=0.5,
         dropout_p_keep=0.8,
         kernel_initializer=kernel_initializer,
-        bn_params={}
+        bn_params={},
+        pool_before_conv=pool_before_conv
     )
 
 
-def DenseNet169(input_shape, classes=1000, include_top=False, create_model=False, kernel_initializer=InitConvKernel.HE):
+def DenseNet169(input_shape, classes=1000, include_top=False, create_model=False, kernel_initializer=InitConvKernel.HE,
+                pool_before_conv=False):
     """
     Create ResNet18 model with certain `input_shape`
 
@@ -135,6 +150,7 @@ def DenseNet169(input_shape, classes=1000, include_top=False, create_model=False
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3]
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -147,6 +163,10 @@ def DenseNet169(input_shape, classes=1000, include_top=False, create_model=False
         Name of type initialization for conv layers,
         For more examples see: makiflow.layers.utils,
         By default He initialization are used
+    pool_before_conv : bool
+        If equal to True, then in transition blocks AvgPoolLayer will be applied before 1x1 ConvLayer,
+        which gives the same result at inference with less computation (training with dropout differs,
+        see `TransitionDenseNetBlock`), weights are compatible with default model.
 
     Returns
     -------
@@ -175,11 +195,13 @@ def DenseNet169(input_shape, classes=1000, include_top=False, create_model=False
         reduction=0.5,
         dropout_p_keep=0.8,
         kernel_initializer=kernel_initializer,
-        bn_params={}
+        bn_params={},
+        pool_before_conv=pool_before_conv
     )
 
 
-def DenseNet201(input_shape, classes=1000, include_top=False, create_model=False, kernel_initializer=InitConvKernel.HE):
+def DenseNet201(input_shape, classes=1000, include_top=False, create_model=False, kernel_initializer=InitConvKernel.HE,
+                pool_before_conv=False):
     """
     Create ResNet18 model with certain `input_shape`
 
@@ -188,6 +210,7 @@ def DenseNet201(input_shape, classes=1000, include_top=False, create_model=False
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3]
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -200,6 +223,10 @@ def DenseNet201(input_shape, classes=1000, include_top=False, create_model=False
         Name of type initialization for conv layers,
         For more examples see: makiflow.layers.utils,
         By default He initialization are used
+    pool_before_conv : bool
+        If equal to True, then in transition blocks AvgPoolLayer will be applied before 1x1 ConvLayer,
+        which gives the same result at inference with less computation (training with dropout differs,
+        see `TransitionDenseNetBlock`), weights are compatible with default model.
 
     Returns
     -------
@@ -228,11 +255,13 @@ def DenseNet201(input_shape, classes=1000, include_top=False, create_model=False
         reduction=0.5,
         dropout_p_keep=0.8,
         kernel_initializer=kernel_initializer,
-        bn_params={}
+        bn_params={},
+        pool_before_conv=pool_before_conv
     )
 
 
-def DenseNet264(input_shape, classes=1000, include_top=False, create_model=False, kernel_initializer=InitConvKernel.HE):
+def DenseNet264(input_shape, classes=1000, include_top=False, create_model=False, kernel_initializer=InitConvKernel.HE,
+                pool_before_conv=False):
     """
     Create ResNet18 model with certain `input_shape`
 
@@ -241,6 +270,7 @@ def DenseNet264(input_shape, classes=1000, include_top=False, create_model=False
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3]
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -253,6 +283,10 @@ def DenseNet264(input_shape, classes=1000, include_top=False, create_model=False
         Name of type initialization for conv layers,
         For more examples see: makiflow.layers.utils,
         By default He initialization are used
+    pool_before_conv : bool
+        If equal to True, then in transition blocks AvgPoolLayer will be applied before 1x1 ConvLayer,
+        which gives the same result at inference with less computation (training with dropout differs,
+        see `TransitionDenseNetBlock`), weights are compatible with default model.
 
     Returns
     -------
@@ -281,6 +315,7 @@ def DenseNet264(input_shape, classes=1000, include_top=False, create_model=False
         reduction=0.5,
         dropout_p_keep=0.8,
         kernel_initializer=kernel_initializer,
-        bn_params={}
+        bn_params={},
+        pool_before_conv=pool_before_conv
     )
 
@@ -15,13 +15,15 @@
 # You should have received a copy of the GNU General Public License
 # along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
 
+from makizoo.lazy import attach
 
-from __future__ import absolute_import
-
-from .models import MobileNetV2_1_4, MobileNetV2_1_3, MobileNetV2_1_0, MobileNetV2_0_75
-from .blocks import MobileNetV2InvertedResBlock
-from .builder import build_MobileNetV2
-from .utils import get_batchnorm_params, make_divisible
-
-del absolute_import
-
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=['blocks', 'builder', 'models', 'utils'],
+    attributes={
+        'models': ['MobileNetV2_1_4', 'MobileNetV2_1_3', 'MobileNetV2_1_0', 'MobileNetV2_0_75'],
+        'blocks': ['MobileNetV2InvertedResBlock'],
+        'builder': ['build_MobileNetV2'],
+        'utils': ['get_batchnorm_params', 'make_divisible'],
+    }
+)
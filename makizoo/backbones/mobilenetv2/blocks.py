@@ -17,7 +17,9 @@
 
 import tensorflow as tf
 from .utils import make_divisible
-from makiflow.layers import *
+from makizoo.backbones.utils import align_channels, get_channels
+from makizoo.ir import NHWC, layout_kwargs
+from makizoo.layers import *
 from makiflow.layers.utils import InitConvKernel
 
 
@@ -54,7 +56,10 @@ def MobileNetV2InvertedResBlock(
         activation=tf.nn.relu6,
         use_bias=False,
         kernel_initializer=InitConvKernel.HE,
-        bn_params={}):
+        bn_params={},
+        dilation=1,
+        channel_multiple=None,
+        data_format=NHWC):
     """
     Parameters
     ----------
@@ -89,6 +94,12 @@ def MobileNetV2InvertedResBlock(
         By default He initialization are used
     bn_params : dict
         Parameters for BatchNormLayer. If empty all parameters will have default valued.
+    dilation : int
+        Dilation rate of the depthwise convolution, by default equal to 1 (usual convolution).
+    channel_multiple : int
+        If not None, number of output feature maps is rounded up to the multiple of it.
+    data_format : str
+        Data format of the tensors: 'NHWC' or 'NCHW'.
 
     Returns
     ---------
@@ -98,12 +109,13 @@ def MobileNetV2InvertedResBlock(
     """
     # Save for sum Operation
     inputs = x
+    layout_params = layout_kwargs(data_format)
 
     if in_f is None:
-        in_f = x.get_shape()[-1]
+        in_f = get_channels(x, data_format)
 
     # Calculate output number of f. for last ConvLayer, this number should be divisible by 8
-    pointwise_f = make_divisible(int(out_f*alpha))
+    pointwise_f = align_channels(make_divisible(int(out_f*alpha)), channel_multiple)
 
     prefix = PREFIX.format(str(block_id))
 
@@ -118,12 +130,15 @@ def MobileNetV2InvertedResBlock(
             name=NAME_EXPAND.format(prefix),
             use_bias=use_bias,
             activation=None,
-            kernel_initializer=kernel_initializer
+            kernel_initializer=kernel_initializer,
+            **layout_params
         )(x)
 
-        x = BatchNormLayer(D=x.get_shape()[-1], name=NAME_EXPAND_BN.format(prefix), **bn_params)(x)
+        x = BatchNormLayer(
+            D=get_channels(x, data_format), name=NAME_EXPAND_BN.format(prefix), **bn_params, **layout_params
+        )(x)
 
-        x = ActivationLayer(activation=activation, name=NAME_EXPAND_ACT.format(prefix))(x)
+        x = ActivationLayer(activation=activation, name=NAME_EXPAND_ACT.format(prefix), **layout_params)(x)
     else:
         # Expand layer is not used in first block
         # TODO: Add unique name for this layer, if we build some custom stuff
@@ -133,37 +148,44 @@ def MobileNetV2InvertedResBlock(
     x = DepthWiseConvLayer(
         kw=3,
         kh=3,
-        in_f=x.get_shape()[-1],
+        in_f=get_channels(x, data_format),
         multiplier = 1,
         activation=None,
         stride=stride,
+        rate=[dilation, dilation],
         use_bias=use_bias,
         name=NAME_DEPTHWISE.format(prefix),
-        kernel_initializer=kernel_initializer
+        kernel_initializer=kernel_initializer,
+        **layout_params
     )(x)
 
-    x = BatchNormLayer(D=x.get_shape()[-1], name=NAME_DEPTHWISE_BN.format(prefix), **bn_params)(x)
-    x = ActivationLayer(activation=activation, name=NAME_DEPTHWISE_ACT.format(prefix))(x)
+    x = BatchNormLayer(
+        D=get_channels(x, data_format), name=NAME_DEPTHWISE_BN.format(prefix), **bn_params, **layout_params
+    )(x)
+    x = ActivationLayer(activation=activation, name=NAME_DEPTHWISE_ACT.format(prefix), **layout_params)(x)
 
     # Pointwise (Project) to certain size (input number of the f)
     x = ConvLayer(
         kw=1,
         kh=1,
-        in_f=x.get_shape()[-1],
+        in_f=get_channels(x, data_format),
         out_f=pointwise_f,
         use_bias=use_bias,
         activation=None,
         name=NAME_POINTWISE.format(prefix),
-        kernel_initializer=kernel_initializer
+        kernel_initializer=kernel_initializer,
+        **layout_params
     )(x)
 
-    x = BatchNormLayer(D=x.get_shape()[-1], name=NAME_POINTWISE_BN.format(prefix), **bn_params)(x)
+    x = BatchNormLayer(
+        D=get_channels(x, data_format), name=NAME_POINTWISE_BN.format(prefix), **bn_params, **layout_params
+    )(x)
 
     if use_skip_connection:
-        if x.get_shape()[-1] != inputs.get_shape()[-1]:
+        if get_channels(x, data_format) != get_channels(inputs, data_format):
             raise ValueError(f'Error SumLayer\nIn block {block_id} input and output f. have different size')
 
-        return SumLayer(name=NAME_FINAL_ADD.format(prefix))([inputs, x])
+        return SumLayer(name=NAME_FINAL_ADD.format(prefix), **layout_params)([inputs, x])
     else:
         return x
 
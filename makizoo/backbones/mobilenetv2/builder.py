@@ -20,9 +20,34 @@ import tensorflow as tf
 from .blocks import MobileNetV2InvertedResBlock
 from .utils import make_divisible, get_batchnorm_params
 
-from makiflow.layers import *
+from makizoo.layers import *
 from makiflow.layers.utils import InitConvKernel
 from makiflow.models import Classificator
+from makizoo.backbones.utils import StageOutputs, OutputStride, align_channels, check_data_format, get_channels
+from makizoo.ir import NHWC, layout_kwargs, from_nhwc
+
+
+# Inverted residual blocks after the first one (`expanded_conv`):
+# (out_f, index of the stride in `stride_list` or None for stride 1, use_skip_connection,
+# index of the stage which ends after the block or None)
+INVERTED_RES_BLOCKS = (
+    (24, 1, False, None),
+    (24, None, True, 2),
+    (32, 2, False, None),
+    (32, None, True, None),
+    (32, None, True, 3),
+    (64, 3, False, None),
+    (64, None, True, None),
+    (64, None, True, None),
+    (64, None, True, None),
+    (96, None, False, None),
+    (96, None, True, None),
+    (96, None, True, 4),
+    (160, 4, False, None),
+    (160, None, True, None),
+    (160, None, True, None),
+    (320, None, False, None),
+)
 
 
 def build_MobileNetV2(
@@ -38,13 +63,19 @@ def build_MobileNetV2(
         num_classes=1000,
         create_model=False,
         kernel_initializer=InitConvKernel.HE,
-        name_model='MakiClassificator'):
+        name_model='MakiClassificator',
+        return_stages=None,
+        stop_at_stage=None,
+        output_stride=None,
+        channel_multiple=None,
+        data_format=NHWC):
     """
     Parameters
     ----------
     input_shape : List
         Input shape of neural network. Example - [32, 128, 128, 3]
         which mean 32 - batch size, two 128 - size of picture, 3 - number of colors
+        Batch size, height and width can be None, then one graph serves any batch size and resolution.
     input_tensor : mf.MakiTensor
         A tensor that will be fed into the model instead of InputLayer with the specified `input_shape`.
     use_bias : bool
@@ -77,9 +108,31 @@ def build_MobileNetV2(
         By default He initialization are used
     name_model : str
         Name of model, if it will be created
+    return_stages : list
+        Indices of the stages which outputs will be returned, for example (2, 3, 4, 5) for C2-C5 features.
+        Stage 1 is the stem, stages 2-4 are outputs of the last blocks with 24, 32 and 96 (scaled by `alpha`) feature maps, stage 5 is the output of the last pointwise conv (`out_relu`).
+        If not None, then list of outputs is returned instead of the single output.
+    stop_at_stage : int
+        Index of the last stage which will be created, layers after it are not created at all.
+        By default it is equal to max(`return_stages`), if both are None then the whole model is created.
+    output_stride : int
+        Ratio of the input resolution to the resolution of the output, for example 8 or 16 for dense prediction.
+        Blocks after the target stride are used without stride and with dilated depthwise convolutions instead,
+        names and shapes of the weights are not changed. By default is None, i.e. 32 with default `stride_list`.
+    channel_multiple : int
+        If not None, numbers of feature maps are rounded up to the multiple of `channel_multiple` (for example 8, 16 or 32),
+        so that GEMMs of the convolutions have SIMD-friendly sizes. By default is None, i.e. numbers are not changed.
+    data_format : str
+        Data format of the tensors: 'NHWC' (default) or 'NCHW', for NCHW `input_shape` is [N, C, H, W].
+        MakiFlow layers support only NHWC, so NCHW model can be created only as IR (see `makizoo.ir.trace`).
 
     Returns
     ---------
+    if `return_stages` is not None
+        in_x : mf.MakiTensor
+            Input MakiTensor
+        outputs : list
+            Output MakiTensors of the `return_stages`
     if `create_model` is False
         in_x : mf.MakiTensor
             Input MakiTensor
@@ -90,13 +143,21 @@ def build_MobileNetV2(
             Classification model
 
     """
+    stages = StageOutputs(
+        return_stages=return_stages, stop_at_stage=stop_at_stage,
+        include_top=include_top, create_model=create_model
+    )
+    strides = OutputStride(output_stride=output_stride, current_stride=stride_list[0])
+    check_data_format(data_format)
+    layout_params = layout_kwargs(data_format)
+
     if bn_params is None:
         bn_params = get_batchnorm_params()
 
-    first_filt = make_divisible(32 * alpha)
+    first_filt = align_channels(make_divisible(32 * alpha), channel_multiple)
 
     if input_tensor is None and input_shape is not None:
-        in_x = InputLayer(input_shape=input_shape, name='input')
+        in_x = InputLayer(input_shape=input_shape, name='input', **layout_params)
     elif input_tensor is not None:
         in_x = input_tensor
     else:
@@ -107,172 +168,86 @@ def build_MobileNetV2(
     x = ConvLayer(
         kw=3,
         kh=3,
-        in_f=input_shape[-1],
+        in_f=get_channels(in_x, data_format),
         out_f=first_filt,
         stride=stride_list[0],
         activation=None,
         use_bias=use_bias,
         name='Conv/weights',
         kernel_initializer=kernel_initializer,
+        **layout_params
     )(in_x)
 
-    x = BatchNormLayer(D=first_filt, name='Conv/BatchNorm', **bn_params)(x)
-    x = ActivationLayer(activation=activation, name='Conv_relu')(x)
+    x = BatchNormLayer(D=first_filt, name='Conv/BatchNorm', **bn_params, **layout_params)(x)
+    x = ActivationLayer(activation=activation, name='Conv_relu', **layout_params)(x)
 
     x = MobileNetV2InvertedResBlock(
         x=x, out_f=16, alpha=alpha,
         expansion=1, block_id=0,
         use_bias=use_bias, activation=activation,
         bn_params=bn_params, use_expand=False, use_skip_connection=False,
-        kernel_initializer=kernel_initializer
-    )
-
-    x = MobileNetV2InvertedResBlock(
-        x=x, out_f=24, alpha=alpha, stride=stride_list[1],
-        expansion=expansion, block_id=1,
-        use_bias=use_bias, activation=activation,
-        bn_params=bn_params, use_skip_connection=False,
-        kernel_initializer=kernel_initializer
-    )
-
-    x = MobileNetV2InvertedResBlock(
-        x=x, out_f=24, alpha=alpha,
-        expansion=expansion, block_id=2,
-        use_bias=use_bias, activation=activation, bn_params=bn_params,
-        kernel_initializer=kernel_initializer
-    )
-
-    x = MobileNetV2InvertedResBlock(
-        x=x, out_f=32, alpha=alpha,
-        stride=stride_list[2], expansion=expansion, block_id=3,
-        use_bias=use_bias, activation=activation,
-        bn_params=bn_params, use_skip_connection=False,
-        kernel_initializer=kernel_initializer
-    )
-
-    x = MobileNetV2InvertedResBlock(
-        x=x, out_f=32, alpha=alpha,
-        expansion=expansion, block_id=4,
-        use_bias=use_bias, activation=activation, bn_params=bn_params,
-        kernel_initializer=kernel_initializer
-    )
-
-    x = MobileNetV2InvertedResBlock(
-        x=x, out_f=32, alpha=alpha,
-        expansion=expansion, block_id=5,
-        use_bias=use_bias, activation=activation, bn_params=bn_params,
-        kernel_initializer=kernel_initializer
-    )
-
-    x = MobileNetV2InvertedResBlock(
-        x=x, out_f=64, alpha=alpha,
-        stride=stride_list[3], expansion=expansion, block_id=6,
-        use_bias=use_bias, activation=activation,
-        bn_params=bn_params, use_skip_connection=False,
-        kernel_initializer=kernel_initializer
-    )
-
-    x = MobileNetV2InvertedResBlock(
-        x=x, out_f=64, alpha=alpha,
-        expansion=expansion, block_id=7,
-        use_bias=use_bias, activation=activation, bn_params=bn_params,
-        kernel_initializer=kernel_initializer
-    )
-
-    x = MobileNetV2InvertedResBlock(
-        x=x, out_f=64, alpha=alpha,
-        expansion=expansion, block_id=8,
-        use_bias=use_bias, activation=activation, bn_params=bn_params,
-        kernel_initializer=kernel_initializer
+        kernel_initializer=kernel_initializer, channel_multiple=channel_multiple,
+        data_format=data_format
     )
 
-    x = MobileNetV2InvertedResBlock(
-        x=x,out_f=64, alpha=alpha,
-        expansion=expansion, block_id=9,
-        use_bias=use_bias, activation=activation, bn_params=bn_params,
-        kernel_initializer=kernel_initializer
-    )
-
-    x = MobileNetV2InvertedResBlock(
-        x=x, out_f=96, alpha=alpha,
-        expansion=expansion, block_id=10,
-        use_bias=use_bias, activation=activation,
-        bn_params=bn_params, use_skip_connection=False,
-        kernel_initializer=kernel_initializer
-    )
-
-    x = MobileNetV2InvertedResBlock(
-        x=x, out_f=96, alpha=alpha,
-        expansion=expansion, block_id=11,
-        use_bias=use_bias, activation=activation,
-        bn_params=bn_params,
-        kernel_initializer=kernel_initializer
-    )
-
-    x = MobileNetV2InvertedResBlock(
-        x=x, out_f=96, alpha=alpha,
-        expansion=expansion, block_id=12,
-        use_bias=use_bias, activation=activation,
-        bn_params=bn_params,
-        kernel_initializer=kernel_initializer
-    )
-
-    x = MobileNetV2InvertedResBlock(
-        x=x, out_f=160, alpha=alpha, stride=stride_list[4],
-        expansion=expansion, block_id=13,
-        use_bias=use_bias, activation=activation,
-        bn_params=bn_params, use_skip_connection=False,
-        kernel_initializer=kernel_initializer
-    )
+    if stages.add(1, x):
+        return stages.result(in_x)
+
+    for block_id, (out_f, stride_index, use_skip_connection, stage) in enumerate(INVERTED_RES_BLOCKS, start=1):
+        # After `output_stride` is reached, stride is replaced by dilation of the next blocks
+        if stride_index is None:
+            stride, dilation = 1, strides.rate
+        else:
+            stride, dilation = strides.step(stride_list[stride_index])
+
+        x = MobileNetV2InvertedResBlock(
+            x=x, out_f=out_f, alpha=alpha,
+            stride=stride, dilation=dilation,
+            expansion=expansion, block_id=block_id,
+            use_bias=use_bias, activation=activation,
+            bn_params=bn_params, use_skip_connection=use_skip_connection,
+            kernel_initializer=kernel_initializer, channel_multiple=channel_multiple,
+            data_format=data_format
+        )
 
-    x = MobileNetV2InvertedResBlock(
-        x=x, out_f=160, alpha=alpha,
-        expansion=expansion, block_id=14,
-        use_bias=use_bias, activation=activation,
-        bn_params=bn_params,
-        kernel_initializer=kernel_initializer
-    )
+        if stage is not None and stages.add(stage, x):
+            return stages.result(in_x)
 
-    x = MobileNetV2InvertedResBlock(
-        x=x, out_f=160, alpha=alpha,
-        expansion=expansion, block_id=15,
-        use_bias=use_bias, activation=activation,
-        bn_params=bn_params,
-        kernel_initializer=kernel_initializer
-    )
-
-    x = MobileNetV2InvertedResBlock(
-        x=x, out_f=320, alpha=alpha,
-        expansion=expansion, block_id=16,
-        use_bias=use_bias, activation=activation,
-        bn_params=bn_params, use_skip_connection=False,
-        kernel_initializer=kernel_initializer
-    )
+    strides.check()
 
     if alpha > 1.0:
         last_block_filters = make_divisible(1280 * alpha)
     else:
         last_block_filters = 1280
+    last_block_filters = align_channels(last_block_filters, channel_multiple)
 
     x = ConvLayer(
         kh=1,
         kw=1,
-        in_f=x.get_shape()[-1],
+        in_f=get_channels(x, data_format),
         out_f=last_block_filters,
         activation=None,
         use_bias=use_bias,
         name='Conv_1/weights',
-        kernel_initializer=kernel_initializer
+        kernel_initializer=kernel_initializer,
+        **layout_params
     )(x)
 
-    x = BatchNormLayer(D=last_block_filters, name='Conv_1/BatchNorm', **bn_params)(x)
-    pred_top = ActivationLayer(activation=activation, name='out_relu')(x)
+    x = BatchNormLayer(D=last_block_filters, name='Conv_1/BatchNorm', **bn_params, **layout_params)(x)
+    pred_top = ActivationLayer(activation=activation, name='out_relu', **layout_params)(x)
+
+    if stages.add(5, pred_top):
+        return stages.result(in_x)
 
     if include_top:
-        x = GlobalAvgPoolLayer(name='global_avg')(pred_top)
-        x = ReshapeLayer(new_shape=[1,1, x.get_shape()[-1]], name='resh')(x)
-        x = ConvLayer(kw=1, kh=1, in_f=x.get_shape()[-1], out_f=num_classes, name='prediction')(x)
-        output = ReshapeLayer(new_shape=[num_classes], name='endo')(x)
+        x = GlobalAvgPoolLayer(name='global_avg', **layout_params)(pred_top)
+        x = ReshapeLayer(
+            new_shape=from_nhwc([None, 1, 1, x.get_shape()[-1]], data_format)[1:], name='resh', **layout_params
+        )(x)
+        x = ConvLayer(
+            kw=1, kh=1, in_f=get_channels(x, data_format), out_f=num_classes, name='prediction', **layout_params
+        )(x)
+        output = ReshapeLayer(new_shape=[num_classes], name='endo', **layout_params)(x)
 
         if create_model:
             return Classificator(in_x, output, name_model)
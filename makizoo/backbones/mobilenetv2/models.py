@@ -35,6 +35,7 @@ def MobileNetV2_1_0(
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3]
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -88,6 +89,7 @@ def MobileNetV2_1_4(
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3]
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -141,6 +143,7 @@ def MobileNetV2_0_75(
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3]
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -194,6 +197,7 @@ def MobileNetV2_1_3(
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3]
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -15,14 +15,23 @@
 # You should have received a copy of the GNU General Public License
 # along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
 
+from makizoo.lazy import attach
 
-from .models import (ResNet18, ResNet34, ResNet50,
-                     ResNet101, ResNet152, Little_ResNet20,
-                     Little_ResNet32, Little_ResNet44,
-                     Little_ResNet56, Little_ResNet110)
-
-from .blocks import (ResNetIdentityBlockV1, ResNetConvBlockV1,
-                     ResNetConvBlock_woPointWiseV1, ResNetIdentityBlock_woPointWiseV1)
-
-from .builder import build_ResNetV1, build_LittleResNetV1
-from .utils import get_batchnorm_params
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=['blocks', 'builder', 'models', 'utils'],
+    attributes={
+        'models': [
+            'ResNet18', 'ResNet34', 'ResNet50',
+            'ResNet101', 'ResNet152', 'Little_ResNet20',
+            'Little_ResNet32', 'Little_ResNet44',
+            'Little_ResNet56', 'Little_ResNet110'
+        ],
+        'blocks': [
+            'ResNetIdentityBlockV1', 'ResNetConvBlockV1',
+            'ResNetConvBlock_woPointWiseV1', 'ResNetIdentityBlock_woPointWiseV1'
+        ],
+        'builder': ['build_ResNetV1', 'build_LittleResNetV1'],
+        'utils': ['get_batchnorm_params', 'WITH_POINTWISE', 'WITHOUT_POINTWISE'],
+    }
+)
@@ -16,11 +16,13 @@
 # along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
 
 
-from makiflow.layers import *
+from makizoo.layers import *
 from makiflow.layers.utils import InitConvKernel
 from makiflow.core import MakiTensor
 import tensorflow as tf
 from .utils import get_batchnorm_params
+from makizoo.backbones.utils import align_channels, get_channels
+from makizoo.ir import NHWC, layout_kwargs
 
 
 # ResNet with pointwise operation (i.e. kernel with size 1x1)
@@ -42,6 +44,19 @@ ZERO_PADDING = "{}zero_padding{}"
 SCIP_BRANCH = "{}sc/conv"
 
 
+def _spatial_conv(dilation=1, **kwargs):
+    """
+    Create ConvLayer with `kwargs` or AtrousConvLayer with rate equal to `dilation` if it is more than 1.
+
+    """
+    if dilation == 1:
+        return ConvLayer(**kwargs)
+
+    if kwargs.pop('stride', 1) != 1:
+        raise ValueError('Convolution with `dilation` more than 1 must have stride 1.')
+    return AtrousConvLayer(rate=dilation, **kwargs)
+
+
 def ResNetIdentityBlockV1(
         x : MakiTensor,
         block_id: int,
@@ -51,7 +66,10 @@ def ResNetIdentityBlockV1(
         activation=tf.nn.relu,
         use_bias=False,
         kernel_initializer=InitConvKernel.HE,
-        bn_params=None):
+        bn_params=None,
+        dilation=1,
+        channel_multiple=None,
+        data_format=NHWC):
     """
     Create ResNet block with skip connection,
     This type of block are presented in first paper about ResNet (i.e. v1)
@@ -78,6 +96,12 @@ def ResNetIdentityBlockV1(
         By default He initialization are used
     bn_params : dict
         Parameters for BatchNormLayer. If equal to None all parameters will have default valued.
+    dilation : int
+        Dilation rate of the 3x3 convolutions, by default equal to 1 (usual convolutions).
+    channel_multiple : int
+        If not None, numbers of feature maps which are computed from `in_f` are rounded up to the multiple of it.
+    data_format : str
+        Data format of the tensors: 'NHWC' or 'NCHW'.
 
     Returns
     ---------
@@ -87,38 +111,49 @@ def ResNetIdentityBlockV1(
     """
     if bn_params is None:
         bn_params = get_batchnorm_params()
+    layout_params = layout_kwargs(data_format)
 
     prefix_name = PREFIX_NAME_BLOCK.format(block_id, unit_id)
 
     if in_f is None:
-        in_f = x.get_shape()[-1]
+        in_f = get_channels(x, data_format)
 
-    reduction = int(in_f / 4)
+    reduction = align_channels(int(in_f / 4), channel_multiple)
 
     mx = ConvLayer(
         kw=1, kh=1, in_f=in_f, out_f=reduction, activation=None,
         use_bias=use_bias, name=PREFIX_NAME_LAYER.format(prefix_name, 1, WEIGHTS),
-        kernel_initializer=kernel_initializer
+        kernel_initializer=kernel_initializer, **layout_params
     )(x)
-    mx = BatchNormLayer(D=reduction, name=PREFIX_NAME_LAYER.format(prefix_name, 1, BATCH_NORM), **bn_params)(mx)
-    mx = ActivationLayer(activation=activation, name=PREFIX_NAME_LAYER.format(prefix_name, 1, ACTIV))(mx)
+    mx = BatchNormLayer(
+        D=reduction, name=PREFIX_NAME_LAYER.format(prefix_name, 1, BATCH_NORM), **bn_params, **layout_params
+    )(mx)
+    mx = ActivationLayer(
+        activation=activation, name=PREFIX_NAME_LAYER.format(prefix_name, 1, ACTIV), **layout_params
+    )(mx)
 
-    mx = ConvLayer(
+    mx = _spatial_conv(
         kw=3, kh=3, in_f=reduction, out_f=reduction, activation=None,
         use_bias=use_bias, name=PREFIX_NAME_LAYER.format(prefix_name, 2, WEIGHTS),
-        kernel_initializer=kernel_initializer
+        kernel_initializer=kernel_initializer, dilation=dilation, **layout_params
+    )(mx)
+    mx = BatchNormLayer(
+        D=reduction, name=PREFIX_NAME_LAYER.format(prefix_name, 2, BATCH_NORM), **bn_params, **layout_params
+    )(mx)
+    mx = ActivationLayer(
+        activation=activation, name=PREFIX_NAME_LAYER.format(prefix_name, 2, ACTIV), **layout_params
     )(mx)
-    mx = BatchNormLayer(D=reduction, name=PREFIX_NAME_LAYER.format(prefix_name, 2, BATCH_NORM), **bn_params)(mx)
-    mx = ActivationLayer(activation=activation, name=PREFIX_NAME_LAYER.format(prefix_name, 2, ACTIV))(mx)
 
     mx = ConvLayer(
         kw=1, kh=1, in_f=reduction, out_f=in_f, activation=None,
         use_bias=use_bias, name=PREFIX_NAME_LAYER.format(prefix_name, 3, WEIGHTS),
-        kernel_initializer=kernel_initializer
+        kernel_initializer=kernel_initializer, **layout_params
+    )(mx)
+    mx = BatchNormLayer(
+        D=in_f, name=PREFIX_NAME_LAYER.format(prefix_name, 3, BATCH_NORM), **bn_params, **layout_params
     )(mx)
-    mx = BatchNormLayer(D=in_f, name=PREFIX_NAME_LAYER.format(prefix_name, 3, BATCH_NORM), **bn_params)(mx)
 
-    x = SumLayer(name=prefix_name + str(num_block) + SUM_OPERATION)([mx, x])
+    x = SumLayer(name=prefix_name + str(num_block) + SUM_OPERATION, **layout_params)([mx, x])
 
     return x
 
@@ -135,7 +170,10 @@ def ResNetConvBlockV1(
         in_f=None,
         reduction=None,
         kernel_initializer=InitConvKernel.HE,
-        bn_params=None):
+        bn_params=None,
+        dilation=1,
+        channel_multiple=None,
+        data_format=NHWC):
     """
     Create ResNet block with skip connection using certain `stride`,
     in most cases equal to 2 (and by default in out case)
@@ -171,6 +209,12 @@ def ResNetConvBlockV1(
         By default He initialization are used
     bn_params : dict
         Parameters for BatchNormLayer. If equal to None all parameters will have default valued.
+    dilation : int
+        Dilation rate of the 3x3 convolutions, by default equal to 1 (usual convolutions).
+    channel_multiple : int
+        If not None, numbers of feature maps which are computed from `in_f` are rounded up to the multiple of it.
+    data_format : str
+        Data format of the tensors: 'NHWC' or 'NCHW'.
 
     Returns
     ---------
@@ -180,52 +224,65 @@ def ResNetConvBlockV1(
     """
     if bn_params is None:
         bn_params = get_batchnorm_params()
+    layout_params = layout_kwargs(data_format)
 
     prefix_name = PREFIX_NAME_BLOCK.format(block_id, unit_id)
 
     if in_f is None:
-        in_f = x.get_shape()[-1]
+        in_f = get_channels(x, data_format)
     if reduction is None:
-        reduction = int(in_f / 2)
+        reduction = align_channels(int(in_f / 2), channel_multiple)
     if out_f is None:
-        out_f = in_f * 2
+        out_f = align_channels(in_f * 2, channel_multiple)
 
     # Main Branch
     # Conv(1x1) -> BN -> Activ
     mx = ConvLayer(
         kw=1, kh=1, in_f=in_f, out_f=reduction, stride=stride, activation=None,
         use_bias=use_bias, name=PREFIX_NAME_LAYER.format(prefix_name, 1, WEIGHTS),
-        kernel_initializer=kernel_initializer
+        kernel_initializer=kernel_initializer, **layout_params
     )(x)
-    mx = BatchNormLayer(D=reduction, name=PREFIX_NAME_LAYER.format(prefix_name, 1, BATCH_NORM), **bn_params)(mx)
-    mx = ActivationLayer(activation=activation, name=PREFIX_NAME_LAYER.format(prefix_name, 1, ACTIV))(mx)
+    mx = BatchNormLayer(
+        D=reduction, name=PREFIX_NAME_LAYER.format(prefix_name, 1, BATCH_NORM), **bn_params, **layout_params
+    )(mx)
+    mx = ActivationLayer(
+        activation=activation, name=PREFIX_NAME_LAYER.format(prefix_name, 1, ACTIV), **layout_params
+    )(mx)
 
     # Conv(3x3) -> BN -> Activ
-    mx = ConvLayer(
+    mx = _spatial_conv(
         kw=3, kh=3, in_f=reduction, out_f=reduction, activation=None,
         use_bias=use_bias, name=PREFIX_NAME_LAYER.format(prefix_name, 2, WEIGHTS),
-        kernel_initializer=kernel_initializer
+        kernel_initializer=kernel_initializer, dilation=dilation, **layout_params
+    )(mx)
+    mx = BatchNormLayer(
+        D=reduction, name=PREFIX_NAME_LAYER.format(prefix_name, 2, BATCH_NORM), **bn_params, **layout_params
+    )(mx)
+    mx = ActivationLayer(
+        activation=activation, name=PREFIX_NAME_LAYER.format(prefix_name, 2, ACTIV), **layout_params
     )(mx)
-    mx = BatchNormLayer(D=reduction, name=PREFIX_NAME_LAYER.format(prefix_name, 2, BATCH_NORM), **bn_params)(mx)
-    mx = ActivationLayer(activation=activation, name=PREFIX_NAME_LAYER.format(prefix_name, 2, ACTIV))(mx)
 
     # Conv(1x1) -> BN
     mx = ConvLayer(
         kw=1, kh=1, in_f=reduction, out_f=out_f, activation=None,
         use_bias=use_bias, name=PREFIX_NAME_LAYER.format(prefix_name, 3, WEIGHTS),
-        kernel_initializer=kernel_initializer
+        kernel_initializer=kernel_initializer, **layout_params
+    )(mx)
+    mx = BatchNormLayer(
+        D=out_f, name=PREFIX_NAME_LAYER.format(prefix_name, 3, BATCH_NORM), **bn_params, **layout_params
     )(mx)
-    mx = BatchNormLayer(D=out_f, name=PREFIX_NAME_LAYER.format(prefix_name, 3, BATCH_NORM), **bn_params)(mx)
 
     # Skip branch
     sx = ConvLayer(
         kw=1, kh=1, in_f=in_f, out_f=out_f, stride=stride, activation=None,
         use_bias=use_bias, name=PREFIX_NAME_SHORTCUT.format(prefix_name, WEIGHTS),
-        kernel_initializer=kernel_initializer
+        kernel_initializer=kernel_initializer, **layout_params
     )(x)
-    sx = BatchNormLayer(D=out_f, name=PREFIX_NAME_SHORTCUT.format(prefix_name, BATCH_NORM), **bn_params)(sx)
+    sx = BatchNormLayer(
+        D=out_f, name=PREFIX_NAME_SHORTCUT.format(prefix_name, BATCH_NORM), **bn_params, **layout_params
+    )(sx)
 
-    x = SumLayer(name=prefix_name + str(num_block) + SUM_OPERATION)([mx,sx])
+    x = SumLayer(name=prefix_name + str(num_block) + SUM_OPERATION, **layout_params)([mx,sx])
 
     return x
 
@@ -239,7 +296,10 @@ def ResNetIdentityBlock_woPointWiseV1(
         use_bias=False,
         activation=tf.nn.relu,
         kernel_initializer=InitConvKernel.HE,
-        bn_params=None):
+        bn_params=None,
+        dilation=1,
+        channel_multiple=None,
+        data_format=NHWC):
     """
     Create ResNet block with skip connection and without pointwise operation in block,
     This type of blocks in most cases are used in ResNet34, ResNet18
@@ -268,6 +328,12 @@ def ResNetIdentityBlock_woPointWiseV1(
         By default He initialization are used
     bn_params : dict
         Parameters for BatchNormLayer. If equal to None all parameters will have default valued.
+    dilation : int
+        Dilation rate of the 3x3 convolutions, by default equal to 1 (usual convolutions).
+    channel_multiple : int
+        Not used, block keeps `in_f` feature maps (argument is kept for the same signature as other blocks).
+    data_format : str
+        Data format of the tensors: 'NHWC' or 'NCHW'.
 
     Returns
     ---------
@@ -277,33 +343,38 @@ def ResNetIdentityBlock_woPointWiseV1(
     """
     if bn_params is None:
         bn_params = get_batchnorm_params()
+    layout_params = layout_kwargs(data_format)
 
     prefix_name = PREFIX_NAME_BLOCK_WOP.format(block_id, unit_id)
 
     if in_f is None:
-        in_f = x.get_shape()[-1]
+        in_f = get_channels(x, data_format)
 
     # BN -> ACT -> ZERO_PADDING -> CONV, first block
-    mx = BatchNormLayer(D=in_f, name=BN.format(prefix_name, 1), **bn_params)(x)
-    mx = ActivationLayer(activation=activation, name=ACTIVATION.format(prefix_name, 1))(mx)
-    mx = ZeroPaddingLayer(padding=[[1,1],[1,1]], name=ZERO_PADDING.format(prefix_name, 1))(mx)
-    mx = ConvLayer(
+    mx = BatchNormLayer(D=in_f, name=BN.format(prefix_name, 1), **bn_params, **layout_params)(x)
+    mx = ActivationLayer(activation=activation, name=ACTIVATION.format(prefix_name, 1), **layout_params)(mx)
+    mx = ZeroPaddingLayer(
+        padding=[[dilation, dilation], [dilation, dilation]], name=ZERO_PADDING.format(prefix_name, 1), **layout_params
+    )(mx)
+    mx = _spatial_conv(
         kw=3, kh=3, in_f=in_f, out_f=in_f, activation=None,
         padding='VALID', use_bias=use_bias, name=CONV.format(prefix_name, 1),
-        kernel_initializer=kernel_initializer
+        kernel_initializer=kernel_initializer, dilation=dilation, **layout_params
     )(mx)
 
     # BN -> ACT -> ZERO_PADDING -> CONV, second block
-    mx = BatchNormLayer(D=in_f, name=BN.format(prefix_name, 2), **bn_params)(mx)
-    mx = ActivationLayer(activation=activation, name=ACTIVATION.format(prefix_name, 2))(mx)
-    mx = ZeroPaddingLayer(padding=[[1,1],[1,1]], name=ZERO_PADDING.format(prefix_name, 2))(mx)
-    mx = ConvLayer(
+    mx = BatchNormLayer(D=in_f, name=BN.format(prefix_name, 2), **bn_params, **layout_params)(mx)
+    mx = ActivationLayer(activation=activation, name=ACTIVATION.format(prefix_name, 2), **layout_params)(mx)
+    mx = ZeroPaddingLayer(
+        padding=[[dilation, dilation], [dilation, dilation]], name=ZERO_PADDING.format(prefix_name, 2), **layout_params
+    )(mx)
+    mx = _spatial_conv(
         kw=3, kh=3, in_f=in_f, out_f=in_f, activation=None,
         padding='VALID', use_bias=use_bias, name=CONV.format(prefix_name, 2),
-        kernel_initializer=kernel_initializer
+        kernel_initializer=kernel_initializer, dilation=dilation, **layout_params
     )(mx)
 
-    x = SumLayer(name=prefix_name + SUM_OPERATION + str(num_block))([mx,x])
+    x = SumLayer(name=prefix_name + SUM_OPERATION + str(num_block), **layout_params)([mx,x])
 
     return x
 
@@ -319,7 +390,10 @@ def ResNetConvBlock_woPointWiseV1(
         in_f=None,
         out_f=None,
         kernel_initializer=InitConvKernel.HE,
-        bn_params=None):
+        bn_params=None,
+        dilation=1,
+        channel_multiple=None,
+        data_format=NHWC):
     """
     Create ResNet block with skip connection using certain `stride`
     And without point wise convolutions (i.e. convs with 1x1 kernel),
@@ -353,6 +427,12 @@ def ResNetConvBlock_woPointWiseV1(
         By default He initialization are used
     bn_params : dict
         Parameters for BatchNormLayer. If equal to None all parameters will have default valued.
+    dilation : int
+        Dilation rate of the 3x3 convolutions, by default equal to 1 (usual convolutions).
+    channel_multiple : int
+        If not None, numbers of feature maps which are computed from `in_f` are rounded up to the multiple of it.
+    data_format : str
+        Data format of the tensors: 'NHWC' or 'NCHW'.
 
     Returns
     ---------
@@ -362,43 +442,48 @@ def ResNetConvBlock_woPointWiseV1(
     """
     if bn_params is None:
         bn_params = get_batchnorm_params()
+    layout_params = layout_kwargs(data_format)
 
     prefix_name = PREFIX_NAME_BLOCK_WOP.format(block_id, unit_id)
 
     if in_f is None:
-        in_f = x.get_shape()[-1]
+        in_f = get_channels(x, data_format)
     if out_f is None:
-        out_f = int(2*in_f)
+        out_f = align_channels(int(2*in_f), channel_multiple)
 
     # BatchNorm + activation layer before main ConvBlock
-    x = BatchNormLayer(D=in_f, name=BN.format(prefix_name, 1), **bn_params)(x)
-    x = ActivationLayer(activation=activation, name=ACTIVATION.format(prefix_name, 1))(x)
+    x = BatchNormLayer(D=in_f, name=BN.format(prefix_name, 1), **bn_params, **layout_params)(x)
+    x = ActivationLayer(activation=activation, name=ACTIVATION.format(prefix_name, 1), **layout_params)(x)
 
     # Main branch
     # Zero_padding -> Conv -> BN -> Activation -> Zero_padding -> Conv
-    mx = ZeroPaddingLayer(padding=[[1,1],[1,1]], name=ZERO_PADDING.format(prefix_name, 1))(x)
-    mx = ConvLayer(
+    mx = ZeroPaddingLayer(
+        padding=[[dilation, dilation], [dilation, dilation]], name=ZERO_PADDING.format(prefix_name, 1), **layout_params
+    )(x)
+    mx = _spatial_conv(
         kw=3, kh=3, in_f=in_f, out_f=out_f, activation=None, stride=stride,
         padding='VALID', use_bias=use_bias, name=CONV.format(prefix_name, 1),
-        kernel_initializer=kernel_initializer
+        kernel_initializer=kernel_initializer, dilation=dilation, **layout_params
     )(mx)
 
-    mx = BatchNormLayer(D=out_f, name=BN.format(prefix_name, 2), **bn_params)(mx)
-    mx = ActivationLayer(activation=activation, name=ACTIVATION.format(prefix_name, 2))(mx)
-    mx = ZeroPaddingLayer(padding=[[1,1],[1,1]], name=ZERO_PADDING.format(prefix_name, 2))(mx)
-    mx = ConvLayer(
+    mx = BatchNormLayer(D=out_f, name=BN.format(prefix_name, 2), **bn_params, **layout_params)(mx)
+    mx = ActivationLayer(activation=activation, name=ACTIVATION.format(prefix_name, 2), **layout_params)(mx)
+    mx = ZeroPaddingLayer(
+        padding=[[dilation, dilation], [dilation, dilation]], name=ZERO_PADDING.format(prefix_name, 2), **layout_params
+    )(mx)
+    mx = _spatial_conv(
         kw=3, kh=3, in_f=out_f, out_f=out_f, activation=None,
         padding='VALID', use_bias=use_bias, name=CONV.format(prefix_name, 2),
-        kernel_initializer=kernel_initializer
+        kernel_initializer=kernel_initializer, dilation=dilation, **layout_params
     )(mx)
                                                                                 
     # Skip branch
     sx = ConvLayer(
         kw=1, kh=1, in_f=in_f, out_f=out_f, stride=stride,
         padding='VALID', activation=None, use_bias=use_bias, name=SCIP_BRANCH.format(prefix_name),
-        kernel_initializer=kernel_initializer
+        kernel_initializer=kernel_initializer, **layout_params
     )(x)
                                                                                
-    x = SumLayer(name=prefix_name + SUM_OPERATION + str(num_block))([mx, sx])
+    x = SumLayer(name=prefix_name + SUM_OPERATION + str(num_block), **layout_params)([mx, sx])
 
     return x
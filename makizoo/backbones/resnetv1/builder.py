@@ -23,9 +23,14 @@ from .blocks import (ResNetIdentityBlockV1, ResNetConvBlockV1,
 from .utils import (get_batchnorm_params, get_head_batchnorm_params,
                     get_batchnorm_params_resnet34, WITH_POINTWISE, WITHOUT_POINTWISE)
 
-from makiflow.layers import *
+from makizoo.layers import *
 from makiflow.layers.utils import InitConvKernel
 from makiflow.models import Classificator
+from makizoo.backbones.utils import (StageOutputs, OutputStride, scale_width, align_channels, check_stem,
+                                     check_data_format, get_channels,
+                                     STEM_CONV, STEM_SPACE_TO_DEPTH, SPACE_TO_DEPTH_BLOCK)
+from makizoo.ir import NHWC, layout_kwargs, from_nhwc
+from makizoo.backbones.blocks import SpaceToDepthConv
 import tensorflow as tf
 
 
@@ -48,7 +53,14 @@ def build_ResNetV1(
     activation_between_blocks=True,
     kernel_initializer=InitConvKernel.HE,
     output_factorization_layer=None,
-    input_tensor=None):
+    input_tensor=None,
+    return_stages=None,
+    stop_at_stage=None,
+    output_stride=None,
+    width_multiplier=1.0,
+    channel_multiple=None,
+    stem=STEM_CONV,
+    data_format=NHWC):
     """
     Build ResNet version 1 with certain parameters
 
@@ -57,6 +69,7 @@ def build_ResNetV1(
     input_shape : List
         Input shape of neural network. Example - [32, 128, 128, 3]
         which mean 32 - batch size, two 128 - size of picture, 3 - number of colors.
+        Batch size, height and width can be None, then one graph serves any batch size and resolution.
     repetition : list
         Number of repetition on certain depth.
     include_top : bool
@@ -92,9 +105,40 @@ def build_ResNetV1(
         otherwise output_factorization_layer = 2 * output_factorization_layer
     input_tensor : mf.MakiTensor
         A tensor that will be fed into the model instead of InputLayer with the specified `input_shape`.
+    return_stages : list
+        Indices of the stages which outputs will be returned, for example (2, 3, 4, 5) for C2-C5 features.
+        Stage 1 is the stem, stages 2-5 are outputs of four groups of blocks (`repetition`).
+        If not None, then list of outputs is returned instead of the single output.
+    stop_at_stage : int
+        Index of the last stage which will be created, layers after it are not created at all.
+        By default it is equal to max(`return_stages`), if both are None then the whole model is created.
+    output_stride : int
+        Ratio of the input resolution to the resolution of the output, for example 8 or 16 for dense prediction.
+        Blocks after the target stride are used without stride and with dilated 3x3 convolutions instead,
+        names and shapes of the weights are not changed. By default is None, i.e. 32 with default `stride_list`.
+    width_multiplier : float
+        Multiplier of the number of feature maps of every layer, for example 0.5 or 0.75 (analogue of `alpha` of MobileNetV2).
+        It is applied to `init_filters`, `min_reduction`, `output_factorization_layer` and widths of the blocks,
+        numbers of feature maps are rounded to the multiple of 8.
+    channel_multiple : int
+        If not None, numbers of feature maps are rounded up to the multiple of `channel_multiple` (for example 8, 16 or 32),
+        so that GEMMs of the convolutions have SIMD-friendly sizes. By default is None, i.e. numbers are not changed.
+    stem : str
+        'conv' - usual stem (see `factorization_first_layer` and `using_zero_padding`) followed by max pooling.
+        'space_to_depth' - 4x4 space-to-depth followed by the cheap convolution (TResNet), instead of the conv
+        and the max pooling, layers have prefix 'stem_s2d/'. Stride of the stem is 4, `stride_list[0]` and
+        `stride_list[1]` are not used, output of the stage 1 is the output of the stem.
+    data_format : str
+        Data format of the tensors: 'NHWC' (default) or 'NCHW', for NCHW `input_shape` is [N, C, H, W].
+        MakiFlow layers support only NHWC, so NCHW model can be created only as IR (see `makizoo.ir.trace`).
 
     Returns
     ---------
+    if `return_stages` is not None
+        in_x : mf.MakiTensor
+            Input MakiTensor
+        outputs : list
+            Output MakiTensors of the `return_stages`
     if `create_model` is False
         in_x : mf.MakiTensor
             Input MakiTensor
@@ -109,6 +153,31 @@ def build_ResNetV1(
     if (type(repetition) is not list and type(repetition) is not tuple) or len(repetition) != 4:
         raise TypeError('repetition should be list of size 4')
 
+    stages = StageOutputs(
+        return_stages=return_stages, stop_at_stage=stop_at_stage, num_stages=len(repetition) + 1,
+        include_top=include_top, create_model=create_model
+    )
+    check_stem(stem)
+    check_data_format(data_format)
+    layout_params = layout_kwargs(data_format)
+    if stem == STEM_SPACE_TO_DEPTH:
+        if factorization_first_layer:
+            raise ValueError('`factorization_first_layer` can not be used with the space-to-depth stem.')
+        stem_stride = SPACE_TO_DEPTH_BLOCK
+    else:
+        stem_stride = stride_list[0] * stride_list[1]
+    strides = OutputStride(output_stride=output_stride, current_stride=stem_stride)
+
+    init_filters = align_channels(scale_width(init_filters, width_multiplier), channel_multiple)
+    min_reduction = align_channels(scale_width(min_reduction, width_multiplier), channel_multiple)
+    # Identity blocks with pointwise use `in_f / 4` feature maps, so output of the first stage
+    # is rounded to the multiple of 4 * 8
+    first_stage_f = align_channels(scale_width(256, width_multiplier, divisor=32), channel_multiple)
+    if output_factorization_layer is not None:
+        output_factorization_layer = align_channels(
+            scale_width(output_factorization_layer, width_multiplier), channel_multiple
+        )
+
     feature_maps = init_filters
     if using_zero_padding:
         bn_params = get_batchnorm_params_resnet34()
@@ -131,74 +200,88 @@ def build_ResNetV1(
         raise Exception(f'{block_type} type is not found')
 
     if input_tensor is None:
-        in_x = InputLayer(input_shape=input_shape, name='Input')
+        in_x = InputLayer(input_shape=input_shape, name='Input', **layout_params)
     elif input_tensor is not None:
         in_x = input_tensor
         input_shape = input_tensor.get_shape()
 
-    if factorization_first_layer:
+    if stem == STEM_SPACE_TO_DEPTH:
+        x = SpaceToDepthConv(
+            in_x, out_f=feature_maps, name='stem_s2d/weights',
+            use_bias=use_bias, kernel_initializer=kernel_initializer, data_format=data_format
+        )
+        x = BatchNormLayer(D=feature_maps, name='stem_s2d/BatchNorm', **bn_params, **layout_params)(x)
+        x = ActivationLayer(activation=activation, name='stem_s2d/activation', **layout_params)(x)
+    elif factorization_first_layer:
 
         x = ConvLayer(
-            kw=3, kh=3, in_f=input_shape[-1], out_f=feature_maps, use_bias=use_bias,
+            kw=3, kh=3, in_f=get_channels(in_x, data_format), out_f=feature_maps, use_bias=use_bias,
             activation=None, stride=stride_list[0], name='conv1_1/weights',
-            kernel_initializer=kernel_initializer
+            kernel_initializer=kernel_initializer, **layout_params
         )(in_x)
-        x = BatchNormLayer(D=feature_maps, name='conv1_1/BatchNorm', **bn_params)(x)
-        x = ActivationLayer(activation=activation, name='conv1_1/activation')(x)
+        x = BatchNormLayer(D=feature_maps, name='conv1_1/BatchNorm', **bn_params, **layout_params)(x)
+        x = ActivationLayer(activation=activation, name='conv1_1/activation', **layout_params)(x)
 
         x = ConvLayer(
             kw=3, kh=3, in_f=feature_maps, out_f=feature_maps, use_bias=use_bias,
             activation=None, name='conv1_2/weights',
-            kernel_initializer=kernel_initializer
+            kernel_initializer=kernel_initializer, **layout_params
         )(x)
-        x = BatchNormLayer(D=feature_maps, name='conv1_2/BatchNorm', **bn_params)(x)
-        x = ActivationLayer(activation=activation, name='conv1_2/activation')(x)
+        x = BatchNormLayer(D=feature_maps, name='conv1_2/BatchNorm', **bn_params, **layout_params)(x)
+        x = ActivationLayer(activation=activation, name='conv1_2/activation', **layout_params)(x)
 
         x = ConvLayer(
             kw=3, kh=3, in_f=feature_maps, out_f=output_factorization_layer,
             use_bias=use_bias, activation=None, name='conv1_3/weights',
-            kernel_initializer=kernel_initializer
+            kernel_initializer=kernel_initializer, **layout_params
         )(x)
-        x = BatchNormLayer(D=output_factorization_layer, name='conv1_3/BatchNorm', **bn_params)(x)
-        x = ActivationLayer(activation=activation, name='conv1_3/activation')(x)
+        x = BatchNormLayer(D=output_factorization_layer, name='conv1_3/BatchNorm', **bn_params, **layout_params)(x)
+        x = ActivationLayer(activation=activation, name='conv1_3/activation', **layout_params)(x)
 
         feature_maps = output_factorization_layer
     elif using_zero_padding:
         if head_bn_params is None:
             head_bn_params = get_head_batchnorm_params()
 
-        x = BatchNormLayer(D=input_shape[-1], name='bn_data', **head_bn_params)(in_x)
+        x = BatchNormLayer(D=get_channels(in_x, data_format), name='bn_data', **head_bn_params, **layout_params)(in_x)
 
-        x = ZeroPaddingLayer(padding=[[3, 3], [3, 3]], name='zero_padding2d')(x)
+        x = ZeroPaddingLayer(padding=[[3, 3], [3, 3]], name='zero_padding2d', **layout_params)(x)
         
         x = ConvLayer(
-            kw=7, kh=7, in_f=input_shape[-1], out_f=feature_maps, stride=stride_list[0],
+            kw=7, kh=7, in_f=get_channels(in_x, data_format), out_f=feature_maps, stride=stride_list[0],
             use_bias=False, activation=None, padding='VALID',name='conv0',
-            kernel_initializer=kernel_initializer
+            kernel_initializer=kernel_initializer, **layout_params
         )(x)
         
-        x = BatchNormLayer(D=feature_maps, name='bn0', **bn_params)(x)
-        x = ActivationLayer(name='activation0')(x)
-
-        x = ZeroPaddingLayer(padding=[[1, 1], [1, 1]], name='zero_padding2d_1')(x)
+        x = BatchNormLayer(D=feature_maps, name='bn0', **bn_params, **layout_params)(x)
+        x = ActivationLayer(name='activation0', **layout_params)(x)
     else:
         x = ConvLayer(
-            kw=7, kh=7, in_f=input_shape[-1], out_f=feature_maps, use_bias=use_bias,
+            kw=7, kh=7, in_f=get_channels(in_x, data_format), out_f=feature_maps, use_bias=use_bias,
             stride=stride_list[0], activation=None,name='conv1/weights',
-            kernel_initializer=kernel_initializer
+            kernel_initializer=kernel_initializer, **layout_params
         )(in_x)
-        x = BatchNormLayer(D=feature_maps, name='conv1/BatchNorm', **bn_params)(x)
-        x = ActivationLayer(activation=activation, name='activation')(x)
+        x = BatchNormLayer(D=feature_maps, name='conv1/BatchNorm', **bn_params, **layout_params)(x)
+        x = ActivationLayer(activation=activation, name='activation', **layout_params)(x)
 
-    if using_zero_padding:
+    if stages.add(1, x):
+        return stages.result(in_x)
+
+    # Space-to-depth stem already has stride 4, so max pooling is used only after the conv stem
+    if stem == STEM_CONV and using_zero_padding:
+        x = ZeroPaddingLayer(padding=[[1, 1], [1, 1]], name='zero_padding2d_1', **layout_params)(x)
         x = MaxPoolLayer(
-            strides=[1, stride_list[1], stride_list[1], 1],
-            ksize=[1,3,3,1],
+            strides=from_nhwc([1, stride_list[1], stride_list[1], 1], data_format),
+            ksize=from_nhwc([1, 3, 3, 1], data_format),
             padding='VALID',
-            name='max_pooling2d'
+            name='max_pooling2d', **layout_params
+        )(x)
+    elif stem == STEM_CONV:
+        x = MaxPoolLayer(
+            strides=from_nhwc([1, stride_list[1], stride_list[1], 1], data_format),
+            ksize=from_nhwc([1, 3, 3, 1], data_format),
+            name='max_pooling2d', **layout_params
         )(x)
-    else:
-        x = MaxPoolLayer(strides=[1, stride_list[1], stride_list[1], 1], ksize=[1, 3, 3, 1], name='max_pooling2d')(x)
 
     # Build body of ResNet
     num_activation = 3
@@ -223,10 +306,13 @@ def build_ResNetV1(
                         use_bias=use_bias,
                         activation=activation,
                         stride=1,
-                        out_f=256,
+                        out_f=first_stage_f,
                         reduction=min_reduction,
                         kernel_initializer=kernel_initializer,
-                        bn_params=bn_params
+                        bn_params=bn_params,
+                        dilation=strides.rate,
+                        channel_multiple=channel_multiple,
+                        data_format=data_format
                     )
                 else:
                     x = conv_block(
@@ -239,10 +325,15 @@ def build_ResNetV1(
                         stride=1,
                         out_f=feature_maps,
                         kernel_initializer=kernel_initializer,
-                        bn_params=bn_params
+                        bn_params=bn_params,
+                        dilation=strides.rate,
+                        channel_multiple=channel_multiple,
+                        data_format=data_format
                     )
             elif block == 1:
                 # Every first block in new stage (zero block) we do block with stride 2 and increase number of feature maps
+                # After `output_stride` is reached, stride is replaced by dilation of the next blocks
+                stride, dilation = strides.step(stride_list[num_stride])
                 x = conv_block(
                     x=x, 
                     block_id=stage, 
@@ -250,9 +341,12 @@ def build_ResNetV1(
                     num_block=num_block,
                     use_bias=use_bias,
                     activation=activation,
-                    stride=stride_list[num_stride],
+                    stride=stride,
                     kernel_initializer=kernel_initializer,
-                    bn_params=bn_params
+                    bn_params=bn_params,
+                    dilation=dilation,
+                    channel_multiple=channel_multiple,
+                    data_format=data_format
                 )
                 num_stride += 1
             else:
@@ -264,20 +358,32 @@ def build_ResNetV1(
                     use_bias=use_bias,
                     activation=activation,
                     kernel_initializer=kernel_initializer,
-                    bn_params=bn_params
+                    bn_params=bn_params,
+                    dilation=strides.rate,
+                    channel_multiple=channel_multiple,
+                    data_format=data_format
                 )
             num_block += 1
 
             if activation_between_blocks:
-                x = ActivationLayer(activation=activation, name='activation_' + str(num_activation))(x)
+                x = ActivationLayer(activation=activation, name='activation_' + str(num_activation), **layout_params)(x)
                 num_activation += 3
-    
+
+        # Output of the last stage is taken after final normalization
+        if stage < len(repetition) and stages.add(stage + 1, x):
+            return stages.result(in_x)
+
+    strides.check()
+
     if not pointwise:
-        x = BatchNormLayer(D=x.get_shape()[-1], name='bn1', **bn_params)(x)
-        x = ActivationLayer(activation=activation, name='relu1')(x)
+        x = BatchNormLayer(D=get_channels(x, data_format), name='bn1', **bn_params, **layout_params)(x)
+        x = ActivationLayer(activation=activation, name='relu1', **layout_params)(x)
+
+    if stages.add(len(repetition) + 1, x):
+        return stages.result(in_x)
 
     if include_top:
-        x = GlobalAvgPoolLayer(name='avg_pool')(x)
+        x = GlobalAvgPoolLayer(name='avg_pool', **layout_params)(x)
         output = DenseLayer(
             in_d=x.get_shape()[-1], out_d=num_classes,
             activation=None, name='logits' if pointwise else 'fc1'
@@ -302,7 +408,12 @@ def build_LittleResNetV1(
         name_model='MakiClassificator',
         activation_between_blocks=True,
         kernel_initializer=InitConvKernel.HE,
-        input_tensor=None):
+        input_tensor=None,
+        return_stages=None,
+        stop_at_stage=None,
+        width_multiplier=1.0,
+        channel_multiple=None,
+        data_format=NHWC):
     """
     These type of ResNet tests on CIFAR-10 and CIFAR-100
 
@@ -311,6 +422,7 @@ def build_LittleResNetV1(
     input_shape : List
         Input shape of neural network. Example - [32, 128, 128, 3]
         which mean 32 - batch size, two 128 - size of picture, 3 - number of colors.
+        Batch size, height and width can be None, then one graph serves any batch size and resolution.
     depth : int
         Maximum number of layers.
     use_bias : bool
@@ -329,9 +441,30 @@ def build_LittleResNetV1(
         By default He initialization are used
     input_tensor : mf.MakiTensor
         A tensor that will be fed into the model instead of InputLayer with the specified `input_shape`.
+    return_stages : list
+        Indices of the stages which outputs will be returned, for example (2, 3, 4).
+        Stage 1 is the stem, stages 2-4 are outputs of three groups of blocks.
+        If not None, then list of outputs is returned instead of the single output.
+    stop_at_stage : int
+        Index of the last stage which will be created, layers after it are not created at all.
+        By default it is equal to max(`return_stages`), if both are None then the whole model is created.
+    width_multiplier : float
+        Multiplier of the number of feature maps of every layer, for example 0.5 or 0.75
+        (analogue of `alpha` of MobileNetV2). Numbers of feature maps are rounded to the multiple of 8.
+    channel_multiple : int
+        If not None, numbers of feature maps are rounded up to the multiple of `channel_multiple` (for example 8, 16 or 32),
+        so that GEMMs of the convolutions have SIMD-friendly sizes. By default is None, i.e. numbers are not changed.
+    data_format : str
+        Data format of the tensors: 'NHWC' (default) or 'NCHW', for NCHW `input_shape` is [N, C, H, W].
+        MakiFlow layers support only NHWC, so NCHW model can be created only as IR (see `makizoo.ir.trace`).
 
     Returns
     ---------
+    if `return_stages` is not None
+        in_x : mf.MakiTensor
+            Input MakiTensor
+        outputs : list
+            Output MakiTensors of the `return_stages`
     if `create_model` is False
         in_x : mf.MakiTensor
             Input MakiTensor
@@ -343,31 +476,42 @@ def build_LittleResNetV1(
 
     """
 
-    feature_maps = 16
+    stages = StageOutputs(
+        return_stages=return_stages, stop_at_stage=stop_at_stage, num_stages=4,
+        include_top=include_top, create_model=create_model
+    )
+    check_data_format(data_format)
+    layout_params = layout_kwargs(data_format)
+
+    feature_maps = align_channels(scale_width(16, width_multiplier), channel_multiple)
     bm_params = get_batchnorm_params()
 
     conv_block = ResNetConvBlock_woPointWiseV1
     iden_block = ResNetIdentityBlock_woPointWiseV1
 
     if input_tensor is None:
-        in_x = InputLayer(input_shape=input_shape, name='Input')
+        in_x = InputLayer(input_shape=input_shape, name='Input', **layout_params)
     elif input_tensor is not None:
         in_x = input_tensor
         input_shape = input_tensor.get_shape()
 
     x = ConvLayer(
-        kw=3, kh=3, in_f=input_shape[-1], out_f=feature_maps, activation=None,
+        kw=3, kh=3, in_f=get_channels(in_x, data_format), out_f=feature_maps, activation=None,
         use_bias=use_bias, name='conv1',
-        kernel_initializer=kernel_initializer
+        kernel_initializer=kernel_initializer, **layout_params
     )(in_x)
-    x = BatchNormLayer(D=feature_maps, name='bn_1', **bm_params)(x)
-    x = ActivationLayer(activation=activation, name= 'activation_1')(x)
+    x = BatchNormLayer(D=feature_maps, name='bn_1', **bm_params, **layout_params)(x)
+    x = ActivationLayer(activation=activation, name= 'activation_1', **layout_params)(x)
+
+    if stages.add(1, x):
+        return stages.result(in_x)
 
     repeat = int((depth - 2) / 6)
 
     # Build body of ResNet
     num_block = 0
     num_activation = 3
+    num_stage = 1
     
     for stage in range(3):
         for block in range(1, repeat + 1):
@@ -387,7 +531,9 @@ def build_LittleResNetV1(
                     stride=1,
                     out_f=feature_maps,
                     kernel_initializer=kernel_initializer,
-                    bn_params=bm_params
+                    bn_params=bm_params,
+                    channel_multiple=channel_multiple,
+                    data_format=data_format
                 )
             elif block == 1:
                 # Every first block in new stage (zero block) we do block with stride 2 and increase number of feature maps
@@ -400,7 +546,9 @@ def build_LittleResNetV1(
                     activation=activation,
                     stride=2,
                     kernel_initializer=kernel_initializer,
-                    bn_params=bm_params
+                    bn_params=bm_params,
+                    channel_multiple=channel_multiple,
+                    data_format=data_format
                 )
             else:
                 x = iden_block(
@@ -411,16 +559,22 @@ def build_LittleResNetV1(
                     use_bias=use_bias,
                     activation=activation,
                     kernel_initializer=kernel_initializer,
-                    bn_params=bm_params
+                    bn_params=bm_params,
+                    channel_multiple=channel_multiple,
+                    data_format=data_format
                 )
 
             if activation_between_blocks:
-                x = ActivationLayer(activation=activation, name='activation_' + str(num_activation))(x)
+                x = ActivationLayer(activation=activation, name='activation_' + str(num_activation), **layout_params)(x)
                 num_activation += 3
             num_block += 1
 
+        num_stage += 1
+        if stages.add(num_stage, x):
+            return stages.result(in_x)
+
     if include_top:
-        x = GlobalAvgPoolLayer(name='avg_pool')(x)
+        x = GlobalAvgPoolLayer(name='avg_pool', **layout_params)(x)
         output = DenseLayer(in_d=x.get_shape()[-1], out_d=num_classes, activation=None, name='logits')(x)
     else:
         output = x
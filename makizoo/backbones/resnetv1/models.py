@@ -40,6 +40,7 @@ def ResNet18(
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3]
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -95,6 +96,7 @@ def ResNet34(
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3]
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -154,6 +156,7 @@ def ResNet50(
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3]
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -211,6 +214,7 @@ def ResNet101(
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3]
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -268,6 +272,7 @@ def ResNet152(
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3]
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -331,6 +336,7 @@ def Little_ResNet20(
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3]
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -385,6 +391,7 @@ def Little_ResNet32(
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3]
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -439,6 +446,7 @@ def Little_ResNet44(
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3]
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -493,6 +501,7 @@ def Little_ResNet56(
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3]
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -547,6 +556,7 @@ def Little_ResNet110(
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3]
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -15,6 +15,15 @@
 # You should have received a copy of the GNU General Public License
 # along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
 
-from .models import ShuffleNetv2_10, ShuffleNetv2_15, ShuffleNetv2_05, ShuffleNetV2_20
-from .blocks import ShuffleNetSpatialDownUnit, ShuffleNetBasicUnitBlock
-from .builder import build_ShuffleNetV2
+from makizoo.lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=['blocks', 'builder', 'models', 'utils'],
+    attributes={
+        'models': ['ShuffleNetv2_10', 'ShuffleNetv2_15', 'ShuffleNetv2_05', 'ShuffleNetV2_20'],
+        'blocks': ['ShuffleNetSpatialDownUnit', 'ShuffleNetBasicUnitBlock'],
+        'builder': ['build_ShuffleNetV2'],
+        'utils': ['SIZE_2_CONFIG_MODEL', 'MODEL_05', 'MODEL_10', 'MODEL_15', 'MODEL_20'],
+    }
+)
@@ -15,13 +15,73 @@
 # You should have received a copy of the GNU General Public License
 # along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
 
-from makiflow.layers import *
+from makizoo.layers import *
 from makiflow.layers.utils import InitConvKernel
 from makiflow.core import MakiTensor
+from makizoo.backbones.utils import get_channels
+from makizoo.ir import NHWC, channel_axis, layout_kwargs
 
 import tensorflow as tf
 
 
+def ConcatChannelShuffle(xs: list, stage: str, shuffle_group=2, fuse_shuffle=False, data_format=NHWC):
+    """
+    Concatenate branches of the ShuffleNetV2 unit and shuffle channels.
+
+    Parameters
+    ----------
+    xs : list
+        List of branches (MakiTensors) of the unit.
+    stage : str
+        Prefix to all layers, used only for layer names
+    shuffle_group : int
+        Number of feature that need to shuffle,
+        For more information, please refer to: https://arxiv.org/pdf/1707.01083.pdf
+    fuse_shuffle : bool
+        If equal to True, then every branch is reshaped to [H, W, C, 1] ([C, 1, H, W] for NCHW)
+        and branches are concatenated along the new axis, i.e. they are written straight
+        into interleaved channel positions,
+        which is the same as ConcatLayer + ChannelShuffleLayer, but with one copy of the tensor instead of two.
+        Used only if `shuffle_group` is equal to the number of the branches,
+        all branches have the same number of feature maps and shapes are fully known (except batch size),
+        otherwise ConcatLayer + ChannelShuffleLayer are used.
+    data_format : str
+        Data format of the tensors: 'NHWC' or 'NCHW'.
+
+    Returns
+    -------
+    MakiTensor
+        Output MakiTensor
+
+    """
+    layout_params = layout_kwargs(data_format)
+    shapes = [x.get_shape()[1:] for x in xs]
+    can_fuse = (
+        fuse_shuffle and
+        shuffle_group == len(xs) and
+        all(dim is not None for dim in shapes[0]) and
+        all(list(shape) == list(shapes[0]) for shape in shapes)
+    )
+
+    if not can_fuse:
+        x = ConcatLayer(name=stage + '/concat_f', **layout_params)(xs)
+        return ChannelShuffleLayer(num_groups=shuffle_group, name=stage + '/shuffle_f', **layout_params)(x)
+
+    # New axis goes right after the axis of the feature maps (shapes are given without batch dimension)
+    c_axis = channel_axis(data_format) - 1
+    branch_shape = list(shapes[0])
+    branch_shape.insert(c_axis + 1, 1)
+    output_shape = list(shapes[0])
+    output_shape[c_axis] *= len(xs)
+
+    xs = [
+        ReshapeLayer(new_shape=branch_shape, name=stage + f'/shuffle_f/reshape_{i}', **layout_params)(x)
+        for i, x in enumerate(xs)
+    ]
+    x = ConcatLayer(axis=c_axis + 2, name=stage + '/concat_f', **layout_params)(xs)
+    return ReshapeLayer(new_shape=output_shape, name=stage + '/shuffle_f', **layout_params)(x)
+
+
 def ShuffleNetBasicUnitBlock(
         x: MakiTensor,
         out_f: int,
@@ -29,7 +89,9 @@ def ShuffleNetBasicUnitBlock(
         shuffle_group=2,
         activation=tf.nn.relu,
         use_bias=False,
-        kernel_initializer=InitConvKernel.HE):
+        kernel_initializer=InitConvKernel.HE,
+        fuse_shuffle=False,
+        data_format=NHWC):
     """
     Create basic unit of ShuffleNetV2.
     You can see more detail image in original paper: https://arxiv.org/pdf/1807.11164.pdf
@@ -53,6 +115,10 @@ def ShuffleNetBasicUnitBlock(
         Name of type initialization for conv layers,
         For more examples see: makiflow.layers.utils,
         By default He initialization are used
+    fuse_shuffle : bool
+        Use fused concat and channel shuffle, see `ConcatChannelShuffle`.
+    data_format : str
+        Data format of the tensors: 'NHWC' or 'NCHW'.
 
     Returns
     -------
@@ -60,41 +126,45 @@ def ShuffleNetBasicUnitBlock(
         Output MakiTensor of this block
 
     """
-    if x.get_shape()[-1] % 2 != 0:
+    if get_channels(x, data_format) % 2 != 0:
         raise ValueError(
             "Error!!!\n"
             "In ShuffleNetBasicUnitBlock input number of features must be divided by 2 without reminder."
         )
     stage = str(stage)
+    layout_params = layout_kwargs(data_format)
 
     # Split input tensor into 2 parts
-    x1, x2 = ChannelSplitLayer(num_or_size_splits=2, axis=3, name=stage + '_split')(x)
+    x1, x2 = ChannelSplitLayer(
+        num_or_size_splits=2, axis=channel_axis(data_format), name=stage + '_split', **layout_params
+    )(x)
 
     # Main branch
     x = ConvLayer(
-        kw=1, kh=1, in_f=x1.get_shape()[-1], out_f=out_f // 2, kernel_initializer=kernel_initializer,
-        use_bias=use_bias, activation=None, name=stage + '/mb/conv1'
+        kw=1, kh=1, in_f=get_channels(x1, data_format), out_f=out_f // 2, kernel_initializer=kernel_initializer,
+        use_bias=use_bias, activation=None, name=stage + '/mb/conv1', **layout_params
     )(x1)
-    x = BatchNormLayer(D=x.get_shape()[-1], name=stage + f'/mb/bn_1')(x)
-    x = ActivationLayer(activation=activation, name=stage + f'/mb/activation_1')(x)
+    x = BatchNormLayer(D=get_channels(x, data_format), name=stage + f'/mb/bn_1', **layout_params)(x)
+    x = ActivationLayer(activation=activation, name=stage + f'/mb/activation_1', **layout_params)(x)
 
     x = DepthWiseConvLayer(
-        kw=3, kh=3, in_f=x.get_shape()[-1], multiplier=1, kernel_initializer=kernel_initializer,
-        use_bias=use_bias, activation=None, name=stage + f'/mb/conv_2'
+        kw=3, kh=3, in_f=get_channels(x, data_format), multiplier=1, kernel_initializer=kernel_initializer,
+        use_bias=use_bias, activation=None, name=stage + f'/mb/conv_2', **layout_params
     )(x)
-    x = BatchNormLayer(D=x.get_shape()[-1], name=stage + f'/mb/bn_2')(x)
+    x = BatchNormLayer(D=get_channels(x, data_format), name=stage + f'/mb/bn_2', **layout_params)(x)
 
     x = ConvLayer(
-        kw=1, kh=1, in_f=x.get_shape()[-1], out_f=x.get_shape()[-1], kernel_initializer=kernel_initializer,
-        use_bias=use_bias, activation=None, name=stage + '/mb/conv3'
+        kw=1, kh=1, in_f=get_channels(x, data_format), out_f=get_channels(x, data_format),
+        kernel_initializer=kernel_initializer, use_bias=use_bias, activation=None, name=stage + '/mb/conv3',
+        **layout_params
     )(x)
-    x = BatchNormLayer(D=x.get_shape()[-1], name=stage + f'/mb/bn_3')(x)
-    x = ActivationLayer(activation=activation, name=stage + f'/mb/activation_3')(x)
+    x = BatchNormLayer(D=get_channels(x, data_format), name=stage + f'/mb/bn_3', **layout_params)(x)
+    x = ActivationLayer(activation=activation, name=stage + f'/mb/activation_3', **layout_params)(x)
 
     # Connect reminder x1 and main branch
-    x = ConcatLayer(name=stage + '/concat_f')([x2, x])
-    x = ChannelShuffleLayer(num_groups=shuffle_group, name=stage + '/shuffle_f')(x)
-    return x
+    return ConcatChannelShuffle(
+        [x2, x], stage=stage, shuffle_group=shuffle_group, fuse_shuffle=fuse_shuffle, data_format=data_format
+    )
 
 
 def ShuffleNetSpatialDownUnit(
@@ -105,7 +175,9 @@ def ShuffleNetSpatialDownUnit(
         stride=2,
         activation=tf.nn.relu,
         use_bias=False,
-        kernel_initializer=InitConvKernel.HE):
+        kernel_initializer=InitConvKernel.HE,
+        fuse_shuffle=False,
+        data_format=NHWC):
     """
     Create spatial unit of ShuffleNetV2.
     This layers usually used to reduce image size (i.e. with `stride`=2)
@@ -132,6 +204,10 @@ def ShuffleNetSpatialDownUnit(
         Name of type initialization for conv layers,
         For more examples see: makiflow.layers.utils,
         By default He initialization are used
+    fuse_shuffle : bool
+        Use fused concat and channel shuffle, see `ConcatChannelShuffle`.
+    data_format : str
+        Data format of the tensors: 'NHWC' or 'NCHW'.
 
     Returns
     -------
@@ -139,46 +215,48 @@ def ShuffleNetSpatialDownUnit(
         Output MakiTensor of this block
 
     """
+    layout_params = layout_kwargs(data_format)
 
     # First branch
     # Conv(1x1) -> bn -> relu --> DepthWiseConv(3x3, s=2) -> bn --> Conv(1x1) -> bn -> relu
     fx = ConvLayer(
-        kw=1, kh=1, in_f=x.get_shape()[-1], out_f=out_f // 2, kernel_initializer=kernel_initializer,
-        use_bias=use_bias, activation=None, name=stage + '/fx/conv1'
+        kw=1, kh=1, in_f=get_channels(x, data_format), out_f=out_f // 2, kernel_initializer=kernel_initializer,
+        use_bias=use_bias, activation=None, name=stage + '/fx/conv1', **layout_params
     )(x)
-    fx = BatchNormLayer(D=fx.get_shape()[-1], name=stage + f'/fx/bn_1')(fx)
-    fx = ActivationLayer(activation=activation, name=stage + f'/fx/activation_1')(fx)
+    fx = BatchNormLayer(D=get_channels(fx, data_format), name=stage + f'/fx/bn_1', **layout_params)(fx)
+    fx = ActivationLayer(activation=activation, name=stage + f'/fx/activation_1', **layout_params)(fx)
 
     fx = DepthWiseConvLayer(
-        kw=3, kh=3, in_f=fx.get_shape()[-1], multiplier=1, kernel_initializer=kernel_initializer,
-        use_bias=use_bias, stride=stride, activation=None, name=stage + f'/fx/conv_2'
+        kw=3, kh=3, in_f=get_channels(fx, data_format), multiplier=1, kernel_initializer=kernel_initializer,
+        use_bias=use_bias, stride=stride, activation=None, name=stage + f'/fx/conv_2', **layout_params
     )(fx)
-    fx = BatchNormLayer(D=fx.get_shape()[-1], name=stage + f'/fx/bn_2')(fx)
+    fx = BatchNormLayer(D=get_channels(fx, data_format), name=stage + f'/fx/bn_2', **layout_params)(fx)
 
     fx = ConvLayer(
-        kw=1, kh=1, in_f=fx.get_shape()[-1], out_f=fx.get_shape()[-1], kernel_initializer=kernel_initializer,
-        use_bias=use_bias, activation=None, name=stage + '/fx/conv3'
+        kw=1, kh=1, in_f=get_channels(fx, data_format), out_f=get_channels(fx, data_format),
+        kernel_initializer=kernel_initializer, use_bias=use_bias, activation=None, name=stage + '/fx/conv3',
+        **layout_params
     )(fx)
-    fx = BatchNormLayer(D=fx.get_shape()[-1], name=stage + f'/fx/bn_3')(fx)
-    fx = ActivationLayer(activation=activation, name=stage + f'/fx/activation_3')(fx)
+    fx = BatchNormLayer(D=get_channels(fx, data_format), name=stage + f'/fx/bn_3', **layout_params)(fx)
+    fx = ActivationLayer(activation=activation, name=stage + f'/fx/activation_3', **layout_params)(fx)
 
     # Second branch
     # DepthWiseConv(3x3, s=2) -> bn --> Conv(1x1) -> bn -> relu
     sx = DepthWiseConvLayer(
-        kw=3, kh=3, in_f=x.get_shape()[-1], multiplier=1, kernel_initializer=kernel_initializer,
-        use_bias=use_bias, stride=stride, activation=None, name=stage + f'/sx/conv_1'
+        kw=3, kh=3, in_f=get_channels(x, data_format), multiplier=1, kernel_initializer=kernel_initializer,
+        use_bias=use_bias, stride=stride, activation=None, name=stage + f'/sx/conv_1', **layout_params
     )(x)
-    sx = BatchNormLayer(D=sx.get_shape()[-1], name=stage + f'/sx/bn_1')(sx)
+    sx = BatchNormLayer(D=get_channels(sx, data_format), name=stage + f'/sx/bn_1', **layout_params)(sx)
 
     sx = ConvLayer(
-        kw=1, kh=1, in_f=x.get_shape()[-1], out_f=out_f // 2, kernel_initializer=kernel_initializer,
-        use_bias=use_bias, activation=None, name=stage + '/sx/conv2'
+        kw=1, kh=1, in_f=get_channels(x, data_format), out_f=out_f // 2, kernel_initializer=kernel_initializer,
+        use_bias=use_bias, activation=None, name=stage + '/sx/conv2', **layout_params
     )(sx)
-    sx = BatchNormLayer(D=sx.get_shape()[-1], name=stage + f'/sx/bn_2')(sx)
-    sx = ActivationLayer(activation=activation, name=stage + f'/sx/activation_2')(sx)
+    sx = BatchNormLayer(D=get_channels(sx, data_format), name=stage + f'/sx/bn_2', **layout_params)(sx)
+    sx = ActivationLayer(activation=activation, name=stage + f'/sx/activation_2', **layout_params)(sx)
 
     # Connect two branches and shuffle
-    x = ConcatLayer(name=stage + '/concat_f')([fx, sx])
-    x = ChannelShuffleLayer(num_groups=shuffle_group, name=stage + '/shuffle_f')(x)
-    return x
+    return ConcatChannelShuffle(
+        [fx, sx], stage=stage, shuffle_group=shuffle_group, fuse_shuffle=fuse_shuffle, data_format=data_format
+    )
 
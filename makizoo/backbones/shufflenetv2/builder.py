@@ -16,8 +16,10 @@
 # along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
 
 from makiflow.layers.utils import InitConvKernel
-from makiflow.layers import *
+from makizoo.layers import *
 import tensorflow as tf
+from makizoo.backbones.utils import StageOutputs, scale_width, align_channels, check_data_format, get_channels
+from makizoo.ir import NHWC, layout_kwargs, from_nhwc
 
 from .blocks import ShuffleNetSpatialDownUnit, ShuffleNetBasicUnitBlock
 
@@ -34,7 +36,13 @@ def build_ShuffleNetV2(
     create_model=False,
     name_model='MakiClassificator',
     kernel_initializer=InitConvKernel.HE,
-    input_tensor=None):
+    input_tensor=None,
+    fuse_shuffle=False,
+    return_stages=None,
+    stop_at_stage=None,
+    width_multiplier=1.0,
+    channel_multiple=None,
+    data_format=NHWC):
     """
     Build ResNet version 1 with certain parameters
 
@@ -43,6 +51,7 @@ def build_ShuffleNetV2(
     input_shape : List
         Input shape of neural network. Example - [32, 128, 128, 3]
         which mean 32 - batch size, two 128 - size of picture, 3 - number of colors.
+        Batch size, height and width can be None, then one graph serves any batch size and resolution.
     model_config : list
         [(out_channel, repeat_times), (out_channel, repeat_times), ...]
     shuffle_group : int
@@ -70,9 +79,37 @@ def build_ShuffleNetV2(
         By default He initialization are used
     input_tensor : mf.MakiTensor
         A tensor that will be fed into the model instead of InputLayer with the specified `input_shape`.
+    fuse_shuffle : bool
+        If equal to True, then concat and channel shuffle at the end of every unit are fused
+        into one copy of the tensor (layers without weights are changed only, so weights are compatible).
+        Used only if spatial shape of the input is known.
+    return_stages : list
+        Indices of the stages which outputs will be returned, for example (2, 3, 4, 5) for C2-C5 features.
+        Stage 1 is the stem, stage 2 is the output of the max pooling, stages 3-5 are outputs of the groups of units from `model_config`, stage 5 includes the final conv.
+        If not None, then list of outputs is returned instead of the single output.
+    stop_at_stage : int
+        Index of the last stage which will be created, layers after it are not created at all.
+        By default it is equal to max(`return_stages`), if both are None then the whole model is created.
+    width_multiplier : float
+        Multiplier of the number of feature maps, for example 0.5 or 0.75 (analogue of `alpha` of MobileNetV2).
+        It is applied to the stem (rounded to the multiple of 8) and `out_channel` of `model_config`
+        (rounded to the multiple of 16, i.e. 8 in every branch of the unit).
+        As in MobileNetV2, the final conv is scaled only if `width_multiplier` is more than 1.
+    channel_multiple : int
+        If not None, numbers of feature maps are rounded up to the multiple of `channel_multiple` (for example 8, 16 or 32),
+        so that GEMMs of the convolutions have SIMD-friendly sizes. By default is None, i.e. numbers are not changed.
+        Outputs of the units are rounded up to the multiple of 2 * `channel_multiple`, so that both branches are aligned.
+    data_format : str
+        Data format of the tensors: 'NHWC' (default) or 'NCHW', for NCHW `input_shape` is [N, C, H, W].
+        MakiFlow layers support only NHWC, so NCHW model can be created only as IR (see `makizoo.ir.trace`).
 
     Returns
     ---------
+    if `return_stages` is not None
+        in_x : mf.MakiTensor
+            Input MakiTensor
+        outputs : list
+            Output MakiTensors of the `return_stages`
     if `create_model` is False
         in_x : mf.MakiTensor
             Input MakiTensor
@@ -83,28 +120,49 @@ def build_ShuffleNetV2(
             Classification model
 
     """
+    stages = StageOutputs(
+        return_stages=return_stages, stop_at_stage=stop_at_stage, num_stages=len(model_config) + 1,
+        include_top=include_top, create_model=create_model
+    )
+    check_data_format(data_format)
+    layout_params = layout_kwargs(data_format)
+
     if input_tensor is None:
-        in_x = InputLayer(input_shape=input_shape, name='Input')
+        in_x = InputLayer(input_shape=input_shape, name='Input', **layout_params)
     elif input_tensor is not None:
         in_x = input_tensor
 
+    stem_f = align_channels(scale_width(24, width_multiplier), channel_multiple)
     x = ConvLayer(
-        kw=3, kh=3, in_f=in_x.get_shape()[-1], out_f=24, kernel_initializer=kernel_initializer,
-        use_bias=use_bias, activation=activation, stride=stride_list[0], name='conv1'
+        kw=3, kh=3, in_f=get_channels(in_x, data_format), out_f=stem_f, kernel_initializer=kernel_initializer,
+        use_bias=use_bias, activation=activation, stride=stride_list[0], name='conv1', **layout_params
     )(in_x)
-    x = BatchNormLayer(D=x.get_shape()[-1], name=f'bn_1')(x)
-    x = ActivationLayer(activation=activation, name=f'activation_1')(x)
-    x = MaxPoolLayer(name='maxpool1', ksize=[1, 3, 3, 1], strides=[1, stride_list[1], stride_list[1], 1])(x)
+    x = BatchNormLayer(D=get_channels(x, data_format), name=f'bn_1', **layout_params)(x)
+    x = ActivationLayer(activation=activation, name=f'activation_1', **layout_params)(x)
+    if stages.add(1, x):
+        return stages.result(in_x)
+
+    x = MaxPoolLayer(
+        name='maxpool1', ksize=from_nhwc([1, 3, 3, 1], data_format),
+        strides=from_nhwc([1, stride_list[1], stride_list[1], 1], data_format), **layout_params
+    )(x)
+    if stages.add(2, x):
+        return stages.result(in_x)
 
     for idx, (block, stride_single) in enumerate(zip(model_config[:-1], stride_list[2:])):
         out_channel, repeat = block
+        # Units split feature maps into two branches, so every branch has multiple of 8 feature maps
+        out_channel = scale_width(out_channel, width_multiplier, divisor=16)
+        if channel_multiple is not None:
+            out_channel = align_channels(out_channel, 2 * channel_multiple)
 
         # First block is downsampling
         x = ShuffleNetSpatialDownUnit(
             x, out_channel, f"{idx}_block_down_shufflenet_",
             shuffle_group=shuffle_group, stride=stride_single,
             kernel_initializer=kernel_initializer,
-            use_bias=use_bias, activation=activation
+            use_bias=use_bias, activation=activation,
+            fuse_shuffle=fuse_shuffle, data_format=data_format
         )
 
         # Rest blocks
@@ -112,15 +170,22 @@ def build_ShuffleNetV2(
             x = ShuffleNetBasicUnitBlock(
                 x=x, out_f=out_channel, stage=f"{idx}_block_num_{i}_shufflenet_",
                 shuffle_group=shuffle_group, use_bias=use_bias, activation=activation,
-                kernel_initializer=kernel_initializer
+                kernel_initializer=kernel_initializer, fuse_shuffle=fuse_shuffle, data_format=data_format
             )
 
+        # Output of the last stage is taken after the final conv
+        if idx < len(model_config) - 2 and stages.add(idx + 3, x):
+            return stages.result(in_x)
+
+    final_f = align_channels(scale_width(model_config[-1], max(width_multiplier, 1.0)), channel_multiple)
     x = ConvLayer(
-        kw=1, kh=1, in_f=x.get_shape()[-1], out_f=model_config[-1],
+        kw=1, kh=1, in_f=get_channels(x, data_format), out_f=final_f,
         kernel_initializer=kernel_initializer, use_bias=use_bias,
-        activation=activation, name='final'
+        activation=activation, name='final', **layout_params
     )(x)
-    x = BatchNormLayer(D=x.get_shape()[-1], name=f'final_bn')(x)
-    x = ActivationLayer(activation=activation, name=f'final_activation')(x)
+    x = BatchNormLayer(D=get_channels(x, data_format), name=f'final_bn', **layout_params)(x)
+    x = ActivationLayer(activation=activation, name=f'final_activation', **layout_params)(x)
+    if stages.add(len(model_config) + 1, x):
+        return stages.result(in_x)
 
     return in_x, x
@@ -26,7 +26,8 @@ def ShuffleNetV2_20(
         classes=1000,
         include_top=False,
         create_model=False,
-        kernel_initializer=InitConvKernel.HE):
+        kernel_initializer=InitConvKernel.HE,
+        fuse_shuffle=False):
     """
     Create ShuffleNetV2 with x2.0 model with certain `input_shape`
 
@@ -35,6 +36,7 @@ def ShuffleNetV2_20(
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3]
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -47,6 +49,9 @@ def ShuffleNetV2_20(
         Name of type initialization for conv layers,
         For more examples see: makiflow.layers.utils,
         By default He initialization are used
+    fuse_shuffle : bool
+        If equal to True, then concat and channel shuffle at the end of every unit are fused,
+        weights are compatible with the default model.
 
     Returns
     -------
@@ -70,6 +75,7 @@ def ShuffleNetV2_20(
         activation=tf.nn.relu,
         create_model=create_model,
         kernel_initializer=kernel_initializer,
+        fuse_shuffle=fuse_shuffle,
         name_model='ShuffleNetv2_20'
     )
 
@@ -79,7 +85,8 @@ def ShuffleNetv2_15(
         classes=1000,
         include_top=False,
         create_model=False,
-        kernel_initializer=InitConvKernel.HE):
+        kernel_initializer=InitConvKernel.HE,
+        fuse_shuffle=False):
     """
     Create ShuffleNetV2 with x1.5 model with certain `input_shape`
 
@@ -88,6 +95,7 @@ def ShuffleNetv2_15(
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3]
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -100,6 +108,9 @@ def ShuffleNetv2_15(
         Name of type initialization for conv layers,
         For more examples see: makiflow.layers.utils,
         By default He initialization are used
+    fuse_shuffle : bool
+        If equal to True, then concat and channel shuffle at the end of every unit are fused,
+        weights are compatible with the default model.
 
     Returns
     -------
@@ -123,6 +134,7 @@ def ShuffleNetv2_15(
         activation=tf.nn.relu,
         create_model=create_model,
         kernel_initializer=kernel_initializer,
+        fuse_shuffle=fuse_shuffle,
         name_model='ShuffleNetv2_20'
     )
 
@@ -132,7 +144,8 @@ def ShuffleNetv2_10(
         classes=1000,
         include_top=False,
         create_model=False,
-        kernel_initializer=InitConvKernel.HE):
+        kernel_initializer=InitConvKernel.HE,
+        fuse_shuffle=False):
     """
     Create ShuffleNetV2 with x1.0 model with certain `input_shape`
 
@@ -141,6 +154,7 @@ def ShuffleNetv2_10(
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3]
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -153,6 +167,9 @@ def ShuffleNetv2_10(
         Name of type initialization for conv layers,
         For more examples see: makiflow.layers.utils,
         By default He initialization are used
+    fuse_shuffle : bool
+        If equal to True, then concat and channel shuffle at the end of every unit are fused,
+        weights are compatible with the default model.
 
     Returns
     -------
@@ -176,6 +193,7 @@ def ShuffleNetv2_10(
         activation=tf.nn.relu,
         create_model=create_model,
         kernel_initializer=kernel_initializer,
+        fuse_shuffle=fuse_shuffle,
         name_model='ShuffleNetv2_20'
     )
 
@@ -185,7 +203,8 @@ def ShuffleNetv2_05(
         classes=1000,
         include_top=False,
         create_model=False,
-        kernel_initializer=InitConvKernel.HE):
+        kernel_initializer=InitConvKernel.HE,
+        fuse_shuffle=False):
     """
     Create ShuffleNetV2 with x0.5 model with certain `input_shape`
 
@@ -194,6 +213,7 @@ def ShuffleNetv2_05(
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3]
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -206,6 +226,9 @@ def ShuffleNetv2_05(
         Name of type initialization for conv layers,
         For more examples see: makiflow.layers.utils,
         By default He initialization are used
+    fuse_shuffle : bool
+        If equal to True, then concat and channel shuffle at the end of every unit are fused,
+        weights are compatible with the default model.
 
     Returns
     -------
@@ -229,5 +252,6 @@ def ShuffleNetv2_05(
         activation=tf.nn.relu,
         create_model=create_model,
         kernel_initializer=kernel_initializer,
+        fuse_shuffle=fuse_shuffle,
         name_model='ShuffleNetv2_20'
     )
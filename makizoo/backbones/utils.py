@@ -0,0 +1,221 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+from makizoo.ir import get_backend, MAKIFLOW, NHWC, channel_axis
+from makizoo.ir.layout import check_data_format as _check_layout
+
+
+# Types of the stem (`stem` argument of the builders)
+STEM_CONV = 'conv'
+STEM_SPACE_TO_DEPTH = 'space_to_depth'
+STEMS = (STEM_CONV, STEM_SPACE_TO_DEPTH)
+
+# Size of the block of the space-to-depth stem, i.e. stride of the stem
+SPACE_TO_DEPTH_BLOCK = 4
+
+
+# This function taken from original git of MobileNetV2
+# Main idea of these function - make numbers (`v` in function)
+# divisible by other number (`divisor` in function) without remainder
+def make_divisible(v, divisor=8, min_value=None):
+    if min_value is None:
+        min_value = divisor
+    new_v = max(min_value, int(v + divisor / 2) // divisor * divisor)
+    # Make sure that round down does not go down by more than 10%.
+    if new_v < 0.9 * v:
+        new_v += divisor
+    return new_v
+
+
+def scale_width(filters, width_multiplier=1.0, divisor=8):
+    """
+    Scale number of feature maps by `width_multiplier` (`width_multiplier` argument of the builders)
+    and round it to the multiple of `divisor` with `make_divisible`.
+    If `width_multiplier` is equal to 1, `filters` are returned without changes.
+
+    """
+    if width_multiplier == 1.0:
+        return filters
+    return make_divisible(filters * width_multiplier, divisor)
+
+
+def align_channels(filters, channel_multiple=None):
+    """
+    Round number of feature maps up to the multiple of `channel_multiple` (`channel_multiple` argument of the builders),
+    so that GEMMs of the convolutions have SIMD-friendly sizes. Unlike `make_divisible`, number of feature maps
+    is never decreased. If `channel_multiple` is None, `filters` are returned without changes.
+
+    """
+    if channel_multiple is None:
+        return filters
+    return -(-int(filters) // channel_multiple) * channel_multiple
+
+
+def check_stem(stem):
+    """
+    Raise ValueError if `stem` argument of the builder is unknown.
+
+    """
+    if stem not in STEMS:
+        raise ValueError(f'Unknown stem: {stem}. Available: {STEMS}')
+
+
+def check_data_format(data_format):
+    """
+    Raise ValueError if `data_format` argument of the builder is unknown or is not supported by the current backend.
+    MakiFlow layers support only NHWC, models with NCHW data format can be created only as IR (see `makizoo.ir.trace`).
+
+    """
+    _check_layout(data_format)
+    if data_format != NHWC and get_backend() == MAKIFLOW:
+        raise ValueError(
+            f'MakiFlow layers support only {NHWC} data format, but {data_format} is given. '
+            f'Use `makizoo.ir.trace` to create IR of the model with this data format.'
+        )
+
+
+def get_channels(x, data_format=NHWC):
+    """
+    Return number of feature maps of the 4D tensor `x`.
+
+    """
+    return x.get_shape()[channel_axis(data_format)]
+
+
+class StageOutputs:
+    """
+    Collect outputs of the stages of the backbone for `return_stages` and `stop_at_stage` arguments of the builders.
+    Stage 1 is the stem, every other stage ends right before the next reduction of the spatial size,
+    i.e. with default strides output of the stage `k` has stride 2^k (C1-C5 features).
+
+    Parameters
+    ----------
+    return_stages : list
+        Indices of the stages which outputs will be returned, for example (2, 3, 4, 5).
+    stop_at_stage : int
+        Index of the last stage which will be created, by default it is equal to max(`return_stages`).
+    num_stages : int
+        Number of stages of the backbone.
+    include_top : bool
+        Value of `include_top` of the builder, can not be used with truncation and multiple outputs.
+    create_model : bool
+        Value of `create_model` of the builder, can not be used with truncation and multiple outputs.
+
+    """
+    def __init__(self, return_stages=None, stop_at_stage=None, num_stages=5, include_top=False, create_model=False):
+        if return_stages is not None:
+            return_stages = [int(stage) for stage in return_stages]
+            if len(return_stages) == 0:
+                raise ValueError('`return_stages` must contain at least one stage.')
+            self._check_stage(max(return_stages), num_stages)
+            self._check_stage(min(return_stages), num_stages)
+            if stop_at_stage is None:
+                stop_at_stage = max(return_stages)
+
+        if stop_at_stage is not None:
+            self._check_stage(stop_at_stage, num_stages)
+            if return_stages is not None and max(return_stages) > stop_at_stage:
+                raise ValueError(
+                    f'Stages {return_stages} can not be returned if building is stopped at the stage {stop_at_stage}.'
+                )
+            if include_top or create_model:
+                raise ValueError(
+                    '`include_top` and `create_model` can not be used with `return_stages` and `stop_at_stage`.'
+                )
+
+        self.return_stages = return_stages
+        self.stop_at_stage = stop_at_stage
+        self.outputs = {}
+
+    @staticmethod
+    def _check_stage(stage, num_stages):
+        if stage < 1 or stage > num_stages:
+            raise ValueError(f'Index of the stage must be in range [1, {num_stages}], got {stage}.')
+
+    def add(self, stage, x):
+        """
+        Save output `x` of the `stage`.
+        Return True if building must be stopped after this stage.
+
+        """
+        self.outputs[stage] = x
+        return self.stop_at_stage == stage
+
+    def result(self, in_x):
+        """
+        Return `in_x` and the output of the `stop_at_stage` or list of outputs of the `return_stages`.
+
+        """
+        if self.return_stages is None:
+            return in_x, self.outputs[self.stop_at_stage]
+        return in_x, [self.outputs[stage] for stage in self.return_stages]
+
+
+class OutputStride:
+    """
+    Control `output_stride` argument of the builders (as in DeepLab): after the target stride is reached,
+    units which would reduce spatial size are used with stride 1 and the next units use dilated convolutions
+    with the rate equal to the product of the skipped strides.
+    Shapes of the weights do not depend on stride and rate, so the same weights can be used for any `output_stride`.
+
+    Parameters
+    ----------
+    output_stride : int
+        Ratio of the input resolution to the resolution of the output, None to keep all strides.
+    current_stride : int
+        Stride of the layers which are created before the first unit (stem).
+
+    """
+    def __init__(self, output_stride=None, current_stride=1):
+        if output_stride is not None and (output_stride < current_stride or output_stride % current_stride != 0):
+            raise ValueError(
+                f'`output_stride`={output_stride} can not be reached, stride of the stem is {current_stride}.'
+            )
+
+        self.output_stride = output_stride
+        self.current_stride = current_stride
+        self.rate = 1
+
+    def step(self, stride):
+        """
+        Return (stride, rate) of the unit which reduces spatial size by `stride`.
+        Rate of the next units is available as `rate` attribute.
+
+        """
+        if self.output_stride is not None and self.current_stride == self.output_stride:
+            rate = self.rate
+            self.rate *= stride
+            return 1, rate
+
+        if self.output_stride is not None and self.current_stride * stride > self.output_stride:
+            raise ValueError(
+                f'`output_stride`={self.output_stride} can not be reached, '
+                f'stride changes from {self.current_stride} to {self.current_stride * stride}.'
+            )
+        self.current_stride *= stride
+        return stride, self.rate
+
+    def check(self):
+        """
+        Raise ValueError if the target `output_stride` is more than stride of the whole backbone.
+
+        """
+        if self.output_stride is not None and self.current_stride != self.output_stride:
+            raise ValueError(
+                f'`output_stride`={self.output_stride} can not be reached, '
+                f'stride of the backbone is {self.current_stride}.'
+            )
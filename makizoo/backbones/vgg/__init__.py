@@ -15,11 +15,15 @@
 # You should have received a copy of the GNU General Public License
 # along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
 
+from makizoo.lazy import attach
 
-from __future__ import absolute_import
-from .models import VGG16, VGG19
-from .blocks import VGGBlock
-from .builder import build_VGG
-
-del absolute_import
-
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=['blocks', 'builder', 'models', 'utils'],
+    attributes={
+        'models': ['VGG16', 'VGG19'],
+        'blocks': ['VGGBlock'],
+        'builder': ['build_VGG'],
+        'utils': ['get_pool_params', 'dense_head_to_conv', 'FC6_KERNEL'],
+    }
+)
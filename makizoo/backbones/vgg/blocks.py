@@ -16,13 +16,15 @@
 # along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
 
 
-from makiflow.layers import *
+from makizoo.layers import *
 from makiflow.layers.utils import InitConvKernel
 
 from makiflow.core import MakiTensor
 import tensorflow as tf
 
 from .utils import get_pool_params
+from makizoo.backbones.utils import get_channels
+from makizoo.ir import NHWC, layout_kwargs
 
 
 PREFIX = "conv{}/conv{}_"
@@ -46,7 +48,8 @@ def VGGBlock(
         activation=tf.nn.relu,
         pooling_type='max_pool',
         kernel_initializer=InitConvKernel.HE,
-        pool_params=None):
+        pool_params=None,
+        data_format=NHWC):
     """
     VGGBlock is consist of certain number (in our case `n`) conv + activation layers,
     First layer scale `in_f` upto `out_f`
@@ -85,6 +88,9 @@ def VGGBlock(
             'strides': [1,2,2,1],
             'padding': 'SAME'
         }
+        (`ksize` and `strides` are given in the order of `data_format`).
+    data_format : str
+        Data format of the tensors: 'NHWC' or 'NCHW'.
 
     Returns
     ---------
@@ -94,12 +100,13 @@ def VGGBlock(
     """
 
     if pool_params is None:
-        pool_params = get_pool_params()
+        pool_params = get_pool_params(data_format)
+    layout_params = layout_kwargs(data_format)
 
     prefix_name = PREFIX.format(str(num_block), str(num_block))
 
     if in_f is None:
-        in_f = x.get_shape()[-1]
+        in_f = get_channels(x, data_format)
 
     if out_f is None:
         out_f = in_f * 2
@@ -107,25 +114,25 @@ def VGGBlock(
     x = ConvLayer(
         kw=3,kh=3,in_f=in_f,out_f=out_f,use_bias=use_bias,
         activation=None,name=NAME_CONV.format(prefix_name, str(1)),
-        kernel_initializer=kernel_initializer
+        kernel_initializer=kernel_initializer, **layout_params
     )(x)
-    x = ActivationLayer(activation=activation, name=NAME_ACT.format(prefix_name, str(1)))(x)
+    x = ActivationLayer(activation=activation, name=NAME_ACT.format(prefix_name, str(1)), **layout_params)(x)
 
     for i in range(2, n+1):
         x = ConvLayer(
             kw=3,kh=3,in_f=out_f,out_f=out_f,use_bias=use_bias,
             activation=None,name=NAME_CONV.format(prefix_name, str(i)),
-            kernel_initializer=kernel_initializer
+            kernel_initializer=kernel_initializer, **layout_params
         )(x)
-        x = ActivationLayer(activation=activation, name=NAME_ACT.format(prefix_name, str(i)))(x)
+        x = ActivationLayer(activation=activation, name=NAME_ACT.format(prefix_name, str(i)), **layout_params)(x)
 
     if pooling_type == MAX_POOL:
         x = MaxPoolLayer(
-            name=NAME_POOL.format(str(num_block)), **pool_params
+            name=NAME_POOL.format(str(num_block)), **pool_params, **layout_params
         )(x)
     elif pooling_type == AVG_POOL:
         x = AvgPoolLayer(
-            name=NAME_POOL.format(str(num_block)), **pool_params
+            name=NAME_POOL.format(str(num_block)), **pool_params, **layout_params
         )(x)
 
     return x
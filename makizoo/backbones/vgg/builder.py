@@ -16,12 +16,15 @@
 # along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
 
 
-from makiflow.layers import *
+from makizoo.layers import *
 from makiflow.layers.utils import InitConvKernel
 from makiflow.models import Classificator
+from makizoo.backbones.utils import StageOutputs, scale_width, align_channels, check_data_format, get_channels
+from makizoo.ir import NHWC, layout_kwargs, spatial_axes
 import tensorflow as tf
 
 from .blocks import VGGBlock, NONE
+from .utils import FC6_KERNEL
 
 
 def build_VGG(
@@ -39,13 +42,22 @@ def build_VGG(
     create_model=False,
     pool_params=None,
     kernel_initializer=InitConvKernel.HE,
-    name_model='MakiClassificator'):
+    name_model='MakiClassificator',
+    return_stages=None,
+    stop_at_stage=None,
+    width_multiplier=1.0,
+    channel_multiple=None,
+    data_format=NHWC,
+    conv_head=False):
     """
     Parameters
     ----------
     input_shape : List
         Input shape of neural network. Example - [32, 128, 128, 3]
         which mean 32 - batch size, two 128 - size of picture, 3 - number of colors.
+        Batch size, height and width can be None, then one graph serves any batch size and resolution.
+        If `include_top` is True, then height and width must be known, because `fc6` is applied to the
+        flattened feature map (with `conv_head` the input must be at least 224x224 instead).
     input_tensor : mf.MakiTensor
         A tensor that will be fed into the model instead of InputLayer with the specified `input_shape`.
     use_bias : bool
@@ -82,9 +94,38 @@ def build_VGG(
         By default He initialization are used
     name_model : str
         Name of model, if it will be created
+    return_stages : list
+        Indices of the stages which outputs will be returned, for example (2, 3, 4, 5) for C2-C5 features.
+        Stage `k` is the output of the block `k` (after pooling), there are `number_of_blocks` stages.
+        If not None, then list of outputs is returned instead of the single output.
+    stop_at_stage : int
+        Index of the last stage which will be created, layers after it are not created at all.
+        By default it is equal to max(`return_stages`), if both are None then the whole model is created.
+    width_multiplier : float
+        Multiplier of the number of feature maps of every layer, for example 0.5 or 0.75 (analogue of `alpha` of MobileNetV2).
+        It is applied to `init_fm` and hidden layers `fc6`, `fc7`, which are rounded to the multiple of 8.
+    channel_multiple : int
+        If not None, numbers of feature maps are rounded up to the multiple of `channel_multiple` (for example 8, 16 or 32),
+        so that GEMMs of the convolutions have SIMD-friendly sizes. By default is None, i.e. numbers are not changed.
+    data_format : str
+        Data format of the tensors: 'NHWC' (default) or 'NCHW', for NCHW `input_shape` is [N, C, H, W].
+        MakiFlow layers support only NHWC, so NCHW model can be created only as IR (see `makizoo.ir.trace`).
+        `flatten` uses NHWC order for any data format, so weights of `fc6` are interchangeable between formats.
+    conv_head : bool
+        Used if `include_top` is True. If true, the head is fully convolutional: `fc6` is 7x7 VALID convolution,
+        `fc7` and `fc8` are 1x1 convolutions (`fc8` without activation) followed by Global Avg pooling,
+        so height and width can be None and larger inputs produce class scores averaged over the positions.
+        Layer names are the same, but weights of `fc6`, `fc7` and `fc8` have convolutional shapes, i.e.
+        checkpoints of the default dense head can not be loaded directly, convert their weights
+        with `dense_head_to_conv`.
 
     Returns
     ---------
+    if `return_stages` is not None
+        in_x : mf.MakiTensor
+            Input MakiTensor
+        outputs : list
+            Output MakiTensors of the `return_stages`
     if `create_model` is False
         in_x : mf.MakiTensor
             Input MakiTensor
@@ -100,8 +141,16 @@ def build_VGG(
     if repetition <= 0:
         raise TypeError('repetition should have type int and be more than 0')
 
+    stages = StageOutputs(
+        return_stages=return_stages, stop_at_stage=stop_at_stage, num_stages=number_of_blocks,
+        include_top=include_top, create_model=create_model
+    )
+    check_data_format(data_format)
+    layout_params = layout_kwargs(data_format)
+    init_fm = align_channels(scale_width(init_fm, width_multiplier), channel_multiple)
+
     if input_tensor is None and input_shape is not None:
-        in_x = InputLayer(input_shape=input_shape, name='Input')
+        in_x = InputLayer(input_shape=input_shape, name='Input', **layout_params)
     elif input_tensor is not None:
         in_x = input_tensor
     else:
@@ -121,7 +170,8 @@ def build_VGG(
                 x=in_x, num_block=str(i), n=2,
                 out_f=init_fm, pooling_type=type_pool,
                 use_bias=use_bias, activation=activation,
-                kernel_initializer=kernel_initializer, pool_params=pool_params
+                kernel_initializer=kernel_initializer, pool_params=pool_params,
+                data_format=data_format
             )
         # Second block
         elif i == 2:
@@ -129,29 +179,66 @@ def build_VGG(
                 x=x, num_block=str(i), n=2,
                 pooling_type=type_pool,
                 use_bias=use_bias, activation=activation,
-                kernel_initializer=kernel_initializer, pool_params=pool_params
+                kernel_initializer=kernel_initializer, pool_params=pool_params,
+                data_format=data_format
             )
         else:
             x = VGGBlock(
                 x=x, num_block=str(i), n=repetition,
                 pooling_type=type_pool,
                 use_bias=use_bias, activation=activation,
-                kernel_initializer=kernel_initializer, pool_params=pool_params
+                kernel_initializer=kernel_initializer, pool_params=pool_params,
+                data_format=data_format
             )
 
+        if stages.add(i, x):
+            return stages.result(in_x)
+
     # Last block
     x = VGGBlock(
-        x, out_f=x.get_shape()[-1], num_block=str(number_of_blocks),
+        x, out_f=get_channels(x, data_format), num_block=str(number_of_blocks),
         n=repetition, pooling_type=pooling_type if is_use_pool_list[-1] else NONE,
         use_bias=use_bias, activation=activation,
-        kernel_initializer=kernel_initializer, pool_params=pool_params
+        kernel_initializer=kernel_initializer, pool_params=pool_params,
+        data_format=data_format
     )
 
-    if include_top:
-        x = FlattenLayer(name='flatten')(x)
-        x = DenseLayer(in_d=x.get_shape()[-1], out_d=4096, name='fc6')(x)
-        x = DenseLayer(in_d=4096, out_d=4096, name='fc7')(x)
-        output = DenseLayer(in_d=4096, out_d=num_classes, activation=None, name='fc8')(x)
+    if stages.add(number_of_blocks, x):
+        return stages.result(in_x)
+
+    if include_top and not conv_head:
+        if any(dim is None for dim in x.get_shape()[1:]):
+            raise ValueError(
+                f"VGG with `include_top` requires known height and width of the input, "
+                f"because `fc6` is applied to the flattened feature map of shape {x.get_shape()[1:]}. "
+                f"Only batch size can be None, use `conv_head=True` for unknown height and width."
+            )
+        x = FlattenLayer(name='flatten', **layout_params)(x)
+        fc_units = align_channels(scale_width(4096, width_multiplier), channel_multiple)
+        x = DenseLayer(in_d=x.get_shape()[-1], out_d=fc_units, name='fc6')(x)
+        x = DenseLayer(in_d=fc_units, out_d=fc_units, name='fc7')(x)
+        output = DenseLayer(in_d=fc_units, out_d=num_classes, activation=None, name='fc8')(x)
+
+        if create_model:
+            return Classificator(in_x, output, name=name_model)
+    elif include_top:
+        # Fully convolutional head: `fc6` is the 7x7 VALID convolution (the same as the dense layer applied to
+        # the flattened 7x7 feature map of the 224x224 input), `fc7` and `fc8` are 1x1 convolutions
+        # and class scores are averaged over the spatial positions
+        spatial_shape = [x.get_shape()[axis] for axis in spatial_axes(data_format)]
+        if any(dim is not None and dim < FC6_KERNEL for dim in spatial_shape):
+            raise ValueError(
+                f"VGG with `conv_head` requires feature map of at least {FC6_KERNEL}x{FC6_KERNEL} for `fc6`, "
+                f"but it is {spatial_shape[0]}x{spatial_shape[1]}."
+            )
+        fc_units = align_channels(scale_width(4096, width_multiplier), channel_multiple)
+        x = ConvLayer(
+            kw=FC6_KERNEL, kh=FC6_KERNEL, in_f=get_channels(x, data_format), out_f=fc_units,
+            padding='VALID', name='fc6', **layout_params
+        )(x)
+        x = ConvLayer(kw=1, kh=1, in_f=fc_units, out_f=fc_units, name='fc7', **layout_params)(x)
+        x = ConvLayer(kw=1, kh=1, in_f=fc_units, out_f=num_classes, activation=None, name='fc8', **layout_params)(x)
+        output = GlobalAvgPoolLayer(name='global_avg', **layout_params)(x)
 
         if create_model:
             return Classificator(in_x, output, name=name_model)
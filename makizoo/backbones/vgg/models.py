@@ -25,7 +25,9 @@ from .builder import build_VGG
 # Image - [103.939, 116.779, 123.68]
 
 
-def VGG16(input_shape, classes=1000, include_top=False, create_model=False, kernel_initializer=InitConvKernel.HE):
+def VGG16(
+        input_shape, classes=1000, include_top=False, create_model=False, kernel_initializer=InitConvKernel.HE,
+        conv_head=False):
     """
     Create VGG16 model with certain `input_shape`
 
@@ -34,6 +36,9 @@ def VGG16(input_shape, classes=1000, include_top=False, create_model=False, kern
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3],
+        if `include_top` is True, then only batch size can be None (height and width must be at least 224
+        and can be None with `conv_head`)
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -46,6 +51,8 @@ def VGG16(input_shape, classes=1000, include_top=False, create_model=False, kern
         Name of type initialization for conv layers,
         For more examples see: makiflow.layers.utils,
         By default He initialization are used
+    conv_head : bool
+        Use fully convolutional head, see `build_VGG`.
 
     Returns
     -------
@@ -69,11 +76,14 @@ def VGG16(input_shape, classes=1000, include_top=False, create_model=False, kern
             activation=tf.nn.relu,
             create_model=create_model,
             kernel_initializer=kernel_initializer,
+            conv_head=conv_head,
             name_model='VGG16'
     )
 
 
-def VGG19(input_shape, classes=1000, include_top=False, create_model=False, kernel_initializer=InitConvKernel.HE):
+def VGG19(
+        input_shape, classes=1000, include_top=False, create_model=False, kernel_initializer=InitConvKernel.HE,
+        conv_head=False):
     """
     Create VGG19 model with certain `input_shape`
 
@@ -82,6 +92,9 @@ def VGG19(input_shape, classes=1000, include_top=False, create_model=False, kern
     input_shape : list
         Input shape into model,
         Example: [1, 300, 300, 3]
+        Batch size, height and width can be None, for example: [None, None, None, 3],
+        if `include_top` is True, then only batch size can be None (height and width must be at least 224
+        and can be None with `conv_head`)
     classes : int
         Number of classes for classification task, used if `include_top` is True
     include_top : bool
@@ -94,6 +107,8 @@ def VGG19(input_shape, classes=1000, include_top=False, create_model=False, kern
         Name of type initialization for conv layers,
         For more examples see: makiflow.layers.utils,
         By default He initialization are used
+    conv_head : bool
+        Use fully convolutional head, see `build_VGG`.
 
     Returns
     -------
@@ -117,6 +132,7 @@ def VGG19(input_shape, classes=1000, include_top=False, create_model=False, kern
             activation=tf.nn.relu,
             create_model=create_model,
             kernel_initializer=kernel_initializer,
+            conv_head=conv_head,
             name_model='VGG19'
     )
 
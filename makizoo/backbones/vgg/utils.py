@@ -16,11 +16,54 @@
 # along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
 
 
-def get_pool_params():
+import numpy as np
+
+from makizoo.ir import NHWC, from_nhwc
+
+
+# Size of the feature map of the 224x224 input before `fc6`, i.e. the kernel size of `fc6`
+FC6_KERNEL = 7
+
+
+def get_pool_params(data_format=NHWC):
     return {
-        'ksize': [1,2,2,1],
-        'strides': [1,2,2,1],
+        'ksize': from_nhwc([1,2,2,1], data_format),
+        'strides': from_nhwc([1,2,2,1], data_format),
         'padding': 'SAME'
     }
 
 
+
+
+def dense_head_to_conv(weights, kernel_size=FC6_KERNEL):
+    """
+    Convert weights of the dense head (flatten of the NHWC feature map + DenseLayer `fc6`, `fc7`, `fc8`)
+    into weights of the fully convolutional head (`conv_head=True` of `build_VGG`) with the same names:
+    W of `fc6` [kernel_size * kernel_size * C, F] -> [kernel_size, kernel_size, C, F],
+    W of `fc7` and `fc8` [F_in, F_out] -> [1, 1, F_in, F_out].
+    Weights which are already convolutional are not changed.
+
+    Parameters
+    ----------
+    weights : dict
+        Weights of the model, see `makizoo.ir.weights`.
+    kernel_size : int
+        Size of the feature map which was flattened for `fc6`.
+
+    Returns
+    -------
+    dict
+        New weights dictionary, arrays of other layers are shared with `weights`.
+
+    """
+    new_weights = dict(weights)
+    for layer_name in ('fc6', 'fc7', 'fc8'):
+        params = weights.get(layer_name)
+        if params is None or np.ndim(params['W']) != 2:
+            continue
+
+        W = np.asarray(params['W'])
+        size = kernel_size if layer_name == 'fc6' else 1
+        in_f = W.shape[0] // (size * size)
+        new_weights[layer_name] = dict(params, W=W.reshape(size, size, in_f, W.shape[1]))
+    return new_weights
@@ -0,0 +1,23 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+from .graph import IRTensor, LayerSpec, ArchitectureIR
+from .backend import use_backend, get_backend, MAKIFLOW, IR
+from .tracing import trace
+from .lowering import lower, replay, rebuild
+from .executor import build_tf_graph, layer_ops
+from .layout import NHWC, NCHW, DATA_FORMATS, channel_axis, spatial_axes, from_nhwc, to_nhwc, layout_kwargs
@@ -0,0 +1,71 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import importlib
+from contextlib import contextmanager
+
+
+MAKIFLOW = 'makiflow'
+IR = 'ir'
+
+_BACKENDS = (MAKIFLOW, IR)
+_current_backend = MAKIFLOW
+
+
+def get_backend():
+    """
+    Return name of the backend which is used by builders to create layers.
+
+    """
+    return _current_backend
+
+
+@contextmanager
+def use_backend(backend):
+    """
+    Context manager which switches the backend of `makizoo.layers`.
+
+    Parameters
+    ----------
+    backend : str
+        'makiflow' - builders create MakiFlow layers (default),
+        'ir' - builders record layer specs into an `ArchitectureIR`.
+
+    """
+    global _current_backend
+    if backend not in _BACKENDS:
+        raise ValueError(f'Unknown backend: {backend}. Available: {_BACKENDS}')
+
+    previous_backend = _current_backend
+    _current_backend = backend
+    try:
+        yield
+    finally:
+        _current_backend = previous_backend
+
+
+def get_layers_module(backend=None):
+    """
+    Return module with layer classes of the `backend` (current backend by default).
+
+    """
+    if backend is None:
+        backend = _current_backend
+
+    if backend == IR:
+        return importlib.import_module('makizoo.ir.layers')
+    return importlib.import_module('makiflow.layers')
@@ -0,0 +1,241 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Execution of the IR with raw TensorFlow ops, without MakiFlow layers.
+It is used when ops must be inserted between the layers (for example, simulation of the quantization)
+or when MakiFlow does not support configuration of the layer (NCHW data format).
+Weights are stored in the graph as constants, so the graph does not require initialization.
+
+"""
+
+import numpy as np
+
+from .graph import ArchitectureIR
+from .layout import NHWC, channel_axis, spatial_axes, from_nhwc, to_nhwc, spec_data_format
+
+
+# Layers which output is the input (they are identity at inference)
+IDENTITY_LAYERS = ('DropoutLayer',)
+
+
+def _activation(name):
+    import tensorflow.compat.v1 as tf
+
+    activations = {
+        None: tf.identity,
+        'linear': tf.identity,
+        'relu': tf.nn.relu,
+        'relu6': tf.nn.relu6,
+        'sigmoid': tf.nn.sigmoid,
+        'tanh': tf.nn.tanh,
+        'softmax': tf.nn.softmax,
+    }
+    if name not in activations:
+        raise ValueError(f'Activation {name} is not supported by the executor.')
+    return activations[name]
+
+
+def _conv_padding(padding):
+    # Explicit padding of tf.nn.conv2d is given in the same layout as in IR
+    return padding if isinstance(padding, str) else [list(pair) for pair in padding]
+
+
+def _constant(value):
+    import tensorflow.compat.v1 as tf
+
+    # Weights can be given as tensors (for example, variables of the quantization-aware training)
+    if not isinstance(value, (np.ndarray, np.generic, list, tuple, float, int)):
+        return value
+    return tf.constant(np.asarray(value, dtype=np.float32))
+
+
+def _dynamic_shape(x):
+    # Static dimensions are kept as integers, unknown ones (batch, height and width) are taken from the tensor
+    import tensorflow.compat.v1 as tf
+
+    static_shape = x.get_shape().as_list()
+    if all(size is not None for size in static_shape):
+        return static_shape
+    dynamic_shape = tf.shape(x)
+    return [dynamic_shape[axis] if size is None else size for axis, size in enumerate(static_shape)]
+
+
+def layer_ops(spec, inputs, weights):
+    """
+    Create TensorFlow ops of the single layer.
+
+    Parameters
+    ----------
+    spec : LayerSpec
+        Spec of the layer.
+    inputs : list
+        Input tensors of the layer.
+    weights : dict
+        Weights of the layer {param_name: np.ndarray or tf.Tensor}, see `makizoo.ir.weights`.
+
+    Returns
+    -------
+    list
+        Output tensors of the layer.
+
+    """
+    import tensorflow.compat.v1 as tf
+
+    data_format = spec_data_format(spec)
+    kwargs = spec.kwargs
+    x = inputs[0]
+
+    if spec.type in ('ConvLayer', 'AtrousConvLayer', 'DepthWiseConvLayer'):
+        strides = from_nhwc([1, spec.stride[0], spec.stride[1], 1], data_format)
+        if spec.type == 'DepthWiseConvLayer':
+            y = tf.nn.depthwise_conv2d(
+                x, _constant(weights['W']), strides=strides, padding=_conv_padding(spec.padding),
+                rate=kwargs.get('rate', [1, 1]), data_format=data_format
+            )
+        else:
+            rate = kwargs.get('rate', 1)
+            y = tf.nn.conv2d(
+                x, _constant(weights['W']), strides=strides, padding=_conv_padding(spec.padding),
+                dilations=from_nhwc([1, rate, rate, 1], data_format), data_format=data_format
+            )
+        if kwargs.get('use_bias', True):
+            y = tf.nn.bias_add(y, _constant(weights['b']), data_format=data_format)
+        return [_activation(spec.activation)(y)]
+
+    if spec.type == 'BatchNormLayer':
+        mean = np.asarray(weights['mean'])
+        gamma = weights['gamma'] if kwargs.get('use_gamma', True) else np.ones_like(mean)
+        beta = weights['beta'] if kwargs.get('use_beta', True) else np.zeros_like(mean)
+        y, _, _ = tf.nn.fused_batch_norm(
+            x, scale=_constant(gamma), offset=_constant(beta), mean=_constant(mean),
+            variance=_constant(weights['var']), epsilon=kwargs.get('eps', 1e-4),
+            data_format=data_format, is_training=False
+        )
+        return [y]
+
+    if spec.type == 'ActivationLayer':
+        return [_activation(spec.activation)(x)]
+
+    if spec.type == 'ZeroPaddingLayer':
+        paddings = [[0, 0] for _ in range(4)]
+        for axis, pair in zip(spatial_axes(data_format), spec.padding):
+            paddings[axis] = list(pair)
+        return [tf.pad(x, paddings)]
+
+    if spec.type in ('MaxPoolLayer', 'AvgPoolLayer'):
+        pool = tf.nn.max_pool if spec.type == 'MaxPoolLayer' else tf.nn.avg_pool
+        return [pool(
+            x, ksize=from_nhwc([1, spec.kernel[0], spec.kernel[1], 1], data_format),
+            strides=from_nhwc([1, spec.stride[0], spec.stride[1], 1], data_format),
+            padding=spec.padding, data_format=data_format
+        )]
+
+    if spec.type == 'GlobalAvgPoolLayer':
+        return [tf.reduce_mean(x, axis=list(spatial_axes(data_format)))]
+
+    if spec.type == 'DenseLayer':
+        y = tf.matmul(x, _constant(weights['W']))
+        if kwargs.get('use_bias', True):
+            y = y + _constant(weights['b'])
+        return [_activation(spec.activation)(y)]
+
+    if spec.type == 'SumLayer':
+        if len(inputs) == 2:
+            # Single Add op, unlike AddN it has int8 kernel in TFLite
+            return [tf.add(inputs[0], inputs[1])]
+        return [tf.add_n(inputs)]
+
+    if spec.type == 'ConcatLayer':
+        return [tf.concat(inputs, axis=kwargs.get('axis', channel_axis(data_format)))]
+
+    if spec.type == 'ChannelSplitLayer':
+        return tf.split(x, kwargs['num_or_size_splits'], axis=kwargs.get('axis', channel_axis(data_format)))
+
+    if spec.type == 'ChannelShuffleLayer':
+        groups = kwargs['num_groups']
+        shape = _dynamic_shape(x)
+        c_axis = channel_axis(data_format)
+        channels = spec.output_shapes[0][c_axis]
+        grouped_shape = shape[:c_axis] + [groups, channels // groups] + shape[c_axis + 1:]
+        perm = list(range(5))
+        perm[c_axis], perm[c_axis + 1] = perm[c_axis + 1], perm[c_axis]
+        y = tf.transpose(tf.reshape(x, grouped_shape), perm)
+        return [tf.reshape(y, shape[:c_axis] + [channels] + shape[c_axis + 1:])]
+
+    if spec.type in IDENTITY_LAYERS:
+        return [tf.identity(x)]
+
+    if spec.type == 'ReshapeLayer':
+        return [tf.reshape(x, [-1] + list(kwargs['new_shape']))]
+
+    if spec.type == 'FlattenLayer':
+        # Elements are flattened in NHWC order for any data format (see `makizoo.ir.layers.FlattenLayer`)
+        if len(x.get_shape()) == 4 and data_format != NHWC:
+            x = tf.transpose(x, to_nhwc([0, 1, 2, 3], data_format))
+        return [tf.reshape(x, [-1, int(np.prod(spec.output_shapes[0][1:]))])]
+
+    raise ValueError(f'Layer type {spec.type} is not supported by the executor.')
+
+
+def build_tf_graph(arch: ArchitectureIR, weights, inputs=None, output_fn=None):
+    """
+    Create TensorFlow ops of the IR in the default graph.
+    Ops of every layer are created in the name scope of the layer.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model, see `makizoo.ir.trace`.
+    weights : dict
+        Weights of the model, see `makizoo.ir.weights`.
+    inputs : dict
+        Mapping from the name of the input of IR to tensor. Placeholders are created for missing inputs.
+    output_fn : function
+        Function (spec, tensor_name, tensor) -> tensor which is applied to every output of the layers
+        (including inputs of the model, spec is None for them), for example to simulate quantization.
+
+    Returns
+    -------
+    dict
+        Mapping from the name of the tensor in IR to created tensor.
+
+    """
+    import tensorflow.compat.v1 as tf
+
+    if inputs is None:
+        inputs = {}
+    if output_fn is None:
+        def output_fn(spec, tensor_name, tensor):
+            return tensor
+
+    tensors = {}
+    for input_name in arch.inputs:
+        tensor = inputs.get(input_name)
+        if tensor is None:
+            tensor = tf.placeholder(tf.float32, shape=arch.get_shape(input_name), name=input_name)
+        tensors[input_name] = output_fn(None, input_name, tensor)
+
+    for spec in arch.layers:
+        if spec.type == 'InputLayer':
+            continue
+
+        with tf.name_scope(spec.name):
+            outputs = layer_ops(spec, [tensors[tensor_name] for tensor_name in spec.inputs], weights.get(spec.name))
+            for tensor_name, tensor in zip(spec.outputs, outputs):
+                tensors[tensor_name] = output_fn(spec, tensor_name, tensor)
+
+    return tensors
@@ -0,0 +1,282 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import copy
+from itertools import count
+
+
+# Layers which take list of tensors as input
+MULTI_INPUT_LAYERS = ('SumLayer', 'ConcatLayer')
+
+_layer_counter = count()
+
+
+def activation_name(activation):
+    """
+    Return plain-Python name of the activation function (for example, `tf.nn.relu` -> 'relu').
+
+    """
+    if activation is None or isinstance(activation, str):
+        return activation
+    return getattr(activation, '__name__', str(activation))
+
+
+class IRTensor:
+    """
+    Analogue of MakiTensor which is produced by IR layers.
+    Holds only the static shape and links to the producing layer.
+
+    """
+    def __init__(self, name, shape, spec=None, parents=None):
+        self._name = name
+        self._shape = list(shape)
+        self._spec = spec
+        self._parents = parents if parents is not None else []
+
+    def get_name(self):
+        return self._name
+
+    def get_shape(self):
+        return list(self._shape)
+
+    def get_spec(self):
+        return self._spec
+
+    def get_parents(self):
+        return list(self._parents)
+
+    def __repr__(self):
+        return f'IRTensor(name={self._name}, shape={self._shape})'
+
+
+class LayerSpec:
+    """
+    Backend-neutral description of the single layer.
+
+    Parameters
+    ----------
+    name : str
+        Name of the layer (the same as in MakiFlow model).
+    type : str
+        Name of the layer class, for example 'ConvLayer'.
+    kwargs : dict
+        Arguments which were passed into the constructor of the layer (except name).
+        Used to lower the spec back into MakiFlow.
+    inputs : list
+        Names of input tensors (edges of the graph).
+    outputs : list
+        Names of output tensors.
+    output_shapes : list
+        Static shapes of output tensors.
+    kernel : tuple
+        (kh, kw) of the layer, if it has one.
+    stride : tuple
+        (stride_h, stride_w) of the layer, if it has one.
+    padding : str or list
+        'SAME', 'VALID' or explicit padding [[0, 0], [top, bottom], [left, right], [0, 0]]
+        (axes are in the order of the data format of the layer,
+        ZeroPaddingLayer uses its own format [[top, bottom], [left, right]]).
+    in_f : int
+        Number of input feature maps.
+    out_f : int
+        Number of output feature maps.
+    activation : str
+        Name of the activation function which applied inside the layer.
+
+    """
+    def __init__(
+            self, name, type, kwargs, inputs, outputs, output_shapes,
+            kernel=None, stride=None, padding=None, in_f=None, out_f=None, activation=None):
+        self.name = name
+        self.type = type
+        self.kwargs = kwargs
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.output_shapes = [list(shape) for shape in output_shapes]
+        self.kernel = kernel
+        self.stride = stride
+        self.padding = padding
+        self.in_f = in_f
+        self.out_f = out_f
+        self.activation = activation
+        self.order = next(_layer_counter)
+
+    def to_dict(self):
+        """
+        Return plain-Python (json-serializable) description of the spec.
+
+        """
+        return {
+            'name': self.name,
+            'type': self.type,
+            'inputs': list(self.inputs),
+            'outputs': list(self.outputs),
+            'output_shapes': [list(shape) for shape in self.output_shapes],
+            'kernel': self.kernel,
+            'stride': self.stride,
+            'padding': self.padding,
+            'in_f': self.in_f,
+            'out_f': self.out_f,
+            'activation': self.activation,
+            'kwargs': {
+                key: activation_name(value) if callable(value) else value
+                for key, value in self.kwargs.items()
+            },
+        }
+
+    def __repr__(self):
+        return f'LayerSpec(name={self.name}, type={self.type}, inputs={self.inputs})'
+
+
+class ArchitectureIR:
+    """
+    Intermediate representation of the model: ordered (topologically sorted) list of layer specs.
+
+    Parameters
+    ----------
+    layers : list
+        List of `LayerSpec` in the order of execution.
+    inputs : list
+        Names of input tensors.
+    outputs : list
+        Names of output tensors.
+
+    """
+    def __init__(self, layers, inputs, outputs):
+        self.layers = list(layers)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self._update_index()
+
+    @staticmethod
+    def from_tensors(inputs, outputs):
+        """
+        Collect all layers which are required to compute `outputs` from `inputs`.
+
+        Parameters
+        ----------
+        inputs : IRTensor or list
+            Input tensors of the model.
+        outputs : IRTensor or list
+            Output tensors of the model.
+
+        Returns
+        -------
+        ArchitectureIR
+
+        """
+        if not isinstance(inputs, (list, tuple)):
+            inputs = [inputs]
+        if not isinstance(outputs, (list, tuple)):
+            outputs = [outputs]
+
+        specs = {}
+        stack = list(outputs)
+        while len(stack) != 0:
+            tensor = stack.pop()
+            spec = tensor.get_spec()
+            if spec is None or spec.name in specs:
+                continue
+            specs[spec.name] = spec
+            stack += tensor.get_parents()
+
+        layers = sorted(specs.values(), key=lambda spec: spec.order)
+        return ArchitectureIR(
+            layers=layers,
+            inputs=[tensor.get_name() for tensor in inputs],
+            outputs=[tensor.get_name() for tensor in outputs]
+        )
+
+    def _update_index(self):
+        self._name2layer = {}
+        self._producers = {}
+        self._consumers = {}
+        self._shapes = {}
+        for spec in self.layers:
+            self._name2layer[spec.name] = spec
+            for tensor_name, shape in zip(spec.outputs, spec.output_shapes):
+                self._producers[tensor_name] = spec
+                self._shapes[tensor_name] = shape
+                self._consumers[tensor_name] = []
+            for tensor_name in spec.inputs:
+                self._consumers[tensor_name].append(spec)
+
+    def get_layer(self, name):
+        return self._name2layer[name]
+
+    def has_layer(self, name):
+        return name in self._name2layer
+
+    def get_shape(self, tensor_name):
+        return list(self._shapes[tensor_name])
+
+    def producer(self, tensor_name):
+        """
+        Return spec of the layer which produces tensor with `tensor_name`.
+
+        """
+        return self._producers[tensor_name]
+
+    def consumers(self, tensor_name):
+        """
+        Return list of specs of the layers which take tensor with `tensor_name` as input.
+
+        """
+        return list(self._consumers.get(tensor_name, []))
+
+    def get_input_shapes(self, spec):
+        return [self.get_shape(name) for name in spec.inputs]
+
+    def copy(self):
+        """
+        Return deep copy of the IR, specs can be freely modified in the copy.
+
+        """
+        layers = []
+        for spec in self.layers:
+            new_spec = copy.copy(spec)
+            new_spec.kwargs = dict(spec.kwargs)
+            new_spec.inputs = list(spec.inputs)
+            new_spec.outputs = list(spec.outputs)
+            new_spec.output_shapes = [list(shape) for shape in spec.output_shapes]
+            layers.append(new_spec)
+        return ArchitectureIR(layers, self.inputs, self.outputs)
+
+    def lower(self, weights=None, create_model=False, name_model='MakiClassificator'):
+        """
+        Create MakiFlow layers from the IR.
+        See `makizoo.ir.lowering.lower` for more information.
+
+        """
+        from .lowering import lower
+        return lower(self, weights=weights, create_model=create_model, name_model=name_model)
+
+    def to_dict(self):
+        return {
+            'inputs': list(self.inputs),
+            'outputs': list(self.outputs),
+            'layers': [spec.to_dict() for spec in self.layers],
+        }
+
+    def __iter__(self):
+        return iter(self.layers)
+
+    def __len__(self):
+        return len(self.layers)
+
+    def __repr__(self):
+        return f'ArchitectureIR(layers={len(self.layers)}, inputs={self.inputs}, outputs={self.outputs})'
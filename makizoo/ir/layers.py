@@ -0,0 +1,473 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+IR analogues of the MakiFlow layers which are used by the zoo.
+Constructors have the same arguments as in `makiflow.layers`, but instead of creating
+variables and tensorflow operations, layers record `LayerSpec` and infer output shapes analytically.
+Unknown dimensions are represented as None.
+Every layer also takes optional `data_format` argument (NHWC by default, see `makizoo.ir.layout`).
+
+"""
+
+from .graph import IRTensor, LayerSpec, activation_name
+from .layout import NHWC, channel_axis, spatial_axes, from_nhwc
+
+
+def conv_output_size(size, kernel, stride, padding, rate=1):
+    """
+    Compute output spatial size of convolution or pooling along one dimension.
+
+    Parameters
+    ----------
+    size : int
+        Input size, None if unknown.
+    kernel : int
+        Size of the kernel.
+    stride : int
+        Stride of the operation.
+    padding : str or list
+        'SAME', 'VALID' or explicit padding [before, after] along this dimension.
+    rate : int
+        Dilation rate.
+
+    Returns
+    -------
+    int
+        Output size, None if input size is unknown.
+
+    """
+    if size is None:
+        return None
+
+    effective_kernel = (kernel - 1) * rate + 1
+    if padding == 'SAME':
+        return -(-size // stride)
+    if padding == 'VALID':
+        return -(-(size - effective_kernel + 1) // stride)
+
+    before, after = padding
+    return (size + before + after - effective_kernel) // stride + 1
+
+
+def _prod(values):
+    result = 1
+    for value in values:
+        if value is None:
+            return None
+        result *= value
+    return result
+
+
+def _normalize_axis(axis, rank):
+    return axis if axis >= 0 else rank + axis
+
+
+class IRLayer:
+    """
+    Base class for the IR layers.
+    Child classes must define `_compute_output_shapes` and can define `_spec_attrs`.
+
+    """
+    REQUIRED = ()
+    DEFAULTS = {}
+    MULTI_OUTPUT = False
+
+    def __init__(self, name, **kwargs):
+        missing = [arg for arg in self.REQUIRED if arg not in kwargs]
+        if len(missing) != 0:
+            raise TypeError(f'{type(self).__name__} missing required arguments: {missing}')
+
+        self._name = name
+        self._kwargs = kwargs
+        self._params = dict(self.DEFAULTS)
+        self._params.update(kwargs)
+
+    def get_name(self):
+        return self._name
+
+    def _data_format(self):
+        return self._params.get('data_format', NHWC)
+
+    def _channels(self, shape):
+        # Number of feature maps of 4D tensor, number of features of the other tensors
+        if len(shape) != 4:
+            return shape[-1]
+        return shape[channel_axis(self._data_format())]
+
+    def _compute_output_shapes(self, input_shapes):
+        raise NotImplementedError()
+
+    def _spec_attrs(self, input_shapes):
+        return {}
+
+    def __call__(self, x):
+        inputs = list(x) if isinstance(x, (list, tuple)) else [x]
+        input_shapes = [tensor.get_shape() for tensor in inputs]
+        output_shapes = self._compute_output_shapes(input_shapes)
+
+        if len(output_shapes) == 1 and not self.MULTI_OUTPUT:
+            output_names = [self._name]
+        else:
+            output_names = [f'{self._name}:{i}' for i in range(len(output_shapes))]
+
+        spec = LayerSpec(
+            name=self._name,
+            type=type(self).__name__,
+            kwargs=dict(self._kwargs),
+            inputs=[tensor.get_name() for tensor in inputs],
+            outputs=output_names,
+            output_shapes=output_shapes,
+            **self._spec_attrs(input_shapes)
+        )
+        outputs = [
+            IRTensor(name=tensor_name, shape=shape, spec=spec, parents=inputs)
+            for tensor_name, shape in zip(output_names, output_shapes)
+        ]
+
+        if self.MULTI_OUTPUT:
+            return outputs
+        return outputs[0]
+
+
+class InputLayer(IRTensor):
+    def __init__(self, input_shape, name, **kwargs):
+        input_shape = list(input_shape)
+        out_f = input_shape[-1]
+        if len(input_shape) == 4:
+            out_f = input_shape[channel_axis(kwargs.get('data_format', NHWC))]
+        spec = LayerSpec(
+            name=name,
+            type='InputLayer',
+            kwargs=dict(input_shape=input_shape, **kwargs),
+            inputs=[],
+            outputs=[name],
+            output_shapes=[input_shape],
+            out_f=out_f
+        )
+        super().__init__(name=name, shape=input_shape, spec=spec)
+
+
+class ConvLayer(IRLayer):
+    REQUIRED = ('kw', 'kh', 'in_f', 'out_f')
+    DEFAULTS = {
+        'stride': 1,
+        'padding': 'SAME',
+        'activation': 'relu',
+        'use_bias': True,
+    }
+
+    def _check_in_f(self, input_shape):
+        in_f = self._params['in_f']
+        channels = self._channels(input_shape)
+        if channels is not None and in_f != channels:
+            raise ValueError(
+                f'Layer {self._name}: `in_f`={in_f}, but input has {channels} feature maps.'
+            )
+
+    def _spatial_padding(self, axis):
+        padding = self._params['padding']
+        if isinstance(padding, str):
+            return padding
+        # Explicit padding in the format of tf.nn.conv2d: [[0, 0], [top, bottom], [left, right], [0, 0]] for NHWC
+        return padding[spatial_axes(self._data_format())[axis]]
+
+    def _spatial_shape(self, input_shape, rate=1):
+        stride = self._params['stride']
+        h_axis, w_axis = spatial_axes(self._data_format())
+        h = conv_output_size(input_shape[h_axis], self._params['kh'], stride, self._spatial_padding(0), rate)
+        w = conv_output_size(input_shape[w_axis], self._params['kw'], stride, self._spatial_padding(1), rate)
+        return h, w
+
+    def _out_f(self):
+        return self._params['out_f']
+
+    def _compute_output_shapes(self, input_shapes):
+        self._check_in_f(input_shapes[0])
+        h, w = self._spatial_shape(input_shapes[0])
+        return [from_nhwc([input_shapes[0][0], h, w, self._out_f()], self._data_format())]
+
+    def _spec_attrs(self, input_shapes):
+        return {
+            'kernel': (self._params['kh'], self._params['kw']),
+            'stride': (self._params['stride'], self._params['stride']),
+            'padding': self._params['padding'],
+            'in_f': self._params['in_f'],
+            'out_f': self._out_f(),
+            'activation': activation_name(self._params['activation']),
+        }
+
+
+class AtrousConvLayer(ConvLayer):
+    REQUIRED = ('kw', 'kh', 'in_f', 'out_f', 'rate')
+    DEFAULTS = {
+        # Atrous convolution has no stride
+        'stride': 1,
+        'padding': 'SAME',
+        'activation': 'relu',
+        'use_bias': True,
+    }
+
+    def _spatial_shape(self, input_shape, rate=1):
+        return super()._spatial_shape(input_shape, rate=self._params['rate'])
+
+
+class DepthWiseConvLayer(ConvLayer):
+    REQUIRED = ('kw', 'kh', 'in_f', 'multiplier')
+    DEFAULTS = {
+        'stride': 1,
+        'padding': 'SAME',
+        'rate': [1, 1],
+        'activation': 'relu',
+        'use_bias': True,
+    }
+
+    def _spatial_shape(self, input_shape, rate=1):
+        stride = self._params['stride']
+        rate_h, rate_w = self._params['rate']
+        h_axis, w_axis = spatial_axes(self._data_format())
+        h = conv_output_size(input_shape[h_axis], self._params['kh'], stride, self._spatial_padding(0), rate_h)
+        w = conv_output_size(input_shape[w_axis], self._params['kw'], stride, self._spatial_padding(1), rate_w)
+        return h, w
+
+    def _out_f(self):
+        return self._params['in_f'] * self._params['multiplier']
+
+
+class BatchNormLayer(IRLayer):
+    REQUIRED = ('D',)
+    DEFAULTS = {
+        'decay': 0.9,
+        'eps': 1e-4,
+        'use_gamma': True,
+        'use_beta': True,
+    }
+
+    def _compute_output_shapes(self, input_shapes):
+        return [input_shapes[0]]
+
+    def _spec_attrs(self, input_shapes):
+        return {'in_f': self._params['D'], 'out_f': self._params['D']}
+
+
+class ActivationLayer(IRLayer):
+    DEFAULTS = {'activation': 'relu'}
+
+    def _compute_output_shapes(self, input_shapes):
+        return [input_shapes[0]]
+
+    def _spec_attrs(self, input_shapes):
+        return {
+            'in_f': self._channels(input_shapes[0]),
+            'out_f': self._channels(input_shapes[0]),
+            'activation': activation_name(self._params['activation']),
+        }
+
+
+class ZeroPaddingLayer(IRLayer):
+    REQUIRED = ('padding',)
+
+    def _compute_output_shapes(self, input_shapes):
+        shape = list(input_shapes[0])
+        for axis, (before, after) in zip(spatial_axes(self._data_format()), self._params['padding']):
+            if shape[axis] is not None:
+                shape[axis] += before + after
+        return [shape]
+
+    def _spec_attrs(self, input_shapes):
+        return {
+            'padding': self._params['padding'],
+            'in_f': self._channels(input_shapes[0]),
+            'out_f': self._channels(input_shapes[0]),
+        }
+
+
+class MaxPoolLayer(IRLayer):
+    DEFAULTS = {
+        'ksize': [1, 2, 2, 1],
+        'strides': [1, 2, 2, 1],
+        'padding': 'SAME',
+    }
+
+    def __init__(self, name, **kwargs):
+        super().__init__(name, **kwargs)
+        # Defaults are given in NHWC order
+        for param in ('ksize', 'strides'):
+            if param not in kwargs:
+                self._params[param] = from_nhwc(self.DEFAULTS[param], self._data_format())
+
+    def _compute_output_shapes(self, input_shapes):
+        shape = list(input_shapes[0])
+        ksize, strides, padding = self._params['ksize'], self._params['strides'], self._params['padding']
+        for axis in spatial_axes(self._data_format()):
+            shape[axis] = conv_output_size(shape[axis], ksize[axis], strides[axis], padding)
+        return [shape]
+
+    def _spec_attrs(self, input_shapes):
+        h_axis, w_axis = spatial_axes(self._data_format())
+        return {
+            'kernel': (self._params['ksize'][h_axis], self._params['ksize'][w_axis]),
+            'stride': (self._params['strides'][h_axis], self._params['strides'][w_axis]),
+            'padding': self._params['padding'],
+            'in_f': self._channels(input_shapes[0]),
+            'out_f': self._channels(input_shapes[0]),
+        }
+
+
+class AvgPoolLayer(MaxPoolLayer):
+    pass
+
+
+class GlobalAvgPoolLayer(IRLayer):
+    def _compute_output_shapes(self, input_shapes):
+        return [[input_shapes[0][0], self._channels(input_shapes[0])]]
+
+    def _spec_attrs(self, input_shapes):
+        return {'in_f': self._channels(input_shapes[0]), 'out_f': self._channels(input_shapes[0])}
+
+
+class DenseLayer(IRLayer):
+    REQUIRED = ('in_d', 'out_d')
+    DEFAULTS = {
+        'activation': 'relu',
+        'use_bias': True,
+    }
+
+    def _compute_output_shapes(self, input_shapes):
+        in_d = input_shapes[0][-1]
+        if in_d is None:
+            raise ValueError(
+                f'Layer {self._name}: input shape {input_shapes[0]} has unknown number of features, '
+                f'it must be known for the dense layer.'
+            )
+        if in_d != self._params['in_d']:
+            raise ValueError(
+                f'Layer {self._name}: `in_d`={self._params["in_d"]}, but input has {in_d} features.'
+            )
+        return [[input_shapes[0][0], self._params['out_d']]]
+
+    def _spec_attrs(self, input_shapes):
+        return {
+            'in_f': self._params['in_d'],
+            'out_f': self._params['out_d'],
+            'activation': activation_name(self._params['activation']),
+        }
+
+
+class SumLayer(IRLayer):
+    def _compute_output_shapes(self, input_shapes):
+        known_channels = set(self._channels(shape) for shape in input_shapes if self._channels(shape) is not None)
+        if len(known_channels) > 1:
+            raise ValueError(f'Layer {self._name}: inputs have different shapes {input_shapes}.')
+        return [input_shapes[0]]
+
+    def _spec_attrs(self, input_shapes):
+        return {'in_f': self._channels(input_shapes[0]), 'out_f': self._channels(input_shapes[0])}
+
+
+class _ChannelAxisLayer(IRLayer):
+    # Default `axis` is the axis of the feature maps of the data format
+    def __init__(self, name, **kwargs):
+        super().__init__(name, **kwargs)
+        if 'axis' not in kwargs:
+            self._params['axis'] = channel_axis(self._data_format())
+
+
+class ConcatLayer(_ChannelAxisLayer):
+    DEFAULTS = {'axis': 3}
+
+    def _compute_output_shapes(self, input_shapes):
+        shape = list(input_shapes[0])
+        axis = _normalize_axis(self._params['axis'], len(shape))
+        shape[axis] = 0
+        for input_shape in input_shapes:
+            if input_shape[axis] is None or shape[axis] is None:
+                shape[axis] = None
+            else:
+                shape[axis] += input_shape[axis]
+        return [shape]
+
+    def _spec_attrs(self, input_shapes):
+        shape = self._compute_output_shapes(input_shapes)[0]
+        return {'in_f': self._channels(input_shapes[0]), 'out_f': self._channels(shape)}
+
+
+class ChannelSplitLayer(_ChannelAxisLayer):
+    REQUIRED = ('num_or_size_splits',)
+    DEFAULTS = {'axis': 3}
+    MULTI_OUTPUT = True
+
+    def _split_sizes(self, input_shape):
+        splits = self._params['num_or_size_splits']
+        axis = _normalize_axis(self._params['axis'], len(input_shape))
+        if isinstance(splits, int):
+            size = input_shape[axis]
+            return axis, [None if size is None else size // splits for _ in range(splits)]
+        return axis, list(splits)
+
+    def _compute_output_shapes(self, input_shapes):
+        axis, sizes = self._split_sizes(input_shapes[0])
+        output_shapes = []
+        for size in sizes:
+            shape = list(input_shapes[0])
+            shape[axis] = size
+            output_shapes.append(shape)
+        return output_shapes
+
+    def _spec_attrs(self, input_shapes):
+        return {'in_f': self._channels(input_shapes[0]), 'out_f': self._channels(input_shapes[0])}
+
+
+class ChannelShuffleLayer(IRLayer):
+    REQUIRED = ('num_groups',)
+
+    def _compute_output_shapes(self, input_shapes):
+        return [input_shapes[0]]
+
+    def _spec_attrs(self, input_shapes):
+        return {'in_f': self._channels(input_shapes[0]), 'out_f': self._channels(input_shapes[0])}
+
+
+class DropoutLayer(IRLayer):
+    DEFAULTS = {'p_keep': 0.9}
+
+    def _compute_output_shapes(self, input_shapes):
+        return [input_shapes[0]]
+
+    def _spec_attrs(self, input_shapes):
+        return {'in_f': self._channels(input_shapes[0]), 'out_f': self._channels(input_shapes[0])}
+
+
+class ReshapeLayer(IRLayer):
+    REQUIRED = ('new_shape',)
+
+    def _compute_output_shapes(self, input_shapes):
+        return [[input_shapes[0][0]] + list(self._params['new_shape'])]
+
+    def _spec_attrs(self, input_shapes):
+        output_shape = self._compute_output_shapes(input_shapes)[0]
+        return {'in_f': self._channels(input_shapes[0]), 'out_f': self._channels(output_shape)}
+
+
+class FlattenLayer(IRLayer):
+    # Elements of 4D tensor are flattened in NHWC order for any data format (NCHW input is transposed first),
+    # so weights of the following dense layer do not depend on the layout
+    def _compute_output_shapes(self, input_shapes):
+        return [[input_shapes[0][0], _prod(input_shapes[0][1:])]]
+
+    def _spec_attrs(self, input_shapes):
+        return {'in_f': self._channels(input_shapes[0]), 'out_f': _prod(input_shapes[0][1:])}
@@ -0,0 +1,97 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Data formats (layouts) of the 4D tensors.
+Layers of MakiFlow support only NHWC, IR layers take optional `data_format` argument:
+spatial arguments (`ksize` and `strides` of the pooling, explicit `padding` of the convolution)
+are given in the order of the axes of the data format, as in tensorflow,
+and `padding` of the ZeroPaddingLayer is always [[top, bottom], [left, right]].
+Default `ksize` and `strides` of the pooling and default `axis` of the concat and split
+are converted into the data format of the layer.
+
+"""
+
+NHWC = 'NHWC'
+NCHW = 'NCHW'
+
+DATA_FORMATS = (NHWC, NCHW)
+
+
+def check_data_format(data_format):
+    if data_format not in DATA_FORMATS:
+        raise ValueError(f'Unknown data format: {data_format}. Available: {DATA_FORMATS}')
+
+
+def channel_axis(data_format=NHWC):
+    """
+    Return axis of the feature maps of 4D tensor.
+
+    """
+    return 1 if data_format == NCHW else 3
+
+
+def spatial_axes(data_format=NHWC):
+    """
+    Return (height axis, width axis) of 4D tensor.
+
+    """
+    return (2, 3) if data_format == NCHW else (1, 2)
+
+
+def from_nhwc(values, data_format=NHWC):
+    """
+    Reorder 4 values given in NHWC order into the order of the `data_format`,
+    for example, `ksize` [1, 3, 3, 1] or output shape [N, H, W, C].
+
+    """
+    n, h, w, c = values
+    if data_format == NCHW:
+        return [n, c, h, w]
+    return [n, h, w, c]
+
+
+def to_nhwc(values, data_format=NHWC):
+    """
+    Reorder 4 values given in the order of the `data_format` into NHWC order,
+    for example, `to_nhwc([0, 1, 2, 3], NCHW)` is the permutation which transposes NCHW tensor into NHWC.
+
+    """
+    if data_format == NCHW:
+        n, c, h, w = values
+        return [n, h, w, c]
+    return list(values)
+
+
+def layout_kwargs(data_format=NHWC):
+    """
+    Return keyword arguments which set `data_format` of the layer.
+    NHWC is the default of every layer, so it gives empty dict and layers keep the MakiFlow signature.
+
+    """
+    check_data_format(data_format)
+    if data_format == NHWC:
+        return {}
+    return {'data_format': data_format}
+
+
+def spec_data_format(spec):
+    """
+    Return data format of the layer from its spec.
+
+    """
+    return spec.kwargs.get('data_format', NHWC)
@@ -0,0 +1,139 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+from .backend import get_layers_module, MAKIFLOW, IR
+from .graph import ArchitectureIR, MULTI_INPUT_LAYERS
+from .layout import NHWC, spec_data_format
+
+
+def replay(arch: ArchitectureIR, layers_module, weights=None, layers=None):
+    """
+    Create layers from `layers_module` for every spec of `arch` and connect them as in IR.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model.
+    layers_module : module
+        Module with layer classes, for example `makiflow.layers` or `makizoo.ir.layers`.
+    weights : dict
+        Initial values of the parameters, passed into constructors of the layers:
+        {layer_name: {param_name: np.ndarray}},
+        where `param_name` is the name of the constructor argument in MakiFlow,
+        i.e. 'W' and 'b' for ConvLayer, AtrousConvLayer, DepthWiseConvLayer and DenseLayer;
+        'mean', 'var', 'gamma' and 'beta' for BatchNormLayer.
+    layers : dict
+        If given, it is filled with created layers: {layer_name: layer},
+        use it to read the parameters back with `makizoo.ir.weights.read_weights`.
+
+    Returns
+    -------
+    dict
+        Mapping from the name of the tensor in IR to created tensor.
+
+    """
+    if weights is None:
+        weights = {}
+
+    tensors = {}
+    for spec in arch.layers:
+        kwargs = dict(spec.kwargs)
+        if spec.type == 'InputLayer':
+            tensors[spec.outputs[0]] = layers_module.InputLayer(name=spec.name, **kwargs)
+            continue
+
+        kwargs.update(weights.get(spec.name, {}))
+        layer = getattr(layers_module, spec.type)(name=spec.name, **kwargs)
+        if layers is not None:
+            layers[spec.name] = layer
+
+        inputs = [tensors[tensor_name] for tensor_name in spec.inputs]
+        outputs = layer(inputs if spec.type in MULTI_INPUT_LAYERS else inputs[0])
+        if not isinstance(outputs, (list, tuple)):
+            outputs = [outputs]
+
+        for tensor_name, tensor in zip(spec.outputs, outputs):
+            tensors[tensor_name] = tensor
+
+    return tensors
+
+
+def lower(arch: ArchitectureIR, weights=None, create_model=False, name_model='MakiClassificator', layers=None):
+    """
+    Lower IR into MakiFlow layers.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model.
+    weights : dict
+        Initial values of the parameters, see `replay` for more information.
+    create_model : bool
+        Return classification model, otherwise return input MakiTensor and output MakiTensor.
+    name_model : str
+        Name of model, if it will be created.
+    layers : dict
+        If given, it is filled with created MakiFlow layers, see `replay`.
+
+    Returns
+    ---------
+    if `create_model` is False
+        in_x : mf.MakiTensor
+            Input MakiTensor
+        output : mf.MakiTensor or list
+            Output MakiTensor (list of them if IR has several outputs)
+    if `create_model` is True
+        model : mf.models.Classificator
+            Classification model
+
+    """
+    nchw_layers = [spec.name for spec in arch.layers if spec_data_format(spec) != NHWC]
+    if len(nchw_layers) != 0:
+        raise ValueError(
+            f'MakiFlow layers support only NHWC data format, but {len(nchw_layers)} layers of the IR '
+            f'use another one, for example {nchw_layers[0]}.'
+        )
+
+    tensors = replay(arch, get_layers_module(MAKIFLOW), weights=weights, layers=layers)
+    in_x = tensors[arch.inputs[0]]
+    outputs = [tensors[tensor_name] for tensor_name in arch.outputs]
+
+    if create_model:
+        from makiflow.models import Classificator
+        return Classificator(in_x, outputs[0], name=name_model)
+
+    if len(outputs) == 1:
+        return in_x, outputs[0]
+    return in_x, outputs
+
+
+def rebuild(arch: ArchitectureIR):
+    """
+    Replay IR through IR layers, i.e. recompute all shapes and attributes of specs.
+    Useful after modification of the `kwargs` of some specs (for example, after pruning).
+
+    Returns
+    -------
+    ArchitectureIR
+        New IR with the same layers and updated shapes.
+
+    """
+    tensors = replay(arch, get_layers_module(IR))
+    return ArchitectureIR.from_tensors(
+        inputs=[tensors[tensor_name] for tensor_name in arch.inputs],
+        outputs=[tensors[tensor_name] for tensor_name in arch.outputs]
+    )
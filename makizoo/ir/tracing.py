@@ -0,0 +1,55 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import inspect
+
+from .backend import use_backend, IR
+from .graph import ArchitectureIR
+
+
+def trace(model_fn, *args, **kwargs):
+    """
+    Run builder (or model factory) of the zoo and record layers into IR instead of creating MakiFlow graph.
+    No variables or tensorflow operations are created.
+
+    Parameters
+    ----------
+    model_fn : function
+        Any builder or model from the zoo, for example `build_ResNetV1` or `MobileNetV2_1_0`.
+    args : list
+        Positional arguments of `model_fn`.
+    kwargs : dict
+        Keyword arguments of `model_fn`. `create_model` is always set to False.
+
+    Returns
+    -------
+    ArchitectureIR
+
+    Examples
+    --------
+    >>> from makizoo.backbones.resnetv1 import ResNet50
+    >>> arch = trace(ResNet50, input_shape=[1, 224, 224, 3], include_top=True)
+    >>> in_x, output = arch.lower()
+
+    """
+    if 'create_model' in inspect.signature(model_fn).parameters:
+        kwargs['create_model'] = False
+
+    with use_backend(IR):
+        in_x, outputs = model_fn(*args, **kwargs)
+
+    return ArchitectureIR.from_tensors(in_x, outputs)
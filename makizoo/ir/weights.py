@@ -0,0 +1,186 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Weights of the IR are stored as plain dictionary:
+{layer_name: {param_name: np.ndarray}},
+where `param_name` is the name of the constructor argument of the MakiFlow layer:
+- 'W', 'b' for ConvLayer and AtrousConvLayer ([kh, kw, in_f, out_f]), DepthWiseConvLayer ([kh, kw, in_f, multiplier])
+  and DenseLayer ([in_d, out_d]);
+- 'mean', 'var', 'gamma', 'beta' for BatchNormLayer.
+Weights are passed into the MakiFlow layers by `makizoo.ir.lower` and read back from the session
+(for example, after training or fine-tuning) by `read_weights`.
+
+"""
+
+import numpy as np
+
+
+SEPARATOR = '::'
+
+# Attributes of the MakiFlow layers with variables of the parameters: {param_name: attribute}
+PARAM_ATTRIBUTES = {
+    'W': 'W',
+    'b': 'b',
+    'mean': 'running_mean',
+    'var': 'running_variance',
+    'gamma': 'gamma',
+    'beta': 'beta',
+}
+
+LAYER_PARAMS = {
+    'ConvLayer': ('W', 'b'),
+    'AtrousConvLayer': ('W', 'b'),
+    'DepthWiseConvLayer': ('W', 'b'),
+    'DenseLayer': ('W', 'b'),
+    'BatchNormLayer': ('mean', 'var', 'gamma', 'beta'),
+}
+
+
+def save_weights(weights, path):
+    """
+    Save weights dictionary into npz file.
+
+    """
+    arrays = {
+        f'{layer_name}{SEPARATOR}{param_name}': np.asarray(value)
+        for layer_name, params in weights.items()
+        for param_name, value in params.items()
+    }
+    np.savez(path, **arrays)
+
+
+def load_weights(path):
+    """
+    Load weights dictionary from npz file created by `save_weights`.
+
+    """
+    weights = {}
+    with np.load(path) as arrays:
+        for key in arrays.files:
+            layer_name, param_name = key.rsplit(SEPARATOR, 1)
+            weights.setdefault(layer_name, {})[param_name] = arrays[key]
+    return weights
+
+
+def copy_weights(weights):
+    """
+    Return copy of the weights dictionary (arrays are copied too).
+
+    """
+    return {
+        layer_name: {param_name: np.array(value, copy=True) for param_name, value in params.items()}
+        for layer_name, params in weights.items()
+    }
+
+
+def count_weights(weights):
+    """
+    Total number of elements in the weights dictionary.
+
+    """
+    return sum(int(np.size(value)) for params in weights.values() for value in params.values())
+
+
+def random_weights(arch, seed=None):
+    """
+    Create random weights for every layer of the IR (He initialization of the kernels,
+    zero biases, identity batch normalization). Useful for benchmarks and tests of the transforms.
+
+    """
+    rng = np.random.RandomState(seed)
+
+    def kernel(shape, fan_in):
+        return (rng.randn(*shape) * np.sqrt(2.0 / fan_in)).astype(np.float32)
+
+    weights = {}
+    for spec in arch.layers:
+        if spec.type in ('ConvLayer', 'AtrousConvLayer'):
+            kh, kw = spec.kernel
+            weights[spec.name] = {
+                'W': kernel([kh, kw, spec.in_f, spec.out_f], kh * kw * spec.in_f),
+                'b': np.zeros(spec.out_f, dtype=np.float32),
+            }
+        elif spec.type == 'DepthWiseConvLayer':
+            kh, kw = spec.kernel
+            multiplier = spec.kwargs['multiplier']
+            weights[spec.name] = {
+                'W': kernel([kh, kw, spec.in_f, multiplier], kh * kw),
+                'b': np.zeros(spec.in_f * multiplier, dtype=np.float32),
+            }
+        elif spec.type == 'DenseLayer':
+            weights[spec.name] = {
+                'W': kernel([spec.in_f, spec.out_f], spec.in_f),
+                'b': np.zeros(spec.out_f, dtype=np.float32),
+            }
+        elif spec.type == 'BatchNormLayer':
+            weights[spec.name] = {
+                'mean': np.zeros(spec.out_f, dtype=np.float32),
+                'var': np.ones(spec.out_f, dtype=np.float32),
+                'gamma': np.ones(spec.out_f, dtype=np.float32),
+                'beta': np.zeros(spec.out_f, dtype=np.float32),
+            }
+    return weights
+
+
+def read_weights(arch, layers, sess):
+    """
+    Read values of the parameters of the lowered model from the session, inverse of `makizoo.ir.replay`.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model.
+    layers : dict
+        Layers of the model, filled by `makizoo.ir.lower(arch, layers=layers)`.
+    sess : tf.Session
+        Session with the values of the variables (trained, fine-tuned or loaded from the checkpoint).
+
+    Returns
+    -------
+    dict
+        Weights dictionary, parameters which are not created by the layer
+        (for example, bias of the convolution with `use_bias=False`) are skipped.
+
+    Examples
+    --------
+    >>> layers = {}
+    >>> in_x, output = lower(arch, layers=layers)
+    >>> model = Classificator(in_x, output)
+    >>> model.set_session(sess)
+    >>> model.load_weights('resnet50.ckpt')
+    >>> weights = read_weights(arch, layers, sess)
+
+    """
+    variables = {}
+    for spec in arch.layers:
+        param_names = LAYER_PARAMS.get(spec.type)
+        if param_names is None:
+            continue
+        if spec.name not in layers:
+            raise ValueError(f'Layer {spec.name} is not found, lower the IR with `layers` argument.')
+
+        for param_name in param_names:
+            variable = getattr(layers[spec.name], PARAM_ATTRIBUTES[param_name], None)
+            if variable is not None:
+                variables.setdefault(spec.name, {})[param_name] = variable
+
+    values = sess.run(variables)
+    return {
+        layer_name: {param_name: np.asarray(value) for param_name, value in params.items()}
+        for layer_name, params in values.items()
+    }
@@ -0,0 +1,63 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Layers used by the zoo builders.
+Every name here is a thin constructor which creates a layer of the current backend
+(see `makizoo.ir.backend`): MakiFlow layer by default or IR layer spec while tracing.
+Signatures are the same as in `makiflow.layers`.
+
+"""
+
+from makizoo.ir.backend import get_layers_module
+
+
+__all__ = [
+    'InputLayer', 'ConvLayer', 'AtrousConvLayer', 'DepthWiseConvLayer', 'BatchNormLayer', 'ActivationLayer',
+    'ZeroPaddingLayer', 'MaxPoolLayer', 'AvgPoolLayer', 'GlobalAvgPoolLayer', 'DenseLayer',
+    'SumLayer', 'ConcatLayer', 'ChannelSplitLayer', 'ChannelShuffleLayer', 'DropoutLayer',
+    'ReshapeLayer', 'FlattenLayer',
+]
+
+
+def _dispatch(layer_name):
+    def create_layer(*args, **kwargs):
+        return getattr(get_layers_module(), layer_name)(*args, **kwargs)
+
+    create_layer.__name__ = layer_name
+    create_layer.__qualname__ = layer_name
+    return create_layer
+
+
+InputLayer = _dispatch('InputLayer')
+ConvLayer = _dispatch('ConvLayer')
+AtrousConvLayer = _dispatch('AtrousConvLayer')
+DepthWiseConvLayer = _dispatch('DepthWiseConvLayer')
+BatchNormLayer = _dispatch('BatchNormLayer')
+ActivationLayer = _dispatch('ActivationLayer')
+ZeroPaddingLayer = _dispatch('ZeroPaddingLayer')
+MaxPoolLayer = _dispatch('MaxPoolLayer')
+AvgPoolLayer = _dispatch('AvgPoolLayer')
+GlobalAvgPoolLayer = _dispatch('GlobalAvgPoolLayer')
+DenseLayer = _dispatch('DenseLayer')
+SumLayer = _dispatch('SumLayer')
+ConcatLayer = _dispatch('ConcatLayer')
+ChannelSplitLayer = _dispatch('ChannelSplitLayer')
+ChannelShuffleLayer = _dispatch('ChannelShuffleLayer')
+DropoutLayer = _dispatch('DropoutLayer')
+ReshapeLayer = _dispatch('ReshapeLayer')
+FlattenLayer = _dispatch('FlattenLayer')
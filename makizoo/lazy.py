@@ -0,0 +1,76 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import importlib
+
+
+def attach(package_name, submodules=(), attributes=None):
+    """
+    Create module level `__getattr__` and `__dir__` (PEP 562) which import
+    submodules of the package only when one of their attributes is requested.
+    With it heavy dependencies (tensorflow, makiflow) are loaded only
+    by the family of models which is actually used.
+
+    Parameters
+    ----------
+    package_name : str
+        Name of the package, usually `__name__`.
+    submodules : list
+        Names of the submodules which can be accessed as attributes of the package.
+    attributes : dict
+        Mapping from the name of the submodule (relative to the package) to the list
+        of names which are exported by the package from this submodule.
+
+    Returns
+    -------
+    __getattr__ : function
+        Lazy attribute getter for the package.
+    __dir__ : function
+        Function which lists all (including not loaded yet) attributes.
+    __all__ : list
+        Names of all exported attributes.
+
+    """
+    if attributes is None:
+        attributes = {}
+
+    submodules = set(submodules)
+    attr_to_module = {
+        attr: module_name
+        for module_name, attrs in attributes.items()
+        for attr in attrs
+    }
+    __all__ = sorted(submodules | set(attr_to_module))
+
+    def __getattr__(name):
+        if name in submodules:
+            return importlib.import_module(f'{package_name}.{name}')
+
+        module_name = attr_to_module.get(name)
+        if module_name is None:
+            raise AttributeError(f"module '{package_name}' has no attribute '{name}'")
+
+        module = importlib.import_module(f'{package_name}.{module_name}')
+        value = getattr(module, name)
+        # Cache value in the package, so `__getattr__` will not be called next time
+        setattr(importlib.import_module(package_name), name, value)
+        return value
+
+    def __dir__():
+        return list(__all__)
+
+    return __getattr__, __dir__, __all__
@@ -0,0 +1,27 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+from .pipeline import prune_model, prune_arch, prune_densenet_model, prune_densenet_arch, PrunedModel
+from .channels import prune_channels, plan_output_pruning, propagate_channels, apply_plan, find_prunable_layers
+from .batchnorm import (
+    prune_by_batchnorm, select_by_batchnorm, select_layers, channel_scores,
+    MOBILENETV2_PRUNING_PATTERNS, SHUFFLENETV2_PRUNING_PATTERNS, LAYER, GLOBAL
+)
+from .report import pruning_report, measure_latency, PruningReport
+from .densenet import (
+    prune_densenet, prune_dense_layers, select_dense_pruning, dense_channel_importance, find_dense_units, DenseUnit
+)
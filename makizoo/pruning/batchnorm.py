@@ -0,0 +1,172 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Ranking of the channels by the scale (gamma) of the batch normalization which follows the convolution
+(Network Slimming): channel with small |gamma| contributes little to the output of the block.
+
+"""
+
+import re
+
+import numpy as np
+
+from makizoo.ir import ArchitectureIR
+from makizoo.transforms.utils import single_consumer
+from .channels import find_prunable_layers, prune_channels
+
+
+LAYER = 'layer'
+GLOBAL = 'global'
+SCOPES = (LAYER, GLOBAL)
+
+# Expanded channels of every MobileNetV2InvertedResBlock (expand -> depthwise -> project)
+MOBILENETV2_PRUNING_PATTERNS = (
+    r'/expand/weights$',
+)
+# Inner channels of the branches of ShuffleNetV2 units (conv1 -> depthwise -> conv3)
+SHUFFLENETV2_PRUNING_PATTERNS = (
+    r'/(fx|mb)/conv1$',
+)
+
+
+def select_layers(arch: ArchitectureIR, patterns=None):
+    """
+    Return names of the prunable convolutions (see `find_prunable_layers`) which match any of the `patterns`.
+    All prunable convolutions are returned if `patterns` is None.
+
+    """
+    names = find_prunable_layers(arch)
+    if patterns is None:
+        return names
+
+    patterns = [re.compile(pattern) for pattern in patterns]
+    return [name for name in names if any(pattern.search(name) for pattern in patterns)]
+
+
+def channel_scores(arch: ArchitectureIR, weights, layer_name):
+    """
+    Importance of every output channel of the convolution: |gamma| of the batch normalization
+    which consumes the output of the convolution, L1 norm of the filters if there is no such batch normalization
+    (or it does not use gamma).
+
+    """
+    spec = arch.get_layer(layer_name)
+    bn = single_consumer(arch, spec, 'BatchNormLayer')
+    if bn is not None and 'gamma' in weights.get(bn.name, {}):
+        return np.abs(np.asarray(weights[bn.name]['gamma'], dtype=np.float64))
+
+    # W: [kh, kw, in_f, out_f]
+    return np.abs(np.asarray(weights[layer_name]['W'], dtype=np.float64)).sum(axis=(0, 1, 2))
+
+
+def num_kept(num_channels, num_keep, channel_multiple=1, min_channels=1):
+    """
+    Round the number of the kept channels up to the multiple of `channel_multiple`
+    and clip it into [`min_channels`, `num_channels`].
+
+    """
+    num_keep = max(num_keep, min_channels, 1)
+    num_keep = -(-num_keep // channel_multiple) * channel_multiple
+    return min(num_keep, num_channels)
+
+
+def select_channels(scores, num_keep):
+    """
+    Indices of `num_keep` channels with the largest `scores`, in the increasing order.
+
+    """
+    order = np.argsort(-np.asarray(scores), kind='stable')
+    return np.sort(order[:num_keep])
+
+
+def select_by_batchnorm(arch: ArchitectureIR, weights, ratio, layers=None, scope=LAYER, channel_multiple=1, min_channels=1):
+    """
+    Choose the output channels of the convolutions which are kept.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model, see `makizoo.ir.trace`.
+    weights : dict
+        Weights of the model.
+    ratio : float
+        Fraction of the channels which are removed, in [0, 1).
+    layers : list
+        Names of the convolutions which are pruned. All prunable convolutions are used if None,
+        see `select_layers` to choose them by the name.
+    scope : str
+        'layer' - every convolution loses `ratio` of its channels,
+        'global' - channels of all `layers` are ranked together, i.e. one threshold of |gamma| is used.
+    channel_multiple : int
+        Number of the kept channels of every convolution is rounded up to the multiple of this value.
+    min_channels : int
+        Minimum number of the kept channels of every convolution.
+
+    Returns
+    -------
+    dict
+        Mapping from the name of the convolution to the indices of the kept output channels.
+
+    """
+    if not 0.0 <= ratio < 1.0:
+        raise ValueError(f'Ratio of the removed channels must be in [0, 1), got {ratio}.')
+    if scope not in SCOPES:
+        raise ValueError(f'Unknown scope {scope}, expected one of {SCOPES}.')
+
+    if layers is None:
+        layers = find_prunable_layers(arch)
+    scores = {layer_name: channel_scores(arch, weights, layer_name) for layer_name in layers}
+    if len(scores) == 0:
+        return {}
+
+    threshold = None
+    if scope == GLOBAL:
+        threshold = np.quantile(np.concatenate(list(scores.values())), ratio)
+
+    keep = {}
+    for layer_name, layer_scores in scores.items():
+        if threshold is None:
+            num_keep = int(round(len(layer_scores) * (1.0 - ratio)))
+        else:
+            num_keep = int(np.sum(layer_scores >= threshold))
+        num_keep = num_kept(len(layer_scores), num_keep, channel_multiple, min_channels)
+        keep[layer_name] = select_channels(layer_scores, num_keep)
+    return keep
+
+
+def prune_by_batchnorm(arch: ArchitectureIR, weights, ratio, layers=None, scope=LAYER, channel_multiple=1, min_channels=1):
+    """
+    Remove output channels of the convolutions with the smallest |gamma| of the following batch normalization.
+    See `select_by_batchnorm` for the description of the parameters.
+
+    Returns
+    -------
+    arch : ArchitectureIR
+        Smaller IR.
+    weights : dict
+        Weights of the smaller IR.
+    keep : dict
+        Mapping from the name of the convolution to the indices of the kept output channels.
+
+    """
+    keep = select_by_batchnorm(
+        arch, weights, ratio, layers=layers, scope=scope,
+        channel_multiple=channel_multiple, min_channels=min_channels
+    )
+    arch, weights = prune_channels(arch, weights, keep)
+    return arch, weights, keep
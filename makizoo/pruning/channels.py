@@ -0,0 +1,294 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Removal of the channels from the IR and weights.
+
+Channels are removed from the output of a layer (usually a convolution) and the removal is propagated
+to the consumers: layers which process every channel separately (batch normalization, activations,
+depthwise convolutions, pooling) lose the same channels, convolutions and dense layers lose
+the corresponding input channels of their weights and stop the propagation.
+Concatenation along the channels keeps the remaining channels of every input.
+Tensors which must keep their size (inputs of SumLayer, ChannelSplitLayer, ChannelShuffleLayer, reshapes
+and outputs of the model) can not be pruned.
+
+"""
+
+import numpy as np
+
+from makizoo.ir import ArchitectureIR, channel_axis
+from makizoo.ir.layout import spec_data_format
+from makizoo.transforms.utils import rewire
+
+
+# Layers which output channel `i` depends only on the input channel `i`,
+# removed input channels are removed from the output (and from the parameters of the layer)
+CHANNELWISE_LAYERS = (
+    'BatchNormLayer', 'ActivationLayer', 'DepthWiseConvLayer', 'MaxPoolLayer', 'AvgPoolLayer',
+    'GlobalAvgPoolLayer', 'ZeroPaddingLayer', 'DropoutLayer'
+)
+# Layers which mix input channels, removed input channels are removed only from their weights
+MIXING_LAYERS = ('ConvLayer', 'AtrousConvLayer', 'DenseLayer')
+# Layers which output channels can be removed
+PRUNABLE_LAYERS = ('ConvLayer', 'AtrousConvLayer')
+
+IN = 'in'
+OUT = 'out'
+
+
+def _depthwise_channels(channels, multiplier):
+    """
+    Output channels of the depthwise convolution which are computed from the input `channels`.
+
+    """
+    return np.array([channel * multiplier + j for channel in channels for j in range(multiplier)], dtype=np.int64)
+
+
+def _is_channel_concat(spec):
+    rank = len(spec.output_shapes[0])
+    axis = spec.kwargs.get('axis', channel_axis(spec_data_format(spec)))
+    return axis % rank == channel_axis(spec_data_format(spec)) % rank
+
+
+def propagate_channels(arch: ArchitectureIR, kept, plan=None):
+    """
+    Collect changes of the layers which are required to keep only some channels of the tensors.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model, see `makizoo.ir.trace`.
+    kept : dict
+        Mapping from the name of the tensor to the indices of its channels which are kept
+        (empty if the tensor is removed completely, for example, together with the dense layer of DenseNet).
+    plan : dict
+        Plan to update, see `plan_output_pruning`. New plan is created if None.
+
+    Returns
+    -------
+    dict
+        Updated plan.
+
+    Raises
+    ------
+    ValueError
+        If the channels of the tensor can not be removed, for example if the tensor is added to the skip
+        connection by the SumLayer, or the tensor is the output of the model.
+
+    """
+    if plan is None:
+        plan = {}
+
+    kept = {tensor_name: np.asarray(channels, dtype=np.int64) for tensor_name, channels in kept.items()}
+    for spec in arch.layers:
+        pruned = [tensor_name for tensor_name in spec.inputs if tensor_name in kept]
+        if len(pruned) == 0:
+            continue
+
+        tensor_name = pruned[0]
+        channels = kept[tensor_name]
+        if spec.type in MIXING_LAYERS:
+            plan.setdefault(spec.name, {})[IN] = channels
+        elif spec.type in CHANNELWISE_LAYERS:
+            output_channels = channels
+            if spec.type == 'DepthWiseConvLayer':
+                output_channels = _depthwise_channels(channels, spec.kwargs['multiplier'])
+            plan.setdefault(spec.name, {}).update({IN: channels, OUT: output_channels})
+            kept[spec.outputs[0]] = output_channels
+        elif spec.type == 'ConcatLayer' and _is_channel_concat(spec):
+            # Kept channels of every input are shifted by the size of the previous inputs
+            parts = []
+            offset = 0
+            for input_name in spec.inputs:
+                size = arch.get_shape(input_name)[channel_axis(spec_data_format(spec))]
+                parts.append(kept.get(input_name, np.arange(size, dtype=np.int64)) + offset)
+                offset += size
+            kept[spec.outputs[0]] = np.concatenate(parts)
+        else:
+            raise ValueError(
+                f'Channels of the tensor {tensor_name} can not be removed: it is used by {spec.type} {spec.name}.'
+            )
+
+    for tensor_name in arch.outputs:
+        if tensor_name in kept:
+            raise ValueError(f'Channels of the tensor {tensor_name} can not be removed: it is the output of the model.')
+    return plan
+
+
+def plan_output_pruning(arch: ArchitectureIR, keep, kept=None):
+    """
+    Create plan of the removal of the output channels of the layers.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model, see `makizoo.ir.trace`.
+    keep : dict
+        Mapping from the name of the layer (ConvLayer or AtrousConvLayer) to the indices of its output channels
+        which are kept.
+    kept : dict
+        Kept channels of other tensors, see `propagate_channels`.
+
+    Returns
+    -------
+    dict
+        Mapping from the name of the layer to the dict {'in': kept input channels, 'out': kept output channels}
+        (one of them can be missing if the layer keeps all its input or output channels).
+
+    """
+    plan = {}
+    kept = {} if kept is None else dict(kept)
+    for layer_name, channels in keep.items():
+        spec = arch.get_layer(layer_name)
+        if spec.type not in PRUNABLE_LAYERS:
+            raise ValueError(f'Output channels of {spec.type} {spec.name} can not be removed.')
+
+        channels = np.unique(np.asarray(channels, dtype=np.int64))
+        if len(channels) == 0 or channels[0] < 0 or channels[-1] >= spec.out_f:
+            raise ValueError(f'Layer {layer_name} has {spec.out_f} output channels, can not keep {list(channels)}.')
+
+        plan.setdefault(layer_name, {})[OUT] = channels
+        kept[spec.outputs[0]] = channels
+    return propagate_channels(arch, kept, plan)
+
+
+def find_prunable_layers(arch: ArchitectureIR):
+    """
+    Return names of the convolutions which output channels can be removed, i.e. their outputs
+    reach only other convolutions (dense layers) through the channel-wise layers and concatenations.
+    For example, in MobileNetV2 the expand convolution of every block is prunable and the project
+    convolution is not if the output of the block is added to the skip connection.
+
+    """
+    names = []
+    for spec in arch.layers:
+        if spec.type not in PRUNABLE_LAYERS:
+            continue
+        try:
+            propagate_channels(arch, {spec.outputs[0]: np.arange(spec.out_f)})
+        except ValueError:
+            continue
+        names.append(spec.name)
+    return names
+
+
+def _prune_params(spec, params, changes):
+    params = dict(params)
+    in_channels = changes.get(IN)
+    out_channels = changes.get(OUT)
+    if spec.type in ('ConvLayer', 'AtrousConvLayer'):
+        # W: [kh, kw, in_f, out_f]
+        if in_channels is not None:
+            params['W'] = np.take(params['W'], in_channels, axis=2)
+        if out_channels is not None:
+            params['W'] = np.take(params['W'], out_channels, axis=3)
+            if 'b' in params:
+                params['b'] = np.take(params['b'], out_channels)
+    elif spec.type == 'DenseLayer':
+        # W: [in_d, out_d]
+        params['W'] = np.take(params['W'], in_channels, axis=0)
+    elif spec.type == 'DepthWiseConvLayer':
+        # W: [kh, kw, in_f, multiplier], b: [in_f * multiplier]
+        params['W'] = np.take(params['W'], in_channels, axis=2)
+        if 'b' in params:
+            params['b'] = np.take(params['b'], out_channels)
+    else:
+        # Parameters of the batch normalization have shape [D]
+        params = {param_name: np.take(value, out_channels) for param_name, value in params.items()}
+    return params
+
+
+def _prune_kwargs(spec, changes):
+    kwargs = dict(spec.kwargs)
+    in_channels = changes.get(IN)
+    out_channels = changes.get(OUT)
+    if spec.type in ('ConvLayer', 'AtrousConvLayer'):
+        if in_channels is not None:
+            kwargs['in_f'] = len(in_channels)
+        if out_channels is not None:
+            kwargs['out_f'] = len(out_channels)
+    elif spec.type == 'DenseLayer':
+        kwargs['in_d'] = len(in_channels)
+    elif spec.type == 'DepthWiseConvLayer':
+        kwargs['in_f'] = len(in_channels)
+    elif spec.type == 'BatchNormLayer':
+        kwargs['D'] = len(out_channels)
+    return kwargs
+
+
+def apply_plan(arch: ArchitectureIR, weights, plan, removed=(), rename=None):
+    """
+    Remove channels from the IR and weights according to the `plan`, see `plan_output_pruning`.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model.
+    weights : dict
+        Weights of the model.
+    plan : dict
+        Changes of the layers.
+    removed : set
+        Names of the layers which are removed completely, see `makizoo.transforms.rewire`.
+    rename : dict
+        Mapping from the outputs of the removed layers to the tensors which are used instead of them.
+
+    Returns
+    -------
+    arch : ArchitectureIR
+        Smaller IR, names of all remaining layers are not changed.
+    weights : dict
+        Weights of the smaller IR. Weights of the layers which are not changed are shared with the input dict.
+
+    """
+    new_arch = arch.copy()
+    new_weights = {layer_name: params for layer_name, params in weights.items() if layer_name not in removed}
+    for spec in new_arch.layers:
+        changes = plan.get(spec.name)
+        if changes is None or spec.name in removed:
+            continue
+
+        spec.kwargs = _prune_kwargs(spec, changes)
+        if spec.name in weights:
+            new_weights[spec.name] = _prune_params(spec, weights[spec.name], changes)
+
+    return rewire(new_arch, set(removed), {} if rename is None else rename), new_weights
+
+
+def prune_channels(arch: ArchitectureIR, weights, keep):
+    """
+    Physically remove output channels of the convolutions and the corresponding channels of all layers
+    which consume them (batch normalization, depthwise convolutions, input channels of the next convolutions).
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model, see `makizoo.ir.trace`.
+    weights : dict
+        Weights of the model.
+    keep : dict
+        Mapping from the name of the convolution to the indices of its output channels which are kept.
+
+    Returns
+    -------
+    arch : ArchitectureIR
+        Smaller IR, it can be lowered into MakiFlow model with `makizoo.ir.lower` for fine-tuning.
+    weights : dict
+        Weights of the smaller IR.
+
+    """
+    return apply_plan(arch, weights, plan_output_pruning(arch, keep))
@@ -0,0 +1,314 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Pruning of the dense layers of DenseNet.
+
+Output of every dense layer (ConvDenseNetBlock) is concatenated to the input of the layer and consumed
+by all next dense layers of the DenseNetBlock and by the transition block (or the head of the model),
+every consumer applies BN-ReLU-1x1 convolution to it. Importance of the channel of the dense layer is measured
+by the weights which the consumers apply to it (1x1 kernels scaled by the batch normalization in front of them),
+so channels which are effectively ignored by all consumers are removed first.
+
+"""
+
+import re
+from collections import OrderedDict
+
+import numpy as np
+
+from makizoo.ir import ArchitectureIR
+from makizoo.transforms import get_batchnorm_scale_shift
+from .channels import propagate_channels, plan_output_pruning, apply_plan, CHANNELWISE_LAYERS, MIXING_LAYERS, IN
+from .batchnorm import num_kept, select_channels
+
+
+# Concat of the dense layer, first group is the name of the dense layer, for example `conv3_block5`
+DENSE_CONCAT_PATTERN = r'^((conv\d+)_block\d+)_concat$'
+
+
+class DenseUnit:
+    """
+    Dense layer (ConvDenseNetBlock with its concat) in the IR.
+
+    Attributes
+    ----------
+    name : str
+        Name of the dense layer, for example `conv3_block5`.
+    stage : str
+        Name of the DenseNetBlock, for example `conv3`.
+    conv : str
+        Name of the convolution which produces new channels (`growth_rate` of them).
+    concat : str
+        Name of the concat which appends new channels to the input of the dense layer.
+    features : str
+        Name of the tensor with new channels, i.e. the last input of the concat.
+    layers : list
+        Names of all layers of the dense layer (including the concat).
+
+    """
+    def __init__(self, name, stage, conv, concat, features, layers):
+        self.name = name
+        self.stage = stage
+        self.conv = conv
+        self.concat = concat
+        self.features = features
+        self.layers = layers
+
+    def __repr__(self):
+        return f'DenseUnit(name={self.name}, conv={self.conv})'
+
+
+def find_dense_units(arch: ArchitectureIR):
+    """
+    Return list of `DenseUnit` of the IR in the order of execution.
+
+    """
+    pattern = re.compile(DENSE_CONCAT_PATTERN)
+    units = []
+    for spec in arch.layers:
+        match = pattern.match(spec.name)
+        if spec.type != 'ConcatLayer' or match is None:
+            continue
+
+        features = spec.inputs[-1]
+        producer = arch.producer(features)
+        while producer.type in CHANNELWISE_LAYERS:
+            producer = arch.producer(producer.inputs[0])
+        if producer.type != 'ConvLayer':
+            continue
+
+        name = match.group(1)
+        units.append(DenseUnit(
+            name=name,
+            stage=match.group(2),
+            conv=producer.name,
+            concat=spec.name,
+            features=features,
+            layers=[layer.name for layer in arch.layers if layer.name.startswith(name + '_')],
+        ))
+    return units
+
+
+def _input_channel_norms(spec, params):
+    """
+    L1 norm of the weights which are applied to every input channel of the convolution (dense layer).
+
+    """
+    W = np.abs(np.asarray(params['W'], dtype=np.float64))
+    if spec.type == 'DenseLayer':
+        # W: [in_d, out_d]
+        return W.sum(axis=1)
+    # W: [kh, kw, in_f, out_f]
+    return W.sum(axis=(0, 1, 3))
+
+
+def _input_scale(arch: ArchitectureIR, weights, spec):
+    """
+    Product of |scale| of the batch normalizations between the consumer and the last layer
+    which mixes channels, i.e. the scale which is applied to every input channel of the consumer.
+
+    """
+    scale = np.ones(spec.in_f)
+    producer = arch.producer(spec.inputs[0])
+    while producer.type in CHANNELWISE_LAYERS and producer.type != 'DepthWiseConvLayer':
+        if producer.type == 'BatchNormLayer' and producer.name in weights:
+            bn_scale, _ = get_batchnorm_scale_shift(producer, weights[producer.name])
+            scale = scale * np.abs(bn_scale)
+        producer = arch.producer(producer.inputs[0])
+    return scale
+
+
+def dense_channel_importance(arch: ArchitectureIR, weights, units=None):
+    """
+    Measure how much every channel of the dense layers is used by its consumers.
+
+    For every consumer (1x1 convolution of the next dense layers, convolution of the transition block
+    or the classifier) L1 norm of its weights of every input channel is scaled by the batch normalization
+    in front of it and normalized by the mean over all its input channels.
+    Importance of the channel is the mean of these values over all consumers, i.e. channel with importance 1
+    is used as much as an average input channel.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of DenseNet, see `makizoo.ir.trace`.
+    weights : dict
+        Weights of the model.
+    units : list
+        List of `DenseUnit`, all dense layers of the IR are used if None.
+        Dense layers which outputs reach the output of the model (the last DenseNetBlock
+        of the model without classifier) are skipped, their channels can not be removed.
+
+    Returns
+    -------
+    OrderedDict
+        Mapping from the name of the dense layer to the importance of every its channel.
+
+    """
+    if units is None:
+        units = find_dense_units(arch)
+
+    importance = OrderedDict()
+    for unit in units:
+        # Channels of the dense layer are contiguous in the inputs of the consumers,
+        # so their positions are the input channels which are lost if the dense layer is removed
+        try:
+            plan = propagate_channels(arch, {unit.features: np.zeros(0, dtype=np.int64)})
+        except ValueError:
+            continue
+
+        usages = []
+        for layer_name, changes in plan.items():
+            spec = arch.get_layer(layer_name)
+            if spec.type not in MIXING_LAYERS:
+                continue
+
+            usage = _input_channel_norms(spec, weights[layer_name]) * _input_scale(arch, weights, spec)
+            usage = usage / max(float(np.mean(usage)), np.finfo(np.float64).tiny)
+            usages.append(usage[np.setdiff1d(np.arange(spec.in_f), changes[IN])])
+        importance[unit.name] = np.mean(usages, axis=0)
+    return importance
+
+
+def select_dense_pruning(
+        arch: ArchitectureIR, weights, layer_ratio=0.0, channel_ratio=0.0, channel_multiple=1, min_layers=1):
+    """
+    Choose dense layers which are removed and channels of the other dense layers which are kept.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of DenseNet, see `makizoo.ir.trace`.
+    weights : dict
+        Weights of the model.
+    layer_ratio : float
+        Fraction of the dense layers of every DenseNetBlock which are removed (the least important ones,
+        importance of the dense layer is the mean importance of its channels).
+    channel_ratio : float
+        Fraction of the channels of every remaining dense layer which are removed.
+    channel_multiple : int
+        Number of the kept channels is rounded up to the multiple of this value.
+    min_layers : int
+        Minimum number of the dense layers which are kept in every DenseNetBlock.
+
+    Returns
+    -------
+    dict
+        Mapping from the name of the convolution of the dense layer (see `DenseUnit.conv`)
+        to the indices of its kept channels, empty if the dense layer is removed.
+
+    """
+    if not 0.0 <= layer_ratio < 1.0 or not 0.0 <= channel_ratio < 1.0:
+        raise ValueError(
+            f'Ratios of the removed layers and channels must be in [0, 1), got {layer_ratio} and {channel_ratio}.'
+        )
+
+    units = find_dense_units(arch)
+    importance = dense_channel_importance(arch, weights, units)
+
+    stages = OrderedDict()
+    for unit in units:
+        if unit.name in importance:
+            stages.setdefault(unit.stage, []).append(unit)
+
+    keep = {}
+    for stage_units in stages.values():
+        num_removed = min(int(len(stage_units) * layer_ratio), max(len(stage_units) - min_layers, 0))
+        order = sorted(stage_units, key=lambda unit: float(np.mean(importance[unit.name])))
+        removed = set(unit.name for unit in order[:num_removed])
+
+        for unit in stage_units:
+            scores = importance[unit.name]
+            if unit.name in removed:
+                keep[unit.conv] = np.zeros(0, dtype=np.int64)
+                continue
+
+            num_keep = num_kept(len(scores), int(round(len(scores) * (1.0 - channel_ratio))), channel_multiple)
+            keep[unit.conv] = select_channels(scores, num_keep)
+    return keep
+
+
+def prune_dense_layers(arch: ArchitectureIR, weights, keep):
+    """
+    Remove dense layers and channels of the dense layers from the IR and weights.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of DenseNet, see `makizoo.ir.trace`.
+    weights : dict
+        Weights of the model.
+    keep : dict
+        Mapping from the name of the convolution of the dense layer to the indices of its kept channels,
+        empty to remove the whole dense layer, see `select_dense_pruning`.
+
+    Returns
+    -------
+    arch : ArchitectureIR
+        Thinner IR, names of the remaining layers are not changed.
+    weights : dict
+        Weights of the thinner IR: remaining weights of the original model with the input channels
+        of the consumers sliced to match.
+
+    """
+    units = {unit.conv: unit for unit in find_dense_units(arch)}
+    unknown = [layer_name for layer_name in keep if layer_name not in units]
+    if len(unknown) != 0:
+        raise ValueError(f'Layers {unknown} are not convolutions of the dense layers.')
+
+    channels_keep = {}
+    kept = {}
+    removed = set()
+    rename = {}
+    for layer_name, channels in keep.items():
+        if len(channels) != 0:
+            channels_keep[layer_name] = channels
+            continue
+
+        unit = units[layer_name]
+        concat = arch.get_layer(unit.concat)
+        kept[unit.features] = np.zeros(0, dtype=np.int64)
+        removed.update(unit.layers)
+        rename[concat.outputs[0]] = concat.inputs[0]
+
+    plan = plan_output_pruning(arch, channels_keep, kept)
+    return apply_plan(arch, weights, plan, removed, rename)
+
+
+def prune_densenet(
+        arch: ArchitectureIR, weights, layer_ratio=0.0, channel_ratio=0.0, channel_multiple=1, min_layers=1):
+    """
+    Remove the least important dense layers and channels of DenseNet.
+    See `select_dense_pruning` for the description of the parameters.
+
+    Returns
+    -------
+    arch : ArchitectureIR
+        Thinner IR.
+    weights : dict
+        Weights of the thinner IR.
+    keep : dict
+        Mapping from the name of the convolution of the dense layer to the indices of its kept channels.
+
+    """
+    keep = select_dense_pruning(
+        arch, weights, layer_ratio=layer_ratio, channel_ratio=channel_ratio,
+        channel_multiple=channel_multiple, min_layers=min_layers
+    )
+    arch, weights = prune_dense_layers(arch, weights, keep)
+    return arch, weights, keep
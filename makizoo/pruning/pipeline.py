@@ -0,0 +1,206 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Structured pruning of the zoo models:
+trace -> rank channels (by |gamma| of batch normalization or, for DenseNet, by the weights of the consumers
+of the dense layers) -> remove channels -> lower for fine-tuning.
+
+"""
+
+from makizoo.ir import ArchitectureIR, trace, lower
+from makizoo.ir.weights import save_weights, read_weights
+from .batchnorm import prune_by_batchnorm, select_layers, LAYER
+from .densenet import prune_densenet
+from .report import pruning_report
+
+
+class PrunedModel:
+    """
+    Result of the `prune_model`.
+
+    Attributes
+    ----------
+    arch : ArchitectureIR
+        IR of the pruned model.
+    weights : dict
+        Weights of the pruned model.
+    keep : dict
+        Mapping from the name of the pruned convolution to the indices of its kept output channels
+        (indices of the channels of the original model, empty if the layer is removed).
+    report : PruningReport
+        Cost of the model before and after pruning.
+
+    """
+    def __init__(self, arch, weights, keep, report):
+        self.arch = arch
+        self.weights = weights
+        self.keep = keep
+        self.report = report
+
+    def lower(self, create_model=True, name_model='MakiClassificator', layers=None):
+        """
+        Create MakiFlow model of the pruned IR initialized with the pruned weights, i.e. ready for fine-tuning.
+        See `makizoo.ir.lower` for the description of the parameters.
+
+        """
+        return lower(self.arch, self.weights, create_model=create_model, name_model=name_model, layers=layers)
+
+    def read_weights(self, layers, sess):
+        """
+        Replace weights with the fine-tuned values of the model created by `lower(layers=layers)`.
+
+        Returns
+        -------
+        dict
+            New weights.
+
+        """
+        self.weights = read_weights(self.arch, layers, sess)
+        return self.weights
+
+    def save(self, path):
+        """
+        Save weights of the pruned model into npz file `path`.
+
+        """
+        save_weights(self.weights, path)
+
+
+def _pruned_model(arch, weights, pruned_arch, pruned_weights, keep, measure_latency):
+    if measure_latency:
+        report = pruning_report(arch, pruned_arch, keep, weights, pruned_weights)
+    else:
+        report = pruning_report(arch, pruned_arch, keep)
+    return PrunedModel(pruned_arch, pruned_weights, keep, report)
+
+
+def prune_arch(
+        arch: ArchitectureIR, weights, ratio, patterns=None, scope=LAYER, channel_multiple=1, min_channels=1,
+        measure_latency=False):
+    """
+    Prune IR with weights, see `prune_model`.
+
+    """
+    layers = select_layers(arch, patterns)
+    pruned_arch, pruned_weights, keep = prune_by_batchnorm(
+        arch, weights, ratio, layers=layers, scope=scope,
+        channel_multiple=channel_multiple, min_channels=min_channels
+    )
+    return _pruned_model(arch, weights, pruned_arch, pruned_weights, keep, measure_latency)
+
+
+def prune_model(
+        model_fn, weights, ratio, patterns=None, image_size=224, scope=LAYER, channel_multiple=1, min_channels=1,
+        measure_latency=False, **kwargs):
+    """
+    Remove channels of the model with the smallest |gamma| of batch normalization.
+
+    Only channels which do not reach skip connections, concatenations or channel splits are removed,
+    so the shapes checked by SumLayer (and the channel split of ShuffleNetV2) are preserved.
+    For MobileNetV2 use `MOBILENETV2_PRUNING_PATTERNS` to prune the expanded channels of every
+    inverted residual block (they are removed from the expand, depthwise and project convolutions),
+    for ShuffleNetV2 use `SHUFFLENETV2_PRUNING_PATTERNS` to prune the inner channels of the branches.
+
+    Parameters
+    ----------
+    model_fn : function
+        Model builder from the zoo, for example `makizoo.backbones.mobilenetv2.MobileNetV2_1_0`.
+    weights : dict
+        Trained weights of the model, see `makizoo.ir.weights`.
+    ratio : float
+        Fraction of the channels of the selected convolutions which are removed.
+    patterns : list
+        Regular expressions of the names of the pruned convolutions. All prunable convolutions are pruned if None.
+    image_size : int
+        Size of the input image.
+    scope : str
+        'layer' or 'global', see `makizoo.pruning.select_by_batchnorm`.
+    channel_multiple : int
+        Number of the kept channels is rounded up to the multiple of this value.
+    min_channels : int
+        Minimum number of the kept channels of every convolution.
+    measure_latency : bool
+        Measure latency of both models with TensorFlow in addition to FLOPs.
+    kwargs : dict
+        Other arguments of the `model_fn`.
+
+    Returns
+    -------
+    PrunedModel
+
+    """
+    arch = trace(model_fn, input_shape=[1, image_size, image_size, 3], **kwargs)
+    return prune_arch(
+        arch, weights, ratio, patterns=patterns, scope=scope, channel_multiple=channel_multiple,
+        min_channels=min_channels, measure_latency=measure_latency
+    )
+
+
+def prune_densenet_arch(
+        arch: ArchitectureIR, weights, layer_ratio=0.0, channel_ratio=0.0, channel_multiple=1, min_layers=1,
+        measure_latency=False):
+    """
+    Prune IR of DenseNet with weights, see `prune_densenet_model`.
+
+    """
+    pruned_arch, pruned_weights, keep = prune_densenet(
+        arch, weights, layer_ratio=layer_ratio, channel_ratio=channel_ratio,
+        channel_multiple=channel_multiple, min_layers=min_layers
+    )
+    return _pruned_model(arch, weights, pruned_arch, pruned_weights, keep, measure_latency)
+
+
+def prune_densenet_model(
+        model_fn, weights, layer_ratio=0.0, channel_ratio=0.0, image_size=224, channel_multiple=1, min_layers=1,
+        measure_latency=False, **kwargs):
+    """
+    Remove the dense layers (and channels of the dense layers) of DenseNet which are used the least
+    by their consumers, see `makizoo.pruning.dense_channel_importance`.
+    Useful to get a thinner model from DenseNet169/201 which keeps their features.
+
+    Parameters
+    ----------
+    model_fn : function
+        DenseNet builder from the zoo, for example `makizoo.backbones.densenet.DenseNet169`.
+    weights : dict
+        Trained weights of the model, see `makizoo.ir.weights`.
+    layer_ratio : float
+        Fraction of the dense layers of every DenseNetBlock which are removed.
+    channel_ratio : float
+        Fraction of the channels of every remaining dense layer which are removed.
+    image_size : int
+        Size of the input image.
+    channel_multiple : int
+        Number of the kept channels is rounded up to the multiple of this value.
+    min_layers : int
+        Minimum number of the dense layers which are kept in every DenseNetBlock.
+    measure_latency : bool
+        Measure latency of both models with TensorFlow in addition to FLOPs.
+    kwargs : dict
+        Other arguments of the `model_fn`.
+
+    Returns
+    -------
+    PrunedModel
+
+    """
+    arch = trace(model_fn, input_shape=[1, image_size, image_size, 3], **kwargs)
+    return prune_densenet_arch(
+        arch, weights, layer_ratio=layer_ratio, channel_ratio=channel_ratio, channel_multiple=channel_multiple,
+        min_layers=min_layers, measure_latency=measure_latency
+    )
@@ -0,0 +1,189 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Cost of the pruned model compared with the original one.
+
+"""
+
+import time
+
+import numpy as np
+
+from makizoo.ir import ArchitectureIR
+from makizoo.analysis import profile_arch
+from makizoo.quantize.report import SessionRunner
+
+
+def measure_latency(arch: ArchitectureIR, weights, iterations=50, warmup=5):
+    """
+    Median time (in seconds) of the inference of one random batch with raw TensorFlow ops of the IR.
+    Unknown batch size of the input is replaced with 1.
+
+    """
+    shape = [1 if dim is None else dim for dim in arch.get_shape(arch.inputs[0])]
+    sample = np.random.RandomState(0).normal(size=shape).astype(np.float32)
+
+    runner = SessionRunner(arch, weights)
+    try:
+        for _ in range(warmup):
+            runner(sample)
+
+        times = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            runner(sample)
+            times.append(time.perf_counter() - start)
+    finally:
+        runner.close()
+    return float(np.median(times))
+
+
+class PruningReport:
+    """
+    Cost of the model before and after pruning.
+
+    Attributes
+    ----------
+    original : ModelProfile
+        Profile of the original model.
+    pruned : ModelProfile
+        Profile of the pruned model.
+    channels : dict
+        Mapping from the name of the pruned convolution to (original number of channels, kept number of channels).
+    original_latency : float
+        Median latency of the original model in seconds, None if it was not measured.
+    pruned_latency : float
+        Median latency of the pruned model in seconds, None if it was not measured.
+
+    """
+    def __init__(self, original, pruned, channels, original_latency=None, pruned_latency=None):
+        self.original = original
+        self.pruned = pruned
+        self.channels = channels
+        self.original_latency = original_latency
+        self.pruned_latency = pruned_latency
+
+    @property
+    def macs_delta(self):
+        return self.pruned.macs - self.original.macs
+
+    @property
+    def flops_delta(self):
+        return self.pruned.flops - self.original.flops
+
+    @property
+    def params_delta(self):
+        return self.pruned.params - self.original.params
+
+    @property
+    def macs_ratio(self):
+        return self.pruned.macs / self.original.macs
+
+    @property
+    def latency_delta(self):
+        if self.original_latency is None or self.pruned_latency is None:
+            return None
+        return self.pruned_latency - self.original_latency
+
+    def to_dict(self):
+        return {
+            'original_macs': self.original.macs,
+            'pruned_macs': self.pruned.macs,
+            'flops_delta': self.flops_delta,
+            'original_params': self.original.params,
+            'pruned_params': self.pruned.params,
+            'original_latency': self.original_latency,
+            'pruned_latency': self.pruned_latency,
+            'channels': {name: list(counts) for name, counts in self.channels.items()},
+        }
+
+    def summary(self, by_layers=False):
+        """
+        Return table (as string) with the cost of both models
+        (and the number of channels of every pruned convolution if `by_layers` is True).
+
+        """
+        lines = [
+            f'{"":<10} | {"original":>12} | {"pruned":>12} | {"ratio":>7}',
+            '-' * 50,
+            f'{"MMACs":<10} | {self.original.macs / 1e6:12.2f} | {self.pruned.macs / 1e6:12.2f} | '
+            f'{self.macs_ratio:7.3f}',
+            f'{"params":<10} | {self.original.params:12d} | {self.pruned.params:12d} | '
+            f'{self.pruned.params / self.original.params:7.3f}',
+        ]
+        if self.latency_delta is not None:
+            lines.append(
+                f'{"ms":<10} | {self.original_latency * 1e3:12.2f} | {self.pruned_latency * 1e3:12.2f} | '
+                f'{self.pruned_latency / self.original_latency:7.3f}'
+            )
+
+        if by_layers and self.channels:
+            name_width = max(len(name) for name in self.channels)
+            lines += ['', f'{"layer":<{name_width}} | {"channels":>8} | {"kept":>8}', '-' * (name_width + 22)]
+            for name, (num_channels, num_keep) in self.channels.items():
+                lines.append(f'{name:<{name_width}} | {num_channels:8d} | {num_keep:8d}')
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return (
+            f'PruningReport(GMACs={self.original.macs / 1e9:.3f}->{self.pruned.macs / 1e9:.3f}, '
+            f'params={self.original.params}->{self.pruned.params})'
+        )
+
+
+def pruning_report(original_arch, pruned_arch, keep, original_weights=None, pruned_weights=None, iterations=50):
+    """
+    Compare cost of the original and pruned IR.
+    Latency is measured only if both `original_weights` and `pruned_weights` are given.
+
+    Parameters
+    ----------
+    original_arch : ArchitectureIR
+        IR of the original model.
+    pruned_arch : ArchitectureIR
+        IR of the pruned model.
+    keep : dict
+        Mapping from the name of the convolution to the indices of the kept output channels.
+    original_weights : dict
+        Weights of the original model.
+    pruned_weights : dict
+        Weights of the pruned model.
+    iterations : int
+        Number of runs of every model for the latency measurement.
+
+    Returns
+    -------
+    PruningReport
+
+    """
+    channels = {
+        layer_name: (original_arch.get_layer(layer_name).out_f, len(channels))
+        for layer_name, channels in keep.items()
+    }
+    original_latency = pruned_latency = None
+    if original_weights is not None and pruned_weights is not None:
+        original_latency = measure_latency(original_arch, original_weights, iterations)
+        pruned_latency = measure_latency(pruned_arch, pruned_weights, iterations)
+
+    return PruningReport(
+        original=profile_arch(original_arch, name='original'),
+        pruned=profile_arch(pruned_arch, name='pruned'),
+        channels=channels,
+        original_latency=original_latency,
+        pruned_latency=pruned_latency,
+    )
@@ -0,0 +1,31 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+from .pipeline import quantize_model, quantize_arch, QuantizedModel
+from .calibration import (
+    calibrate, adjust_ranges, take_samples, shared_range_groups, RangeObserver, SAME_RANGE_LAYERS, ACTIVATION_RANGES
+)
+from .qparams import (
+    quantize_weights, fake_quantize_weights, weight_quantization_errors, quantize_array, dequantize_array,
+    activation_qparams, quantize_bias, weight_channel_axes
+)
+from .simulation import build_fake_quant_graph, fused_with_activation
+from .tflite import convert_to_tflite, TFLiteRunner
+from .report import quantization_report, evaluate, QuantizationReport, SessionRunner
+from .qat import quantize_aware_model, build_qat_graph, fake_quant_weights, QATModel
+from .sensitivity import (
+    SensitivityAnalyzer, SensitivityReport, LayerSensitivity, MixedPrecisionPlan, output_drift
+)
@@ -0,0 +1,212 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Calibration of the activation ranges: the float model is run over the calibration samples
+and min/max of every tensor of the IR is collected.
+
+"""
+
+import numpy as np
+
+from makizoo.ir import ArchitectureIR, build_tf_graph
+
+
+# Output of these layers must have the same quantization parameters as the input (int8 spec of TFLite)
+SAME_RANGE_LAYERS = (
+    'ZeroPaddingLayer', 'MaxPoolLayer', 'AvgPoolLayer', 'ChannelSplitLayer', 'ChannelShuffleLayer',
+    'DropoutLayer', 'ReshapeLayer', 'FlattenLayer',
+)
+
+# Fixed output range of the activations which are bounded from both sides
+ACTIVATION_RANGES = {
+    'relu6': (0.0, 6.0),
+}
+
+
+def take_samples(dataset, num_samples):
+    """
+    Collect `num_samples` inputs from the `dataset`.
+
+    Parameters
+    ----------
+    dataset : iterable
+        Yields batches of inputs (np.ndarray) or pairs (inputs, labels).
+    num_samples : int
+        Number of samples, the whole dataset is used if None.
+
+    Returns
+    -------
+    np.ndarray
+        Array of samples [num_samples, ...].
+
+    """
+    samples = []
+    collected = 0
+    for batch in dataset:
+        if isinstance(batch, (list, tuple)):
+            batch = batch[0]
+        batch = np.asarray(batch, dtype=np.float32)
+        samples.append(batch)
+        collected += len(batch)
+        if num_samples is not None and collected >= num_samples:
+            break
+
+    if len(samples) == 0:
+        raise ValueError('Calibration dataset is empty.')
+    samples = np.concatenate(samples)
+    return samples if num_samples is None else samples[:num_samples]
+
+
+def iterate_batches(samples, batch_size):
+    for start in range(0, len(samples), batch_size):
+        yield samples[start: start + batch_size]
+
+
+class RangeObserver:
+    """
+    Accumulate min and max of the tensors over the calibration batches.
+
+    """
+    def __init__(self):
+        self._ranges = {}
+
+    def update(self, tensor_name, value):
+        min_value, max_value = float(np.min(value)), float(np.max(value))
+        if tensor_name in self._ranges:
+            old_min, old_max = self._ranges[tensor_name]
+            min_value, max_value = min(min_value, old_min), max(max_value, old_max)
+        self._ranges[tensor_name] = (min_value, max_value)
+
+    def get_ranges(self):
+        return dict(self._ranges)
+
+
+def _batch_size(arch: ArchitectureIR):
+    return arch.get_shape(arch.inputs[0])[0]
+
+
+def calibrate(arch: ArchitectureIR, weights, samples, batch_size=None):
+    """
+    Run float model over the calibration `samples` and collect ranges of all tensors of the IR.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model (usually with folded batch normalization).
+    weights : dict
+        Weights of the model, see `makizoo.ir.weights`.
+    samples : np.ndarray
+        Calibration samples, for example from `take_samples`. A few hundred samples are usually enough.
+    batch_size : int
+        Batch size of the runs, by default batch size of the IR input is used (or 32 if it is unknown).
+
+    Returns
+    -------
+    dict
+        {tensor_name: (min, max)}, raw ranges, see `adjust_ranges`.
+
+    """
+    import tensorflow.compat.v1 as tf
+
+    if batch_size is None:
+        batch_size = _batch_size(arch) or 32
+
+    observer = RangeObserver()
+    graph = tf.Graph()
+    with graph.as_default():
+        tensors = build_tf_graph(arch, weights)
+        input_tensor = tensors[arch.inputs[0]]
+        with tf.Session(graph=graph) as sess:
+            for batch in iterate_batches(samples, batch_size):
+                if len(batch) != batch_size and _batch_size(arch) is not None:
+                    # Static batch size of the IR, the rest of samples is skipped
+                    break
+                values = sess.run(tensors, feed_dict={input_tensor: batch})
+                for tensor_name, value in values.items():
+                    observer.update(tensor_name, value)
+    return observer.get_ranges()
+
+
+def _find(parents, tensor_name):
+    while parents[tensor_name] != tensor_name:
+        parents[tensor_name] = parents[parents[tensor_name]]
+        tensor_name = parents[tensor_name]
+    return tensor_name
+
+
+def shared_range_groups(arch: ArchitectureIR):
+    """
+    Split tensors of the IR into groups which must have the same quantization parameters:
+    input and outputs of padding, pooling, split, shuffle and reshape layers, inputs and output of the concat.
+
+    Returns
+    -------
+    list
+        List of groups (lists of tensor names), tensors without constraints are not included.
+
+    """
+    parents = {}
+    for spec in arch.layers:
+        for tensor_name in spec.inputs + spec.outputs:
+            parents.setdefault(tensor_name, tensor_name)
+
+        if spec.type in SAME_RANGE_LAYERS or spec.type == 'ConcatLayer':
+            root = _find(parents, spec.outputs[0])
+            for tensor_name in spec.inputs + spec.outputs[1:]:
+                parents[_find(parents, tensor_name)] = root
+
+    groups = {}
+    for tensor_name in parents:
+        groups.setdefault(_find(parents, tensor_name), []).append(tensor_name)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def adjust_ranges(arch: ArchitectureIR, ranges):
+    """
+    Adjust calibrated ranges to the int8 quantization scheme:
+    - every range contains zero;
+    - outputs of relu6 have the fixed range [0, 6] and outputs of relu start at zero;
+    - tensors from `shared_range_groups` get the union of ranges of their group
+      (for example, all inputs of the concat and its output have the same range).
+
+    Returns
+    -------
+    dict
+        New ranges {tensor_name: (min, max)}.
+
+    """
+    ranges = {
+        tensor_name: (min(min_value, 0.0), max(max_value, 0.0))
+        for tensor_name, (min_value, max_value) in ranges.items()
+    }
+
+    for spec in arch.layers:
+        if spec.activation in ACTIVATION_RANGES:
+            for tensor_name in spec.outputs:
+                ranges[tensor_name] = ACTIVATION_RANGES[spec.activation]
+        elif spec.activation == 'relu':
+            for tensor_name in spec.outputs:
+                ranges[tensor_name] = (0.0, ranges[tensor_name][1])
+
+    for group in shared_range_groups(arch):
+        group_range = (
+            min(ranges[tensor_name][0] for tensor_name in group),
+            max(ranges[tensor_name][1] for tensor_name in group),
+        )
+        for tensor_name in group:
+            ranges[tensor_name] = group_range
+    return ranges
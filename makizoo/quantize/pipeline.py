@@ -0,0 +1,171 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Post-training int8 quantization of the zoo models:
+trace -> fold batch normalization -> calibrate activation ranges -> quantize weights -> convert into TFLite.
+The int8 TFLite model is converted from the simulated int8 graph, so it uses exactly the adjusted ranges
+and the quantized weights of the `QuantizedModel` (the converter does not calibrate again).
+
+"""
+
+from makizoo.ir import ArchitectureIR, trace
+from makizoo.transforms import fold_batchnorm, batchnorm_to_depthwise
+from .calibration import take_samples, calibrate, adjust_ranges
+from .qparams import quantize_weights, weight_quantization_errors, NUM_BITS
+from .tflite import convert_to_tflite
+from .report import SessionRunner, quantization_report
+
+
+DEFAULT_NUM_SAMPLES = 300
+
+
+class QuantizedModel:
+    """
+    Result of the `quantize_model`.
+
+    Attributes
+    ----------
+    arch : ArchitectureIR
+        IR of the model with folded batch normalization.
+    weights : dict
+        Float weights of the `arch`.
+    ranges : dict
+        Adjusted ranges of all tensors of the `arch` {tensor_name: (min, max)}.
+    quantized_weights : dict
+        Int8 kernels and int32 biases with their scales, see `makizoo.quantize.quantize_weights`.
+    weight_errors : dict
+        Relative quantization error of the kernel of every layer.
+    float_model : bytes
+        Float32 TFLite model.
+    int8_model : bytes
+        Int8 TFLite model with `ranges` of the activations and kernels quantized as in `quantized_weights`.
+    per_channel : bool
+        Kernels are quantized per channel.
+
+    """
+    def __init__(self, arch, weights, ranges, quantized_weights, weight_errors, float_model, int8_model, per_channel):
+        self.arch = arch
+        self.weights = weights
+        self.ranges = ranges
+        self.quantized_weights = quantized_weights
+        self.weight_errors = weight_errors
+        self.float_model = float_model
+        self.int8_model = int8_model
+        self.per_channel = per_channel
+
+    def save(self, path):
+        """
+        Save int8 TFLite model into file `path`.
+
+        """
+        with open(path, 'wb') as f:
+            f.write(self.int8_model)
+
+    def worst_layers(self, count=5):
+        """
+        Names and errors of the `count` layers with the largest weight quantization error.
+
+        """
+        return sorted(self.weight_errors.items(), key=lambda item: item[1], reverse=True)[:count]
+
+    def report(self, dataset, max_samples=None, num_threads=None, simulate=True):
+        """
+        Compare accuracy and latency of the int8 model against the float32 model on the `dataset`,
+        see `makizoo.quantize.quantization_report`.
+
+        """
+        simulated_runner = None
+        if simulate:
+            simulated_runner = SessionRunner(self.arch, self.weights, self.ranges, self.per_channel)
+        try:
+            return quantization_report(
+                self.float_model, self.int8_model, dataset, max_samples=max_samples,
+                num_threads=num_threads, simulated_runner=simulated_runner
+            )
+        finally:
+            if simulated_runner is not None:
+                simulated_runner.close()
+
+
+def quantize_arch(arch: ArchitectureIR, weights, samples, per_channel=True, int8_io=False, ranges=None):
+    """
+    Quantize IR with weights, see `quantize_model`.
+    Activation `ranges` are calibrated on the `samples` if they are not given
+    (for example, ranges of the quantization-aware training, see `QATModel.export_ranges`),
+    otherwise `samples` are not used.
+
+    """
+    arch, weights = fold_batchnorm(arch, weights)
+    # Names of the tensors are kept, so the given ranges are still valid
+    arch, weights = batchnorm_to_depthwise(arch, weights, fuse_activation=False)
+    if ranges is None:
+        ranges = calibrate(arch, weights, samples)
+    ranges = adjust_ranges(arch, ranges)
+    return QuantizedModel(
+        arch=arch,
+        weights=weights,
+        ranges=ranges,
+        quantized_weights=quantize_weights(arch, weights, per_channel, NUM_BITS, ranges=ranges),
+        weight_errors=weight_quantization_errors(arch, weights, per_channel),
+        float_model=convert_to_tflite(arch, weights),
+        int8_model=convert_to_tflite(arch, weights, int8_io=int8_io, ranges=ranges, per_channel=per_channel),
+        per_channel=per_channel,
+    )
+
+
+def quantize_model(
+        model_fn, weights, calibration_dataset, image_size=224, num_samples=DEFAULT_NUM_SAMPLES,
+        per_channel=True, int8_io=False, **kwargs):
+    """
+    Post-training int8 quantization of the zoo model.
+
+    Parameters
+    ----------
+    model_fn : function
+        Any model from the zoo, for example `ResNet50` or `MobileNetV2_1_0`.
+    weights : dict
+        Trained weights of the model, see `makizoo.ir.weights`.
+        Weights of the trained MakiFlow model are read by `makizoo.ir.weights.read_weights`.
+    calibration_dataset : iterable
+        Yields batches of the preprocessed images or pairs (images, labels).
+    image_size : int
+        Height and width of the input images.
+    num_samples : int
+        Number of calibration samples.
+    per_channel : bool
+        Quantize kernels per output channel (recommended, especially for models with depthwise convolutions).
+    int8_io : bool
+        Inputs and outputs of the TFLite model are int8.
+    kwargs : dict
+        Other arguments of `model_fn`, for example `include_top=True`.
+
+    Returns
+    -------
+    QuantizedModel
+
+    Examples
+    --------
+    >>> from makizoo.backbones.mobilenetv2 import MobileNetV2_1_0
+    >>> weights = load_weights('mobilenetv2.npz')
+    >>> quantized = quantize_model(MobileNetV2_1_0, weights, calibration_images, include_top=True)
+    >>> quantized.save('mobilenetv2_int8.tflite')
+    >>> print(quantized.report(lambda: validation_batches(), max_samples=1000).summary())
+
+    """
+    arch = trace(model_fn, input_shape=[1, image_size, image_size, 3], **kwargs)
+    samples = take_samples(calibration_dataset, num_samples)
+    return quantize_arch(arch, weights, samples, per_channel=per_channel, int8_io=int8_io)
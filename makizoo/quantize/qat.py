@@ -0,0 +1,457 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Quantization-aware training (QAT) of the zoo models.
+Training graph is built from the IR with raw TensorFlow ops (MakiFlow layers can not hold fake quantization):
+- kernels are fake-quantized in the folded form W * gamma / sigma for chains Conv -> BN (-> Activation),
+  so the trained network is exactly the network of the int8 inference path after `fold_batchnorm`;
+  during training batch statistics are used with the correction of Krishnamoorthi (2018):
+  y = conv(x, fq(W * gamma / sigma)) * sigma / sigma_B + beta + gamma * (b - mean_B) / sigma_B;
+- every activation is fake-quantized with the range which is the moving average of its batch min/max,
+  initialized from the calibrated ranges; relu6 keeps the fixed range [0, 6];
+- tensors which are consumed only by the activation layer are not quantized (the activation is fused).
+Trained weights are exported in the format of `makizoo.ir.weights` and go directly into `quantize_arch`
+together with the trained ranges, i.e. the int8 model is converted with these ranges without calibration.
+
+"""
+
+import copy
+
+import numpy as np
+
+from makizoo.ir import ArchitectureIR, trace, layer_ops, channel_axis, spatial_axes
+from makizoo.ir.layout import spec_data_format
+from makizoo.transforms import find_batchnorm_chains, remove_dropout
+from makizoo.transforms.batchnorm_folding import BATCHNORM_DEFAULT_EPS
+from .calibration import take_samples, calibrate, adjust_ranges, shared_range_groups, ACTIVATION_RANGES
+from .qparams import weight_channel_axes, WEIGHT_LAYERS, NUM_BITS
+from .simulation import fused_with_activation
+from .pipeline import quantize_arch, DEFAULT_NUM_SAMPLES
+
+
+# Decay of the moving averages of the activation ranges
+RANGE_DECAY = 0.999
+# Default decay of the MakiFlow BatchNormLayer
+BATCHNORM_DEFAULT_DECAY = 0.9
+
+
+def _per_channel(value, data_format, ndim):
+    # Reshape vector of the channel parameters so that it is broadcasted along the channel axis
+    if ndim != 4 or channel_axis(data_format) == ndim - 1:
+        return value
+    import tensorflow.compat.v1 as tf
+    return tf.reshape(value, [1, -1, 1, 1])
+
+
+def _reduce_axes(data_format, ndim):
+    if ndim != 4:
+        return list(range(ndim - 1))
+    return [0] + list(spatial_axes(data_format))
+
+
+def _without_bias(spec):
+    spec = copy.copy(spec)
+    spec.kwargs = dict(spec.kwargs, use_bias=False)
+    return spec
+
+
+def fake_quant_weights(spec, W, per_channel=True, num_bits=NUM_BITS):
+    """
+    Symmetric fake quantization of the kernel `W` (tensor) of the layer `spec`, see `makizoo.quantize.quantize_array`.
+
+    """
+    import tensorflow.compat.v1 as tf
+
+    if not per_channel:
+        max_abs = tf.stop_gradient(tf.reduce_max(tf.abs(W)))
+        return tf.quantization.fake_quant_with_min_max_vars(
+            W, -max_abs, max_abs, num_bits=num_bits, narrow_range=True
+        )
+
+    shape = W.get_shape().as_list()
+    channel_axes = weight_channel_axes(spec)
+    # Per-channel fake quantization works with the last axis, depthwise kernel [kh, kw, in_f, multiplier]
+    # is reshaped so that its output channels are the last axis
+    flat_W = tf.reshape(W, shape[:channel_axes[0]] + [-1])
+    max_abs = tf.stop_gradient(tf.reduce_max(tf.abs(flat_W), axis=list(range(channel_axes[0]))))
+    flat_W = tf.quantization.fake_quant_with_min_max_vars_per_channel(
+        flat_W, -max_abs, max_abs, num_bits=num_bits, narrow_range=True
+    )
+    return tf.reshape(flat_W, shape)
+
+
+class QATModel:
+    """
+    Graph of the quantization-aware training, result of the `build_qat_graph`.
+
+    Attributes
+    ----------
+    arch : ArchitectureIR
+        IR of the model (without dropout).
+    tensors : dict
+        Mapping from the name of the tensor in IR to the tensor of the training graph
+        (inputs of the model are mapped to their fake-quantized values).
+    input_tensors : dict
+        Mapping from the name of the input of IR to the tensor which is fed (placeholder by default).
+    training : tf.Tensor
+        Boolean placeholder (True by default): use batch statistics of the batch normalization.
+        Feed False for evaluation.
+    freeze_batchnorm : tf.Tensor
+        Boolean placeholder (False by default): use moving statistics in the folded convolutions during training,
+        usually it is set to True for the last epochs.
+    update_ops : list
+        Updates of the moving statistics and activation ranges, they are added into
+        tf.GraphKeys.UPDATE_OPS too and must be run with every training step.
+    samples : np.ndarray
+        Calibration samples of the initial activation ranges.
+
+    """
+    def __init__(self, arch, tensors, input_tensors, training, freeze_batchnorm, update_ops, variables,
+                 range_variables, chains, samples=None, per_channel=True):
+        self.arch = arch
+        self.tensors = tensors
+        self.input_tensors = input_tensors
+        self.training = training
+        self.freeze_batchnorm = freeze_batchnorm
+        self.update_ops = update_ops
+        self.samples = samples
+        self.per_channel = per_channel
+        self._variables = variables
+        self._range_variables = range_variables
+        self._chains = chains
+
+    @property
+    def inputs(self):
+        return [self.input_tensors[tensor_name] for tensor_name in self.arch.inputs]
+
+    @property
+    def outputs(self):
+        return [self.tensors[tensor_name] for tensor_name in self.arch.outputs]
+
+    def get_variables(self):
+        return [variable for params in self._variables.values() for variable in params.values()]
+
+    def export_weights(self, sess):
+        """
+        Return trained weights in the format of `makizoo.ir.weights` for `arch` (batch normalization is not folded).
+
+        """
+        values = sess.run(self._variables)
+        return {
+            layer_name: {param_name: np.asarray(value) for param_name, value in params.items()}
+            for layer_name, params in values.items()
+        }
+
+    def export_ranges(self, sess):
+        """
+        Return trained activation ranges {tensor_name: (min, max)}.
+        Output of the folded convolution gets the range of the end of its chain,
+        so ranges are valid for the IR after `fold_batchnorm` too.
+
+        """
+        values = sess.run(self._range_variables)
+        ranges = {
+            tensor_name: (float(min_value), float(max_value))
+            for tensor_name, (min_value, max_value) in values.items()
+        }
+        for conv_spec, bn_spec, activation_spec in self._chains:
+            chain_end = activation_spec if activation_spec is not None else bn_spec
+            ranges[conv_spec.outputs[0]] = ranges[chain_end.outputs[0]]
+        return ranges
+
+    def export(self, sess, int8_io=False):
+        """
+        Convert trained model into int8 with the trained activation ranges (see `export_ranges`),
+        the converter does not calibrate. See `makizoo.quantize.quantize_arch`.
+
+        Returns
+        -------
+        QuantizedModel
+
+        """
+        return quantize_arch(
+            self.arch, self.export_weights(sess), samples=None,
+            per_channel=self.per_channel, int8_io=int8_io, ranges=self.export_ranges(sess)
+        )
+
+
+def build_qat_graph(
+        arch: ArchitectureIR, weights, ranges, per_channel=True, num_bits=NUM_BITS, range_decay=RANGE_DECAY,
+        inputs=None):
+    """
+    Create quantization-aware training graph of the IR in the default graph.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model, batch normalization must not be folded.
+    weights : dict
+        Initial (pretrained) weights of the model, see `makizoo.ir.weights`.
+    ranges : dict
+        Initial activation ranges, see `makizoo.quantize.calibrate` and `makizoo.quantize.adjust_ranges`.
+    per_channel : bool
+        Fake-quantize kernels per output channel.
+    num_bits : int
+        Number of bits.
+    range_decay : float
+        Decay of the moving averages of the activation ranges.
+    inputs : dict
+        Input tensors, placeholders are created for missing ones.
+
+    Returns
+    -------
+    QATModel
+
+    """
+    import tensorflow.compat.v1 as tf
+
+    arch = remove_dropout(arch)
+    if inputs is None:
+        inputs = {}
+
+    training = tf.placeholder_with_default(True, shape=[], name='training')
+    freeze_batchnorm = tf.placeholder_with_default(False, shape=[], name='freeze_batchnorm')
+    use_batch_stats = tf.logical_and(training, tf.logical_not(freeze_batchnorm))
+
+    chains = find_batchnorm_chains(arch)
+    conv2chain = {
+        conv_spec.name: (conv_spec, bn_spec, activation_spec) for conv_spec, bn_spec, activation_spec in chains
+    }
+    folded_bn = set(bn_spec.name for _, bn_spec, _ in chains)
+
+    # Tensors with the same quantization parameters share range variables
+    range_keys = {}
+    for group in shared_range_groups(arch):
+        for tensor_name in group:
+            range_keys[tensor_name] = group[0]
+    fixed = {
+        tensor_name: ACTIVATION_RANGES[spec.activation]
+        for spec in arch.layers if spec.activation in ACTIVATION_RANGES for tensor_name in spec.outputs
+    }
+
+    variables = {}
+    update_ops = []
+    range_variables = {}
+    raw_tensors = {}
+
+    def variable(layer_name, param_name, value, trainable=True):
+        var = tf.Variable(np.asarray(value, dtype=np.float32), name=param_name, trainable=trainable)
+        variables.setdefault(layer_name, {})[param_name] = var
+        return var
+
+    def moving_average(var, value, decay):
+        update = tf.assign_sub(var, (1.0 - decay) * (var - value))
+        update_ops.append(update)
+        tf.add_to_collection(tf.GraphKeys.UPDATE_OPS, update)
+
+    def batchnorm_variables(bn_spec):
+        bn_weights = weights[bn_spec.name]
+        mean = np.asarray(bn_weights['mean'])
+        return (
+            variable(bn_spec.name, 'mean', mean, trainable=False),
+            variable(bn_spec.name, 'var', bn_weights['var'], trainable=False),
+            variable(bn_spec.name, 'gamma', bn_weights['gamma'])
+            if bn_spec.kwargs.get('use_gamma', True) else tf.ones_like(mean),
+            variable(bn_spec.name, 'beta', bn_weights['beta'])
+            if bn_spec.kwargs.get('use_beta', True) else tf.zeros_like(mean),
+        )
+
+    def batch_moments(bn_spec, x, moving_mean, moving_var, shift=0.0):
+        batch_mean, batch_var = tf.nn.moments(x, axes=_reduce_axes(spec_data_format(bn_spec), len(x.get_shape())))
+        batch_mean = batch_mean + shift
+        decay = bn_spec.kwargs.get('decay', BATCHNORM_DEFAULT_DECAY)
+        moving_average(moving_mean, batch_mean, decay)
+        moving_average(moving_var, batch_var, decay)
+        return batch_mean, batch_var
+
+    def folded_conv(conv_spec, bn_spec, x):
+        data_format = spec_data_format(conv_spec)
+        W = variable(conv_spec.name, 'W', weights[conv_spec.name]['W'])
+        if conv_spec.kwargs.get('use_bias', True):
+            b = variable(conv_spec.name, 'b', weights[conv_spec.name]['b'])
+        else:
+            b = tf.zeros([conv_spec.out_f])
+        moving_mean, moving_var, gamma, beta = batchnorm_variables(bn_spec)
+        eps = bn_spec.kwargs.get('eps', BATCHNORM_DEFAULT_EPS)
+
+        plain_spec = _without_bias(conv_spec)
+        y = layer_ops(plain_spec, [x], {'W': W})[0]
+        batch_mean, batch_var = batch_moments(bn_spec, y, moving_mean, moving_var, shift=b)
+
+        sigma = tf.sqrt(moving_var + eps)
+        scale = gamma / sigma
+        if conv_spec.type == 'DepthWiseConvLayer':
+            folded_W = W * tf.reshape(scale, W.get_shape().as_list()[2:])
+        else:
+            folded_W = W * scale
+        y = layer_ops(plain_spec, [x], {'W': fake_quant_weights(conv_spec, folded_W, per_channel, num_bits)})[0]
+
+        batch_sigma = tf.sqrt(batch_var + eps)
+        correction, mean, used_sigma = tf.cond(
+            use_batch_stats,
+            lambda: (sigma / batch_sigma, batch_mean, batch_sigma),
+            lambda: (tf.ones_like(sigma), tf.identity(moving_mean), sigma)
+        )
+        shift = beta + gamma * (b - mean) / used_sigma
+        return y * _per_channel(correction, data_format, 4) + _per_channel(shift, data_format, 4)
+
+    def batchnorm(bn_spec, x):
+        data_format = spec_data_format(bn_spec)
+        ndim = len(x.get_shape())
+        moving_mean, moving_var, gamma, beta = batchnorm_variables(bn_spec)
+        batch_mean, batch_var = batch_moments(bn_spec, x, moving_mean, moving_var)
+        mean, var = tf.cond(
+            training, lambda: (batch_mean, batch_var), lambda: (tf.identity(moving_mean), tf.identity(moving_var))
+        )
+        scale = gamma / tf.sqrt(var + bn_spec.kwargs.get('eps', BATCHNORM_DEFAULT_EPS))
+        return x * _per_channel(scale, data_format, ndim) + _per_channel(beta - mean * scale, data_format, ndim)
+
+    def quantize_output(spec, tensor_name, tensor):
+        raw_tensors[tensor_name] = tensor
+        key = range_keys.get(tensor_name, tensor_name)
+        if key not in range_variables:
+            with tf.name_scope(None):
+                min_value, max_value = ranges[key]
+                range_variables[key] = (
+                    tf.Variable(float(min_value), trainable=False, name=f'{key}_min'.replace(':', '_')),
+                    tf.Variable(float(max_value), trainable=False, name=f'{key}_max'.replace(':', '_')),
+                )
+        if fused_with_activation(arch, spec):
+            return tensor
+
+        min_var, max_var = range_variables[key]
+        return tf.quantization.fake_quant_with_min_max_vars(tensor, min_var, max_var, num_bits=num_bits)
+
+    tensors = {}
+    input_tensors = {}
+    for input_name in arch.inputs:
+        tensor = inputs.get(input_name)
+        if tensor is None:
+            tensor = tf.placeholder(tf.float32, shape=arch.get_shape(input_name), name=input_name)
+        input_tensors[input_name] = tensor
+        tensors[input_name] = quantize_output(None, input_name, tensor)
+
+    for spec in arch.layers:
+        if spec.type == 'InputLayer' or spec.name in folded_bn:
+            continue
+
+        layer_inputs = [tensors[tensor_name] for tensor_name in spec.inputs]
+        with tf.name_scope(spec.name):
+            if spec.name in conv2chain:
+                _, bn_spec, _ = conv2chain[spec.name]
+                output_spec = bn_spec
+                outputs = [folded_conv(spec, bn_spec, layer_inputs[0])]
+            elif spec.type == 'BatchNormLayer':
+                output_spec = spec
+                outputs = [batchnorm(spec, layer_inputs[0])]
+            elif spec.type in WEIGHT_LAYERS:
+                output_spec = spec
+                layer_weights = {'W': variable(spec.name, 'W', weights[spec.name]['W'])}
+                if spec.kwargs.get('use_bias', True):
+                    layer_weights['b'] = variable(spec.name, 'b', weights[spec.name]['b'])
+                layer_weights['W'] = fake_quant_weights(spec, layer_weights['W'], per_channel, num_bits)
+                outputs = layer_ops(spec, layer_inputs, layer_weights)
+            else:
+                output_spec = spec
+                outputs = layer_ops(spec, layer_inputs, weights.get(spec.name))
+
+            for tensor_name, tensor in zip(output_spec.outputs, outputs):
+                tensors[tensor_name] = quantize_output(output_spec, tensor_name, tensor)
+
+    def batch_range(tensor_name):
+        # Tensors with the fixed range contribute the whole range, as in `adjust_ranges`
+        if tensor_name in fixed:
+            return tuple(tf.constant(value, tf.float32) for value in fixed[tensor_name])
+        return tf.reduce_min(raw_tensors[tensor_name]), tf.reduce_max(raw_tensors[tensor_name])
+
+    # Moving averages of the ranges, tensors of one group update the same range by their union
+    members = {}
+    for tensor_name, tensor in raw_tensors.items():
+        members.setdefault(range_keys.get(tensor_name, tensor_name), []).append(tensor_name)
+    for key, tensor_names in members.items():
+        if all(tensor_name in fixed for tensor_name in tensor_names):
+            continue
+        min_var, max_var = range_variables[key]
+        batch_ranges = [batch_range(tensor_name) for tensor_name in tensor_names]
+        batch_min = tf.reduce_min([min_value for min_value, _ in batch_ranges])
+        batch_max = tf.reduce_max([max_value for _, max_value in batch_ranges])
+        # Range must contain zero
+        moving_average(min_var, tf.minimum(batch_min, 0.0), range_decay)
+        moving_average(max_var, tf.maximum(batch_max, 0.0), range_decay)
+
+    return QATModel(
+        arch=arch,
+        tensors=tensors,
+        input_tensors=input_tensors,
+        training=training,
+        freeze_batchnorm=freeze_batchnorm,
+        update_ops=update_ops,
+        variables=variables,
+        range_variables={tensor_name: range_variables[range_keys.get(tensor_name, tensor_name)]
+                         for tensor_name in raw_tensors},
+        chains=chains,
+        per_channel=per_channel,
+    )
+
+
+def quantize_aware_model(
+        model_fn, weights, calibration_dataset, image_size=224, num_samples=DEFAULT_NUM_SAMPLES,
+        per_channel=True, **kwargs):
+    """
+    Trace the zoo model and create its quantization-aware training graph in the default graph.
+    Initial activation ranges are calibrated on the `calibration_dataset` with pretrained `weights`.
+
+    Parameters
+    ----------
+    model_fn : function
+        Any model from the zoo, for example `MobileNetV2_0_75` or `ShuffleNetV2_05`.
+    weights : dict
+        Pretrained float weights of the model, see `makizoo.ir.weights`.
+    calibration_dataset : iterable
+        Yields batches of the preprocessed images or pairs (images, labels).
+    image_size : int
+        Height and width of the input images.
+    num_samples : int
+        Number of calibration samples.
+    per_channel : bool
+        Fake-quantize kernels per output channel.
+    kwargs : dict
+        Other arguments of `model_fn`, for example `include_top=True`.
+
+    Returns
+    -------
+    QATModel
+        Batch size of the graph is not fixed.
+
+    Examples
+    --------
+    >>> qat = quantize_aware_model(MobileNetV2_0_75, weights, calibration_images, include_top=True)
+    >>> labels = tf.placeholder(tf.int32, [None])
+    >>> loss = tf.losses.sparse_softmax_cross_entropy(labels, qat.outputs[0])
+    >>> with tf.control_dependencies(qat.update_ops):
+    ...     train_op = tf.train.MomentumOptimizer(1e-4, 0.9).minimize(loss)
+    >>> # ... training, feed {qat.training: False} for evaluation ...
+    >>> quantized = qat.export(sess)
+    >>> quantized.save('mobilenetv2_0_75_qat_int8.tflite')
+
+    """
+    arch = trace(model_fn, input_shape=[None, image_size, image_size, 3], **kwargs)
+    samples = take_samples(calibration_dataset, num_samples)
+    ranges = adjust_ranges(arch, calibrate(arch, weights, samples))
+    qat = build_qat_graph(arch, weights, ranges, per_channel=per_channel)
+    qat.samples = samples
+    return qat
@@ -0,0 +1,205 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Quantization parameters of the weights and activations (numpy only, no tensorflow session is required).
+Scheme is the same as in TFLite int8:
+- weights are quantized symmetrically into [-127, 127], per output channel or per tensor;
+  for DepthWiseConvLayer the output channel is the pair (input channel, multiplier index);
+- activations are quantized asymmetrically into [-128, 127] per tensor, range always contains zero;
+- biases are quantized into int32 with scale input_scale * weight_scale.
+
+"""
+
+import numpy as np
+
+
+NUM_BITS = 8
+INT8_MIN = -128
+INT8_MAX = 127
+INT32_MIN = -2 ** 31
+INT32_MAX = 2 ** 31 - 1
+
+WEIGHT_LAYERS = ('ConvLayer', 'AtrousConvLayer', 'DepthWiseConvLayer', 'DenseLayer')
+
+
+def weight_channel_axes(spec):
+    """
+    Axes of the kernel which index output channels of the layer.
+    Kernel of the DepthWiseConvLayer has shape [kh, kw, in_f, multiplier], its output channels are
+    indexed by the last two axes, so per-channel scales have shape [in_f, multiplier].
+
+    """
+    if spec.type == 'DepthWiseConvLayer':
+        return (2, 3)
+    if spec.type in ('ConvLayer', 'AtrousConvLayer'):
+        return (3,)
+    if spec.type == 'DenseLayer':
+        return (1,)
+    raise ValueError(f'Layer type {spec.type} does not have weights which can be quantized.')
+
+
+def quantize_array(x, channel_axes=(), num_bits=NUM_BITS):
+    """
+    Symmetric quantization of the `x`, separate scale is used for every index of `channel_axes`.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        Float array.
+    channel_axes : tuple
+        Axes with separate scales, empty tuple for per-tensor quantization.
+    num_bits : int
+        Number of bits, values are quantized into [-(2^(num_bits-1) - 1), 2^(num_bits-1) - 1].
+
+    Returns
+    -------
+    q : np.ndarray
+        Quantized values (int8 for 8 bits, int32 otherwise).
+    scale : np.ndarray
+        Scales which are broadcastable to `x` (size 1 along reduced axes), x ~ q * scale.
+
+    """
+    x = np.asarray(x, dtype=np.float32)
+    qmax = 2 ** (num_bits - 1) - 1
+    reduce_axes = tuple(axis for axis in range(x.ndim) if axis not in channel_axes)
+    max_abs = np.max(np.abs(x), axis=reduce_axes, keepdims=True)
+    # Channels with all zero weights (for example, pruned ones) get unit scale
+    scale = np.where(max_abs > 0, max_abs / qmax, 1.0).astype(np.float32)
+    q = np.clip(np.round(x / scale), -qmax, qmax)
+    return q.astype(np.int8 if num_bits <= 8 else np.int32), scale
+
+
+def dequantize_array(q, scale):
+    return q.astype(np.float32) * scale
+
+
+def fake_quantize_array(x, channel_axes=(), num_bits=NUM_BITS):
+    """
+    Quantize and dequantize `x`, i.e. return float values which are representable after quantization.
+
+    """
+    return dequantize_array(*quantize_array(x, channel_axes, num_bits))
+
+
+def quantize_weights(arch, weights, per_channel=True, num_bits=NUM_BITS, ranges=None):
+    """
+    Quantize kernels of all convolutions and dense layers of the IR.
+    If activation `ranges` are given, biases are quantized too.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model (usually with folded batch normalization, see `makizoo.transforms.fold_batchnorm`).
+    weights : dict
+        Weights of the model, see `makizoo.ir.weights`.
+    per_channel : bool
+        Use per-channel scales, otherwise one scale per kernel is used.
+    num_bits : int
+        Number of bits.
+    ranges : dict
+        Ranges of the activations {tensor_name: (min, max)}, see `makizoo.quantize.calibrate`.
+
+    Returns
+    -------
+    dict
+        {layer_name: {'W': quantized kernel, 'W_scale': scales}} for every layer with weights,
+        with ranges also 'b' (int32) and 'b_scale' for layers with bias.
+
+    """
+    quantized = {}
+    for spec in arch.layers:
+        if spec.type not in WEIGHT_LAYERS or spec.name not in weights:
+            continue
+
+        channel_axes = weight_channel_axes(spec) if per_channel else ()
+        q, scale = quantize_array(weights[spec.name]['W'], channel_axes, num_bits)
+        quantized[spec.name] = {'W': q, 'W_scale': scale}
+
+        if ranges is None or not spec.kwargs.get('use_bias', True):
+            continue
+        input_scale, _ = activation_qparams(*ranges[spec.inputs[0]], num_bits=num_bits)
+        b, b_scale = quantize_bias(weights[spec.name]['b'], input_scale, scale)
+        quantized[spec.name].update({'b': b, 'b_scale': b_scale})
+    return quantized
+
+
+def fake_quantize_weights(arch, weights, per_channel=True, num_bits=NUM_BITS, layers=None):
+    """
+    Return copy of the `weights` where kernels are replaced by their quantized-dequantized values
+    (only kernels of the `layers` if they are given).
+    Biases are kept in float, because int32 quantization of the biases is almost lossless.
+
+    """
+    new_weights = dict(weights)
+    for layer_name, params in quantize_weights(arch, weights, per_channel, num_bits).items():
+        if layers is not None and layer_name not in layers:
+            continue
+        new_weights[layer_name] = dict(weights[layer_name])
+        new_weights[layer_name]['W'] = dequantize_array(params['W'], params['W_scale'])
+    return new_weights
+
+
+def weight_quantization_errors(arch, weights, per_channel=True, num_bits=NUM_BITS):
+    """
+    Relative error ||W - dequantize(quantize(W))|| / ||W|| of the kernel of every layer with weights.
+    Per-tensor quantization of the depthwise kernels usually gives the largest errors,
+    because ranges of their channels differ a lot.
+
+    """
+    errors = {}
+    for spec in arch.layers:
+        if spec.type not in WEIGHT_LAYERS or spec.name not in weights:
+            continue
+
+        W = np.asarray(weights[spec.name]['W'], dtype=np.float32)
+        channel_axes = weight_channel_axes(spec) if per_channel else ()
+        error = np.linalg.norm(W - fake_quantize_array(W, channel_axes, num_bits))
+        errors[spec.name] = float(error / max(np.linalg.norm(W), np.finfo(np.float32).tiny))
+    return errors
+
+
+def activation_qparams(min_value, max_value, num_bits=NUM_BITS):
+    """
+    Scale and zero point of the asymmetric quantization of the activation with range [min_value, max_value].
+    Range is extended to contain zero, zero point is nudged to the integer so that zero is exactly representable.
+
+    Returns
+    -------
+    scale : float
+    zero_point : int
+
+    """
+    qmin = -2 ** (num_bits - 1)
+    qmax = 2 ** (num_bits - 1) - 1
+    min_value = min(float(min_value), 0.0)
+    max_value = max(float(max_value), 0.0)
+    if max_value == min_value:
+        return 1.0, 0
+
+    scale = (max_value - min_value) / (qmax - qmin)
+    zero_point = int(np.clip(np.round(qmin - min_value / scale), qmin, qmax))
+    return scale, zero_point
+
+
+def quantize_bias(b, input_scale, weight_scale):
+    """
+    Quantize bias into int32 with scale `input_scale * weight_scale` (per-channel if `weight_scale` is an array).
+
+    """
+    scale = (input_scale * np.asarray(weight_scale, dtype=np.float64)).reshape(-1)
+    q = np.clip(np.round(np.asarray(b, dtype=np.float64) / scale), INT32_MIN, INT32_MAX)
+    return q.astype(np.int32), scale.astype(np.float32)
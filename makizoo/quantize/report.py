@@ -0,0 +1,214 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Accuracy and CPU throughput of the int8 model against the float32 model on the local dataset.
+
+"""
+
+import time
+
+import numpy as np
+
+from makizoo.ir import ArchitectureIR, build_tf_graph
+from .simulation import build_fake_quant_graph
+from .tflite import TFLiteRunner
+
+
+class SessionRunner:
+    """
+    Run IR with raw TensorFlow ops sample by sample: float model or,
+    if `ranges` are given, simulated int8 model (see `build_fake_quant_graph`).
+
+    """
+    def __init__(self, arch: ArchitectureIR, weights, ranges=None, per_channel=True):
+        import tensorflow.compat.v1 as tf
+
+        self._graph = tf.Graph()
+        with self._graph.as_default():
+            input_name = arch.inputs[0]
+            # Tensor of the input in the simulated graph is the output of its fake quantization, so placeholder is fed
+            self._input = tf.placeholder(tf.float32, shape=arch.get_shape(input_name), name=input_name)
+            if ranges is None:
+                tensors = build_tf_graph(arch, weights, inputs={input_name: self._input})
+            else:
+                tensors = build_fake_quant_graph(
+                    arch, weights, ranges, per_channel=per_channel, inputs={input_name: self._input}
+                )
+            self._output = tensors[arch.outputs[0]]
+            self._sess = tf.Session(graph=self._graph)
+
+    def __call__(self, sample):
+        return self._sess.run(self._output, feed_dict={self._input: sample})
+
+    def close(self):
+        self._sess.close()
+
+
+def _labels(labels):
+    labels = np.asarray(labels)
+    # One-hot labels
+    if labels.ndim == 2:
+        return np.argmax(labels, axis=-1)
+    return labels.reshape(-1)
+
+
+def evaluate(runner, dataset, max_samples=None):
+    """
+    Run `runner` over the dataset sample by sample.
+
+    Parameters
+    ----------
+    runner : callable
+        Function sample [1, ...] -> output [1, num_classes], for example `TFLiteRunner`.
+    dataset : iterable
+        Yields pairs (images, labels), labels are class indices or one-hot vectors.
+    max_samples : int
+        Maximum number of samples, the whole dataset is used if None.
+
+    Returns
+    -------
+    predictions : np.ndarray
+        Predicted classes.
+    labels : np.ndarray
+        True classes.
+    latency : float
+        Median time of the single run in seconds.
+
+    """
+    predictions, labels, times = [], [], []
+    for images, batch_labels in dataset:
+        for image, label in zip(np.asarray(images, dtype=np.float32), _labels(batch_labels)):
+            start = time.perf_counter()
+            output = runner(image[np.newaxis])
+            times.append(time.perf_counter() - start)
+
+            predictions.append(int(np.argmax(output.reshape(-1))))
+            labels.append(int(label))
+            if max_samples is not None and len(labels) >= max_samples:
+                return np.array(predictions), np.array(labels), float(np.median(times))
+
+    return np.array(predictions), np.array(labels), float(np.median(times))
+
+
+class QuantizationReport:
+    """
+    Result of the `quantization_report`.
+
+    Attributes
+    ----------
+    num_samples : int
+        Number of evaluated samples.
+    float_accuracy : float
+        Top-1 accuracy of the float32 TFLite model.
+    int8_accuracy : float
+        Top-1 accuracy of the int8 TFLite model.
+    agreement : float
+        Fraction of samples with the same prediction of both models.
+    float_latency : float
+        Median latency of the float32 model (batch 1) in seconds.
+    int8_latency : float
+        Median latency of the int8 model (batch 1) in seconds.
+    simulated_accuracy : float
+        Top-1 accuracy of the simulated int8 model with calibrated ranges (None if it was not evaluated).
+
+    """
+    def __init__(
+            self, num_samples, float_accuracy, int8_accuracy, agreement, float_latency, int8_latency,
+            simulated_accuracy=None):
+        self.num_samples = num_samples
+        self.float_accuracy = float_accuracy
+        self.int8_accuracy = int8_accuracy
+        self.agreement = agreement
+        self.float_latency = float_latency
+        self.int8_latency = int8_latency
+        self.simulated_accuracy = simulated_accuracy
+
+    @property
+    def accuracy_drop(self):
+        return self.float_accuracy - self.int8_accuracy
+
+    @property
+    def speedup(self):
+        return self.float_latency / self.int8_latency
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    def summary(self):
+        lines = [
+            f'samples: {self.num_samples}',
+            f'top-1 accuracy: float32 {self.float_accuracy * 100:.2f}%, int8 {self.int8_accuracy * 100:.2f}% '
+            f'(drop {self.accuracy_drop * 100:.2f}%)',
+            f'agreement of predictions: {self.agreement * 100:.2f}%',
+            f'latency (batch 1), ms: float32 {self.float_latency * 1e3:.2f}, int8 {self.int8_latency * 1e3:.2f} '
+            f'(speedup {self.speedup:.2f})',
+        ]
+        if self.simulated_accuracy is not None:
+            lines.append(f'top-1 accuracy of the simulated int8 model: {self.simulated_accuracy * 100:.2f}%')
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return (
+            f'QuantizationReport(samples={self.num_samples}, accuracy drop={self.accuracy_drop:.4f}, '
+            f'speedup={self.speedup:.2f})'
+        )
+
+
+def quantization_report(float_model, int8_model, dataset, max_samples=None, num_threads=None, simulated_runner=None):
+    """
+    Compare accuracy and CPU latency of the float32 and int8 TFLite models on the `dataset`.
+
+    Parameters
+    ----------
+    float_model : bytes
+        Float32 TFLite model, see `convert_to_tflite`.
+    int8_model : bytes
+        Int8 TFLite model, see `convert_to_tflite`.
+    dataset : callable
+        Function without arguments which returns iterable over pairs (images, labels),
+        it is called for every evaluated model.
+    max_samples : int
+        Maximum number of evaluated samples.
+    num_threads : int
+        Number of threads of the TFLite interpreter.
+    simulated_runner : SessionRunner
+        Runner of the simulated int8 model, it is evaluated too if given.
+
+    Returns
+    -------
+    QuantizationReport
+
+    """
+    float_predictions, labels, float_latency = evaluate(
+        TFLiteRunner(float_model, num_threads), dataset(), max_samples
+    )
+    int8_predictions, _, int8_latency = evaluate(TFLiteRunner(int8_model, num_threads), dataset(), max_samples)
+
+    simulated_accuracy = None
+    if simulated_runner is not None:
+        simulated_predictions, _, _ = evaluate(simulated_runner, dataset(), max_samples)
+        simulated_accuracy = float(np.mean(simulated_predictions == labels))
+
+    return QuantizationReport(
+        num_samples=len(labels),
+        float_accuracy=float(np.mean(float_predictions == labels)),
+        int8_accuracy=float(np.mean(int8_predictions == labels)),
+        agreement=float(np.mean(float_predictions == int8_predictions)),
+        float_latency=float_latency,
+        int8_latency=int8_latency,
+        simulated_accuracy=simulated_accuracy,
+    )
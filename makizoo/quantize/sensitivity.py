@@ -0,0 +1,366 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Per-layer quantization sensitivity: every layer (or block) is quantized alone while the rest of the model
+stays in float, drift of the outputs on the calibration samples is measured.
+Ranking of the layers shows which of them should be kept in float (fp32/fp16) in the mixed-precision deployment.
+
+"""
+
+import numpy as np
+
+from makizoo.ir import ArchitectureIR, build_tf_graph
+from makizoo.analysis import group_layers
+from makizoo.transforms import fold_batchnorm
+from .calibration import calibrate, adjust_ranges, iterate_batches
+from .qparams import WEIGHT_LAYERS, NUM_BITS
+from .simulation import build_fake_quant_graph
+
+
+DEFAULT_BATCH_SIZE = 32
+
+
+def output_drift(reference, outputs):
+    """
+    Drift of the `outputs` from the float `reference` (lists of arrays with outputs of the model).
+
+    Returns
+    -------
+    rel_error : float
+        Norm of the difference divided by norm of the reference.
+    top1_agreement : float
+        Fraction of samples with the same argmax of the last axis of 2D outputs (None if there are no 2D outputs).
+
+    """
+    diff_norm = np.sqrt(sum(np.sum((out - ref) ** 2) for ref, out in zip(reference, outputs)))
+    reference_norm = np.sqrt(sum(np.sum(ref ** 2) for ref in reference))
+    rel_error = float(diff_norm / max(reference_norm, np.finfo(np.float32).tiny))
+
+    logits = [(ref, out) for ref, out in zip(reference, outputs) if ref.ndim == 2]
+    top1_agreement = None
+    if len(logits) != 0:
+        top1_agreement = float(np.mean(np.concatenate([
+            np.argmax(ref, axis=-1) == np.argmax(out, axis=-1) for ref, out in logits
+        ])))
+    return rel_error, top1_agreement
+
+
+class LayerSensitivity:
+    """
+    Drift of the model when only `layers` of the unit are quantized.
+
+    """
+    def __init__(self, name, layers, rel_error, top1_agreement):
+        self.name = name
+        self.layers = layers
+        self.rel_error = rel_error
+        self.top1_agreement = top1_agreement
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    def __repr__(self):
+        return f'LayerSensitivity(name={self.name}, rel_error={self.rel_error:.4e})'
+
+
+class SensitivityReport:
+    """
+    Result of the `SensitivityAnalyzer.analyze`.
+
+    Attributes
+    ----------
+    units : list
+        `LayerSensitivity` of every unit sorted from the most sensitive one.
+    rel_error : float
+        Drift of the fully quantized model.
+    top1_agreement : float
+        Top-1 agreement of the fully quantized model with the float one (None if outputs are not logits).
+
+    """
+    def __init__(self, units, rel_error, top1_agreement):
+        self.units = sorted(units, key=lambda unit: unit.rel_error, reverse=True)
+        self.rel_error = rel_error
+        self.top1_agreement = top1_agreement
+
+    def to_dict(self):
+        return {
+            'units': [unit.to_dict() for unit in self.units],
+            'rel_error': self.rel_error,
+            'top1_agreement': self.top1_agreement,
+        }
+
+    def summary(self, count=10):
+        lines = [f'fully quantized model: relative error {self.rel_error:.4e}']
+        if self.top1_agreement is not None:
+            lines[0] += f', top-1 agreement {self.top1_agreement * 100:.2f}%'
+        lines.append(f'{count} most sensitive of {len(self.units)} units:')
+        for unit in self.units[:count]:
+            line = f'{unit.name:>50} | relative error {unit.rel_error:.4e}'
+            if unit.top1_agreement is not None:
+                line += f' | top-1 agreement {unit.top1_agreement * 100:.2f}%'
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return f'SensitivityReport(units={len(self.units)}, rel_error={self.rel_error:.4e})'
+
+
+class MixedPrecisionPlan:
+    """
+    Result of the `SensitivityAnalyzer.recommend`: layers which are kept in float and drift of the model.
+    `meets_budget` is False if the budget is not met even with all units in float.
+
+    """
+    def __init__(self, float_units, float_layers, quantized_layers, rel_error, top1_agreement, meets_budget=None):
+        self.float_units = float_units
+        self.float_layers = float_layers
+        self.quantized_layers = quantized_layers
+        self.rel_error = rel_error
+        self.top1_agreement = top1_agreement
+        self.meets_budget = meets_budget
+
+    @property
+    def quantized_fraction(self):
+        total = len(self.float_layers) + len(self.quantized_layers)
+        return len(self.quantized_layers) / total
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    def summary(self):
+        lines = [
+            f'float units ({len(self.float_units)}): {", ".join(self.float_units) or "-"}',
+            f'quantized layers: {len(self.quantized_layers)} ({self.quantized_fraction * 100:.1f}%)',
+            f'relative error: {self.rel_error:.4e}',
+        ]
+        if self.top1_agreement is not None:
+            lines.append(f'top-1 agreement: {self.top1_agreement * 100:.2f}%')
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return f'MixedPrecisionPlan(float units={len(self.float_units)}, rel_error={self.rel_error:.4e})'
+
+
+class SensitivityAnalyzer:
+    """
+    Quantization sensitivity analysis of the model on the calibration samples.
+    Batch normalization is folded and activation ranges are calibrated on the `samples`,
+    so layers are quantized in the same way as in the int8 inference path.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model. If batch size of the input is known, the rest of samples which does not fill
+        the whole batch is skipped, so number of the samples should be divisible by it.
+    weights : dict
+        Float weights of the model, see `makizoo.ir.weights`.
+    samples : np.ndarray
+        Calibration samples, see `makizoo.quantize.take_samples`.
+    per_channel : bool
+        Quantize kernels per output channel.
+    num_bits : int
+        Number of bits.
+    batch_size : int
+        Batch size of the runs, used if batch size of the input of the IR is unknown.
+
+    Examples
+    --------
+    >>> arch = trace(MobileNetV2_1_0, input_shape=[None, 224, 224, 3], include_top=True)
+    >>> analyzer = SensitivityAnalyzer(arch, weights, take_samples(calibration_images, 500))
+    >>> report = analyzer.analyze()
+    >>> print(report.summary())
+    >>> plan = analyzer.recommend(report, min_top1_agreement=0.99)
+    >>> print(plan.float_layers)
+
+    """
+    def __init__(self, arch: ArchitectureIR, weights, samples, per_channel=True, num_bits=NUM_BITS,
+                 batch_size=DEFAULT_BATCH_SIZE):
+        self.arch, self.weights = fold_batchnorm(arch, weights)
+        self.samples = samples
+        self.per_channel = per_channel
+        self.num_bits = num_bits
+        self.static_batch_size = arch.get_shape(arch.inputs[0])[0]
+        if self.static_batch_size is not None and len(samples) < self.static_batch_size:
+            raise ValueError(
+                f"Number of the samples {len(samples)} is less than batch size of the input of the IR "
+                f"{self.static_batch_size}."
+            )
+        self.batch_size = self.static_batch_size or batch_size
+        self.ranges = adjust_ranges(self.arch, calibrate(self.arch, self.weights, samples, self.batch_size))
+        self.reference = self._run(quantize=False)
+
+    def _run(self, quantize=True, layers=None):
+        import tensorflow.compat.v1 as tf
+
+        graph = tf.Graph()
+        with graph.as_default():
+            input_name = self.arch.inputs[0]
+            # Tensor of the input in the simulated graph is the output of its fake quantization, so placeholder is fed
+            input_tensor = tf.placeholder(tf.float32, shape=self.arch.get_shape(input_name), name=input_name)
+            if quantize:
+                tensors = build_fake_quant_graph(
+                    self.arch, self.weights, self.ranges, self.per_channel, self.num_bits,
+                    inputs={input_name: input_tensor}, layers=layers
+                )
+            else:
+                tensors = build_tf_graph(self.arch, self.weights, inputs={input_name: input_tensor})
+
+            output_tensors = [tensors[tensor_name] for tensor_name in self.arch.outputs]
+            outputs = [[] for _ in output_tensors]
+            with tf.Session(graph=graph) as sess:
+                for batch in iterate_batches(self.samples, self.batch_size):
+                    if len(batch) != self.batch_size and self.static_batch_size is not None:
+                        # Static batch size of the graph, the rest of samples is skipped
+                        break
+                    for values, value in zip(outputs, sess.run(output_tensors, feed_dict={input_tensor: batch})):
+                        values.append(value)
+        return [np.concatenate(values) for values in outputs]
+
+    def layer_names(self):
+        """
+        Names of all layers of the model except inputs (after folding of batch normalization).
+
+        """
+        return [spec.name for spec in self.arch.layers if spec.type != 'InputLayer']
+
+    def default_units(self, by_block=False):
+        """
+        Units of the analysis: every layer with weights or, if `by_block` is True,
+        every block of the zoo (see `makizoo.analysis.group_layers`).
+
+        Returns
+        -------
+        dict
+            {unit name: list of the layer names}.
+
+        """
+        if by_block:
+            units = {}
+            for layer_name, block_name in group_layers(self.arch).items():
+                if self.arch.get_layer(layer_name).type != 'InputLayer':
+                    units.setdefault(block_name, []).append(layer_name)
+            return units
+        return {spec.name: [spec.name] for spec in self.arch.layers if spec.type in WEIGHT_LAYERS}
+
+    def drift(self, layers=None):
+        """
+        Drift of the model when only `layers` are quantized (all layers if None).
+
+        Returns
+        -------
+        rel_error : float
+        top1_agreement : float
+
+        """
+        return output_drift(self.reference, self._run(layers=layers))
+
+    def analyze(self, units=None, by_block=False):
+        """
+        Quantize every unit alone and measure drift of the model.
+
+        Parameters
+        ----------
+        units : dict or list
+            {unit name: list of the layer names} or list of the layer names (every layer is a unit),
+            by default see `default_units`.
+        by_block : bool
+            Use blocks of the zoo as units (if `units` is not given).
+
+        Returns
+        -------
+        SensitivityReport
+
+        """
+        if units is None:
+            units = self.default_units(by_block)
+        elif not isinstance(units, dict):
+            units = {layer_name: [layer_name] for layer_name in units}
+
+        for layers in units.values():
+            for layer_name in layers:
+                if not self.arch.has_layer(layer_name):
+                    raise ValueError(
+                        f'Layer {layer_name} is not found in the model (batch normalization is folded into '
+                        f'convolutions, use names of the convolutions).'
+                    )
+
+        results = [
+            LayerSensitivity(unit_name, list(layers), *self.drift(layers))
+            for unit_name, layers in units.items()
+        ]
+        return SensitivityReport(results, *self.drift())
+
+    def _plan(self, report, num_float):
+        float_units = [unit.name for unit in report.units[:num_float]]
+        float_layers = set(layer_name for unit in report.units[:num_float] for layer_name in unit.layers)
+        quantized_layers = [layer_name for layer_name in self.layer_names() if layer_name not in float_layers]
+        return MixedPrecisionPlan(
+            float_units, sorted(float_layers), quantized_layers, *self.drift(quantized_layers)
+        )
+
+    def recommend(self, report, max_rel_error=None, min_top1_agreement=None):
+        """
+        Find the smallest number of the most sensitive units which must be kept in float
+        so that drift of the model is within the budget. Drift is assumed to decrease
+        when more units are kept in float, so binary search is used (O(log(units)) runs).
+        If the budget can not be met, all units are kept in float.
+
+        Parameters
+        ----------
+        report : SensitivityReport
+            Result of the `analyze`.
+        max_rel_error : float
+            Maximum relative error of the outputs.
+        min_top1_agreement : float
+            Minimum top-1 agreement with the float model (proxy of the accuracy drop, outputs must be logits).
+
+        Returns
+        -------
+        MixedPrecisionPlan
+
+        """
+        if max_rel_error is None and min_top1_agreement is None:
+            raise ValueError('Set `max_rel_error` or `min_top1_agreement`.')
+
+        def within_budget(plan):
+            if max_rel_error is not None and plan.rel_error > max_rel_error:
+                return False
+            if min_top1_agreement is not None:
+                if plan.top1_agreement is None:
+                    raise ValueError('Outputs of the model are not logits, use `max_rel_error`.')
+                if plan.top1_agreement < min_top1_agreement:
+                    return False
+            return True
+
+        plans = {}
+
+        def get_plan(num_float):
+            if num_float not in plans:
+                plans[num_float] = self._plan(report, num_float)
+            return plans[num_float]
+
+        low, high = 0, len(report.units)
+        while low < high:
+            middle = (low + high) // 2
+            if within_budget(get_plan(middle)):
+                high = middle
+            else:
+                low = middle + 1
+
+        plan = get_plan(low)
+        plan.meets_budget = within_budget(plan)
+        return plan
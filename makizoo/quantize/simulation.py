@@ -0,0 +1,119 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Simulation of the int8 model with float ops: kernels are replaced by their quantized-dequantized values
+and every tensor is passed through fake quantization with its calibrated range,
+except tensors which are consumed only by the activation layer (int8 kernels fuse the activation).
+Results are close to the int8 inference (up to rounding of the requantization),
+so the graph is used to measure accuracy of the quantization scheme before conversion.
+The same graph is converted into the int8 TFLite model (see `makizoo.quantize.convert_to_tflite`),
+the converter takes quantization parameters of the activations from the fake quantization ops.
+
+"""
+
+import numpy as np
+
+from makizoo.ir import ArchitectureIR, build_tf_graph
+from makizoo.transforms.utils import single_consumer
+from .qparams import fake_quantize_weights, NUM_BITS, WEIGHT_LAYERS
+
+
+def fused_with_activation(arch: ArchitectureIR, spec):
+    """
+    True if output of the `spec` is used only by ActivationLayer, i.e. it is not quantized in the int8 model.
+
+    """
+    return spec is not None and single_consumer(arch, spec, 'ActivationLayer') is not None
+
+
+def _per_tensor_kernels(arch: ArchitectureIR, weights, num_bits, layers):
+    # Per-tensor kernels are quantized by the ops in the graph: scales of the TFLite kernels are taken from them,
+    # while constant kernels are always quantized per channel by the converter
+    import tensorflow.compat.v1 as tf
+
+    new_weights = dict(weights)
+    for spec in arch.layers:
+        if spec.type not in WEIGHT_LAYERS or spec.name not in weights:
+            continue
+        if layers is not None and spec.name not in layers:
+            continue
+        W = np.asarray(weights[spec.name]['W'], dtype=np.float32)
+        max_abs = float(np.max(np.abs(W)))
+        if max_abs == 0.0:
+            continue
+        new_weights[spec.name] = dict(weights[spec.name])
+        new_weights[spec.name]['W'] = tf.quantization.fake_quant_with_min_max_vars(
+            tf.constant(W), -max_abs, max_abs, num_bits=num_bits, narrow_range=True
+        )
+    return new_weights
+
+
+def build_fake_quant_graph(
+        arch: ArchitectureIR, weights, ranges, per_channel=True, num_bits=NUM_BITS, inputs=None, layers=None):
+    """
+    Create TensorFlow ops of the simulated int8 model in the default graph.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model (usually with folded batch normalization).
+    weights : dict
+        Float weights of the model, see `makizoo.ir.weights`.
+    ranges : dict
+        Adjusted ranges of the activations, see `makizoo.quantize.adjust_ranges`.
+    per_channel : bool
+        Use per-channel scales of the kernels (kernels are constants with quantized-dequantized values),
+        otherwise kernels are quantized per tensor by fake quantization ops.
+    num_bits : int
+        Number of bits.
+    inputs : dict
+        Input tensors, see `makizoo.ir.build_tf_graph`.
+    layers : list
+        Names of the layers which are quantized, other layers are computed in float (mixed-precision model).
+        Kernels, inputs and outputs of the quantized layers are fake-quantized. All layers are quantized if None.
+
+    Returns
+    -------
+    dict
+        Mapping from the name of the tensor in IR to created tensor.
+
+    """
+    import tensorflow.compat.v1 as tf
+
+    if layers is not None:
+        layers = set(layers)
+
+    def is_quantized(spec, tensor_name):
+        if layers is None:
+            return True
+        if spec is not None and spec.name in layers:
+            return True
+        return any(consumer.name in layers for consumer in arch.consumers(tensor_name))
+
+    def fake_quant(spec, tensor_name, tensor):
+        if fused_with_activation(arch, spec) or not is_quantized(spec, tensor_name):
+            return tensor
+        min_value, max_value = ranges[tensor_name]
+        return tf.quantization.fake_quant_with_min_max_vars(
+            tensor, tf.constant(min_value, tf.float32), tf.constant(max_value, tf.float32), num_bits=num_bits
+        )
+
+    if per_channel:
+        kernel_weights = fake_quantize_weights(arch, weights, per_channel, num_bits, layers)
+    else:
+        kernel_weights = _per_tensor_kernels(arch, weights, num_bits, layers)
+    return build_tf_graph(arch, kernel_weights, inputs=inputs, output_fn=fake_quant)
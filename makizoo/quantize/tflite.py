@@ -0,0 +1,163 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Conversion of the IR into TFLite models: float32 model and int8 model with per-channel int8 kernels
+and per-tensor int8 activations (post-training full integer quantization).
+Int8 model is converted either from the simulated int8 graph with the given activation ranges
+(see `makizoo.quantize.build_fake_quant_graph`) or with ranges calibrated by the converter.
+
+"""
+
+import numpy as np
+
+from makizoo.ir import ArchitectureIR, build_tf_graph
+from .calibration import iterate_batches
+from .qparams import activation_qparams, NUM_BITS
+from .simulation import build_fake_quant_graph
+
+
+def _check_batch_size(arch: ArchitectureIR):
+    batch_size = arch.get_shape(arch.inputs[0])[0]
+    # Unknown batch size is set to 1 by the converter
+    if batch_size not in (1, None):
+        raise ValueError(
+            f'TFLite models are converted with batch size 1, but input of the IR has shape '
+            f'{arch.get_shape(arch.inputs[0])}. Trace the model with input_shape=[1, H, W, C].'
+        )
+
+
+def convert_to_tflite(arch: ArchitectureIR, weights, samples=None, int8_io=False, ranges=None, per_channel=True):
+    """
+    Convert IR with weights into TFLite model.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model with batch size 1 or unknown (usually with folded batch normalization).
+    weights : dict
+        Float weights of the model, see `makizoo.ir.weights`.
+    samples : np.ndarray
+        Calibration samples (see `makizoo.quantize.take_samples`). If given, the model is quantized into int8:
+        kernels per output channel (depthwise kernels too), activations per tensor with ranges
+        collected by the converter on the `samples`.
+    int8_io : bool
+        Inputs and outputs of the int8 model are int8 too, otherwise they are float32
+        and model quantizes/dequantizes them.
+    ranges : dict
+        Adjusted ranges of the activations (see `makizoo.quantize.adjust_ranges`). If given, the model is
+        quantized into int8 with exactly these ranges: the simulated int8 graph is converted and
+        the converter does not calibrate. Can't be used with `samples`.
+        If neither `samples` nor `ranges` are given, float32 model is returned.
+    per_channel : bool
+        Quantize kernels per output channel, used only with `ranges`.
+
+    Returns
+    -------
+    bytes
+        Serialized TFLite model.
+
+    """
+    import tensorflow.compat.v1 as tf
+
+    _check_batch_size(arch)
+    if ranges is not None:
+        if samples is not None:
+            raise ValueError('Int8 model is converted either with the given `ranges` or with calibration `samples`.')
+        return _convert_with_ranges(arch, weights, ranges, per_channel, int8_io)
+
+    graph = tf.Graph()
+    with graph.as_default():
+        tensors = build_tf_graph(arch, weights)
+        with tf.Session(graph=graph) as sess:
+            converter = tf.lite.TFLiteConverter.from_session(
+                sess,
+                [tensors[tensor_name] for tensor_name in arch.inputs],
+                [tensors[tensor_name] for tensor_name in arch.outputs]
+            )
+            if samples is not None:
+                def representative_dataset():
+                    for sample in iterate_batches(np.asarray(samples, dtype=np.float32), 1):
+                        yield [sample]
+
+                converter.optimizations = [tf.lite.Optimize.DEFAULT]
+                converter.representative_dataset = tf.lite.RepresentativeDataset(representative_dataset)
+                converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+                if int8_io:
+                    converter.inference_input_type = tf.int8
+                    converter.inference_output_type = tf.int8
+            return converter.convert()
+
+
+def _convert_with_ranges(arch: ArchitectureIR, weights, ranges, per_channel, int8_io):
+    import tensorflow.compat.v1 as tf
+
+    graph = tf.Graph()
+    with graph.as_default():
+        input_name = arch.inputs[0]
+        input_tensor = tf.placeholder(tf.float32, shape=arch.get_shape(input_name), name=input_name)
+        tensors = build_fake_quant_graph(
+            arch, weights, ranges, per_channel=per_channel, num_bits=NUM_BITS, inputs={input_name: input_tensor}
+        )
+        with tf.Session(graph=graph) as sess:
+            converter = tf.lite.TFLiteConverter.from_session(
+                sess, [input_tensor], [tensors[tensor_name] for tensor_name in arch.outputs]
+            )
+            # Quantization parameters of all tensors are taken from the fake quantization ops,
+            # the input ones are set by the stats: real = (q - mean) / std
+            input_scale, input_zero_point = activation_qparams(*ranges[input_name])
+            converter.inference_type = tf.int8
+            converter.quantized_input_stats = {input_tensor.op.name: (input_zero_point, 1.0 / input_scale)}
+            if not int8_io:
+                converter.inference_input_type = tf.float32
+                converter.inference_output_type = tf.float32
+            return converter.convert()
+
+
+class TFLiteRunner:
+    """
+    Run TFLite model sample by sample, int8 inputs and outputs are quantized/dequantized automatically.
+
+    """
+    def __init__(self, model_content, num_threads=None):
+        import tensorflow.compat.v1 as tf
+
+        if num_threads is None:
+            self._interpreter = tf.lite.Interpreter(model_content=model_content)
+        else:
+            self._interpreter = tf.lite.Interpreter(model_content=model_content, num_threads=num_threads)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+
+    def __call__(self, sample):
+        """
+        Run model on the single sample [1, H, W, C], return float output.
+
+        """
+        sample = np.asarray(sample, dtype=np.float32)
+        if self._input['dtype'] != np.float32:
+            scale, zero_point = self._input['quantization']
+            info = np.iinfo(self._input['dtype'])
+            sample = np.clip(np.round(sample / scale + zero_point), info.min, info.max)
+        self._interpreter.set_tensor(self._input['index'], sample.astype(self._input['dtype']))
+        self._interpreter.invoke()
+
+        output = self._interpreter.get_tensor(self._output['index'])
+        if self._output['dtype'] != np.float32:
+            scale, zero_point = self._output['quantization']
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
@@ -0,0 +1,26 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+from .recompute import (
+    set_recompute_hints, get_recompute_config, select_segments, densenet_recompute_segments,
+    recompute_report, RecomputeReport, DENSENET_RECOMPUTE_PATTERNS, RECOMPUTE_HINT
+)
+from .checkpointing import checkpoint_segments, checkpoint_reports, make_segments, split_units
+from .mixed_precision import (
+    get_mixed_precision_config, mixed_precision_drift, compare_outputs, check_compute_dtype, DriftReport,
+    FLOAT32, FLOAT16, BFLOAT16, COMPUTE_DTYPES, DTYPE_BYTES
+)
@@ -0,0 +1,161 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import math
+
+from makizoo.ir import ArchitectureIR
+from makizoo.analysis import group_layers
+from makizoo.analysis.grouping import STEM, HEAD
+from makizoo.analysis.cost import FLOAT32_BYTES
+from .recompute import recompute_report
+
+
+def split_units(arch: ArchitectureIR):
+    """
+    Split layers of the IR into units (blocks of the zoo, for example `block{stage}/unit_{n}` in ResNet),
+    stem and head are not included.
+
+    Returns
+    -------
+    list
+        List of pairs (name of the unit, list of the layer names) in the order of execution.
+
+    """
+    units = {}
+    for layer_name, block_name in group_layers(arch).items():
+        if block_name in (STEM, HEAD):
+            continue
+        units.setdefault(block_name, []).append(layer_name)
+    return list(units.items())
+
+
+def make_segments(units, num_segments):
+    """
+    Split units into `num_segments` contiguous segments of almost the same length.
+    Output of the last layer of every segment is stored (checkpoint),
+    other layers of the segment are recomputed during the backward pass.
+
+    Parameters
+    ----------
+    units : list
+        Units from `split_units`.
+    num_segments : int
+        Number of segments, from 1 to number of the units.
+
+    Returns
+    -------
+    list
+        Recomputed segments (lists of the layer names).
+
+    """
+    if num_segments < 1 or num_segments > len(units):
+        raise ValueError(f'num_segments must be in range [1, {len(units)}], got {num_segments}')
+
+    base, rest = divmod(len(units), num_segments)
+    segments = []
+    start = 0
+    for i in range(num_segments):
+        end = start + base + (1 if i < rest else 0)
+        layer_names = [name for _, unit_layers in units[start:end] for name in unit_layers]
+        segments.append(layer_names[:-1])
+        start = end
+    return segments
+
+
+def checkpoint_reports(arch: ArchitectureIR, dtype_bytes=FLOAT32_BYTES, name=None):
+    """
+    Compute memory/compute trade-off for every possible number of segments.
+
+    Returns
+    -------
+    dict
+        Mapping from the number of segments to `RecomputeReport`.
+
+    """
+    units = split_units(arch)
+    return {
+        num_segments: recompute_report(arch, make_segments(units, num_segments), dtype_bytes=dtype_bytes, name=name)
+        for num_segments in range(1, len(units) + 1)
+    }
+
+
+def checkpoint_segments(
+        arch: ArchitectureIR,
+        num_segments=None,
+        budget_bytes=None,
+        batch_size=1,
+        dtype_bytes=FLOAT32_BYTES):
+    """
+    Select recomputed segments for gradient checkpointing at the unit granularity.
+
+    By default units are split into sqrt(n) segments, which gives O(sqrt(n)) memory
+    for the cost of one additional forward pass.
+    If `budget_bytes` is given, then the number of segments with the smallest recomputation
+    which activations and parameters fit into the budget is selected
+    (empty list is returned if the model fits without recomputation).
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model with fully specified input shape, see `makizoo.ir.trace`.
+    num_segments : int
+        Number of segments, used if `budget_bytes` is None.
+    budget_bytes : int
+        Memory budget for the training step.
+    batch_size : int
+        Batch size used for training, required for `budget_bytes`.
+    dtype_bytes : int
+        Size of one element of activations in bytes, 4 for float32.
+
+    Returns
+    -------
+    list
+        Recomputed segments, use them with `set_recompute_hints` and `recompute_report`.
+
+    Examples
+    --------
+    >>> from makizoo.ir import trace
+    >>> from makizoo.backbones.resnetv1 import ResNet101
+    >>> arch = trace(ResNet101, input_shape=[1, 224, 224, 3], include_top=True)
+    >>> segments = checkpoint_segments(arch, budget_bytes=16 * 2 ** 30, batch_size=128)
+    >>> print(recompute_report(arch, segments, name='ResNet101').summary(batch_size=128))
+
+    """
+    units = split_units(arch)
+    if budget_bytes is None:
+        if num_segments is None:
+            num_segments = max(1, round(math.sqrt(len(units))))
+        return make_segments(units, num_segments)
+
+    reports = checkpoint_reports(arch, dtype_bytes=dtype_bytes)
+    baseline = next(iter(reports.values())).baseline
+    if baseline.peak_bytes(batch_size, include_params=True) <= budget_bytes:
+        return []
+
+    fitted = [
+        report for report in reports.values()
+        if report.plan.peak_bytes(batch_size, include_params=True) <= budget_bytes
+    ]
+    if len(fitted) == 0:
+        lowest = min(report.plan.peak_bytes(batch_size, include_params=True) for report in reports.values())
+        raise ValueError(
+            f'Model does not fit into {budget_bytes / 2 ** 20:.2f} MB with batch size {batch_size}, '
+            f'the lowest peak with checkpointing is {lowest / 2 ** 20:.2f} MB'
+        )
+
+    best = min(fitted, key=lambda report: (report.recompute_macs, report.recompute_bytes_per_sample))
+    return best.segments
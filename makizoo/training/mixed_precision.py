@@ -0,0 +1,255 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Mixed-precision execution of the zoo models.
+MakiFlow layers create float32 variables, so the precision is changed by the grappler rewrite
+(auto mixed precision) of the session: convolutions, matmuls and element-wise ops are computed in float16
+(on GPU) or bfloat16 (on CPU with oneDNN), while variables stay in float32 and are cast on read.
+FusedBatchNorm keeps its statistics, scale and offset in float32, softmax and losses are computed in float32.
+The rewrite does not depend on the architecture, so it covers every family of the zoo.
+
+The precision is a property of the session, not of the model: builders of the zoo take no compute dtype
+and always create float32 graphs, pass the config from `get_mixed_precision_config` to the session
+which runs the model to select the precision.
+
+"""
+
+import numpy as np
+
+from makizoo.analysis.cost import FLOAT32_BYTES, FLOAT16_BYTES
+
+
+FLOAT32 = 'float32'
+FLOAT16 = 'float16'
+BFLOAT16 = 'bfloat16'
+COMPUTE_DTYPES = (FLOAT32, FLOAT16, BFLOAT16)
+
+# Size of one element of activations, use it as `dtype_bytes` of `makizoo.analysis.plan_memory`
+DTYPE_BYTES = {
+    FLOAT32: FLOAT32_BYTES,
+    FLOAT16: FLOAT16_BYTES,
+    BFLOAT16: FLOAT16_BYTES,
+}
+
+# Fields of RewriterConfig which enable bfloat16 rewrite, the name depends on the version of tensorflow
+_BFLOAT16_REWRITERS = ('auto_mixed_precision_onednn_bfloat16', 'auto_mixed_precision_mkl')
+
+
+def check_compute_dtype(compute_dtype):
+    if compute_dtype not in COMPUTE_DTYPES:
+        raise ValueError(f'Unknown compute dtype: {compute_dtype}. Available: {COMPUTE_DTYPES}')
+
+
+def _gpu_available():
+    import tensorflow as tf
+
+    list_devices = getattr(tf.config, 'list_physical_devices', None)
+    if list_devices is None:
+        list_devices = tf.config.experimental.list_physical_devices
+    return len(list_devices('GPU')) != 0
+
+
+def get_mixed_precision_config(compute_dtype=FLOAT16, config=None):
+    """
+    Return session config with auto mixed precision rewrite of grappler.
+    The option is session-level: the graph of the model is built in float32 (builders have no compute dtype)
+    and is rewritten only when it is run by the session created with this config.
+
+    Parameters
+    ----------
+    compute_dtype : str
+        'float16' (GPU only, uses tensor cores), 'bfloat16' (CPU, requires tensorflow built with oneDNN
+        and the processor with bfloat16 instructions to be faster) or 'float32' (config is not changed).
+    config : tf.compat.v1.ConfigProto
+        Config which will be updated, by default the new one is created.
+
+    Returns
+    -------
+    tf.compat.v1.ConfigProto
+
+    Raises
+    ------
+    ValueError
+        If `compute_dtype` is 'float16' and there is no GPU: grappler rewrites float16 only on GPU,
+        the session would silently run in float32.
+
+    """
+    import tensorflow.compat.v1 as tf
+    from tensorflow.core.protobuf import rewriter_config_pb2
+
+    check_compute_dtype(compute_dtype)
+    if compute_dtype == FLOAT16 and not _gpu_available():
+        raise ValueError('float16 mixed precision requires GPU, use bfloat16 on CPU.')
+    if config is None:
+        config = tf.ConfigProto()
+
+    rewrite_options = config.graph_options.rewrite_options
+    if compute_dtype == FLOAT16:
+        rewrite_options.auto_mixed_precision = rewriter_config_pb2.RewriterConfig.ON
+    elif compute_dtype == BFLOAT16:
+        fields = rewrite_options.DESCRIPTOR.fields_by_name
+        available = [field for field in _BFLOAT16_REWRITERS if field in fields]
+        if len(available) == 0:
+            raise ValueError(
+                f'Installed tensorflow {tf.__version__} does not support bfloat16 mixed precision rewrite, '
+                f'use tensorflow with oneDNN (2.3 or newer).'
+            )
+        setattr(rewrite_options, available[0], rewriter_config_pb2.RewriterConfig.ON)
+    return config
+
+
+class DriftReport:
+    """
+    Difference between outputs of the model computed in float32 and in mixed precision,
+    result of the `mixed_precision_drift`. Errors are computed over all outputs.
+
+    Attributes
+    ----------
+    compute_dtype : str
+        Compute dtype of the mixed-precision run.
+    max_abs_error : float
+        Maximum absolute difference.
+    mean_abs_error : float
+        Mean absolute difference.
+    rel_error : float
+        Norm of the difference divided by norm of the float32 outputs.
+    top1_agreement : float
+        Fraction of samples with the same argmax of the last axis of 2D outputs (logits),
+        None if there are no 2D outputs.
+
+    """
+    def __init__(self, compute_dtype, max_abs_error, mean_abs_error, rel_error, top1_agreement=None):
+        self.compute_dtype = compute_dtype
+        self.max_abs_error = max_abs_error
+        self.mean_abs_error = mean_abs_error
+        self.rel_error = rel_error
+        self.top1_agreement = top1_agreement
+
+    def summary(self):
+        lines = [
+            f'float32 -> {self.compute_dtype}',
+            f'max abs error: {self.max_abs_error:.3e}, mean abs error: {self.mean_abs_error:.3e}',
+            f'relative error: {self.rel_error:.3e}',
+        ]
+        if self.top1_agreement is not None:
+            lines.append(f'top-1 agreement: {self.top1_agreement * 100:.2f}%')
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return (
+            f'DriftReport(compute_dtype={self.compute_dtype}, max abs error={self.max_abs_error:.3e}, '
+            f'relative error={self.rel_error:.3e})'
+        )
+
+
+def compare_outputs(reference, outputs, compute_dtype):
+    """
+    Build `DriftReport` from the list of float32 outputs `reference` and the list of mixed-precision `outputs`.
+
+    """
+    reference = [np.asarray(value, dtype=np.float64) for value in reference]
+    outputs = [np.asarray(value, dtype=np.float64) for value in outputs]
+    diff = np.concatenate([(out - ref).ravel() for ref, out in zip(reference, outputs)])
+    reference_norm = np.sqrt(sum(np.sum(ref ** 2) for ref in reference))
+
+    logits = [(ref, out) for ref, out in zip(reference, outputs) if ref.ndim == 2]
+    top1_agreement = None
+    if len(logits) != 0:
+        top1_agreement = float(np.mean(np.concatenate([
+            np.argmax(ref, axis=-1) == np.argmax(out, axis=-1) for ref, out in logits
+        ])))
+
+    return DriftReport(
+        compute_dtype=compute_dtype,
+        max_abs_error=float(np.max(np.abs(diff))),
+        mean_abs_error=float(np.mean(np.abs(diff))),
+        rel_error=float(np.sqrt(np.sum(diff ** 2)) / max(reference_norm, np.finfo(np.float64).tiny)),
+        top1_agreement=top1_agreement,
+    )
+
+
+def mixed_precision_drift(outputs, feed_dict=None, compute_dtype=FLOAT16, sess=None, config=None):
+    """
+    Run `outputs` in float32 and in mixed precision with the same values of the variables
+    and measure numeric drift of the mixed-precision build.
+    The same graph is run by two sessions, the second one is created with `get_mixed_precision_config`.
+
+    Parameters
+    ----------
+    outputs : list
+        Tensors to compare, for example outputs of the model (logits).
+    feed_dict : dict
+        Feed dict for both runs, for example {input tensor: batch of images}.
+    compute_dtype : str
+        'float16' or 'bfloat16', see `get_mixed_precision_config`.
+    sess : tf.compat.v1.Session
+        Session with the trained weights of the model, values of the variables are copied from it.
+        By default variables are initialized by their initializers.
+    config : tf.compat.v1.ConfigProto
+        Base config of both sessions.
+
+    Returns
+    -------
+    DriftReport
+
+    Examples
+    --------
+    >>> x = np.random.uniform(-1, 1, size=[8, 224, 224, 3]).astype(np.float32)
+    >>> input_layer, output, model = ResNet50(input_shape=[8, 224, 224, 3], include_top=True, create_model=True)
+    >>> model.set_session(sess)
+    >>> model.load_weights('resnet50.ckpt')
+    >>> report = mixed_precision_drift(
+    ...     [output.get_data_tensor()], {input_layer.get_data_tensor(): x}, BFLOAT16, sess=sess
+    ... )
+    >>> print(report.summary())
+
+    """
+    import tensorflow.compat.v1 as tf
+
+    check_compute_dtype(compute_dtype)
+    if not isinstance(outputs, (list, tuple)):
+        outputs = [outputs]
+    graph = outputs[0].graph
+
+    reference_config = tf.ConfigProto()
+    if config is not None:
+        reference_config.CopyFrom(config)
+    mixed_config = tf.ConfigProto()
+    mixed_config.CopyFrom(reference_config)
+    get_mixed_precision_config(compute_dtype, mixed_config)
+
+    with graph.as_default():
+        variables = tf.global_variables()
+        init_op = tf.variables_initializer(variables)
+
+    values = None
+    if sess is not None:
+        values = sess.run(variables)
+
+    results = []
+    for session_config in (reference_config, mixed_config):
+        with tf.Session(graph=graph, config=session_config) as run_sess:
+            run_sess.run(init_op)
+            if values is None:
+                values = run_sess.run(variables)
+            else:
+                for variable, value in zip(variables, values):
+                    variable.load(value, run_sess)
+            results.append(run_sess.run(outputs, feed_dict=feed_dict))
+
+    reference, mixed = results
+    return compare_outputs(reference, mixed, compute_dtype)
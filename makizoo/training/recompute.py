@@ -0,0 +1,265 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import re
+
+from makizoo.ir import ArchitectureIR
+from makizoo.analysis import plan_memory_arch, layer_macs, TRAINING
+from makizoo.analysis.cost import num_elements, FLOAT32_BYTES
+
+
+# Attribute of the node which is checked by the memory optimizer of grappler in the MANUAL mode
+RECOMPUTE_HINT = '_recompute_hint'
+# Name scope of the gradients, i.e. ops which will use recomputed values
+GRADIENTS_SCOPE = 'gradients/'
+
+# BN-ReLU of every ConvDenseNetBlock and concat after it are cheap to recompute,
+# but they hold O(L^2) memory of the dense block during the backward pass.
+# First group of the pattern is a name of the segment, i.e. layers of one unit are recomputed together.
+DENSENET_RECOMPUTE_PATTERNS = (
+    r'^(conv\d+_block\d+_)(0_bn|0_relu|1_bn|1_relu|concat)$',
+)
+
+_GRADIENT_OP = re.compile(r'(^|/)gradients(_\d+)?/')
+
+
+def select_segments(arch: ArchitectureIR, patterns):
+    """
+    Select layers which names match any of the `patterns` and group them into recompute segments.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model, see `makizoo.ir.trace`.
+    patterns : list
+        List of regular expressions. If the pattern has a group, layers with the same first group
+        are placed into the same segment, otherwise every layer is a separate segment.
+
+    Returns
+    -------
+    list
+        List of segments (lists of the layer names) in the order of execution.
+
+    """
+    patterns = [re.compile(pattern) for pattern in patterns]
+    segments = {}
+    for spec in arch.layers:
+        for pattern in patterns:
+            match = pattern.search(spec.name)
+            if match is None:
+                continue
+
+            key = match.group(1) if pattern.groups > 0 else spec.name
+            segments.setdefault(key, []).append(spec.name)
+            break
+    return list(segments.values())
+
+
+def densenet_recompute_segments(arch: ArchitectureIR):
+    """
+    Segments of the memory-efficient DenseNet: BN-ReLU and concat of every ConvDenseNetBlock.
+    Only outputs of the convolutions are stored, so memory of the dense block grows linearly with its depth.
+
+    """
+    return select_segments(arch, DENSENET_RECOMPUTE_PATTERNS)
+
+
+def _flatten(segments):
+    return [name for segment in segments for name in ([segment] if isinstance(segment, str) else segment)]
+
+
+def set_recompute_hints(layer_names, graph=None):
+    """
+    Mark forward ops of the layers with `layer_names` for recomputation during the backward pass.
+    Call it after the training graph (with gradients) is built and before the first run of the session,
+    which must be created with config from `get_recompute_config`.
+
+    Parameters
+    ----------
+    layer_names : list
+        Names of the layers or segments from `select_segments`.
+    graph : tf.compat.v1.Graph
+        Graph with the model, by default the default graph is used.
+
+    Returns
+    -------
+    list
+        List of marked ops.
+
+    """
+    import tensorflow.compat.v1 as tf
+    from tensorflow.core.framework import attr_value_pb2
+
+    layer_names = _flatten(layer_names)
+    if len(layer_names) == 0:
+        return []
+
+    if graph is None:
+        graph = tf.get_default_graph()
+
+    # Ops of the layer are created in the name scope of the layer
+    scope = re.compile(
+        r'(^|/)(' + '|'.join(re.escape(name) for name in layer_names) + r')/'
+    )
+    marked = []
+    for op in graph.get_operations():
+        if _GRADIENT_OP.search(op.name) is not None or scope.search(op.name) is None:
+            continue
+        # Variables, their updates (for example moving mean of BN) and random ops can not be recomputed
+        if op.op_def is not None and op.op_def.is_stateful:
+            continue
+
+        op._set_attr(RECOMPUTE_HINT, attr_value_pb2.AttrValue(i=1))
+        marked.append(op)
+    return marked
+
+
+def get_recompute_config(config=None):
+    """
+    Return session config with memory optimizer of grappler which recomputes ops marked by `set_recompute_hints`.
+
+    Parameters
+    ----------
+    config : tf.compat.v1.ConfigProto
+        Config which will be updated, by default the new one is created.
+
+    Returns
+    -------
+    tf.compat.v1.ConfigProto
+
+    """
+    import tensorflow.compat.v1 as tf
+    from tensorflow.core.protobuf import rewriter_config_pb2
+
+    if config is None:
+        config = tf.ConfigProto()
+
+    rewrite_options = config.graph_options.rewrite_options
+    rewrite_options.memory_optimization = rewriter_config_pb2.RewriterConfig.MANUAL
+    rewrite_options.memory_optimizer_target_node_name_scope = GRADIENTS_SCOPE
+    return config
+
+
+class RecomputeReport:
+    """
+    Memory/compute trade-off of the recomputation, result of the `recompute_report`.
+
+    Attributes
+    ----------
+    baseline : MemoryPlan
+        Training memory plan without recomputation.
+    plan : MemoryPlan
+        Training memory plan with recomputation.
+    segments : list
+        Recomputed segments.
+    forward_macs : int
+        MACs of the forward pass for the input shape of the IR.
+    recompute_macs : int
+        MACs which are computed one more time during the backward pass for the input shape of the IR.
+    recompute_bytes_per_sample : int
+        Size of all recomputed activations, i.e. additional memory traffic during the backward pass.
+
+    """
+    def __init__(self, baseline, plan, segments, forward_macs, recompute_macs, recompute_bytes_per_sample):
+        self.baseline = baseline
+        self.plan = plan
+        self.segments = segments
+        self.forward_macs = forward_macs
+        self.recompute_macs = recompute_macs
+        self.recompute_bytes_per_sample = recompute_bytes_per_sample
+
+    @property
+    def memory_saving(self):
+        """
+        Fraction of the peak activation memory which is saved by recomputation.
+
+        """
+        return 1.0 - self.plan.peak_bytes_per_sample / self.baseline.peak_bytes_per_sample
+
+    @property
+    def compute_overhead(self):
+        """
+        Estimated fraction of additional computation for the training step,
+        backward pass is considered as two times more expensive than forward.
+
+        """
+        return self.recompute_macs / (3 * self.forward_macs)
+
+    def summary(self, batch_size=1):
+        return '\n'.join([
+            f'{self.baseline.name} (training, {len(self.segments)} recomputed segments)',
+            f'peak activations for batch {batch_size}, MB: '
+            f'{self.baseline.peak_bytes(batch_size) / 2 ** 20:.2f} -> {self.plan.peak_bytes(batch_size) / 2 ** 20:.2f} '
+            f'(saved {self.memory_saving * 100:.1f}%)',
+            f'recomputed activations for batch {batch_size}, MB: '
+            f'{self.recompute_bytes_per_sample * batch_size / 2 ** 20:.2f}',
+            f'recomputed GMACs: {self.recompute_macs / 1e9:.3f} '
+            f'(about {self.compute_overhead * 100:.1f}% of the training step)',
+        ])
+
+    def __repr__(self):
+        return (
+            f'RecomputeReport(name={self.baseline.name}, segments={len(self.segments)}, '
+            f'memory saving={self.memory_saving:.3f}, compute overhead={self.compute_overhead:.3f})'
+        )
+
+
+def recompute_report(arch: ArchitectureIR, segments, dtype_bytes=FLOAT32_BYTES, name=None):
+    """
+    Estimate memory saving and additional computation of recomputation of the `segments`.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model with fully specified input shape, see `makizoo.ir.trace`.
+        Memory is reported per sample, MACs are reported for the input shape of the IR.
+    segments : list
+        Recomputed segments, for example from `densenet_recompute_segments`.
+    dtype_bytes : int
+        Size of one element of activations in bytes, 4 for float32.
+    name : str
+        Name of the model (used in summary).
+
+    Returns
+    -------
+    RecomputeReport
+
+    Examples
+    --------
+    >>> from makizoo.ir import trace
+    >>> from makizoo.backbones.densenet import DenseNet169
+    >>> arch = trace(DenseNet169, input_shape=[1, 224, 224, 3], include_top=True)
+    >>> report = recompute_report(arch, densenet_recompute_segments(arch), name='DenseNet169')
+    >>> print(report.summary(batch_size=32))
+
+    """
+    baseline = plan_memory_arch(arch, dtype_bytes=dtype_bytes, mode=TRAINING, name=name)
+    plan = plan_memory_arch(arch, dtype_bytes=dtype_bytes, mode=TRAINING, name=name, recompute=segments)
+
+    recomputed = [arch.get_layer(layer_name) for layer_name in _flatten(segments)]
+    return RecomputeReport(
+        baseline=baseline,
+        plan=plan,
+        segments=segments,
+        forward_macs=sum(layer_macs(spec) for spec in arch.layers),
+        recompute_macs=sum(layer_macs(spec) for spec in recomputed),
+        recompute_bytes_per_sample=sum(
+            num_elements(shape[1:]) * dtype_bytes
+            for spec in recomputed
+            for shape in spec.output_shapes
+        )
+    )
@@ -0,0 +1,24 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+from .batchnorm_folding import (
+    fold_batchnorm, find_batchnorm_chains, fold_batchnorm_into_conv, get_batchnorm_scale_shift, batchnorm_to_depthwise
+)
+from .utils import remove_dropout, rewire
+from .padding import fuse_zero_padding, same_padding
+from .pointwise_merge import merge_pointwise_convs, merge_weights, split_weights, find_pointwise_groups
+from .shuffle_elimination import remove_channel_shuffle, shuffle_permutation
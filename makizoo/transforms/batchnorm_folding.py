@@ -0,0 +1,232 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy as np
+
+from makizoo.ir import ArchitectureIR
+from .utils import rewire, single_consumer, remove_dropout
+
+
+# Default epsilon of the MakiFlow BatchNormLayer
+BATCHNORM_DEFAULT_EPS = 1e-4
+
+CONV_LAYERS = ('ConvLayer', 'AtrousConvLayer', 'DepthWiseConvLayer')
+
+
+def get_batchnorm_scale_shift(bn_spec, bn_weights):
+    """
+    Return `scale` and `shift` of the batch normalization at inference,
+    i.e. bn(x) = x * scale + shift.
+
+    """
+    mean = bn_weights['mean']
+    var = bn_weights['var']
+    gamma = bn_weights['gamma'] if bn_spec.kwargs.get('use_gamma', True) else np.ones_like(mean)
+    beta = bn_weights['beta'] if bn_spec.kwargs.get('use_beta', True) else np.zeros_like(mean)
+    eps = bn_spec.kwargs.get('eps', BATCHNORM_DEFAULT_EPS)
+
+    scale = gamma / np.sqrt(var + eps)
+    shift = beta - mean * scale
+    return scale, shift
+
+
+def fold_batchnorm_into_conv(conv_spec, conv_weights, bn_spec, bn_weights):
+    """
+    Fold parameters of the batch normalization into the weights and bias of the preceding convolution.
+
+    Parameters
+    ----------
+    conv_spec : LayerSpec
+        Spec of ConvLayer, AtrousConvLayer or DepthWiseConvLayer.
+    conv_weights : dict
+        {'W': np.ndarray, 'b': np.ndarray}, bias can be absent if layer does not use it.
+    bn_spec : LayerSpec
+        Spec of BatchNormLayer.
+    bn_weights : dict
+        {'mean': np.ndarray, 'var': np.ndarray, 'gamma': np.ndarray, 'beta': np.ndarray}.
+
+    Returns
+    -------
+    dict
+        New weights of the convolution {'W': np.ndarray, 'b': np.ndarray}.
+
+    """
+    scale, shift = get_batchnorm_scale_shift(bn_spec, bn_weights)
+
+    W = np.asarray(conv_weights['W'])
+    b = conv_weights.get('b')
+    if b is None or not conv_spec.kwargs.get('use_bias', True):
+        b = np.zeros(conv_spec.out_f, dtype=W.dtype)
+
+    if conv_spec.type == 'DepthWiseConvLayer':
+        # W: [kh, kw, in_f, multiplier], output channel is `in_f_index * multiplier + multiplier_index`
+        W = W * scale.reshape(W.shape[2], W.shape[3])
+    else:
+        # W: [kh, kw, in_f, out_f]
+        W = W * scale
+
+    return {
+        'W': W.astype(conv_weights['W'].dtype),
+        'b': (b * scale + shift).astype(conv_weights['W'].dtype)
+    }
+
+
+def find_batchnorm_chains(arch: ArchitectureIR, fuse_activation=True):
+    """
+    Find chains Conv -> BN (-> Activation) which are folded by `fold_batchnorm`:
+    convolution without activation which output is used only by BatchNormLayer.
+
+    Returns
+    -------
+    list
+        List of triples (conv spec, batch normalization spec, activation spec or None).
+
+    """
+    chains = []
+    for spec in arch.layers:
+        if spec.type not in CONV_LAYERS or spec.activation is not None:
+            continue
+
+        bn_spec = single_consumer(arch, spec, 'BatchNormLayer')
+        if bn_spec is None:
+            continue
+
+        activation_spec = single_consumer(arch, bn_spec, 'ActivationLayer') if fuse_activation else None
+        chains.append((spec, bn_spec, activation_spec))
+    return chains
+
+
+def fold_batchnorm(arch: ArchitectureIR, weights, fuse_activation=True):
+    """
+    Inference transform: fold every BatchNormLayer which follows ConvLayer, AtrousConvLayer or DepthWiseConvLayer
+    into the weights and bias of the convolution. If `fuse_activation` is True, ActivationLayer
+    after the batch normalization is fused into the convolution too,
+    i.e. chain Conv -> BN -> Activation becomes single Conv (with bias and activation).
+    Dropout layers are removed, because they are identity at inference.
+
+    Layers which outputs are used somewhere else (for example, conv which output is the output of the model)
+    are left as is. Names of the convolutions are kept.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model, see `makizoo.ir.trace`.
+    weights : dict
+        Weights of the model, see `makizoo.ir.weights`.
+    fuse_activation : bool
+        Fuse activation into convolution.
+
+    Returns
+    -------
+    arch : ArchitectureIR
+        Transformed IR.
+    weights : dict
+        New (smaller) weights of the transformed IR.
+
+    Examples
+    --------
+    >>> arch = trace(MobileNetV2_1_0, input_shape=[1, 224, 224, 3], include_top=True)
+    >>> fused_arch, fused_weights = fold_batchnorm(arch, weights)
+    >>> save_weights(fused_weights, 'mobilenetv2_fused.npz')
+    >>> in_x, output = fused_arch.lower(weights=fused_weights)
+
+    """
+    arch = remove_dropout(arch)
+    new_weights = dict(weights)
+
+    removed = set()
+    rename = {}
+    for spec, bn_spec, activation_spec in find_batchnorm_chains(arch, fuse_activation):
+        new_weights[spec.name] = fold_batchnorm_into_conv(
+            spec, weights[spec.name], bn_spec, weights[bn_spec.name]
+        )
+        new_weights.pop(bn_spec.name, None)
+        spec.kwargs['use_bias'] = True
+        removed.add(bn_spec.name)
+        rename[bn_spec.outputs[0]] = spec.outputs[0]
+
+        if activation_spec is None:
+            continue
+
+        if 'activation' in activation_spec.kwargs:
+            spec.kwargs['activation'] = activation_spec.kwargs['activation']
+        else:
+            # Default activation of the ActivationLayer and ConvLayer are the same
+            spec.kwargs.pop('activation', None)
+        removed.add(activation_spec.name)
+        rename[activation_spec.outputs[0]] = spec.outputs[0]
+
+    return rewire(arch, removed, rename), new_weights
+
+
+def batchnorm_to_depthwise(arch: ArchitectureIR, weights, fuse_activation=True):
+    """
+    Replace every BatchNormLayer (usually the ones left by `fold_batchnorm`, for example pre-activation
+    batch normalization of ResNet) by 1x1 DepthWiseConvLayer with the same name, kernel `scale` and bias `shift`.
+    Int8 TFLite models have no per-channel affine op, while the depthwise convolution is quantized per channel
+    without loss (one weight per channel) and fuses the following activation.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model.
+    weights : dict
+        Weights of the model, see `makizoo.ir.weights`.
+    fuse_activation : bool
+        Fuse ActivationLayer after the batch normalization into the depthwise convolution.
+
+    Returns
+    -------
+    arch : ArchitectureIR
+        Transformed IR.
+    weights : dict
+        New weights of the transformed IR.
+
+    """
+    arch = arch.copy()
+    new_weights = dict(weights)
+
+    removed = set()
+    rename = {}
+    for spec in arch.layers:
+        if spec.type != 'BatchNormLayer':
+            continue
+
+        scale, shift = get_batchnorm_scale_shift(spec, weights[spec.name])
+        dtype = np.asarray(weights[spec.name]['mean']).dtype
+        new_weights[spec.name] = {
+            'W': scale.reshape(1, 1, -1, 1).astype(dtype),
+            'b': shift.astype(dtype),
+        }
+        kwargs = dict(kw=1, kh=1, in_f=spec.kwargs['D'], multiplier=1, activation=None, use_bias=True)
+        if 'data_format' in spec.kwargs:
+            kwargs['data_format'] = spec.kwargs['data_format']
+        spec.type = 'DepthWiseConvLayer'
+        spec.kwargs = kwargs
+
+        activation_spec = single_consumer(arch, spec, 'ActivationLayer') if fuse_activation else None
+        if activation_spec is None:
+            continue
+
+        if 'activation' in activation_spec.kwargs:
+            spec.kwargs['activation'] = activation_spec.kwargs['activation']
+        else:
+            spec.kwargs.pop('activation')
+        removed.add(activation_spec.name)
+        rename[activation_spec.outputs[0]] = spec.outputs[0]
+
+    return rewire(arch, removed, rename), new_weights
@@ -0,0 +1,133 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+from makizoo.ir import ArchitectureIR, NHWC, spatial_axes, from_nhwc
+from makizoo.ir.layout import spec_data_format
+from .utils import rewire
+
+
+# Activations which outputs are non-negative
+NON_NEGATIVE_ACTIVATIONS = ('relu', 'relu6')
+
+
+def same_padding(size, kernel, stride, rate=1):
+    """
+    Padding (before, after) which is used by tensorflow for 'SAME' mode, None if `size` is unknown.
+
+    """
+    if size is None:
+        return None
+    effective_kernel = (kernel - 1) * rate + 1
+    out_size = -(-size // stride)
+    total = max((out_size - 1) * stride + effective_kernel - size, 0)
+    return total // 2, total - total // 2
+
+
+def _is_same_padding(padding, input_shape, kernel, stride, rate=1, data_format=NHWC):
+    return all(
+        same_padding(input_shape[shape_axis], kernel[axis], stride[axis], rate) == tuple(padding[axis])
+        for axis, shape_axis in enumerate(spatial_axes(data_format))
+    )
+
+
+def _is_non_negative(arch: ArchitectureIR, tensor_name):
+    spec = arch.producer(tensor_name)
+    return spec.activation in NON_NEGATIVE_ACTIVATIONS and spec.type in ('ActivationLayer', 'ConvLayer', 'AtrousConvLayer', 'DenseLayer')
+
+
+def _fused_padding(arch: ArchitectureIR, pad_spec, consumer):
+    """
+    Return new value of `padding` argument of the consumer of ZeroPaddingLayer,
+    None if padding can not be fused into consumer without change of the result.
+
+    """
+    padding = pad_spec.kwargs['padding']
+    input_shape = arch.get_shape(pad_spec.inputs[0])
+    data_format = spec_data_format(pad_spec)
+    if spec_data_format(consumer) != data_format:
+        return None
+
+    if consumer.type == 'ConvLayer' and consumer.kwargs.get('padding', 'SAME') == 'VALID':
+        if _is_same_padding(padding, input_shape, consumer.kernel, consumer.stride, data_format=data_format):
+            return 'SAME'
+        return from_nhwc([[0, 0], list(padding[0]), list(padding[1]), [0, 0]], data_format)
+
+    # Atrous convolution supports only 'SAME' and 'VALID' modes
+    if (
+            consumer.type == 'AtrousConvLayer' and consumer.kwargs.get('padding', 'SAME') == 'VALID' and
+            _is_same_padding(
+                padding, input_shape, consumer.kernel, consumer.stride, consumer.kwargs['rate'], data_format
+            )
+    ):
+        return 'SAME'
+
+    # For max pooling zeros of padding and padding of the 'SAME' mode (which is ignored in max operation)
+    # give equal result only if input is non-negative and paddings are equal
+    if (
+            consumer.type == 'MaxPoolLayer' and consumer.kwargs.get('padding', 'SAME') == 'VALID' and
+            _is_non_negative(arch, pad_spec.inputs[0]) and
+            _is_same_padding(padding, input_shape, consumer.kernel, consumer.stride, data_format=data_format)
+    ):
+        return 'SAME'
+
+    return None
+
+
+def fuse_zero_padding(arch: ArchitectureIR):
+    """
+    Remove ZeroPaddingLayer which is followed by convolution (or max pooling) with 'VALID' padding,
+    padding is applied inside the consumer instead, so intermediate padded tensor is not created.
+
+    Padding of the convolution becomes 'SAME' if it is equal to the padding of the tensorflow
+    for this geometry (for example, 3x3 convolution with stride 1 and zero padding 1),
+    otherwise explicit padding is used (for example, for 3x3 convolution with stride 2,
+    'SAME' mode of the tensorflow pads 0 pixels before and 1 after).
+    Max pooling takes padding only if it is equal to 'SAME' mode and input is non-negative (after relu),
+    because tensorflow does not support explicit padding for pooling.
+
+    Weights and names of the layers are not changed, so pretrained weights
+    (for example, of ResNet18 and ResNet34) can be loaded into the transformed model.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model, see `makizoo.ir.trace`.
+
+    Returns
+    -------
+    ArchitectureIR
+        Transformed IR.
+
+    """
+    arch = arch.copy()
+    removed = set()
+    rename = {}
+    for spec in arch.layers:
+        if spec.type != 'ZeroPaddingLayer' or spec.outputs[0] in arch.outputs:
+            continue
+
+        consumers = arch.consumers(spec.outputs[0])
+        new_paddings = [_fused_padding(arch, spec, consumer) for consumer in consumers]
+        if len(consumers) == 0 or any(padding is None for padding in new_paddings):
+            continue
+
+        for consumer, padding in zip(consumers, new_paddings):
+            consumer.kwargs['padding'] = padding
+        removed.add(spec.name)
+        rename[spec.outputs[0]] = spec.inputs[0]
+
+    return rewire(arch, removed, rename)
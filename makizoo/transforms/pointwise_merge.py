@@ -0,0 +1,180 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy as np
+
+from makizoo.ir import ArchitectureIR, channel_axis
+from makizoo.ir.layout import spec_data_format
+from .utils import rewire, make_spec
+
+
+MERGED_SEPARATOR = '_'
+SPLIT_POSTFIX = '/split'
+ACTIVATION_POSTFIX = '/activation'
+
+
+def _merged_name(names):
+    """
+    Create name of the merged layer from names of the original layers, for example:
+    ['block2/unit_1/bottleneck_v1/conv1/weights', 'block2/unit_1/bottleneck_v1/shortcut/weights'] ->
+    'block2/unit_1/bottleneck_v1/conv1_shortcut/weights'.
+
+    """
+    parts = [name.split('/') for name in names]
+    prefix = []
+    for components in zip(*parts):
+        if len(set(components)) != 1:
+            break
+        prefix.append(components[0])
+
+    rests = [name_parts[len(prefix):] for name_parts in parts]
+    tails = set(tuple(rest[1:]) for rest in rests)
+    if len(tails) == 1 and all(len(rest) > 0 for rest in rests):
+        head = MERGED_SEPARATOR.join(rest[0] for rest in rests)
+        return '/'.join(prefix + [head] + list(tails.pop()))
+    return '/'.join(prefix + [MERGED_SEPARATOR.join('/'.join(rest) for rest in rests)])
+
+
+def _merge_key(spec):
+    return (
+        spec.stride,
+        str(spec.padding),
+        spec.activation,
+        spec.kwargs.get('use_bias', True),
+        spec.kwargs.get('kernel_initializer'),
+        spec_data_format(spec),
+    )
+
+
+def find_pointwise_groups(arch: ArchitectureIR):
+    """
+    Find groups of 1x1 ConvLayer which read the same tensor with identical geometry
+    (for example, `conv1` and `shortcut` in the ResNetConvBlockV1).
+
+    Returns
+    -------
+    list
+        List of lists of the specs, every list has at least 2 specs.
+
+    """
+    groups = []
+    for tensor_name in arch.inputs + [name for spec in arch.layers for name in spec.outputs]:
+        candidates = {}
+        for consumer in arch.consumers(tensor_name):
+            if consumer.type == 'ConvLayer' and consumer.kernel == (1, 1):
+                candidates.setdefault(_merge_key(consumer), []).append(consumer)
+
+        groups += [group for group in candidates.values() if len(group) > 1]
+    return groups
+
+
+def merge_pointwise_convs(arch: ArchitectureIR):
+    """
+    Merge 1x1 convolutions which read the same input with identical geometry into one wide convolution
+    which output is split back into parts, i.e. input is read only once and one large GEMM
+    is used instead of several smaller ones.
+    In ResNet with pointwise blocks it merges `bottleneck_v1/conv1` and `bottleneck_v1/shortcut`
+    of every ResNetConvBlockV1 into `bottleneck_v1/conv1_shortcut`.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model, see `makizoo.ir.trace`.
+
+    Returns
+    -------
+    arch : ArchitectureIR
+        Transformed IR.
+    merge_map : dict
+        Mapping from the name of the merged layer to the list of (original_name, out_f),
+        use it with `merge_weights` and `split_weights` to convert weights between original and merged IR.
+
+    """
+    arch = arch.copy()
+    merge_map = {}
+    rename = {}
+    removed = set()
+    # Position of the first layer of the group -> list of new specs
+    inserted = {}
+    for group in find_pointwise_groups(arch):
+        names = [spec.name for spec in group]
+        merged_name = _merged_name(names)
+        merge_map[merged_name] = [(spec.name, spec.out_f) for spec in group]
+
+        kwargs = dict(group[0].kwargs)
+        kwargs['out_f'] = sum(spec.out_f for spec in group)
+        new_specs = [
+            make_spec(merged_name, 'ConvLayer', kwargs, inputs=list(group[0].inputs)),
+            make_spec(
+                merged_name + SPLIT_POSTFIX, 'ChannelSplitLayer',
+                {
+                    'num_or_size_splits': [spec.out_f for spec in group],
+                    'axis': channel_axis(spec_data_format(group[0])),
+                },
+                inputs=[merged_name], num_outputs=len(group)
+            )
+        ]
+        split_outputs = new_specs[-1].outputs
+
+        for spec, split_output in zip(group, split_outputs):
+            removed.add(spec.name)
+            rename[spec.outputs[0]] = split_output
+
+        inserted[min(arch.layers.index(spec) for spec in group)] = new_specs
+
+    layers = []
+    for index, spec in enumerate(arch.layers):
+        layers += inserted.get(index, [])
+        layers.append(spec)
+
+    return rewire(ArchitectureIR(layers, arch.inputs, arch.outputs), removed, rename), merge_map
+
+
+def merge_weights(weights, merge_map):
+    """
+    Convert weights of the original IR into weights of the IR with merged convolutions.
+
+    """
+    new_weights = dict(weights)
+    for merged_name, parts in merge_map.items():
+        params = {'W': np.concatenate([weights[name]['W'] for name, _ in parts], axis=-1)}
+        if all('b' in weights[name] for name, _ in parts):
+            params['b'] = np.concatenate([weights[name]['b'] for name, _ in parts], axis=-1)
+
+        new_weights[merged_name] = params
+        for name, _ in parts:
+            new_weights.pop(name)
+    return new_weights
+
+
+def split_weights(weights, merge_map):
+    """
+    Convert weights of the IR with merged convolutions back into weights of the original IR,
+    i.e. with the original names (for example, `bottleneck_v1/shortcut/weights`).
+
+    """
+    new_weights = dict(weights)
+    for merged_name, parts in merge_map.items():
+        params = new_weights.pop(merged_name)
+        sections = np.cumsum([out_f for _, out_f in parts])[:-1]
+        splitted = {
+            param_name: np.split(value, sections, axis=-1)
+            for param_name, value in params.items()
+        }
+        for i, (name, _) in enumerate(parts):
+            new_weights[name] = {param_name: values[i] for param_name, values in splitted.items()}
+    return new_weights
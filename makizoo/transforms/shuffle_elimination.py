@@ -0,0 +1,340 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy as np
+
+from makizoo.ir import ArchitectureIR, rebuild, NHWC
+from makizoo.ir.layout import spec_data_format
+from .utils import make_spec
+
+
+# Layers which output channel `i` depends only on the input channel `i`,
+# permutation of the input is propagated to the output (parameters are permuted too)
+CHANNELWISE_LAYERS = (
+    'BatchNormLayer', 'ActivationLayer', 'DepthWiseConvLayer', 'MaxPoolLayer', 'AvgPoolLayer',
+    'GlobalAvgPoolLayer', 'ZeroPaddingLayer', 'DropoutLayer'
+)
+# Layers which absorb permutation of the input into the weights and can produce output in any order
+ABSORBING_LAYERS = ('ConvLayer', 'AtrousConvLayer', 'DenseLayer')
+
+SLICE_POSTFIX = '/channel_split'
+
+
+def shuffle_permutation(channels, num_groups):
+    """
+    Permutation of the ChannelShuffleLayer: output channel `j` is the input channel `perm[j]`.
+
+    """
+    group_size = channels // num_groups
+    return np.array([(j % num_groups) * group_size + j // num_groups for j in range(channels)])
+
+
+def _runs(positions):
+    """
+    Split positions into runs of consecutive values: [0, 1, 2, 5, 6] -> [(0, 3), (5, 7)].
+
+    """
+    runs = []
+    for position in positions:
+        if runs and runs[-1][1] == position:
+            runs[-1][1] += 1
+        else:
+            runs.append([position, position + 1])
+    return [tuple(run) for run in runs]
+
+
+class _Piece:
+    """
+    Part of the tensor of the original IR which is stored in the tensor `source` of the new IR:
+    original channel `channels[i]` is stored at the channel `positions[i]` of the `source`.
+
+    """
+    def __init__(self, source, positions, channels):
+        self.source = source
+        self.positions = list(positions)
+        self.channels = list(channels)
+
+
+class _Propagation:
+    """
+    Build the IR without channel shuffles by propagation of the channel permutations.
+
+    Every tensor of the original IR is represented by the list of pieces of the tensors of the new IR,
+    so concat, split and shuffle layers do not copy anything: they only change the pieces.
+    Tensors are materialized (pieces are sliced and concatenated) only for the layers which need them
+    and the permutation of the materialized tensor is absorbed into the weights of the consumers.
+
+    Parameters
+    ----------
+    orders : dict
+        Order of the output channels of the absorbing layers.
+        Output channel `i` of the new layer is the output channel `orders[name][i]` of the original layer.
+    boundaries : dict
+        Positions at which tensors of the new IR are sliced. If None, boundaries are collected.
+
+    """
+    def __init__(self, arch: ArchitectureIR, weights, orders, boundaries=None):
+        self.arch = arch
+        self.src_weights = weights
+        self.orders = orders
+        self.collect = boundaries is None
+        self.boundaries = {} if boundaries is None else boundaries
+
+        self.layers = []
+        self.weights = {}
+        # Splits of the channels which every output channel of the absorbing layers goes through
+        self.paths = {}
+        self.layouts = {}
+        self.materialized = {}
+        self.slices = {}
+        self.sizes = {}
+        # Tensor of the new IR -> (name of the absorbing layer, its output channel for every position)
+        self.roots = {}
+
+    def run(self):
+        for tensor_name in self.arch.inputs:
+            size = self.arch.get_shape(tensor_name)[-1]
+            self._add_source(tensor_name, size)
+            self.layouts[tensor_name] = [_Piece(tensor_name, range(size), range(size))]
+
+        for spec in self.arch.layers:
+            if spec.type in ABSORBING_LAYERS:
+                self._absorb(spec)
+            elif spec.type in CHANNELWISE_LAYERS and spec.kwargs.get('multiplier', 1) == 1:
+                self._channelwise(spec)
+            elif spec.type == 'ChannelShuffleLayer' and self._is_last_axis(spec, spec.inputs[0], 3):
+                self._shuffle(spec)
+            elif spec.type == 'ConcatLayer' and self._is_last_axis(spec, spec.outputs[0], 3):
+                self._concat(spec)
+            elif spec.type == 'ChannelSplitLayer' and self._is_last_axis(spec, spec.inputs[0], 3):
+                self._split(spec)
+            else:
+                self._keep(spec)
+
+        outputs = [self._materialize_identity(tensor_name, 'output of the model') for tensor_name in self.arch.outputs]
+        return outputs
+
+    def _is_last_axis(self, spec, tensor_name, default):
+        rank = len(self.arch.get_shape(tensor_name))
+        axis = spec.kwargs.get('axis', default)
+        return axis % rank == rank - 1
+
+    def _emit(self, name, type, kwargs, inputs, num_outputs=1, weights=None):
+        spec = make_spec(name, type, kwargs, inputs, num_outputs)
+        self.layers.append(spec)
+        if weights is not None:
+            self.weights[name] = weights
+        return spec
+
+    def _add_source(self, tensor_name, size, root=None):
+        self.sizes[tensor_name] = size
+        self.roots[tensor_name] = root
+
+        bounds = self.boundaries.get(tensor_name)
+        if self.collect or not bounds:
+            return
+
+        bounds = sorted(set(bounds) | {0, size})
+        split = self._emit(
+            tensor_name + SLICE_POSTFIX, 'ChannelSplitLayer',
+            {'num_or_size_splits': [end - start for start, end in zip(bounds[:-1], bounds[1:])], 'axis': -1},
+            inputs=[tensor_name], num_outputs=len(bounds) - 1
+        )
+        self.slices[tensor_name] = list(zip(bounds[:-1], bounds[1:], split.outputs))
+
+    def _slice(self, source, start, end):
+        if start == 0 and end == self.sizes[source]:
+            return [source]
+
+        if self.collect:
+            self.boundaries.setdefault(source, set()).update({start, end})
+            return [f'{source}[{start}:{end}]']
+        return [tensor_name for a, b, tensor_name in self.slices[source] if a >= start and b <= end]
+
+    def _materialize(self, tensor_name):
+        """
+        Return name of the tensor of the new IR with all channels of the original tensor
+        and the original channel of every its channel.
+
+        """
+        if tensor_name in self.materialized:
+            return self.materialized[tensor_name]
+
+        pieces = self.layouts[tensor_name]
+        channels = [channel for piece in pieces for channel in piece.channels]
+        parts = []
+        for piece in pieces:
+            for start, end in _runs(piece.positions):
+                parts += self._slice(piece.source, start, end)
+
+        if len(parts) == 1:
+            name = parts[0]
+        else:
+            name = tensor_name.replace(':', '_')
+            rank = len(self.arch.get_shape(tensor_name))
+            self._emit(name, 'ConcatLayer', {'axis': rank - 1}, inputs=parts)
+            self._add_source(name, len(channels))
+
+        self.materialized[tensor_name] = (name, channels)
+        return name, channels
+
+    def _materialize_identity(self, tensor_name, consumer):
+        name, channels = self._materialize(tensor_name)
+        if channels != list(range(len(channels))):
+            raise ValueError(f'Can not propagate permutation of the channels through {consumer}.')
+        return name
+
+    def _set_output(self, spec, channels, root=None):
+        tensor_name = spec.outputs[0]
+        self._add_source(tensor_name, len(channels), root)
+        self.layouts[tensor_name] = [_Piece(tensor_name, range(len(channels)), channels)]
+
+    def _absorb(self, spec):
+        input_name, perm = self._materialize(spec.inputs[0])
+        order = self.orders.get(spec.name, np.arange(spec.out_f))
+
+        weights = None
+        if spec.name in self.src_weights:
+            weights = dict(self.src_weights[spec.name])
+            # W: [kh, kw, in_f, out_f] for conv, [in_f, out_f] for dense
+            weights['W'] = np.take(np.take(weights['W'], perm, axis=-2), order, axis=-1)
+            if 'b' in weights:
+                weights['b'] = np.take(weights['b'], order)
+
+        self._emit(spec.name, spec.type, spec.kwargs, [input_name], weights=weights)
+        self._set_output(spec, list(order), root=(spec.name, list(order)))
+
+    def _channelwise(self, spec):
+        input_name, perm = self._materialize(spec.inputs[0])
+
+        weights = None
+        if spec.name in self.src_weights:
+            weights = dict(self.src_weights[spec.name])
+            for param_name, value in weights.items():
+                # Depthwise W: [kh, kw, in_f, 1], other parameters have shape [in_f]
+                weights[param_name] = np.take(value, perm, axis=2 if param_name == 'W' else 0)
+
+        self._emit(spec.name, spec.type, spec.kwargs, [input_name], weights=weights)
+        self._set_output(spec, perm, root=self.roots.get(input_name))
+
+    def _shuffle(self, spec):
+        size = self.arch.get_shape(spec.inputs[0])[-1]
+        inverse = np.argsort(shuffle_permutation(size, spec.kwargs['num_groups']))
+        self.layouts[spec.outputs[0]] = [
+            _Piece(piece.source, piece.positions, [int(inverse[channel]) for channel in piece.channels])
+            for piece in self.layouts[spec.inputs[0]]
+        ]
+
+    def _concat(self, spec):
+        pieces = []
+        offset = 0
+        for tensor_name in spec.inputs:
+            for piece in self.layouts[tensor_name]:
+                pieces.append(_Piece(piece.source, piece.positions, [channel + offset for channel in piece.channels]))
+            offset += self.arch.get_shape(tensor_name)[-1]
+        self.layouts[spec.outputs[0]] = pieces
+
+    def _split(self, spec):
+        start = 0
+        for part_index, (tensor_name, shape) in enumerate(zip(spec.outputs, spec.output_shapes)):
+            end = start + shape[-1]
+            pieces = []
+            for piece in self.layouts[spec.inputs[0]]:
+                selected = [
+                    (position, channel) for position, channel in zip(piece.positions, piece.channels)
+                    if start <= channel < end
+                ]
+                if not selected:
+                    continue
+
+                pieces.append(_Piece(
+                    piece.source,
+                    [position for position, _ in selected],
+                    [channel - start for _, channel in selected]
+                ))
+                root = self.roots.get(piece.source)
+                if root is not None:
+                    root_name, root_channels = root
+                    paths = self.paths.setdefault(root_name, {})
+                    for position, _ in selected:
+                        paths.setdefault(root_channels[position], []).append(part_index)
+
+            self.layouts[tensor_name] = pieces
+            start = end
+
+    def _keep(self, spec):
+        inputs = [self._materialize_identity(tensor_name, f'{spec.type} {spec.name}') for tensor_name in spec.inputs]
+        self._emit(
+            spec.name, spec.type, spec.kwargs, inputs,
+            num_outputs=len(spec.outputs), weights=self.src_weights.get(spec.name)
+        )
+        for tensor_name, shape in zip(spec.outputs, spec.output_shapes):
+            size = shape[-1] if len(shape) > 1 else 1
+            self._add_source(tensor_name, size)
+            self.layouts[tensor_name] = [_Piece(tensor_name, range(size), range(size))]
+
+
+def remove_channel_shuffle(arch: ArchitectureIR, weights):
+    """
+    Remove all ChannelShuffleLayer from the IR by propagation of the channel permutation into the weights.
+
+    Channel shuffle, concat and split layers become views of the tensors of the new IR. Tensors are
+    sliced and concatenated only where a layer needs them as a whole, and the permutation of the channels
+    is absorbed by the weights of the convolutions (or dense layers),
+    depthwise convolutions and batch normalization are permuted along.
+    Output channels of the convolutions are reordered in the way that every split of the original IR
+    selects contiguous slices of the new tensors. For ShuffleNetV2 it replaces concat, shuffle and split
+    of every unit with one split of the branch output and one concat of the input of the next unit.
+    Names of the layers with weights are not changed.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR of the model, see `makizoo.ir.trace`.
+    weights : dict
+        Weights of the model.
+
+    Returns
+    -------
+    arch : ArchitectureIR
+        IR without ChannelShuffleLayer.
+    weights : dict
+        Permuted weights for the new IR.
+
+    """
+    if any(spec_data_format(spec) != NHWC for spec in arch.layers):
+        raise ValueError('Channel shuffle can be removed only from the IR with NHWC data format.')
+
+    # Collect splits which every output channel of the convolutions goes through
+    propagation = _Propagation(arch, weights, orders={})
+    propagation.run()
+
+    # Channels which go through the same splits are placed together, so every split is a contiguous slice
+    orders = {}
+    for layer_name, paths in propagation.paths.items():
+        out_f = arch.get_layer(layer_name).out_f
+        orders[layer_name] = np.array(
+            sorted(range(out_f), key=lambda channel: tuple(paths.get(channel, ())))
+        )
+
+    propagation = _Propagation(arch, weights, orders=orders)
+    propagation.run()
+
+    propagation = _Propagation(arch, weights, orders=orders, boundaries=propagation.boundaries)
+    outputs = propagation.run()
+    new_arch = rebuild(ArchitectureIR(propagation.layers, arch.inputs, outputs))
+    return new_arch, propagation.weights
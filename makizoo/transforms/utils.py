@@ -0,0 +1,115 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+from makizoo.ir import ArchitectureIR, LayerSpec, rebuild
+
+
+def resolve_tensor(tensor_name, rename):
+    """
+    Follow chain of renames of the tensor.
+
+    """
+    while tensor_name in rename:
+        tensor_name = rename[tensor_name]
+    return tensor_name
+
+
+def rewire(arch: ArchitectureIR, removed, rename):
+    """
+    Remove layers from the IR and reconnect their consumers.
+
+    Parameters
+    ----------
+    arch : ArchitectureIR
+        IR which specs will be reused (pass a copy if original IR is still needed).
+    removed : set
+        Names of the layers which must be removed.
+    rename : dict
+        Mapping from the name of the tensor (usually output of removed layer)
+        to the name of the tensor which must be used instead of it.
+
+    Returns
+    -------
+    ArchitectureIR
+        New IR with recomputed shapes.
+
+    """
+    layers = []
+    for spec in arch.layers:
+        if spec.name in removed:
+            continue
+        spec.inputs = [resolve_tensor(tensor_name, rename) for tensor_name in spec.inputs]
+        layers.append(spec)
+
+    outputs = [resolve_tensor(tensor_name, rename) for tensor_name in arch.outputs]
+    return rebuild(ArchitectureIR(layers, arch.inputs, outputs))
+
+
+def single_consumer(arch: ArchitectureIR, spec, layer_type=None):
+    """
+    Return the only consumer of the output of the `spec`,
+    None if there are several consumers, output is the output of the model or type of the consumer is not `layer_type`.
+
+    """
+    tensor_name = spec.outputs[0]
+    if len(spec.outputs) != 1 or tensor_name in arch.outputs:
+        return None
+
+    consumers = arch.consumers(tensor_name)
+    if len(consumers) != 1:
+        return None
+
+    consumer = consumers[0]
+    if layer_type is not None and consumer.type != layer_type:
+        return None
+    return consumer
+
+
+def remove_dropout(arch: ArchitectureIR):
+    """
+    Remove all DropoutLayer from the IR (they are identity at inference).
+
+    """
+    arch = arch.copy()
+    removed = set()
+    rename = {}
+    for spec in arch.layers:
+        if spec.type == 'DropoutLayer':
+            removed.add(spec.name)
+            rename[spec.outputs[0]] = spec.inputs[0]
+    return rewire(arch, removed, rename)
+
+
+def make_spec(name, type, kwargs, inputs, num_outputs=1):
+    """
+    Create spec of the new layer which will be inserted into IR.
+    Shapes and attributes of the spec are filled after `rewire` (or `rebuild`).
+
+    """
+    if num_outputs == 1:
+        outputs = [name]
+    else:
+        outputs = [f'{name}:{i}' for i in range(num_outputs)]
+
+    return LayerSpec(
+        name=name,
+        type=type,
+        kwargs=kwargs,
+        inputs=inputs,
+        outputs=outputs,
+        output_shapes=[[] for _ in outputs]
+    )
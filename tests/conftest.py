@@ -0,0 +1,66 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def random_ir_weights():
+    """
+    Function (arch, seed) -> random weights of the IR with non-trivial statistics of batch normalization.
+
+    """
+    from makizoo.ir.weights import random_weights
+
+    def create(arch, seed=0):
+        rng = np.random.RandomState(seed)
+        weights = random_weights(arch, seed)
+        for spec in arch.layers:
+            if spec.type == 'BatchNormLayer':
+                size = spec.out_f
+                weights[spec.name].update({
+                    'mean': rng.normal(0.0, 0.1, size).astype(np.float32),
+                    'var': rng.uniform(0.5, 1.5, size).astype(np.float32),
+                    'gamma': rng.uniform(0.5, 1.5, size).astype(np.float32),
+                    'beta': rng.normal(0.0, 0.1, size).astype(np.float32),
+                })
+        return weights
+
+    return create
+
+
+@pytest.fixture
+def run_ir():
+    """
+    Function (arch, weights, x, tensor_names=None) -> values of the tensors of the IR
+    (outputs of the model by default) computed with raw TensorFlow ops, see `makizoo.ir.build_tf_graph`.
+
+    """
+    tf = pytest.importorskip('tensorflow').compat.v1
+    from makizoo.ir import build_tf_graph
+
+    def run(arch, weights, x, tensor_names=None):
+        if tensor_names is None:
+            tensor_names = arch.outputs
+        graph = tf.Graph()
+        with graph.as_default():
+            tensors = build_tf_graph(arch, weights, inputs={arch.inputs[0]: tf.constant(x)})
+            with tf.Session(graph=graph) as sess:
+                return sess.run([tensors[tensor_name] for tensor_name in tensor_names])
+
+    return run
@@ -0,0 +1,69 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy as np
+import pytest
+
+tf = pytest.importorskip('tensorflow').compat.v1
+
+from makizoo.ir import ArchitectureIR, build_tf_graph, NHWC, NCHW, from_nhwc, to_nhwc, layout_kwargs, trace
+from makizoo.ir import layers
+
+
+def _shuffle(data_format, groups=2, channels=6):
+    in_x = layers.InputLayer(
+        input_shape=from_nhwc([None, None, None, channels], data_format), name='input', **layout_kwargs(data_format)
+    )
+    x = layers.ChannelShuffleLayer(num_groups=groups, name='shuffle', **layout_kwargs(data_format))(in_x)
+    return ArchitectureIR.from_tensors(in_x, x)
+
+
+def _run(arch, weights, values):
+    graph = tf.Graph()
+    with graph.as_default():
+        tensors = build_tf_graph(arch, weights)
+        with tf.Session(graph=graph) as sess:
+            return [
+                sess.run(tensors[arch.outputs[0]], feed_dict={tensors[arch.inputs[0]]: value}) for value in values
+            ]
+
+
+@pytest.mark.parametrize('data_format', [NHWC, NCHW])
+def test_shuffle_with_unknown_spatial_size(data_format):
+    rng = np.random.RandomState(0)
+    # Different batch sizes and spatial sizes are fed into the same graph
+    values = [rng.normal(size=[1, 4, 5, 6]).astype(np.float32), rng.normal(size=[3, 7, 2, 6]).astype(np.float32)]
+    inputs = [value.transpose(from_nhwc([0, 1, 2, 3], data_format)) for value in values]
+    outputs = _run(_shuffle(data_format), {}, inputs)
+
+    for value, output in zip(values, outputs):
+        # Channel c * groups + g of the output is channel g * (channels / groups) + c of the input
+        expected = value.reshape(value.shape[:3] + (2, 3)).swapaxes(3, 4).reshape(value.shape)
+        np.testing.assert_array_equal(output.transpose(to_nhwc([0, 1, 2, 3], data_format)), expected)
+
+
+def test_shufflenet_with_unknown_spatial_size():
+    pytest.importorskip('makiflow')
+    from makizoo.backbones.shufflenetv2 import ShuffleNetv2_05
+    from makizoo.ir.weights import random_weights
+
+    arch = trace(ShuffleNetv2_05, input_shape=[None, None, None, 3])
+    rng = np.random.RandomState(0)
+    sizes = [64, 96]
+    outputs = _run(arch, random_weights(arch, 0), [rng.normal(size=[2, size, size, 3]) for size in sizes])
+    for size, output in zip(sizes, outputs):
+        assert output.shape[0] == 2 and output.shape[1] == size // 32
@@ -0,0 +1,44 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow')
+
+from makizoo.ir import ArchitectureIR, NHWC, NCHW, from_nhwc, layout_kwargs
+from makizoo.ir import layers
+
+
+def _flatten_dense(data_format):
+    in_x = layers.InputLayer(
+        input_shape=from_nhwc([2, 3, 4, 5], data_format), name='input', **layout_kwargs(data_format)
+    )
+    x = layers.FlattenLayer(name='flatten', **layout_kwargs(data_format))(in_x)
+    x = layers.DenseLayer(in_d=60, out_d=7, activation=None, name='fc')(x)
+    return ArchitectureIR.from_tensors(in_x, x)
+
+
+def test_flatten_order_does_not_depend_on_data_format(run_ir):
+    rng = np.random.RandomState(0)
+    weights = {'fc': {'W': rng.normal(size=[60, 7]).astype(np.float32), 'b': rng.normal(size=[7]).astype(np.float32)}}
+    x = rng.normal(size=[2, 3, 4, 5]).astype(np.float32)
+
+    nhwc, = run_ir(_flatten_dense(NHWC), weights, x)
+    nchw, = run_ir(_flatten_dense(NCHW), weights, x.transpose(0, 3, 1, 2))
+    np.testing.assert_allclose(nchw, nhwc, rtol=1e-5, atol=1e-5)
+    np.testing.assert_allclose(nhwc, x.reshape(2, -1) @ weights['fc']['W'] + weights['fc']['b'], rtol=1e-5, atol=1e-5)
@@ -0,0 +1,59 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow')
+pytest.importorskip('makiflow')
+
+from makizoo.ir import trace
+from makizoo.backbones.densenet.models import DenseNet121
+
+
+INPUT_SHAPE = [2, 64, 64, 3]
+
+
+def _weight_shapes(weights):
+    return {
+        layer_name: {param_name: np.shape(value) for param_name, value in params.items()}
+        for layer_name, params in weights.items()
+    }
+
+
+def test_pool_before_conv_keeps_layer_names_and_weights(random_ir_weights):
+    default = trace(DenseNet121, input_shape=INPUT_SHAPE, include_top=True)
+    pooled = trace(DenseNet121, input_shape=INPUT_SHAPE, include_top=True, pool_before_conv=True)
+
+    assert sorted(spec.name for spec in default.layers) == sorted(spec.name for spec in pooled.layers)
+    assert _weight_shapes(random_ir_weights(default)) == _weight_shapes(random_ir_weights(pooled))
+
+
+def test_pool_before_conv_is_numerically_equivalent(random_ir_weights, run_ir):
+    default = trace(DenseNet121, input_shape=INPUT_SHAPE, include_top=True)
+    pooled = trace(DenseNet121, input_shape=INPUT_SHAPE, include_top=True, pool_before_conv=True)
+    weights = random_ir_weights(default)
+    x = np.random.RandomState(1).normal(size=INPUT_SHAPE).astype(np.float32)
+
+    # Output of the transition block is the input of the next dense block, it is compared via the concats
+    concats = [spec.outputs[0] for spec in default.layers if spec.type == 'ConcatLayer']
+    expected = run_ir(default, weights, x, concats + default.outputs)
+    result = run_ir(pooled, weights, x, concats + pooled.outputs)
+    for expected_value, value in zip(expected, result):
+        # Sums are accumulated in a different order, so the tolerance follows the magnitude of the values
+        atol = 1e-5 * np.abs(expected_value).max()
+        np.testing.assert_allclose(value, expected_value, rtol=1e-4, atol=atol)
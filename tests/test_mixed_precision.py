@@ -0,0 +1,110 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy as np
+import pytest
+
+tf = pytest.importorskip('tensorflow').compat.v1
+
+from makizoo.ir import ArchitectureIR, build_tf_graph
+from makizoo.ir import layers
+from makizoo.training import mixed_precision
+from makizoo.training import (
+    get_mixed_precision_config, mixed_precision_drift, FLOAT32, FLOAT16, BFLOAT16
+)
+
+
+INPUT_SHAPE = [4, 8, 8, 3]
+
+
+def _small_model():
+    in_x = layers.InputLayer(input_shape=INPUT_SHAPE, name='input')
+    x = layers.ConvLayer(kw=3, kh=3, in_f=3, out_f=8, name='conv')(in_x)
+    x = layers.GlobalAvgPoolLayer(name='global_avg')(x)
+    x = layers.DenseLayer(in_d=8, out_d=5, activation=None, name='fc')(x)
+    return ArchitectureIR.from_tensors(in_x, x)
+
+
+def _build_graph(arch, weights):
+    """ Graph of the IR with weights stored in variables, returns (graph, input placeholder, logits). """
+    graph = tf.Graph()
+    with graph.as_default():
+        variables = {
+            layer_name: {name: tf.Variable(value, name=f'{layer_name}/{name}') for name, value in params.items()}
+            for layer_name, params in weights.items()
+        }
+        x = tf.placeholder(tf.float32, shape=INPUT_SHAPE, name='input')
+        tensors = build_tf_graph(arch, variables, inputs={arch.inputs[0]: x})
+    return graph, x, tensors[arch.outputs[0]]
+
+
+def test_float16_requires_gpu(monkeypatch):
+    monkeypatch.setattr(mixed_precision, '_gpu_available', lambda: False)
+    with pytest.raises(ValueError):
+        get_mixed_precision_config(FLOAT16)
+
+    monkeypatch.setattr(mixed_precision, '_gpu_available', lambda: True)
+    config = get_mixed_precision_config(FLOAT16)
+    assert config.graph_options.rewrite_options.auto_mixed_precision == 1
+
+
+def test_config_is_updated_in_place():
+    base = tf.ConfigProto(inter_op_parallelism_threads=2)
+    assert get_mixed_precision_config(FLOAT32, base) is base
+    assert base.graph_options.rewrite_options.auto_mixed_precision == 0
+
+    try:
+        config = get_mixed_precision_config(BFLOAT16, base)
+    except ValueError:
+        pytest.skip('installed tensorflow has no bfloat16 rewrite')
+    rewrite_options = config.graph_options.rewrite_options
+    fields = rewrite_options.DESCRIPTOR.fields_by_name
+    assert any(
+        getattr(rewrite_options, field) == 1 for field in mixed_precision._BFLOAT16_REWRITERS if field in fields
+    )
+    assert config.inter_op_parallelism_threads == 2
+
+
+def test_drift(random_ir_weights):
+    arch = _small_model()
+    weights = random_ir_weights(arch)
+    graph, x, logits = _build_graph(arch, weights)
+    feed_dict = {x: np.random.RandomState(1).uniform(-1, 1, size=INPUT_SHAPE).astype(np.float32)}
+
+    report = mixed_precision_drift([logits], feed_dict, FLOAT32)
+    assert report.max_abs_error == 0.0
+    assert report.top1_agreement == 1.0
+
+    # Values of the variables are taken from the session instead of the initializers
+    with graph.as_default():
+        bias, = [variable for variable in tf.global_variables() if variable.op.name == 'fc/b']
+        with tf.Session(graph=graph) as sess:
+            sess.run(tf.global_variables_initializer())
+            expected = sess.run(logits, feed_dict=feed_dict)
+            bias.load(np.ones(5, np.float32), sess)
+            shifted = sess.run(logits, feed_dict=feed_dict)
+            report = mixed_precision_drift(logits, feed_dict, FLOAT32, sess=sess)
+            np.testing.assert_allclose(sess.run(logits, feed_dict=feed_dict), shifted)
+    np.testing.assert_allclose(shifted - expected, np.broadcast_to(1.0 - weights['fc']['b'], shifted.shape), atol=1e-5)
+    assert report.max_abs_error == 0.0
+
+    try:
+        report = mixed_precision_drift([logits], feed_dict, BFLOAT16)
+    except ValueError:
+        pytest.skip('installed tensorflow has no bfloat16 rewrite')
+    assert report.compute_dtype == BFLOAT16
+    assert report.rel_error < 5e-2
@@ -0,0 +1,90 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy as np
+import pytest
+
+tf = pytest.importorskip('tensorflow').compat.v1
+
+from makizoo.ir import ArchitectureIR
+from makizoo.ir import layers
+from makizoo.quantize import build_qat_graph, calibrate, adjust_ranges, activation_qparams, fused_with_activation
+
+INPUT_SHAPE = [None, 8, 8, 3]
+
+
+def _small_model():
+    in_x = layers.InputLayer(input_shape=INPUT_SHAPE, name='input')
+    x = layers.ConvLayer(kw=3, kh=3, in_f=3, out_f=8, activation=None, use_bias=False, name='conv')(in_x)
+    x = layers.BatchNormLayer(D=8, name='conv_bn')(x)
+    x = layers.ActivationLayer(activation='relu6', name='conv_relu')(x)
+    y = layers.DepthWiseConvLayer(kw=3, kh=3, in_f=8, multiplier=1, activation=None, name='dw')(x)
+    y = layers.BatchNormLayer(D=8, name='dw_bn')(y)
+    y = layers.SumLayer(name='sum')([x, y])
+    # Batch normalization after the sum is not folded
+    y = layers.BatchNormLayer(D=8, name='bn')(y)
+    y = layers.ActivationLayer(activation='relu', name='relu')(y)
+    x = layers.ConcatLayer(name='cat')([x, y])
+    x = layers.MaxPoolLayer(name='pool')(x)
+    x = layers.GlobalAvgPoolLayer(name='global_avg')(x)
+    x = layers.DenseLayer(in_d=16, out_d=5, activation=None, name='fc')(x)
+    return ArchitectureIR.from_tensors(in_x, x)
+
+
+def _qparams(details):
+    scale, zero_point = details['quantization']
+    return np.float32(scale), zero_point
+
+
+def _tensor_qparams(tensor_range):
+    scale, zero_point = activation_qparams(*tensor_range)
+    return np.float32(scale), zero_point
+
+
+def test_export_uses_trained_ranges(random_ir_weights):
+    arch = _small_model()
+    weights = random_ir_weights(arch)
+    rng = np.random.RandomState(1)
+    samples = rng.uniform(-1, 1, size=[16, 8, 8, 3]).astype(np.float32)
+
+    graph = tf.Graph()
+    with graph.as_default():
+        initial_ranges = adjust_ranges(arch, calibrate(arch, weights, samples, batch_size=4))
+        qat = build_qat_graph(arch, weights, initial_ranges, range_decay=0.5)
+        with tf.Session(graph=graph) as sess:
+            sess.run(tf.global_variables_initializer())
+            # Ranges are moved away from the calibrated ones by the updates on the wider inputs
+            for _ in range(20):
+                sess.run(qat.update_ops, feed_dict={qat.inputs[0]: 3.0 * rng.uniform(-1, 1, size=[4, 8, 8, 3])})
+            ranges = qat.export_ranges(sess)
+            quantized = qat.export(sess, int8_io=True)
+
+    assert ranges[arch.inputs[0]][1] > initial_ranges[arch.inputs[0]][1] + 0.1
+
+    interpreter = tf.lite.Interpreter(model_content=quantized.int8_model)
+    model_qparams = {_qparams(details) for details in interpreter.get_tensor_details() if details['dtype'] == np.int8}
+
+    input_name, output_name = quantized.arch.inputs[0], quantized.arch.outputs[0]
+    assert _qparams(interpreter.get_input_details()[0]) == _tensor_qparams(ranges[input_name])
+    assert _qparams(interpreter.get_output_details()[0]) == _tensor_qparams(ranges[output_name])
+
+    for spec in quantized.arch.layers:
+        if spec.type == 'InputLayer' or fused_with_activation(quantized.arch, spec):
+            continue
+        for tensor_name in spec.outputs:
+            np.testing.assert_allclose(quantized.ranges[tensor_name], ranges[tensor_name], rtol=1e-6)
+            assert _tensor_qparams(ranges[tensor_name]) in model_qparams, tensor_name
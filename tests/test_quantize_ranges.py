@@ -0,0 +1,93 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy as np
+import pytest
+
+tf = pytest.importorskip('tensorflow').compat.v1
+
+from makizoo.ir import ArchitectureIR
+from makizoo.ir import layers
+from makizoo.quantize import quantize_arch, activation_qparams, fused_with_activation, TFLiteRunner, SessionRunner
+
+
+def _small_model():
+    in_x = layers.InputLayer(input_shape=[1, 8, 8, 3], name='input')
+    x = layers.ConvLayer(kw=3, kh=3, in_f=3, out_f=8, activation='relu6', name='conv')(in_x)
+    y = layers.DepthWiseConvLayer(kw=3, kh=3, in_f=8, multiplier=1, activation=None, name='dw')(x)
+    y = layers.SumLayer(name='sum')([x, y])
+    # Batch normalization after the sum can not be folded into convolution
+    y = layers.BatchNormLayer(D=8, name='bn')(y)
+    y = layers.ActivationLayer(activation='relu', name='relu')(y)
+    x = layers.ConcatLayer(name='cat')([x, y])
+    x = layers.MaxPoolLayer(name='pool')(x)
+    x = layers.GlobalAvgPoolLayer(name='global_avg')(x)
+    x = layers.DenseLayer(in_d=16, out_d=5, activation=None, name='fc')(x)
+    return ArchitectureIR.from_tensors(in_x, x)
+
+
+def _qparams(details):
+    scale, zero_point = details['quantization']
+    return np.float32(scale), zero_point
+
+
+@pytest.mark.parametrize('per_channel', [True, False])
+def test_int8_model_uses_ranges(random_ir_weights, per_channel):
+    arch = _small_model()
+    samples = np.random.RandomState(1).uniform(-1, 1, size=[16, 8, 8, 3]).astype(np.float32)
+    quantized = quantize_arch(arch, random_ir_weights(arch), samples, per_channel=per_channel, int8_io=True)
+
+    interpreter = tf.lite.Interpreter(model_content=quantized.int8_model)
+    tensors = interpreter.get_tensor_details()
+    assert interpreter.get_input_details()[0]['dtype'] == np.int8
+    assert interpreter.get_output_details()[0]['dtype'] == np.int8
+
+    # Every quantized tensor of the IR has exactly the scale and zero point of its adjusted range
+    model_qparams = {_qparams(details) for details in tensors if details['dtype'] == np.int8}
+    for spec in [None] + quantized.arch.layers:
+        tensor_names = quantized.arch.inputs if spec is None else spec.outputs
+        if fused_with_activation(quantized.arch, spec):
+            continue
+        for tensor_name in tensor_names:
+            scale, zero_point = activation_qparams(*quantized.ranges[tensor_name])
+            assert (np.float32(scale), zero_point) in model_qparams, tensor_name
+
+    input_range = quantized.ranges[quantized.arch.inputs[0]]
+    output_range = quantized.ranges[quantized.arch.outputs[0]]
+    input_scale, input_zero_point = activation_qparams(*input_range)
+    output_scale, output_zero_point = activation_qparams(*output_range)
+    assert _qparams(interpreter.get_input_details()[0]) == (np.float32(input_scale), input_zero_point)
+    assert _qparams(interpreter.get_output_details()[0]) == (np.float32(output_scale), output_zero_point)
+
+    # Kernels have the scales of `quantized_weights`
+    for layer_name, params in quantized.quantized_weights.items():
+        expected = params['W_scale'].ravel()
+        assert any(
+            len(details['quantization_parameters']['scales']) == len(expected) and
+            np.allclose(details['quantization_parameters']['scales'], expected, rtol=1e-6)
+            for details in tensors
+        ), layer_name
+
+    # Simulated int8 model is the converted model up to rounding of the requantization
+    runner = TFLiteRunner(quantized.int8_model)
+    simulated_runner = SessionRunner(quantized.arch, quantized.weights, quantized.ranges, per_channel)
+    try:
+        for sample in samples[:4]:
+            diff = np.abs(runner(sample[None]) - simulated_runner(sample[None]))
+            assert np.max(diff) <= 2 * output_scale + 1e-6
+    finally:
+        simulated_runner.close()
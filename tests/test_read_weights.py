@@ -0,0 +1,68 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy as np
+import pytest
+
+tf = pytest.importorskip('tensorflow').compat.v1
+pytest.importorskip('makiflow')
+
+from makizoo.ir import ArchitectureIR, lower
+from makizoo.ir import layers
+from makizoo.ir.weights import read_weights
+
+
+def _small_model():
+    in_x = layers.InputLayer(input_shape=[1, 8, 8, 3], name='input')
+    x = layers.ConvLayer(kw=3, kh=3, in_f=3, out_f=8, use_bias=False, activation=None, name='conv')(in_x)
+    x = layers.BatchNormLayer(D=8, name='bn')(x)
+    x = layers.DepthWiseConvLayer(kw=3, kh=3, in_f=8, multiplier=1, name='dw')(x)
+    x = layers.GlobalAvgPoolLayer(name='global_avg')(x)
+    x = layers.DenseLayer(in_d=8, out_d=5, activation=None, name='fc')(x)
+    return ArchitectureIR.from_tensors(in_x, x)
+
+
+def test_lower_read_weights_round_trip(random_ir_weights):
+    arch = _small_model()
+    weights = random_ir_weights(arch)
+    del weights['conv']['b']
+
+    graph = tf.Graph()
+    with graph.as_default():
+        lowered_layers = {}
+        lower(arch, weights, layers=lowered_layers)
+        assert set(lowered_layers) == {spec.name for spec in arch.layers if spec.type != 'InputLayer'}
+
+        with tf.Session(graph=graph) as sess:
+            sess.run(tf.global_variables_initializer())
+            restored = read_weights(arch, lowered_layers, sess)
+
+            assert set(restored) == set(weights)
+            for layer_name, params in weights.items():
+                assert set(restored[layer_name]) == set(params)
+                for param_name, value in params.items():
+                    np.testing.assert_array_equal(restored[layer_name][param_name], value)
+
+            # Values are read from the session, i.e. trained values are returned
+            lowered_layers['fc'].W.load(np.ones([8, 5], np.float32), sess)
+            np.testing.assert_array_equal(read_weights(arch, lowered_layers, sess)['fc']['W'], 1.0)
+
+
+def test_read_weights_requires_layers():
+    arch = _small_model()
+    with pytest.raises(ValueError):
+        read_weights(arch, {}, sess=None)
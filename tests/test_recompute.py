@@ -0,0 +1,78 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy as np
+import pytest
+
+tf = pytest.importorskip('tensorflow').compat.v1
+
+from makizoo.ir import ArchitectureIR, build_tf_graph
+from makizoo.ir import layers
+from makizoo.training import set_recompute_hints, get_recompute_config, RECOMPUTE_HINT
+
+INPUT_SHAPE = [2, 8, 8, 3]
+
+
+def _small_model():
+    in_x = layers.InputLayer(input_shape=INPUT_SHAPE, name='input')
+    x = layers.ConvLayer(kw=3, kh=3, in_f=3, out_f=8, activation=None, name='conv1')(in_x)
+    x = layers.BatchNormLayer(D=8, name='bn')(x)
+    x = layers.ActivationLayer(activation='relu', name='relu')(x)
+    x = layers.ConvLayer(kw=3, kh=3, in_f=8, out_f=4, activation=None, name='conv2')(x)
+    x = layers.GlobalAvgPoolLayer(name='global_avg')(x)
+    return ArchitectureIR.from_tensors(in_x, x)
+
+
+def test_recompute_hints_and_config(random_ir_weights):
+    arch = _small_model()
+    weights = random_ir_weights(arch)
+    x = np.random.RandomState(1).uniform(-1, 1, size=INPUT_SHAPE).astype(np.float32)
+
+    graph = tf.Graph()
+    with graph.as_default():
+        variables = {
+            layer_name: {
+                name: tf.Variable(value, name=f'{layer_name}_{name}') for name, value in weights[layer_name].items()
+            }
+            for layer_name in ('conv1', 'conv2')
+        }
+        tensors = build_tf_graph(arch, dict(weights, **variables), inputs={arch.inputs[0]: tf.constant(x)})
+        loss = tf.reduce_sum(tf.square(tensors[arch.outputs[0]]))
+        gradients = tf.gradients(loss, [variables['conv1']['W'], variables['conv2']['W']])
+
+        marked = set_recompute_hints([['bn', 'relu']])
+        assert len(marked) != 0
+        for op in marked:
+            assert op.name.startswith(('bn/', 'relu/'))
+            assert op.get_attr(RECOMPUTE_HINT) == 1
+        assert not any(op.name.startswith('gradients/') for op in marked)
+
+        config = get_recompute_config(tf.ConfigProto(inter_op_parallelism_threads=2))
+        rewrite_options = config.graph_options.rewrite_options
+        assert rewrite_options.memory_optimization == rewrite_options.MANUAL
+        assert rewrite_options.memory_optimizer_target_node_name_scope == 'gradients/'
+        assert config.inter_op_parallelism_threads == 2
+
+        # Recomputation does not change the gradients
+        init_op = tf.global_variables_initializer()
+        values = []
+        for session_config in (None, config):
+            with tf.Session(graph=graph, config=session_config) as sess:
+                sess.run(init_op)
+                values.append(sess.run(gradients))
+    for expected, actual in zip(*values):
+        np.testing.assert_allclose(actual, expected, rtol=1e-5, atol=1e-6)
@@ -0,0 +1,64 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow')
+
+from makizoo.ir import ArchitectureIR
+from makizoo.ir import layers
+from makizoo.quantize import SensitivityAnalyzer
+
+
+def _small_model(batch_size):
+    in_x = layers.InputLayer(input_shape=[batch_size, 8, 8, 3], name='input')
+    x = layers.ConvLayer(kw=3, kh=3, in_f=3, out_f=8, activation='relu', name='conv')(in_x)
+    x = layers.GlobalAvgPoolLayer(name='global_avg')(x)
+    x = layers.DenseLayer(in_d=8, out_d=5, activation=None, name='fc')(x)
+    return ArchitectureIR.from_tensors(in_x, x)
+
+
+def _weights(seed=0):
+    rng = np.random.RandomState(seed)
+    return {
+        'conv': {'W': rng.normal(size=[3, 3, 3, 8]).astype(np.float32), 'b': np.zeros(8, np.float32)},
+        'fc': {'W': rng.normal(size=[8, 5]).astype(np.float32), 'b': np.zeros(5, np.float32)},
+    }
+
+
+def _samples(count):
+    return np.random.RandomState(1).uniform(size=[count, 8, 8, 3]).astype(np.float32)
+
+
+@pytest.mark.parametrize('count', [5, 70])
+def test_dynamic_batch_uses_all_samples(count):
+    analyzer = SensitivityAnalyzer(_small_model(None), _weights(), _samples(count))
+    assert analyzer.reference[0].shape == (count, 5)
+    assert analyzer._run()[0].shape == (count, 5)
+    rel_error, top1_agreement = analyzer.drift()
+    assert 0.0 <= top1_agreement <= 1.0
+
+
+def test_static_batch_skips_partial_batch():
+    analyzer = SensitivityAnalyzer(_small_model(4), _weights(), _samples(10))
+    assert analyzer.reference[0].shape == (8, 5)
+
+
+def test_static_batch_requires_enough_samples():
+    with pytest.raises(ValueError):
+        SensitivityAnalyzer(_small_model(4), _weights(), _samples(3))
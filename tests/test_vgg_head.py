@@ -0,0 +1,77 @@
+# Copyright (C) 2020  Igor Kilbas, Danil Gribanov
+#
+# This file is part of MakiZoo.
+#
+# MakiZoo is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MakiZoo is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow')
+pytest.importorskip('makiflow')
+
+from makizoo.ir import trace
+from makizoo.backbones.vgg.builder import build_VGG
+from makizoo.backbones.vgg.utils import dense_head_to_conv, FC6_KERNEL
+
+
+NUM_CLASSES = 10
+
+
+def _trace(input_shape, conv_head=False):
+    return trace(
+        build_VGG, input_shape=input_shape, include_top=True, num_classes=NUM_CLASSES, width_multiplier=0.25,
+        conv_head=conv_head
+    )
+
+
+def test_dense_head_is_default():
+    arch = _trace([None, 224, 224, 3])
+    assert arch.get_shape(arch.outputs[0]) == [None, NUM_CLASSES]
+    for layer_name in ('fc6', 'fc7', 'fc8'):
+        assert arch.get_layer(layer_name).type == 'DenseLayer'
+
+    with pytest.raises(ValueError):
+        _trace([None, None, None, 3])
+
+
+def test_conv_head_is_fully_convolutional():
+    arch = _trace([None, None, None, 3], conv_head=True)
+    assert arch.get_shape(arch.outputs[0]) == [None, NUM_CLASSES]
+    assert arch.get_layer('fc6').kernel == (FC6_KERNEL, FC6_KERNEL)
+    assert arch.get_layer('fc7').kernel == (1, 1)
+    assert arch.get_layer('fc8').kernel == (1, 1)
+
+    with pytest.raises(ValueError):
+        _trace([1, 64, 64, 3], conv_head=True)
+
+
+def test_conv_head_matches_dense_head(random_ir_weights, run_ir):
+    dense_arch = _trace([None, 224, 224, 3])
+    conv_arch = _trace([None, None, None, 3], conv_head=True)
+    dense_weights = random_ir_weights(dense_arch)
+    conv_weights = dense_head_to_conv(dense_weights)
+    for layer_name in ('fc6', 'fc7', 'fc8'):
+        assert np.ndim(dense_weights[layer_name]['W']) == 2
+        assert np.ndim(conv_weights[layer_name]['W']) == 4
+
+    x = np.random.RandomState(1).uniform(size=[2, 224, 224, 3]).astype(np.float32)
+    expected, = run_ir(dense_arch, dense_weights, x)
+    logits, = run_ir(conv_arch, conv_weights, x)
+    np.testing.assert_allclose(logits, expected, rtol=1e-4, atol=1e-4 * np.abs(expected).max())
+
+    # The same graph serves other batch sizes and resolutions
+    x = np.random.RandomState(2).uniform(size=[1, 256, 288, 3]).astype(np.float32)
+    logits, = run_ir(conv_arch, conv_weights, x)
+    assert logits.shape == (1, NUM_CLASSES)